@@ -0,0 +1,114 @@
+"""
+Notification Push Channel
+/ws/notifications?token=<access token>
+
+Replaces polling of /notifications/count (NotificationBell) and of the
+expiring-quotes badge. The server sends a snapshot on connect, then deltas
+(backend/modules/notification/services/realtime.py):
+
+    {"type": "snapshot", "unread_count": 3, "badges": {"quotes_expiring": 2}}
+    {"type": "notification", "notification": {...}, "unread_delta": 1}
+    {"type": "notifications_read", "ids": [...], "unread_delta": -2}
+    {"type": "badges", "badges": {"quotes_expiring": 1}}
+
+Browsers cannot set headers on a WebSocket, so the bearer token comes as a
+query parameter and is validated like any API request (get_current_user).
+A client may send "ping" (answered with {"type": "pong"}); the server sends
+{"type": "ping"} after KEEPALIVE_SECONDS without traffic so proxies keep the
+socket open. No database connection is held while the socket is idle.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from sqlalchemy import text
+
+from backend.core.auth.router import get_current_user
+from backend.core.auth.schemas import User as UserSchema
+from backend.core.database import AsyncSessionLocal
+from backend.core.pubsub import RESYNC_MESSAGE, get_pubsub
+from backend.modules.notification.services.realtime import (
+    EVENT_BADGES,
+    badge_monitor,
+    badges_topic,
+    build_snapshot,
+    user_topic,
+    visible_badges,
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+KEEPALIVE_SECONDS = 25
+
+
+async def _authenticate(token: str) -> Optional[UserSchema]:
+    async with AsyncSessionLocal() as db:
+        try:
+            return await get_current_user(token, db)
+        except HTTPException:
+            return None
+
+
+async def _snapshot(user: UserSchema, badges: Dict[str, int]) -> Dict[str, Any]:
+    async with AsyncSessionLocal() as db:
+        await db.execute(text("SELECT set_config('app.current_tenant', :tenant_id, true)"),
+                         {"tenant_id": str(user.tenant_id)})
+        return await build_snapshot(db, user, badges)
+
+
+async def _receive(websocket: WebSocket) -> None:
+    """Answer client pings; returns when the client goes away."""
+    try:
+        while True:
+            if await websocket.receive_text() == "ping":
+                await websocket.send_json({"type": "pong"})
+    except WebSocketDisconnect:
+        return
+
+
+@router.websocket("/ws/notifications")
+async def notifications_websocket(websocket: WebSocket, token: str = Query(...)):
+    user = await _authenticate(token)
+    if user is None or not user.tenant_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+
+    pubsub = get_pubsub()
+    await pubsub.start()
+    # Subscribe before the snapshot so nothing committed in between is missed
+    subscription = pubsub.subscribe([user_topic(user.tenant_id, user.id), badges_topic(user.tenant_id)])
+    badges = await badge_monitor.watch(user.tenant_id)
+    receiver = asyncio.create_task(_receive(websocket))
+    try:
+        await websocket.send_json(await _snapshot(user, badges))
+        while not receiver.done():
+            next_message = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait(
+                {next_message, receiver}, timeout=KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED
+            )
+            if next_message not in done:
+                next_message.cancel()
+                if not done:
+                    await websocket.send_json({"type": "ping"})
+                continue
+
+            message = next_message.result()
+            if subscription.take_missed() or message["type"] == RESYNC_MESSAGE["type"]:
+                await websocket.send_json(await _snapshot(user, badge_monitor.counts.get(str(user.tenant_id), {})))
+            elif message["type"] == EVENT_BADGES:
+                await websocket.send_json({"type": EVENT_BADGES, "badges": visible_badges(user, message["badges"])})
+            else:
+                await websocket.send_json(message)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.warning(f"Notification socket of user {user.id} closed: {e}")
+    finally:
+        receiver.cancel()
+        subscription.close()
+        badge_monitor.unwatch(user.tenant_id)
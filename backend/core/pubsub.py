@@ -0,0 +1,292 @@
+"""
+Realtime Pub/Sub
+Backs the /ws/notifications push channel (backend/api/websocket/notifications_ws.py).
+
+Publishers address a topic ("user:<tenant>:<user>", ...) and every socket
+subscribed to it gets the message. Messages are small JSON-able dicts.
+
+- publish_after_commit() queues a message on the session; it goes out only
+  once the transaction commits (a rolled-back notification is never pushed)
+- a subscriber whose queue is full loses messages; Subscription.missed
+  tells the socket to resend a snapshot instead of drifting
+
+Backends (env REALTIME_PUBSUB):
+    memory    (default) in-process fan-out; publishers and sockets must live
+              in the same worker process
+    postgres  NOTIFY on REALTIME_PG_CHANNEL, one LISTEN connection per process
+              that fans out locally - for several uvicorn workers and the arq
+              worker. LISTEN needs a session-mode connection: set
+              REALTIME_PUBSUB_DSN when DATABASE_URL goes through a
+              transaction-mode pooler.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+REALTIME_PUBSUB = os.getenv("REALTIME_PUBSUB", "memory").lower()
+REALTIME_PG_CHANNEL = os.getenv("REALTIME_PG_CHANNEL", "realtime_events")
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("REALTIME_SUBSCRIBER_QUEUE_SIZE", 100))
+RECONNECT_DELAY_SECONDS = 5.0
+PG_NOTIFY_MAX_BYTES = 7900  # NOTIFY payloads are capped at 8000 bytes
+
+# Sent to every local subscriber when messages may have been lost
+RESYNC_MESSAGE = {"type": "resync"}
+
+# session.info key holding (topic, message) pairs to publish on commit
+_PENDING_KEY = "pubsub_pending"
+
+
+# ============ SUBSCRIPTIONS ============
+
+class Subscription:
+    """Bounded queue of the messages of one or more topics"""
+
+    def __init__(self, pubsub: "InProcessPubSub", topics: Tuple[str, ...], maxsize: int):
+        self.pubsub = pubsub
+        self.topics = topics
+        self._queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize)
+        self.dropped = 0
+        self.missed = False
+
+    def put(self, message: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            self.missed = True
+
+    async def get(self) -> Dict[str, Any]:
+        return await self._queue.get()
+
+    def take_missed(self) -> bool:
+        """True (once) if messages were dropped since the last call; clears the queue."""
+        if not self.missed:
+            return False
+        self.missed = False
+        self.clear()
+        return True
+
+    def clear(self) -> int:
+        """Drop the queued messages; returns how many were dropped."""
+        cleared = 0
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            cleared += 1
+        return cleared
+
+    def close(self) -> None:
+        self.pubsub.unsubscribe(self)
+
+    async def __aenter__(self) -> "Subscription":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.close()
+
+
+# ============ BACKENDS ============
+
+class InProcessPubSub:
+    """Fan-out to the subscribers of this process"""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(self, tuple(topics), self.queue_size)
+        for topic in subscription.topics:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[topic]
+
+    def subscriber_count(self, topic: Optional[str] = None) -> int:
+        if topic is not None:
+            return len(self._subscribers.get(topic, ()))
+        return len({s for subscribers in self._subscribers.values() for s in subscribers})
+
+    def deliver(self, topic: str, message: Dict[str, Any]) -> int:
+        """Hand a message to the local subscribers of `topic` (no cross-process fan-out)."""
+        subscribers = self._subscribers.get(topic)
+        if not subscribers:
+            return 0
+        for subscription in list(subscribers):
+            subscription.put(message)
+        return len(subscribers)
+
+    def deliver_all(self, message: Dict[str, Any]) -> None:
+        for subscription in {s for subscribers in self._subscribers.values() for s in subscribers}:
+            subscription.put(message)
+
+    async def publish(self, topic: str, message: Dict[str, Any]) -> None:
+        self.deliver(topic, message)
+
+    def publish_nowait(self, topic: str, message: Dict[str, Any]) -> None:
+        """Publish from synchronous code running on the event loop (session events)."""
+        self.deliver(topic, message)
+
+
+class PostgresPubSub(InProcessPubSub):
+    """NOTIFY to every process; each process LISTENs once and fans out locally"""
+
+    def __init__(self, dsn: Optional[str] = None, channel: str = REALTIME_PG_CHANNEL,
+                 queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        super().__init__(queue_size)
+        self.dsn = dsn
+        self.channel = channel
+        self._listener_task: Optional[asyncio.Task] = None
+        self._pending_publishes: Set[asyncio.Task] = set()
+
+    def _connect_params(self) -> Tuple[str, Dict[str, Any]]:
+        from backend.core import database
+
+        dsn = self.dsn or os.getenv("REALTIME_PUBSUB_DSN") or database.ASYNC_DATABASE_URL
+        kwargs = {}
+        if "ssl" in database._connect_args:
+            kwargs["ssl"] = database._connect_args["ssl"]
+        return dsn.replace("postgresql+asyncpg://", "postgresql://"), kwargs
+
+    async def start(self) -> None:
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen_forever())
+
+    async def stop(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        try:
+            envelope = json.loads(payload)
+            self.deliver(envelope["topic"], envelope["message"])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring malformed realtime payload: {e}")
+
+    async def _listen_forever(self) -> None:
+        import asyncpg
+
+        first = True
+        while True:
+            connection = None
+            try:
+                dsn, kwargs = self._connect_params()
+                connection = await asyncpg.connect(dsn, **kwargs)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _conn: closed.set())
+                await connection.add_listener(self.channel, self._on_notify)
+                if not first:
+                    # Anything published while we were away is lost
+                    self.deliver_all(RESYNC_MESSAGE)
+                first = False
+                await closed.wait()
+                logger.warning("Realtime LISTEN connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Realtime LISTEN failed: {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    def _encode(self, topic: str, message: Dict[str, Any]) -> str:
+        payload = json.dumps({"topic": topic, "message": message}, default=str)
+        if len(payload.encode()) > PG_NOTIFY_MAX_BYTES:
+            # Too large for NOTIFY: subscribers reload instead
+            payload = json.dumps({"topic": topic, "message": RESYNC_MESSAGE})
+        return payload
+
+    async def publish(self, topic: str, message: Dict[str, Any]) -> None:
+        from backend.core.database import async_engine
+
+        # Delivered back to this process through LISTEN as well
+        async with async_engine.connect() as conn:
+            await conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.channel, "payload": self._encode(topic, message)},
+            )
+            await conn.commit()
+
+    def publish_nowait(self, topic: str, message: Dict[str, Any]) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning(f"Realtime message to {topic} dropped: no running event loop")
+            return
+        task = loop.create_task(self._safe_publish(topic, message))
+        self._pending_publishes.add(task)
+        task.add_done_callback(self._pending_publishes.discard)
+
+    async def _safe_publish(self, topic: str, message: Dict[str, Any]) -> None:
+        try:
+            await self.publish(topic, message)
+        except Exception as e:
+            logger.warning(f"Realtime publish to {topic} failed: {e}")
+
+
+# Process-wide singleton
+_pubsub: Optional[InProcessPubSub] = None
+
+
+def get_pubsub() -> InProcessPubSub:
+    global _pubsub
+    if _pubsub is None:
+        _pubsub = PostgresPubSub() if REALTIME_PUBSUB == "postgres" else InProcessPubSub()
+    return _pubsub
+
+
+def set_pubsub(pubsub: Optional[InProcessPubSub]) -> None:
+    """Swap the process-wide backend (tests, custom deployments)."""
+    global _pubsub
+    _pubsub = pubsub
+
+
+# ============ TRANSACTIONAL PUBLISH ============
+
+def publish_after_commit(session, topic: str, message: Dict[str, Any]) -> None:
+    """Publish `message` once the session's transaction commits; dropped on rollback."""
+    session.info.setdefault(_PENDING_KEY, []).append((topic, message))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    pending: List[Tuple[str, Dict[str, Any]]] = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    pubsub = get_pubsub()
+    for topic, message in pending:
+        try:
+            pubsub.publish_nowait(topic, message)
+        except Exception as e:
+            logger.warning(f"Realtime publish to {topic} failed: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
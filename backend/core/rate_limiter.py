@@ -0,0 +1,235 @@
+"""
+Rate Limit Backends
+Backs RateLimitMiddleware (backend/core/middleware/rate_limit.py).
+
+The middleware kept a list of request timestamps per IP behind a
+threading.Lock, rebuilt it on every request (O(limit)) and lived per
+process, so each Render worker allowed the full limit. Limits are now
+enforced with GCRA (generic cell rate algorithm): a token bucket stored as a
+single "theoretical arrival time" (TAT) per key. A request is O(1); `limit`
+requests may arrive as a burst, after which one is allowed every
+window / limit seconds - a smooth sliding window.
+
+- keys are per IP, user or tenant (rate_limit_key); user and tenant come
+  from the bearer token's claims, no DB round-trip
+- InProcessRateLimiter: a dict of TATs, per process
+- PostgresRateLimiter: one atomic INSERT ... ON CONFLICT DO UPDATE per
+  request on the UNLOGGED rate_limit_buckets table (migration 086), timed
+  with the database clock, so every worker shares the same buckets without
+  Redis. Expired buckets are pruned once a minute per process.
+
+Backends (env RATE_LIMIT_BACKEND):
+    memory    (default) per-process limits
+    postgres  limits shared by all workers
+
+Config (env):
+    RATE_LIMIT_KEY   ip (default) | user | tenant - requests without a valid
+                     token fall back to their IP
+"""
+
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from jose import JWTError, jwt
+from sqlalchemy import text
+from starlette.requests import HTTPConnection
+
+from backend.core.auth.security import ALGORITHM, SECRET_KEY
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_KEY = os.getenv("RATE_LIMIT_KEY", "ip").lower()
+IN_PROCESS_MAX_KEYS = 100_000
+PRUNE_INTERVAL_SECONDS = 60.0
+
+# Absorbs float error in the TAT arithmetic (epoch seconds are ~1e9)
+_EPSILON = 1e-6
+
+
+# ============ KEYS ============
+
+def client_ip(request: HTTPConnection) -> str:
+    """Client IP, honouring X-Forwarded-For (Render sits behind a proxy)."""
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def token_claims(request: HTTPConnection) -> Optional[dict]:
+    """Verified claims of the bearer token, None without a valid one."""
+    authorization = request.headers.get("Authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+
+def rate_limit_key(request: HTTPConnection, scope: str = RATE_LIMIT_KEY) -> str:
+    """Bucket owner of a request: "ip:...", "user:..." or "tenant:..."."""
+    if scope in ("user", "tenant"):
+        claims = token_claims(request)
+        owner = claims and claims.get("sub" if scope == "user" else "tenant_id")
+        if owner:
+            return f"{scope}:{owner}"
+    return f"ip:{client_ip(request)}"
+
+
+def key_func_for(scope: str) -> Callable[[HTTPConnection], str]:
+    return lambda request: rate_limit_key(request, scope)
+
+
+# ============ GCRA ============
+
+@dataclass  # not frozen: frozen __init__ costs ~1 µs per request
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds until the next request is allowed, 0 when allowed
+    reset_after: float  # seconds until the bucket is full again
+
+
+def _allowed(tat: float, now: float, limit: int, window: float) -> RateLimitDecision:
+    """Decision for a request that moved the bucket to `tat`."""
+    interval = window / limit
+    remaining = int((now - (tat - window)) / interval + _EPSILON)
+    return RateLimitDecision(True, limit, max(remaining, 0), 0.0, tat - now)
+
+
+def _limited(tat: float, now: float, limit: int, window: float) -> RateLimitDecision:
+    """Decision for a request rejected while the bucket is at `tat`."""
+    retry_after = tat + window / limit - window - now
+    return RateLimitDecision(False, limit, 0, max(retry_after, 0.0), max(tat - now, 0.0))
+
+
+def gcra(tat: Optional[float], now: float, limit: int, window: float) -> Tuple[RateLimitDecision, Optional[float]]:
+    """
+    One GCRA step. Returns the decision and the key's new TAT (None when the
+    request is rejected and the stored TAT must not change).
+    """
+    interval = window / limit
+    tat = max(tat or now, now)
+    new_tat = tat + interval
+    if new_tat - window > now + _EPSILON:
+        return _limited(tat, now, limit, window), None
+    return _allowed(new_tat, now, limit, window), new_tat
+
+
+# ============ BACKENDS ============
+
+class RateLimiter(ABC):
+    """Backend interface: count a request against `key` (`limit` per `window` seconds)."""
+
+    @abstractmethod
+    async def hit(self, key: str, limit: int, window: float) -> RateLimitDecision:
+        pass
+
+
+class InProcessRateLimiter(RateLimiter):
+    """GCRA buckets of this process"""
+
+    def __init__(self, max_keys: int = IN_PROCESS_MAX_KEYS, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    def check(self, key: str, limit: int, window: float) -> RateLimitDecision:
+        now = self.clock()
+        with self._lock:
+            decision, tat = gcra(self._tats.get(key), now, limit, window)
+            if tat is not None:
+                self._tats[key] = tat
+                if len(self._tats) > self.max_keys:
+                    self._prune(now)
+        return decision
+
+    async def hit(self, key: str, limit: int, window: float) -> RateLimitDecision:
+        return self.check(key, limit, window)
+
+    def _prune(self, now: float) -> None:
+        # A TAT in the past is a full bucket - the same as no entry
+        self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+        overflow = len(self._tats) - self.max_keys
+        if overflow > 0:
+            # Still too many live buckets: drop the oldest inserted
+            for key in list(self._tats)[:overflow]:
+                del self._tats[key]
+
+
+HIT_SQL = text("""
+    INSERT INTO rate_limit_buckets AS b (key, tat, seen_at)
+    SELECT :key, c.now + :interval, c.now
+    FROM (SELECT extract(epoch FROM clock_timestamp())::double precision AS now) c
+    ON CONFLICT (key) DO UPDATE
+    SET tat = GREATEST(b.tat, EXCLUDED.seen_at) + :interval, seen_at = EXCLUDED.seen_at
+    WHERE GREATEST(b.tat, EXCLUDED.seen_at) + :interval - :window <= EXCLUDED.seen_at + 0.000001
+    RETURNING tat, seen_at
+""")
+
+PEEK_SQL = text("""
+    SELECT tat, extract(epoch FROM clock_timestamp())::double precision
+    FROM rate_limit_buckets WHERE key = :key
+""")
+
+PRUNE_SQL = text("""
+    DELETE FROM rate_limit_buckets WHERE tat < extract(epoch FROM clock_timestamp())::double precision
+""")
+
+
+class PostgresRateLimiter(RateLimiter):
+    """GCRA buckets in rate_limit_buckets, shared by every worker"""
+
+    def __init__(self, engine=None, prune_interval: float = PRUNE_INTERVAL_SECONDS):
+        if engine is None:
+            from backend.core.database import async_engine
+            engine = async_engine
+        # One statement per request: no BEGIN/COMMIT round-trips
+        self.engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+        self.prune_interval = prune_interval
+        self._next_prune = time.monotonic() + prune_interval
+
+    async def hit(self, key: str, limit: int, window: float) -> RateLimitDecision:
+        params = {"key": key, "interval": window / limit, "window": float(window)}
+        async with self.engine.connect() as conn:
+            row = (await conn.execute(HIT_SQL, params)).first()
+            if row is not None:
+                decision = _allowed(row[0], row[1], limit, window)
+            else:
+                # Rejected: the row lock released, read the TAT for Retry-After
+                peek = (await conn.execute(PEEK_SQL, {"key": key})).first()
+                decision = _limited(peek[0], peek[1], limit, window) if peek else \
+                    RateLimitDecision(False, limit, 0, window / limit, window)
+            if time.monotonic() >= self._next_prune:
+                self._next_prune = time.monotonic() + self.prune_interval
+                await conn.execute(PRUNE_SQL)
+        return decision
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = PostgresRateLimiter() if RATE_LIMIT_BACKEND == "postgres" else InProcessRateLimiter()
+    return _rate_limiter
+
+
+def set_rate_limiter(rate_limiter: Optional[RateLimiter]) -> None:
+    """Swap the process-wide backend (tests, custom deployments)."""
+    global _rate_limiter
+    _rate_limiter = rate_limiter
@@ -8,6 +8,10 @@ Configuration:
 - Read endpoints: 60/minute per IP
 - Write endpoints: 20/minute per IP
 - Delete/Convert: 10/minute per IP (higher protection)
+
+These per-route decorators are per process. Global per-client limits that
+all workers share are RateLimitMiddleware (core/middleware/rate_limit.py,
+RATE_LIMIT_ENABLED=true, RATE_LIMIT_BACKEND=postgres).
 """
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -0,0 +1,237 @@
+"""
+In-app Background Workers
+Drains the durable job_outbox (core/tasks/outbox.py) and push_outbox
+(notification/services/push_sender.py) from the web process, and runs the
+daily tasks of the arq crons.
+
+render.yaml deploys the web service only, so the arq worker
+(core/tasks/worker.py), scripts/run_outbox_worker.py and
+scripts/run_push_worker.py may not run at all. Order completion side effects
+and mobile pushes would then wait in their outboxes forever. Each web
+process therefore polls both outboxes itself, from the app lifespan. Claims
+use SKIP LOCKED, so any number of web processes and dedicated workers can
+drain the same tables side by side.
+
+Daily tasks (DailyTask) are polled every DAILY_TASKS_IN_APP_INTERVAL
+seconds and run once their time of day (DAILY_TASKS_TIMEZONE) has passed,
+so a process started after that time still catches up. Every web process
+polls, but a run is claimed inside a transaction holding
+pg_try_advisory_xact_lock, and scheduled_task_runs (migration 089) records
+the day it ran for. So each task runs once a day across all processes, and
+a run whose process died is picked up again by the next poll.
+
+Config (env):
+    OUTBOX_IN_APP_WORKER    true (default) | false - turn off when a dedicated
+                            worker (arq or run_outbox_worker.py) is deployed
+    OUTBOX_IN_APP_INTERVAL  seconds between polls, default 5
+    PUSH_IN_APP_WORKER      true (default) | false - turn off when arq or
+                            run_push_worker.py delivers pushes
+    PUSH_IN_APP_INTERVAL    seconds between polls, default 2
+    DAILY_IN_APP_TASKS      true (default) | false - turn off when the arq
+                            worker runs the daily crons
+    DAILY_TASKS_IN_APP_INTERVAL  seconds between due checks, default 60
+    DAILY_TASKS_TIMEZONE    time zone of the times below, default Asia/Ho_Chi_Minh
+    RETIER_CUSTOMERS_AT     HH:MM of the CRM RFM re-tier pass, default 02:30
+    BIRTHDAY_GREETINGS_AT   HH:MM of the birthday campaign scheduling, default 03:00
+"""
+
+import asyncio
+import logging
+import os
+from datetime import date, datetime, time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_IN_APP_WORKER = os.getenv("OUTBOX_IN_APP_WORKER", "true").lower() == "true"
+OUTBOX_IN_APP_INTERVAL = float(os.getenv("OUTBOX_IN_APP_INTERVAL", 5))
+PUSH_IN_APP_WORKER = os.getenv("PUSH_IN_APP_WORKER", "true").lower() == "true"
+PUSH_IN_APP_INTERVAL = float(os.getenv("PUSH_IN_APP_INTERVAL", 2))
+DAILY_IN_APP_TASKS = os.getenv("DAILY_IN_APP_TASKS", "true").lower() == "true"
+DAILY_TASKS_IN_APP_INTERVAL = float(os.getenv("DAILY_TASKS_IN_APP_INTERVAL", 60))
+DAILY_TASKS_TIMEZONE = ZoneInfo(os.getenv("DAILY_TASKS_TIMEZONE", "Asia/Ho_Chi_Minh"))
+RETIER_CUSTOMERS_AT = time.fromisoformat(os.getenv("RETIER_CUSTOMERS_AT", "02:30"))
+BIRTHDAY_GREETINGS_AT = time.fromisoformat(os.getenv("BIRTHDAY_GREETINGS_AT", "03:00"))
+
+
+class PollingLoop:
+    """Calls `drain` every `interval` seconds until stopped; failures are logged and retried"""
+
+    def __init__(
+        self,
+        name: str,
+        drain: Callable[[], Awaitable[Dict[str, Any]]],
+        interval: float,
+        close: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        self.name = name
+        self.drain = drain
+        self.interval = interval
+        self.close = close  # releases the drain's resources once stopped
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name=f"background:{self.name}")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self.close is not None:
+            await self.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                totals = await self.drain()
+                if totals and totals.get("claimed"):
+                    logger.info(f"{self.name}: {totals}")
+            except Exception as e:
+                logger.warning(f"{self.name} drain failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# ============ DAILY TASKS ============
+
+# Held until the claiming transaction ends (also under transaction pooling)
+TRY_LOCK_TASK_SQL = text("SELECT pg_try_advisory_xact_lock(hashtext('scheduled_task:' || :name))")
+
+LAST_RUN_SQL = text("SELECT last_run_on FROM scheduled_task_runs WHERE name = :name")
+
+RECORD_RUN_SQL = text("""
+    INSERT INTO scheduled_task_runs (name, last_run_on, finished_at, last_error)
+    VALUES (:name, :day, NOW(), :error)
+    ON CONFLICT (name) DO UPDATE SET
+        last_run_on = EXCLUDED.last_run_on,
+        finished_at = EXCLUDED.finished_at,
+        last_error = EXCLUDED.last_error
+""")
+
+
+def _begin_claim():
+    from backend.core.database import async_engine
+    return async_engine.begin()
+
+
+class DailyTask:
+    """Runs `task` once a day after `at` (DAILY_TASKS_TIMEZONE), once across all processes"""
+
+    def __init__(
+        self,
+        name: str,
+        task: Callable[[], Awaitable[Any]],
+        at: time,
+        begin: Callable[[], Any] = _begin_claim,
+    ):
+        self.name = name
+        self.task = task
+        self.at = at
+        self.begin = begin  # -> async context manager of a connection in a transaction
+        self._done_on: Optional[date] = None  # day known to be done, skips the database
+
+    def due_day(self, now: datetime) -> Optional[date]:
+        """The day whose run is due at `now` (business-local), None before `at`."""
+        local = now.astimezone(DAILY_TASKS_TIMEZONE)
+        return local.date() if local.time() >= self.at else None
+
+    async def run_if_due(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        day = self.due_day(now or datetime.now(DAILY_TASKS_TIMEZONE))
+        if day is None or day == self._done_on:
+            return {"claimed": 0}
+
+        # The claim transaction stays open while the task runs in its own
+        # sessions: the lock keeps other processes out, and a crash rolls
+        # the claim back so the next poll runs the task again
+        async with self.begin() as conn:
+            if not await conn.scalar(TRY_LOCK_TASK_SQL, {"name": self.name}):
+                return {"claimed": 0}  # running in another process
+            last_run_on = await conn.scalar(LAST_RUN_SQL, {"name": self.name})
+            if last_run_on is not None and last_run_on >= day:
+                self._done_on = day
+                return {"claimed": 0}
+
+            error = None
+            result: Any = None
+            try:
+                result = await self.task()
+            except Exception as e:
+                # Recorded as the day's run: the next day's pass covers it
+                error = f"{type(e).__name__}: {e}"[:4000]
+                logger.error(f"Daily task {self.name} failed for {day}: {error}")
+            await conn.execute(RECORD_RUN_SQL, {"name": self.name, "day": day, "error": error})
+        self._done_on = day
+        return {"claimed": 1, "day": day.isoformat(), "result": result, "error": error}
+
+
+async def _retier_customers() -> Dict[str, int]:
+    from backend.modules.crm.application.rfm_engine import retier_all_tenants
+
+    results = await retier_all_tenants()
+    return {tenant_id: r.tier_changes for tenant_id, r in results.items()}
+
+
+async def _schedule_birthday_greetings() -> Dict[str, int]:
+    from backend.modules.crm.application.birthday_service import schedule_all_tenants
+
+    return await schedule_all_tenants()
+
+
+def _daily_task_loops() -> List[PollingLoop]:
+    tasks = [
+        DailyTask("crm.retier_customers", _retier_customers, RETIER_CUSTOMERS_AT),
+        DailyTask("crm.birthday_greetings", _schedule_birthday_greetings, BIRTHDAY_GREETINGS_AT),
+    ]
+    return [PollingLoop(f"daily:{task.name}", task.run_if_due, DAILY_TASKS_IN_APP_INTERVAL) for task in tasks]
+
+
+# ============ DRAINS ============
+
+def _outbox_loop() -> PollingLoop:
+    from backend.core.tasks.outbox import OutboxDispatcher, load_job_modules
+
+    load_job_modules()
+    return PollingLoop("job_outbox", OutboxDispatcher().drain, OUTBOX_IN_APP_INTERVAL)
+
+
+def _push_loop() -> PollingLoop:
+    from backend.modules.notification.services.push_sender import PushDeliveryWorker
+
+    worker = PushDeliveryWorker()
+    return PollingLoop("push_outbox", worker.drain, PUSH_IN_APP_INTERVAL, close=worker.aclose)
+
+
+# Loops started by this process
+_loops: List[PollingLoop] = []
+
+
+def start_background_workers() -> List[PollingLoop]:
+    """Start the enabled in-app drains and daily tasks (app lifespan start-up)."""
+    if _loops:
+        return _loops
+    if OUTBOX_IN_APP_WORKER:
+        _loops.append(_outbox_loop())
+    if PUSH_IN_APP_WORKER:
+        _loops.append(_push_loop())
+    if DAILY_IN_APP_TASKS:
+        _loops.extend(_daily_task_loops())
+    for loop in _loops:
+        loop.start()
+    return _loops
+
+
+async def stop_background_workers() -> None:
+    """Stop every in-app drain and daily task (app lifespan shutdown)."""
+    while _loops:
+        await _loops.pop().stop()
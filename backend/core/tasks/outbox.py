@@ -0,0 +1,305 @@
+"""
+Durable Job Outbox
+Background jobs stored in PostgreSQL (job_outbox), no Redis required.
+
+Producers call enqueue_job() inside their own transaction, so a job exists
+if and only if the business change that triggered it committed.
+
+OutboxDispatcher.process_batch() is the consumer:
+1. claim due jobs with UPDATE ... FOR UPDATE SKIP LOCKED (safe with many workers)
+2. run each handler in its own session with the job's tenant RLS context
+3. mark DONE, or reschedule with exponential backoff, or DEAD after max_attempts
+
+Handlers must be idempotent: a job may run again if a worker dies after the
+handler committed but before the job was marked DONE (expired lease).
+
+Register handlers with the @job decorator:
+
+    @job("crm.recalculate_stats")
+    async def recalculate_stats(db, tenant_id, payload): ...
+
+Drive the dispatcher from the arq worker (core/tasks/worker.py) or from
+scripts/run_outbox_worker.py.
+"""
+
+import logging
+import os
+import socket
+import traceback
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import Column, DateTime, Integer, String, Text, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from backend.core.database import AsyncSessionLocal, Base
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "PENDING"
+JOB_RUNNING = "RUNNING"
+JOB_DONE = "DONE"
+JOB_DEAD = "DEAD"
+
+DEFAULT_MAX_ATTEMPTS = 5
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 20))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", 300))
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 3600
+
+JobHandler = Callable[[AsyncSession, UUID, Dict[str, Any]], Awaitable[Any]]
+
+
+class JobOutboxModel(Base):
+    """Outbox row - see migration 075"""
+    __tablename__ = "job_outbox"
+
+    id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid4)
+    tenant_id = Column(PG_UUID(as_uuid=True), nullable=False)
+    job_name = Column(String(100), nullable=False)
+    payload = Column(JSONB, nullable=False, default=dict)
+    dedupe_key = Column(String(255), nullable=True)
+    status = Column(String(20), nullable=False, default=JOB_PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=DEFAULT_MAX_ATTEMPTS)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    locked_by = Column(String(100), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), nullable=True)
+
+
+# ============ REGISTRY ============
+
+@dataclass
+class JobDefinition:
+    name: str
+    handler: JobHandler
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+
+
+JOB_REGISTRY: Dict[str, JobDefinition] = {}
+
+
+def job(name: str, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+    """Register an outbox job handler: async def handler(db, tenant_id, payload)"""
+    def decorator(fn: JobHandler) -> JobHandler:
+        JOB_REGISTRY[name] = JobDefinition(name=name, handler=fn, max_attempts=max_attempts)
+        return fn
+    return decorator
+
+
+def load_job_modules() -> None:
+    """Import every module that registers jobs (worker start-up)."""
+    import backend.modules.order.application.completion_jobs  # noqa: F401
+    import backend.modules.crm.application.birthday_service  # noqa: F401
+    import backend.modules.finance.services.kpi_rollup_service  # noqa: F401
+
+
+# ============ PRODUCER ============
+
+def enqueue_job_statement(
+    tenant_id: UUID,
+    job_name: str,
+    payload: Optional[Dict[str, Any]] = None,
+    dedupe_key: Optional[str] = None,
+    delay_seconds: int = 0,
+    max_attempts: Optional[int] = None,
+):
+    """The INSERT of enqueue_job(), for sync sessions (ORM event hooks)."""
+    definition = JOB_REGISTRY.get(job_name)
+    values = {
+        "id": uuid4(),
+        "tenant_id": tenant_id,
+        "job_name": job_name,
+        "payload": payload or {},
+        "dedupe_key": dedupe_key,
+        "status": JOB_PENDING,
+        "attempts": 0,
+        "max_attempts": max_attempts or (definition.max_attempts if definition else DEFAULT_MAX_ATTEMPTS),
+    }
+    if delay_seconds:
+        values["run_after"] = datetime.now(timezone.utc) + timedelta(seconds=delay_seconds)
+    stmt = pg_insert(JobOutboxModel).values(**values)
+    if dedupe_key:
+        # Literal predicate: partial index inference cannot use bound parameters
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=[JobOutboxModel.dedupe_key],
+            index_where=text("dedupe_key IS NOT NULL AND status IN ('PENDING', 'RUNNING')"),
+        )
+    return stmt
+
+
+async def enqueue_job(
+    db: AsyncSession,
+    tenant_id: UUID,
+    job_name: str,
+    payload: Optional[Dict[str, Any]] = None,
+    dedupe_key: Optional[str] = None,
+    delay_seconds: int = 0,
+    max_attempts: Optional[int] = None,
+) -> None:
+    """
+    Insert a job in the caller's transaction (committed together with it).
+    With a dedupe_key, a job that is already queued or running is not duplicated.
+    """
+    await db.execute(enqueue_job_statement(tenant_id, job_name, payload, dedupe_key, delay_seconds, max_attempts))
+
+
+# ============ CONSUMER ============
+
+CLAIM_JOBS_SQL = text("""
+    UPDATE job_outbox
+    SET status = 'RUNNING', attempts = attempts + 1, locked_at = NOW(), locked_by = :worker_id
+    WHERE id IN (
+        SELECT id FROM job_outbox
+        WHERE (status = 'PENDING' AND run_after <= NOW())
+           OR (status = 'RUNNING' AND locked_at < NOW() - make_interval(secs => :lease_seconds))
+        ORDER BY run_after
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, tenant_id, job_name, payload, attempts, max_attempts
+""")
+
+MARK_DONE_SQL = text("""
+    UPDATE job_outbox
+    SET status = 'DONE', completed_at = NOW(), locked_at = NULL, last_error = NULL
+    WHERE id = :id AND locked_by = :worker_id
+""")
+
+MARK_FAILED_SQL = text("""
+    UPDATE job_outbox
+    SET status = :status, run_after = NOW() + make_interval(secs => :delay_seconds),
+        locked_at = NULL, last_error = :error
+    WHERE id = :id AND locked_by = :worker_id
+""")
+
+
+@dataclass
+class ClaimedJob:
+    id: UUID
+    tenant_id: UUID
+    job_name: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+
+
+def backoff_seconds(attempts: int) -> int:
+    """10s, 20s, 40s, ... capped at one hour"""
+    return min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+
+
+class OutboxDispatcher:
+    """Claims and runs due outbox jobs"""
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        worker_id: Optional[str] = None,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        lease_seconds: int = OUTBOX_LEASE_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+
+    async def _bypass_rls(self, db: AsyncSession) -> None:
+        # Transaction-local, so the pooled connection does not keep it
+        await db.execute(text("SELECT set_config('app.bypass_rls', 'on', true)"))
+
+    async def claim(self) -> List[ClaimedJob]:
+        async with self.session_factory() as db:
+            await self._bypass_rls(db)
+            result = await db.execute(CLAIM_JOBS_SQL, {
+                "worker_id": self.worker_id,
+                "lease_seconds": self.lease_seconds,
+                "batch_size": self.batch_size,
+            })
+            rows = result.fetchall()
+            await db.commit()
+        return [
+            ClaimedJob(id=r[0], tenant_id=r[1], job_name=r[2], payload=r[3] or {}, attempts=r[4], max_attempts=r[5])
+            for r in rows
+        ]
+
+    async def _update(self, sql, params: Dict[str, Any]) -> None:
+        async with self.session_factory() as db:
+            await self._bypass_rls(db)
+            await db.execute(sql, {**params, "worker_id": self.worker_id})
+            await db.commit()
+
+    async def run_job(self, claimed: ClaimedJob) -> str:
+        """Run one claimed job and record the outcome. Returns the new status."""
+        definition = JOB_REGISTRY.get(claimed.job_name)
+        if definition is None:
+            await self._update(MARK_FAILED_SQL, {
+                "id": claimed.id, "status": JOB_DEAD, "delay_seconds": 0,
+                "error": f"No handler registered for job '{claimed.job_name}'",
+            })
+            logger.error(f"Outbox job {claimed.id}: unknown job '{claimed.job_name}' dead-lettered")
+            return JOB_DEAD
+
+        try:
+            async with self.session_factory() as db:
+                # Session-level like the request path: handlers may commit midway
+                await db.execute(
+                    text("SELECT set_config('app.current_tenant', :tenant_id, false)"),
+                    {"tenant_id": str(claimed.tenant_id)},
+                )
+                await definition.handler(db, claimed.tenant_id, claimed.payload)
+                await db.commit()
+        except Exception as e:
+            dead = claimed.attempts >= claimed.max_attempts
+            status = JOB_DEAD if dead else JOB_PENDING
+            error = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+            await self._update(MARK_FAILED_SQL, {
+                "id": claimed.id, "status": status,
+                "delay_seconds": 0 if dead else backoff_seconds(claimed.attempts),
+                "error": error[:4000],
+            })
+            log = logger.error if dead else logger.warning
+            log(f"Outbox job {claimed.job_name} ({claimed.id}) attempt {claimed.attempts}/{claimed.max_attempts} failed: {e}")
+            return status
+
+        await self._update(MARK_DONE_SQL, {"id": claimed.id})
+        return JOB_DONE
+
+    async def process_batch(self) -> Dict[str, int]:
+        """Claim one batch and run it. Returns counts per outcome."""
+        counts = {"claimed": 0, JOB_DONE: 0, JOB_PENDING: 0, JOB_DEAD: 0}
+        for claimed in await self.claim():
+            counts["claimed"] += 1
+            counts[await self.run_job(claimed)] += 1
+        return counts
+
+    async def drain(self, max_batches: int = 50) -> Dict[str, int]:
+        """Process batches until nothing is due (bounded)."""
+        totals = {"claimed": 0, JOB_DONE: 0, JOB_PENDING: 0, JOB_DEAD: 0}
+        for _ in range(max_batches):
+            counts = await self.process_batch()
+            for key, value in counts.items():
+                totals[key] += value
+            if counts["claimed"] < self.batch_size:
+                break
+        return totals
+
+
+async def requeue_dead_job(db: AsyncSession, job_id: UUID) -> bool:
+    """Give a dead-lettered job a fresh set of attempts (caller commits)."""
+    result = await db.execute(
+        text("""
+            UPDATE job_outbox
+            SET status = 'PENDING', attempts = 0, run_after = NOW(), last_error = NULL
+            WHERE id = :id AND status = 'DEAD'
+        """),
+        {"id": job_id},
+    )
+    return result.rowcount > 0
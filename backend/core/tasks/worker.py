@@ -1,8 +1,46 @@
+from arq import cron
 from arq.connections import RedisSettings
 from datetime import timedelta
 
+from backend.core.tasks.outbox import OutboxDispatcher, load_job_modules
+from backend.modules.notification.services.push_sender import PushDeliveryWorker
+
+
+async def process_outbox(ctx):
+    """Run due job_outbox jobs (order completion side effects, ...)"""
+    return await ctx['outbox'].drain()
+
+
+async def deliver_push(ctx):
+    """Send queued Expo push notifications (push_outbox) in batches of 100"""
+    return await ctx['push'].drain()
+
+
+async def retier_customers(ctx):
+    """Nightly CRM RFM pass: recency tiers (LOYAL -> CHURN_RISK) follow the calendar"""
+    from backend.modules.crm.application.rfm_engine import retier_all_tenants
+    results = await retier_all_tenants()
+    return {tenant_id: r.tier_changes for tenant_id, r in results.items()}
+
+
+async def schedule_birthday_greetings(ctx):
+    """Daily: enqueue birthday greetings (sent by the outbox on the morning of the birthday)"""
+    from backend.modules.crm.application.birthday_service import schedule_all_tenants
+    return await schedule_all_tenants()
+
+
 class WorkerSettings:
-    functions = [] # We will add task functions here
+    functions = [process_outbox, deliver_push, retier_customers, schedule_birthday_greetings]
+    cron_jobs = [
+        # Every 5 seconds; the outbox itself is durable, arq only drives it
+        cron(process_outbox, second=set(range(0, 60, 5)), unique=True, run_at_startup=True),
+        cron(deliver_push, second=set(range(0, 60, 5)), unique=True, run_at_startup=True),
+        # 02:30 server time, off-peak. The web process runs these itself
+        # (core/tasks/background.py): set DAILY_IN_APP_TASKS=false there when
+        # this worker is deployed
+        cron(retier_customers, hour=2, minute=30, unique=True),
+        cron(schedule_birthday_greetings, hour=3, minute=0, unique=True),
+    ]
     redis_settings = RedisSettings(host='localhost', port=6379)
     on_startup = None
     on_shutdown = None
@@ -10,12 +48,14 @@ class WorkerSettings:
     job_timeout = timedelta(minutes=10)
 
 async def startup(ctx):
-    # Initialize DB connection pool, etc.
-    pass
+    load_job_modules()
+    ctx['outbox'] = OutboxDispatcher()
+    # One pooled HTTP client for the worker's lifetime
+    ctx['push'] = PushDeliveryWorker()
 
 async def shutdown(ctx):
     # Close DB connections
-    pass
+    await ctx['push'].aclose()
 
 WorkerSettings.on_startup = startup
 WorkerSettings.on_shutdown = shutdown
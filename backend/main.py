@@ -2,7 +2,7 @@ from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import routers
-from backend.api.websocket import workflow_ws
+from backend.api.websocket import workflow_ws, notifications_ws
 
 # ISS-002 FIX: Rate Limiting
 from backend.core.rate_limiting import limiter, get_rate_limit_exceeded_handler, get_rate_limit_exception
@@ -20,8 +20,14 @@ async def lifespan(app: FastAPI):
     # Startup: Run hotfix migrations
     await apply_logo_column_hotfix()
     await seed_menu_data_hotfix()
+    # Drain job_outbox and push_outbox in-process (no dedicated worker is deployed by default)
+    from backend.core.tasks.background import start_background_workers, stop_background_workers
+    start_background_workers()
     yield
-    # Shutdown logic (if any)
+    await stop_background_workers()
+    # Shutdown: close the realtime LISTEN connection (REALTIME_PUBSUB=postgres)
+    from backend.core.pubsub import get_pubsub
+    await get_pubsub().stop()
 
 app = FastAPI(
     title="AI Workforce API",
@@ -40,8 +46,14 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, get_rate_limit_exceeded_handler())
 
-# CORS Configuration — reads from CORS_ORIGINS env var in production
+# Global per-client limits (backend: RATE_LIMIT_BACKEND, keys: RATE_LIMIT_KEY).
+# Added before CORS so that 429 responses still carry CORS headers.
 import os
+if os.getenv("RATE_LIMIT_ENABLED", "false").lower() == "true":
+    from backend.core.middleware.rate_limit import RateLimitMiddleware, DEFAULT_ENDPOINT_LIMITS
+    app.add_middleware(RateLimitMiddleware, endpoint_limits=DEFAULT_ENDPOINT_LIMITS)
+
+# CORS Configuration — reads from CORS_ORIGINS env var in production
 _cors_origins_env = os.getenv("CORS_ORIGINS", "")
 if _cors_origins_env == "*":
     # Wildcard mode: allow all origins WITHOUT credentials (CORS spec requirement)
@@ -72,6 +84,7 @@ app.add_middleware(
 
 # Include Routers
 app.include_router(workflow_ws.router, tags=["workflow-websocket"])
+app.include_router(notifications_ws.router, tags=["notification-websocket"])
 
 from backend.core.auth import router as auth_router
 from backend.modules.menu.infrastructure import http_router as menu_router
@@ -0,0 +1,41 @@
+-- Migration 074: Finance daily KPI rollups
+-- Pre-aggregated per-tenant daily rows for /finance/dashboard and /analytics/overview
+-- Backfill after applying: python backend/scripts/rebuild_finance_kpis.py
+
+CREATE TABLE IF NOT EXISTS finance_daily_kpis (
+    tenant_id UUID NOT NULL REFERENCES tenants(id) ON DELETE CASCADE,
+    kpi_date DATE NOT NULL,
+
+    -- Orders by created_at
+    paid_revenue NUMERIC(15, 2) NOT NULL DEFAULT 0,
+    orders_created INTEGER NOT NULL DEFAULT 0,
+    receivables_amount NUMERIC(15, 2) NOT NULL DEFAULT 0,
+    receivables_count INTEGER NOT NULL DEFAULT 0,
+
+    -- Orders by event_date
+    booked_revenue NUMERIC(15, 2) NOT NULL DEFAULT 0,
+
+    -- Finance transactions by transaction_date
+    payment_amount NUMERIC(15, 2) NOT NULL DEFAULT 0,
+    expense_amount NUMERIC(15, 2) NOT NULL DEFAULT 0,
+
+    -- Open purchase orders by due_date (dated) or created_at (undated)
+    payables_dated NUMERIC(15, 2) NOT NULL DEFAULT 0,
+    payables_undated NUMERIC(15, 2) NOT NULL DEFAULT 0,
+
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (tenant_id, kpi_date)
+);
+
+-- RLS
+ALTER TABLE finance_daily_kpis ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY tenant_isolation_finance_daily_kpis ON finance_daily_kpis
+    USING (tenant_id = (SELECT current_setting('app.current_tenant')::UUID));
+
+-- Range indexes used by the per-day refresh (half-open ranges, no date() casts)
+CREATE INDEX IF NOT EXISTS idx_orders_tenant_created_at ON orders(tenant_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_orders_tenant_event_date ON orders(tenant_id, event_date);
+CREATE INDEX IF NOT EXISTS idx_finance_tx_tenant_date ON finance_transactions(tenant_id, transaction_date);
+CREATE INDEX IF NOT EXISTS idx_po_tenant_due_date ON purchase_orders(tenant_id, due_date);
+CREATE INDEX IF NOT EXISTS idx_po_tenant_created_at ON purchase_orders(tenant_id, created_at);
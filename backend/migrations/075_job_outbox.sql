@@ -0,0 +1,46 @@
+-- Migration 075: Durable background job outbox
+-- Jobs are inserted in the same transaction as the business change that
+-- triggers them and executed by the outbox worker (arq cron or
+-- python backend/scripts/run_outbox_worker.py). PENDING -> RUNNING -> DONE,
+-- or back to PENDING with backoff on failure, and DEAD after max_attempts.
+
+CREATE TABLE IF NOT EXISTS job_outbox (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    tenant_id UUID NOT NULL REFERENCES tenants(id) ON DELETE CASCADE,
+
+    job_name VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    dedupe_key VARCHAR(255),
+
+    status VARCHAR(20) NOT NULL DEFAULT 'PENDING',  -- PENDING, RUNNING, DONE, DEAD
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+
+    locked_at TIMESTAMP WITH TIME ZONE,
+    locked_by VARCHAR(100),
+    last_error TEXT,
+
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    completed_at TIMESTAMP WITH TIME ZONE
+);
+
+-- RLS (the worker claims across tenants with app.bypass_rls, transaction-local)
+ALTER TABLE job_outbox ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY tenant_isolation_job_outbox ON job_outbox
+    USING (
+        tenant_id = (SELECT current_setting('app.current_tenant', true))::UUID
+        OR (SELECT current_setting('app.bypass_rls', true)) = 'on'
+    );
+
+-- Claim scan: due PENDING jobs and expired RUNNING leases
+CREATE INDEX IF NOT EXISTS idx_job_outbox_due ON job_outbox(status, run_after)
+    WHERE status IN ('PENDING', 'RUNNING');
+
+-- At most one queued/running copy of a deduplicated job
+CREATE UNIQUE INDEX IF NOT EXISTS uq_job_outbox_dedupe_active ON job_outbox(dedupe_key)
+    WHERE dedupe_key IS NOT NULL AND status IN ('PENDING', 'RUNNING');
+
+CREATE INDEX IF NOT EXISTS idx_job_outbox_dead ON job_outbox(tenant_id, created_at DESC)
+    WHERE status = 'DEAD';
@@ -0,0 +1,26 @@
+-- Migration 076: Indexes for the staff recommendation query
+-- GET /orders/{id}/suggest-staff now runs one statement with half-open
+-- time windows (no date() casts), see hr/services/staff_recommendation.py.
+-- orders(tenant_id, event_date) already exists (idx_orders_event_date, 015).
+
+-- Same-day HR assignments by start time
+CREATE INDEX IF NOT EXISTS idx_staff_assignments_tenant_start
+ON staff_assignments(tenant_id, start_time)
+WHERE status <> 'CANCELLED';
+
+-- Workload: assignments created in the last N days
+CREATE INDEX IF NOT EXISTS idx_staff_assignments_tenant_created
+ON staff_assignments(tenant_id, created_at, employee_id)
+WHERE status <> 'CANCELLED';
+
+-- Approved leave covering a day
+CREATE INDEX IF NOT EXISTS idx_leave_requests_approved_dates
+ON leave_requests(tenant_id, start_date, end_date)
+WHERE status = 'APPROVED';
+
+-- Employee lookup by user_id for order_staff_assignments.staff_id
+-- (employees.user_id is UNIQUE, which already provides the index)
+
+COMMENT ON INDEX idx_staff_assignments_tenant_start IS 'Staff recommendation: same-day conflicts';
+COMMENT ON INDEX idx_staff_assignments_tenant_created IS 'Staff recommendation: 7-day workload';
+COMMENT ON INDEX idx_leave_requests_approved_dates IS 'Staff recommendation: approved leave';
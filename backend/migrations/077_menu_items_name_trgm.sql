@@ -0,0 +1,11 @@
+-- Migration 077: Trigram index for menu smart-match
+-- POST /menu/smart-match?use_sql=true matches every pasted line in one
+-- unnest() query; its fuzzy tier (name % term, similarity()) uses this
+-- index. pg_trgm is enabled in 007 (extensions schema since 061).
+
+CREATE INDEX IF NOT EXISTS idx_menu_items_name_trgm
+ON menu_items USING gin (name gin_trgm_ops);
+
+-- Tenant-scoped lower(name) lookups (exact tier)
+CREATE INDEX IF NOT EXISTS idx_menu_items_tenant_lower_name
+ON menu_items(tenant_id, lower(name));
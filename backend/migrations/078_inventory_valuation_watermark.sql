@@ -0,0 +1,11 @@
+-- Migration 078: Index for the inventory valuation cache watermark
+-- /finance/reports/cogs and /finance/reports/stock-valuation are computed in
+-- memory (finance/services/inventory_valuation_service.py) and cached until
+-- the tenant's inventory_transactions change. Each request checks
+--   count(*), max(created_at), count(*) FILTER (WHERE is_reversed)
+-- per tenant; this covering index keeps that an index-only scan.
+
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_tenant_created
+ON inventory_transactions(tenant_id, created_at) INCLUDE (is_reversed);
+
+COMMENT ON INDEX idx_inventory_transactions_tenant_created IS 'Inventory valuation: cache watermark and period scans';
@@ -0,0 +1,14 @@
+-- Migration 079: Index for the batched pull-sheet lot query
+-- The pull-sheet planner (inventory/domain/pull_sheet_planner.py) loads the
+-- candidate lots of every ingredient of one or more orders in one statement:
+--   WHERE tenant_id = ? AND item_id IN (...) AND status = 'ACTIVE' AND remaining_quantity > 0
+--   ORDER BY item_id, expiry_date, received_date, id
+-- idx_inventory_lots_fifo is keyed on received_date per warehouse; this
+-- partial index returns the rows already in expiry (FIFO) order.
+
+CREATE INDEX IF NOT EXISTS idx_inventory_lots_pull_sheet
+ON inventory_lots(tenant_id, item_id, expiry_date, received_date)
+INCLUDE (remaining_quantity, warehouse_id)
+WHERE status = 'ACTIVE' AND remaining_quantity > 0;
+
+COMMENT ON INDEX idx_inventory_lots_pull_sheet IS 'Pull sheet: FIFO-by-expiry candidate lots per ingredient';
@@ -0,0 +1,40 @@
+-- Migration 080: HR employee daily metrics
+-- Per-employee daily counters for /hr/employees/{id}/performance and /hr/employees/performance
+-- Backfill after applying: python backend/scripts/rebuild_employee_metrics.py
+
+CREATE TABLE IF NOT EXISTS hr_employee_daily_metrics (
+    tenant_id UUID NOT NULL,
+    employee_id UUID NOT NULL REFERENCES employees(id) ON DELETE CASCADE,
+    metric_date DATE NOT NULL,
+
+    -- Timesheets by work_date
+    timesheets INTEGER NOT NULL DEFAULT 0,
+    approved_timesheets INTEGER NOT NULL DEFAULT 0,
+    approved_hours NUMERIC(10, 2) NOT NULL DEFAULT 0,
+    approved_overtime_hours NUMERIC(10, 2) NOT NULL DEFAULT 0,
+    checked_in INTEGER NOT NULL DEFAULT 0,
+    late_checkins INTEGER NOT NULL DEFAULT 0,
+
+    -- Staff assignments by created_at
+    assignments INTEGER NOT NULL DEFAULT 0,
+    completed_assignments INTEGER NOT NULL DEFAULT 0,
+
+    refreshed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (tenant_id, employee_id, metric_date)
+);
+
+-- Batch (all employees) reads scan a date range of one tenant
+CREATE INDEX IF NOT EXISTS idx_hr_employee_daily_metrics_date
+    ON hr_employee_daily_metrics(tenant_id, metric_date);
+
+-- RLS
+ALTER TABLE hr_employee_daily_metrics ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY tenant_isolation_hr_employee_daily_metrics ON hr_employee_daily_metrics
+    USING (tenant_id = (SELECT current_setting('app.current_tenant')::UUID));
+
+-- Source lookups used by the per-day refresh and range rebuilds
+CREATE INDEX IF NOT EXISTS idx_timesheets_tenant_employee_date
+    ON timesheets(tenant_id, employee_id, work_date);
+CREATE INDEX IF NOT EXISTS idx_staff_assignments_tenant_employee_created
+    ON staff_assignments(tenant_id, employee_id, created_at);
@@ -0,0 +1,28 @@
+-- Migration 081: Keyset pagination + unaccented trigram search for list endpoints
+-- GET /orders, GET /quotes and GET /crm/customers page by (created_at DESC, id DESC)
+-- and search f_unaccent(lower(...)) LIKE '%term%' (backend/common/utils/keyset_pagination.py).
+-- pg_trgm / unaccent are enabled in 007 (extensions schema since 061).
+
+-- unaccent() is only STABLE (its dictionary can change), so it cannot be
+-- used in an index expression; this wrapper pins the dictionary.
+CREATE OR REPLACE FUNCTION public.f_unaccent(text)
+RETURNS text
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+SET search_path = ''
+AS $$ SELECT extensions.unaccent('extensions.unaccent'::regdictionary, $1) $$;
+
+-- Keyset order (the tuple comparison and ORDER BY use the same columns)
+CREATE INDEX IF NOT EXISTS idx_orders_tenant_created_id ON orders(tenant_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_quotes_tenant_created_id ON quotes(tenant_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_customers_tenant_created_id ON customers(tenant_id, created_at DESC, id DESC);
+
+-- Search documents: expressions must match search_document() exactly
+CREATE INDEX IF NOT EXISTS idx_orders_search_trgm ON orders USING gin (
+    public.f_unaccent(lower(COALESCE(code, '') || ' ' || COALESCE(customer_name, ''))) gin_trgm_ops
+);
+CREATE INDEX IF NOT EXISTS idx_quotes_search_trgm ON quotes USING gin (
+    public.f_unaccent(lower(COALESCE(code, '') || ' ' || COALESCE(customer_name, ''))) gin_trgm_ops
+);
+CREATE INDEX IF NOT EXISTS idx_customers_search_trgm ON customers USING gin (
+    public.f_unaccent(lower(COALESCE(full_name, '') || ' ' || COALESCE(phone, '') || ' ' || COALESCE(email, ''))) gin_trgm_ops
+);
@@ -0,0 +1,44 @@
+-- Migration 082: CRM RFM engine
+-- Running per-customer aggregates + tier change history (backend/modules/crm/application/rfm_engine.py)
+-- Backfill after applying: python backend/scripts/retier_customers.py
+
+ALTER TABLE customers ADD COLUMN IF NOT EXISTS rejected_quote_count INTEGER DEFAULT 0;
+ALTER TABLE customers ADD COLUMN IF NOT EXISTS tier_changed_at TIMESTAMP WITH TIME ZONE;
+
+CREATE TABLE IF NOT EXISTS customer_tier_history (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    tenant_id UUID NOT NULL,
+    customer_id UUID NOT NULL REFERENCES customers(id) ON DELETE CASCADE,
+    old_tier VARCHAR(20),
+    new_tier VARCHAR(20) NOT NULL,
+    source VARCHAR(20) NOT NULL,  -- EVENT, REFRESH, NIGHTLY
+
+    order_count INTEGER DEFAULT 0,
+    total_spent NUMERIC(15, 2) DEFAULT 0,
+    last_order_at TIMESTAMP WITH TIME ZONE,
+
+    changed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_customer_tier_history_customer
+    ON customer_tier_history(customer_id, changed_at DESC);
+CREATE INDEX IF NOT EXISTS idx_customer_tier_history_tenant
+    ON customer_tier_history(tenant_id, changed_at DESC);
+
+-- RLS (the nightly RFM pass runs across tenants with app.bypass_rls)
+ALTER TABLE customer_tier_history ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY tenant_isolation_customer_tier_history ON customer_tier_history
+    USING (
+        tenant_id = (SELECT current_setting('app.current_tenant', true))::UUID
+        OR (SELECT current_setting('app.bypass_rls', true)) = 'on'
+    );
+
+-- Per-customer aggregates of the nightly pass and exact refreshes
+-- (statuses must match COUNTED_ORDER_STATUSES / REJECTED_QUOTE_STATUS)
+CREATE INDEX IF NOT EXISTS idx_orders_tenant_customer_counted
+    ON orders(tenant_id, customer_id) INCLUDE (final_amount, created_at)
+    WHERE status IN ('COMPLETED', 'CONFIRMED') AND customer_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_quotes_tenant_customer_rejected
+    ON quotes(tenant_id, customer_id)
+    WHERE status = 'REJECTED' AND customer_id IS NOT NULL;
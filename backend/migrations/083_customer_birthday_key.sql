@@ -0,0 +1,12 @@
+-- Migration 083: Indexed upcoming-birthday lookup
+-- customers.birthday_key = month * 100 + day of the birthday, a stored generated
+-- column kept in sync by PostgreSQL on every INSERT/UPDATE of birthday.
+-- GET /crm/upcoming-birthdays and the birthday campaign read one or two key
+-- ranges (backend/modules/crm/application/birthday_service.py).
+
+ALTER TABLE customers ADD COLUMN IF NOT EXISTS birthday_key SMALLINT
+    GENERATED ALWAYS AS (CAST(EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday) AS smallint)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_customers_tenant_birthday_key
+    ON customers(tenant_id, birthday_key)
+    WHERE birthday IS NOT NULL;
@@ -0,0 +1,40 @@
+-- Migration 084: Document code counters
+-- Sequence numbers of BG/ĐH/HD/PN codes (per day) and THU/CHI/JNL journal codes
+-- (per month), bumped with INSERT ... ON CONFLICT DO UPDATE ... RETURNING
+-- (backend/common/utils/code_allocator.py).
+-- scope_id: tenant id, or 00000000-0000-0000-0000-000000000000 for codes unique
+-- across tenants. No RLS: rows of the global scope are shared by all tenants.
+
+CREATE TABLE IF NOT EXISTS document_code_counters (
+    scope_id UUID NOT NULL,
+    prefix VARCHAR(20) NOT NULL,
+    period VARCHAR(10) NOT NULL,  -- ddmmyy or YYYYMM
+    last_value BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (scope_id, prefix, period)
+);
+
+-- Continue after the codes already issued
+INSERT INTO document_code_counters (scope_id, prefix, period, last_value)
+SELECT '00000000-0000-0000-0000-000000000000', 'BG', substring(code FROM 4 FOR 6), MAX(CAST(substring(code FROM 10) AS BIGINT))
+FROM quotes
+WHERE code ~ '^BG-[0-9]{9,}$'
+GROUP BY substring(code FROM 4 FOR 6)
+ON CONFLICT (scope_id, prefix, period) DO UPDATE
+    SET last_value = GREATEST(document_code_counters.last_value, EXCLUDED.last_value);
+
+INSERT INTO document_code_counters (scope_id, prefix, period, last_value)
+SELECT '00000000-0000-0000-0000-000000000000', 'ĐH', substring(code FROM 4 FOR 6), MAX(CAST(substring(code FROM 10) AS BIGINT))
+FROM orders
+WHERE code ~ '^ĐH-[0-9]{9,}$'
+GROUP BY substring(code FROM 4 FOR 6)
+ON CONFLICT (scope_id, prefix, period) DO UPDATE
+    SET last_value = GREATEST(document_code_counters.last_value, EXCLUDED.last_value);
+
+INSERT INTO document_code_counters (scope_id, prefix, period, last_value)
+SELECT tenant_id, split_part(code, '-', 1), split_part(code, '-', 2), MAX(CAST(split_part(code, '-', 3) AS BIGINT))
+FROM journals
+WHERE code ~ '^(THU|CHI|JNL)-[0-9]{6}-[0-9]+$'
+GROUP BY tenant_id, split_part(code, '-', 1), split_part(code, '-', 2)
+ON CONFLICT (scope_id, prefix, period) DO UPDATE
+    SET last_value = GREATEST(document_code_counters.last_value, EXCLUDED.last_value);
@@ -0,0 +1,45 @@
+-- Migration 085: Expo push delivery queue
+-- One row per (notification, device token), inserted in the transaction that
+-- creates the notification and delivered by the push worker (arq cron or
+-- python backend/scripts/run_push_worker.py) in Expo batches of 100.
+-- PENDING -> SENDING -> SENT, or back to PENDING with backoff, DEAD after
+-- max_attempts or when the device is no longer registered.
+
+CREATE TABLE IF NOT EXISTS push_outbox (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    tenant_id UUID NOT NULL REFERENCES tenants(id) ON DELETE CASCADE,
+    user_id UUID NOT NULL,
+    device_token TEXT NOT NULL,
+
+    title VARCHAR(255) NOT NULL,
+    body TEXT,
+    data JSONB NOT NULL DEFAULT '{}'::jsonb,
+
+    status VARCHAR(20) NOT NULL DEFAULT 'PENDING',  -- PENDING, SENDING, SENT, DEAD
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_after TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+
+    locked_at TIMESTAMP WITH TIME ZONE,
+    locked_by VARCHAR(100),
+    ticket_id VARCHAR(100),
+    last_error TEXT,
+
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    sent_at TIMESTAMP WITH TIME ZONE
+);
+
+-- RLS (the worker claims across tenants with app.bypass_rls, transaction-local)
+ALTER TABLE push_outbox ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY tenant_isolation_push_outbox ON push_outbox
+    USING (
+        tenant_id = (SELECT current_setting('app.current_tenant', true))::UUID
+        OR (SELECT current_setting('app.bypass_rls', true)) = 'on'
+    );
+
+-- Claim scan: due PENDING messages and expired SENDING leases
+CREATE INDEX IF NOT EXISTS idx_push_outbox_due ON push_outbox(status, run_after)
+    WHERE status IN ('PENDING', 'SENDING');
+
+CREATE INDEX IF NOT EXISTS idx_push_outbox_tenant ON push_outbox(tenant_id, created_at DESC);
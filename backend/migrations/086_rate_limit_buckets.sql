@@ -0,0 +1,18 @@
+-- Migration 086: shared rate limit buckets (RATE_LIMIT_BACKEND=postgres)
+-- One GCRA bucket per key ("ip:1.2.3.4", "user:<uuid>", "tenant:<uuid>",
+-- prefixed with the endpoint scope), updated with a single upsert per
+-- request by backend/core/rate_limiter.py. Times are epoch seconds of the
+-- database clock, so workers on different hosts agree.
+--
+-- UNLOGGED: no WAL for a write on every request, the buckets are disposable
+-- and simply start full again after a crash. No RLS - keys are not tenant data
+-- and the limiter runs before authentication.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+    key TEXT PRIMARY KEY,
+    tat DOUBLE PRECISION NOT NULL,      -- theoretical arrival time
+    seen_at DOUBLE PRECISION NOT NULL   -- last allowed request
+) WITH (fillfactor = 70);
+
+-- Deliberately no index on tat: every request rewrites it, and an index would
+-- rule out HOT updates. The once-a-minute prune of expired buckets scans the table.
@@ -0,0 +1,30 @@
+-- Migration 087: in-place edits of inventory_transactions move the valuation watermark
+-- The inventory valuation cache (finance/services/inventory_valuation_service.py)
+-- compared count(*), max(created_at) and the reversed count only, so an UPDATE
+-- of an existing row (quantity, unit_price corrected in place) kept serving the
+-- stale report. updated_at is now maintained by a trigger (raw SQL included)
+-- and max(updated_at) is part of the watermark.
+
+ALTER TABLE inventory_transactions
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION update_inventory_transactions_timestamp()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_update_inventory_transactions_timestamp ON inventory_transactions;
+CREATE TRIGGER trigger_update_inventory_transactions_timestamp
+    BEFORE UPDATE ON inventory_transactions
+    FOR EACH ROW
+    EXECUTE FUNCTION update_inventory_transactions_timestamp();
+
+-- Keep the watermark an index-only scan (replaces the migration 078 index)
+DROP INDEX IF EXISTS idx_inventory_transactions_tenant_created;
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_tenant_created
+ON inventory_transactions(tenant_id, created_at) INCLUDE (is_reversed, updated_at);
+
+COMMENT ON INDEX idx_inventory_transactions_tenant_created IS 'Inventory valuation: cache watermark and period scans';
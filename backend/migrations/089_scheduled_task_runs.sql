@@ -0,0 +1,13 @@
+-- Migration 089: last run of each in-app daily task
+-- One row per DailyTask of backend/core/tasks/background.py (CRM re-tier,
+-- birthday campaign, ...). Every web process polls the tasks; the process
+-- holding pg_try_advisory_xact_lock runs a due task and records the day it
+-- ran for in the same transaction, so a task runs once a day whatever the
+-- number of processes. No RLS - rows are not tenant data.
+
+CREATE TABLE IF NOT EXISTS scheduled_task_runs (
+    name VARCHAR(100) PRIMARY KEY,
+    last_run_on DATE NOT NULL,                  -- business-local day of the last run
+    finished_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    last_error TEXT                             -- NULL when the last run succeeded
+);
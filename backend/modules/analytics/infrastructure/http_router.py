@@ -23,9 +23,10 @@ from backend.modules.order.domain.models import OrderModel, OrderItemModel
 from backend.modules.quote.domain.models import QuoteModel
 from backend.modules.inventory.domain.models import InventoryItemModel, InventoryTransactionModel, InventoryLotModel, InventoryStockModel
 from backend.modules.procurement.domain.models import PurchaseOrderModel, SupplierModel
-from backend.modules.finance.domain.models import JournalModel, JournalLineModel, FinanceTransactionModel
+from backend.modules.finance.domain.models import JournalModel, JournalLineModel
 from backend.modules.hr.domain.models import EmployeeModel, TimesheetModel, PayrollItemModel, PayrollPeriodModel
 from backend.modules.crm.domain.models import CustomerModel
+from backend.modules.finance.services.kpi_rollup_service import get_kpi_rollup_service
 
 router = APIRouter(tags=["Analytics & Reports"])
 
@@ -181,73 +182,17 @@ async def get_analytics_overview(
             cur_start, cur_end = get_month_range(0)
             prev_start, prev_end = get_month_range(-1)
 
-        # Revenue: sum of active/completed orders in range
-        REVENUE_STATUSES = ["CONFIRMED", "IN_PROGRESS", "COMPLETED", "DELIVERED", "PAID"]
-        rev_cur = await db.execute(
-            select(func.coalesce(func.sum(OrderModel.final_amount), 0))
-            .where(and_(
-                OrderModel.tenant_id == tenant_id,
-                OrderModel.status.in_(REVENUE_STATUSES),
-                OrderModel.event_date >= cur_start,
-                OrderModel.event_date <= cur_end,
-            ))
-        )
-        revenue_month = float(rev_cur.scalar() or 0)
-
-        rev_prev = await db.execute(
-            select(func.coalesce(func.sum(OrderModel.final_amount), 0))
-            .where(and_(
-                OrderModel.tenant_id == tenant_id,
-                OrderModel.status.in_(REVENUE_STATUSES),
-                OrderModel.event_date >= prev_start,
-                OrderModel.event_date <= prev_end,
-            ))
-        )
-        revenue_prev = float(rev_prev.scalar() or 0)
-
-        # Expenses: use finance transactions (PAYMENT type)
-        exp_result = await db.execute(
-            select(func.coalesce(func.sum(FinanceTransactionModel.amount), 0))
-            .where(and_(
-                FinanceTransactionModel.tenant_id == tenant_id,
-                FinanceTransactionModel.type == "EXPENSE",
-                FinanceTransactionModel.transaction_date >= cur_start,
-                FinanceTransactionModel.transaction_date <= cur_end,
-            ))
-        )
-        expenses_month = float(exp_result.scalar() or 0)
-
-        exp_prev_result = await db.execute(
-            select(func.coalesce(func.sum(FinanceTransactionModel.amount), 0))
-            .where(and_(
-                FinanceTransactionModel.tenant_id == tenant_id,
-                FinanceTransactionModel.type == "EXPENSE",
-                FinanceTransactionModel.transaction_date >= prev_start,
-                FinanceTransactionModel.transaction_date <= prev_end,
-            ))
-        )
-        expenses_prev = float(exp_prev_result.scalar() or 0)
-
-        # Orders count
-        orders_cur = await db.execute(
-            select(func.count(OrderModel.id))
-            .where(and_(
-                OrderModel.tenant_id == tenant_id,
-                OrderModel.created_at >= datetime.combine(cur_start, datetime.min.time()),
-                OrderModel.created_at <= datetime.combine(cur_end, datetime.max.time()),
-            ))
+        # Revenue (booked orders by event day), expenses, order counts and
+        # receivables: one query over the finance_daily_kpis rollup
+        kpis = await get_kpi_rollup_service(db, tenant_id).overview_totals(
+            cur_start, cur_end, prev_start, prev_end
         )
-        orders_month = orders_cur.scalar() or 0
-
-        orders_prev = await db.execute(
-            select(func.count(OrderModel.id))
-            .where(and_(
-                OrderModel.tenant_id == tenant_id,
-                OrderModel.created_at >= datetime.combine(prev_start, datetime.min.time()),
-                OrderModel.created_at <= datetime.combine(prev_end, datetime.max.time()),
-            ))
-        )
-        orders_prev_count = orders_prev.scalar() or 0
+        revenue_month = float(kpis["revenue_current"] or 0)
+        revenue_prev = float(kpis["revenue_previous"] or 0)
+        expenses_month = float(kpis["expenses_current"] or 0)
+        expenses_prev = float(kpis["expenses_previous"] or 0)
+        orders_month = int(kpis["orders_current"] or 0)
+        orders_prev_count = int(kpis["orders_previous"] or 0)
 
         # Inventory value & warnings (join with stock table for quantities)
         inv_stats = await db.execute(
@@ -273,20 +218,8 @@ async def get_analytics_overview(
         out_of_stock = int(inv_row[3] or 0)
 
         # Receivables (unpaid orders = balance_amount > 0)
-        recv = await db.execute(
-            select(
-                func.coalesce(func.sum(OrderModel.balance_amount), 0),
-                func.count(OrderModel.id),
-            )
-            .where(and_(
-                OrderModel.tenant_id == tenant_id,
-                OrderModel.balance_amount > 0,
-                OrderModel.status.notin_(["CANCELLED"]),
-            ))
-        )
-        recv_row = recv.one()
-        receivables_total = float(recv_row[0] or 0)
-        receivables_overdue = recv_row[1] or 0
+        receivables_total = float(kpis["receivables_total"] or 0)
+        receivables_overdue = int(kpis["receivables_count"] or 0)
 
         # Employees
         emp_count = await db.execute(
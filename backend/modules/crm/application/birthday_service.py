@@ -0,0 +1,206 @@
+"""
+Customer Birthday Service
+Backs GET /crm/upcoming-birthdays and the birthday greeting campaign.
+
+The endpoint used to load every customer with a birthday and compute
+days-until in Python on each call. customers.birthday_key (migration 083)
+is a stored month * 100 + day of the birthday, indexed per tenant, so a
+window of N days is one or two key ranges (Dec 20 -> Jan 10 is
+1220..1231 + 101..110) read with ORDER BY + LIMIT.
+
+Feb 29 birthdays are celebrated on Feb 28 in non-leap years (as before).
+
+Campaign: schedule_all_tenants() runs every morning (in-app daily task in
+core/tasks/background.py, or the arq cron) and calls schedule_birthday_campaigns();
+it enqueues one crm.birthday_greeting outbox job per customer whose birthday
+is within BIRTHDAY_CAMPAIGN_LEAD_DAYS, delayed to BIRTHDAY_SEND_HOUR on the day.
+"""
+
+import calendar
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import and_, case, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.core.tasks.outbox import enqueue_job, job
+from backend.modules.crm.domain.models import CustomerModel, InteractionLogModel
+
+logger = logging.getLogger(__name__)
+
+VN_TIMEZONE = ZoneInfo("Asia/Ho_Chi_Minh")
+
+JOB_BIRTHDAY_GREETING = "crm.birthday_greeting"
+INTERACTION_BIRTHDAY_GREETING = "BIRTHDAY_GREETING"
+BIRTHDAY_CAMPAIGN_LEAD_DAYS = 3
+BIRTHDAY_SEND_HOUR = 8  # local time on the birthday
+
+FIRST_KEY, LAST_KEY = 101, 1231
+
+
+# ============ KEYS ============
+
+def birthday_key(day: date) -> int:
+    """month * 100 + day - same expression as the generated column of migration 083."""
+    return day.month * 100 + day.day
+
+
+def _celebration(birthday: date, year: int) -> date:
+    return date(year, birthday.month, min(birthday.day, calendar.monthrange(year, birthday.month)[1]))
+
+
+def next_birthday(birthday: date, today: date) -> date:
+    """The next celebration on or after `today` (Feb 29 -> Feb 28 in non-leap years)."""
+    celebration = _celebration(birthday, today.year)
+    return celebration if celebration >= today else _celebration(birthday, today.year + 1)
+
+
+def birthday_ranges(today: date, days: int) -> List[Tuple[int, int]]:
+    """Inclusive birthday_key ranges of [today, today + days], in date order."""
+    if days >= 365:
+        return [(FIRST_KEY, LAST_KEY)]
+    end = today + timedelta(days=days)
+    low, high = birthday_key(today), birthday_key(end)
+    if end.month == 2 and end.day == 28 and not calendar.isleap(end.year):
+        high = 229  # Feb 29 birthdays are celebrated on the 28th
+    if end.year == today.year:
+        return [(low, high)]
+    return [(low, LAST_KEY), (FIRST_KEY, high)]
+
+
+# ============ SERVICE ============
+
+@dataclass
+class UpcomingBirthday:
+    customer: Any
+    celebration: date
+    days_until: int
+
+
+class BirthdayService:
+    """Upcoming birthdays of one tenant's customers"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID):
+        self.db = db
+        self.tenant_id = tenant_id
+
+    def upcoming_query(self, today: date, days: int, limit: Optional[int] = None):
+        key = CustomerModel.birthday_key
+        start = birthday_key(today)
+        ranges = birthday_ranges(today, days)
+        query = select(CustomerModel).where(
+            CustomerModel.tenant_id == self.tenant_id,
+            CustomerModel.birthday.isnot(None),
+            or_(*(key.between(low, high) for low, high in ranges)),
+        )
+        if any(low < start for low, _ in ranges):
+            # Wrap-around (or a full year): from today to Dec 31 first, then next January on
+            query = query.order_by(case((key >= start, 0), else_=1), key, CustomerModel.id)
+        else:
+            query = query.order_by(key, CustomerModel.id)
+        if limit:
+            query = query.limit(limit)
+        return query
+
+    async def upcoming(self, days: int = 30, limit: Optional[int] = None,
+                       today: Optional[date] = None) -> List[UpcomingBirthday]:
+        today = today or datetime.now(timezone.utc).date()
+        result = await self.db.execute(self.upcoming_query(today, days, limit))
+        upcoming = []
+        for customer in result.scalars().all():
+            celebration = next_birthday(customer.birthday, today)
+            upcoming.append(UpcomingBirthday(customer, celebration, (celebration - today).days))
+        return upcoming
+
+
+def get_birthday_service(db: AsyncSession, tenant_id: UUID) -> BirthdayService:
+    """Factory function for dependency injection"""
+    return BirthdayService(db, tenant_id)
+
+
+# ============ CAMPAIGN ============
+
+def greeting_send_at(celebration: date) -> datetime:
+    return datetime.combine(celebration, time(BIRTHDAY_SEND_HOUR), tzinfo=VN_TIMEZONE)
+
+
+async def schedule_birthday_campaigns(
+    db: AsyncSession,
+    tenant_id: UUID,
+    lead_days: int = BIRTHDAY_CAMPAIGN_LEAD_DAYS,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Enqueue greetings for birthdays in the next `lead_days` days (caller commits).
+    Safe to run more than once a day: the dedupe key holds while a greeting is
+    pending and the job itself skips customers already greeted.
+    """
+    now = now or datetime.now(timezone.utc)
+    today = now.astimezone(VN_TIMEZONE).date()
+    scheduled = 0
+    for item in await BirthdayService(db, tenant_id).upcoming(days=lead_days, today=today):
+        delay = (greeting_send_at(item.celebration) - now).total_seconds()
+        await enqueue_job(
+            db, tenant_id, JOB_BIRTHDAY_GREETING,
+            payload={"customer_id": str(item.customer.id), "birthday": item.celebration.isoformat()},
+            dedupe_key=f"{JOB_BIRTHDAY_GREETING}:{item.customer.id}:{item.celebration.year}",
+            delay_seconds=max(0, int(delay)),
+        )
+        scheduled += 1
+    return scheduled
+
+
+async def schedule_all_tenants(session_factory=None, tenant_ids: Optional[Iterable[UUID]] = None) -> Dict[str, int]:
+    """Daily run over every tenant (or the given ones), one transaction per tenant."""
+    if session_factory is None:
+        from backend.core.database import AsyncSessionLocal
+        session_factory = AsyncSessionLocal
+
+    bypass_rls = text("SELECT set_config('app.bypass_rls', 'on', true)")
+    scheduled: Dict[str, int] = {}
+    async with session_factory() as db:
+        if tenant_ids is None:
+            await db.execute(bypass_rls)
+            tenant_ids = [row[0] for row in (await db.execute(text("SELECT id FROM tenants ORDER BY id"))).fetchall()]
+            await db.commit()
+        for tenant_id in tenant_ids:
+            # Transaction-local, so the pooled connection does not keep it
+            await db.execute(bypass_rls)
+            scheduled[str(tenant_id)] = await schedule_birthday_campaigns(db, tenant_id)
+            await db.commit()
+    return scheduled
+
+
+@job(JOB_BIRTHDAY_GREETING)
+async def send_birthday_greeting(db: AsyncSession, tenant_id: UUID, payload: Dict[str, Any]) -> None:
+    """Send (log) the greeting once per celebration."""
+    from backend.modules.crm.application.services import CrmIntegrationService
+
+    customer_id = UUID(payload["customer_id"])
+    celebration = date.fromisoformat(payload["birthday"])
+    customer = (await db.execute(
+        select(CustomerModel).where(CustomerModel.id == customer_id, CustomerModel.tenant_id == tenant_id)
+    )).scalar_one_or_none()
+    if not customer or not customer.birthday:
+        return
+
+    already_sent = (await db.execute(
+        select(InteractionLogModel.id).where(and_(
+            InteractionLogModel.tenant_id == tenant_id,
+            InteractionLogModel.customer_id == customer_id,
+            InteractionLogModel.type == INTERACTION_BIRTHDAY_GREETING,
+            InteractionLogModel.created_at >= greeting_send_at(celebration) - timedelta(days=30),
+        )).limit(1)
+    )).first()
+    if already_sent:
+        logger.info(f"Birthday greeting for customer {customer_id} already sent")
+        return
+
+    await CrmIntegrationService.log_interaction(
+        db, tenant_id, customer_id, INTERACTION_BIRTHDAY_GREETING,
+        f"Gửi lời chúc mừng sinh nhật ({celebration.strftime('%d/%m')})",
+    )
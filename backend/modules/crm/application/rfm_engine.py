@@ -0,0 +1,398 @@
+"""
+CRM RFM Engine
+Customer statistics (order_count, total_spent, last_order_at,
+rejected_quote_count) and the derived tier in customers.customer_type,
+read by /crm/stats, /crm/marketing/retention-stats and the customer list.
+
+recalculate_stats used to re-aggregate the customer's whole order and quote
+history (and commit) after every confirm / payment / completion / quote
+edit, and a tier only moved when one of the customer's orders changed - a
+customer whose last order is two years old stayed LOYAL forever.
+
+Maintenance (same scheme as the finance KPI rollup):
+- Incremental: ORM changes to OrderModel / QuoteModel become per-customer
+  deltas on the session; right before COMMIT they are applied to the running
+  aggregates and the customer is re-tiered, in one statement per tenant
+  (common/utils/commit_refresh.py).
+  Changes that cannot be expressed as a delta (an order stops counting, is
+  moved to another customer or re-dated) recompute that customer exactly.
+- Nightly: retier_tenant() recomputes aggregates and tiers of every
+  customer of a tenant in one UPDATE ... FROM aggregate query, so recency
+  tiers (LOYAL -> REGULAR -> CHURN_RISK) follow the calendar
+  (in-app daily task in core/tasks/background.py, or the arq cron in
+  core/tasks/worker.py; scripts/retier_customers.py, POST /crm/rfm/retier).
+Every tier change is recorded in customer_tier_history.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.common.utils.commit_refresh import CommitRefresh, tenant_lock_sql
+from backend.modules.order.domain.models import OrderModel
+from backend.modules.quote.domain.models import QuoteModel
+
+logger = logging.getLogger(__name__)
+
+# Orders that count towards the customer's statistics
+COUNTED_ORDER_STATUSES = ("COMPLETED", "CONFIRMED")
+REJECTED_QUOTE_STATUS = "REJECTED"
+
+# Tier rules, evaluated top-down
+VIP_MIN_SPENT = 100_000_000
+VIP_MIN_ORDERS = 5
+CHURN_AFTER_DAYS = 365  # more than 1 order and none for > 365 days
+LOYAL_WITHIN_DAYS = 180  # 2+ orders, the last one < 180 days ago
+LOST_MIN_REJECTED_QUOTES = 3  # no order and > 3 rejected quotes
+
+# Set by hand, never overwritten
+MANUAL_TIERS = ("CORPORATE",)
+
+SOURCE_EVENT = "EVENT"
+SOURCE_REFRESH = "REFRESH"
+SOURCE_NIGHTLY = "NIGHTLY"
+
+_DELTAS_KEY = "crm_rfm_deltas"
+
+_COUNTED_SQL = ", ".join(f"'{s}'" for s in COUNTED_ORDER_STATUSES)
+_MANUAL_SQL = ", ".join(f"'{t}'" for t in MANUAL_TIERS)
+
+# The "src" CTE yields (customer_id, order_count, total_spent, last_order_at,
+# rejected_quote_count); this tail tiers it, writes the customers that
+# changed and logs tier changes. `prev` is a second reference to the row as
+# it was before the UPDATE. One row: (updated, tier_changes).
+_RETIER_TAIL = f"""
+    , tiered AS (
+        SELECT s.*,
+               CASE
+                   WHEN s.total_spent > {VIP_MIN_SPENT} OR s.order_count >= {VIP_MIN_ORDERS} THEN 'VIP'
+                   WHEN s.order_count > 1 AND (s.last_order_at IS NULL
+                        OR s.last_order_at <= CAST(:now AS timestamptz) - interval '{CHURN_AFTER_DAYS + 1} days')
+                       THEN 'CHURN_RISK'
+                   WHEN s.order_count >= 2
+                        AND s.last_order_at > CAST(:now AS timestamptz) - interval '{LOYAL_WITHIN_DAYS} days'
+                       THEN 'LOYAL'
+                   WHEN s.order_count = 0 AND s.rejected_quote_count > {LOST_MIN_REJECTED_QUOTES} THEN 'LOST'
+                   WHEN s.order_count = 0 THEN 'POTENTIAL'
+                   ELSE 'REGULAR'
+               END AS tier
+        FROM src s
+    ),
+    changed AS (
+        UPDATE customers c SET
+            order_count = t.order_count,
+            total_spent = t.total_spent,
+            last_order_at = t.last_order_at,
+            rejected_quote_count = t.rejected_quote_count,
+            customer_type = CASE WHEN prev.customer_type IN ({_MANUAL_SQL}) THEN prev.customer_type ELSE t.tier END,
+            tier_changed_at = CASE
+                WHEN prev.customer_type IN ({_MANUAL_SQL}) OR prev.customer_type IS NOT DISTINCT FROM t.tier
+                    THEN prev.tier_changed_at
+                ELSE CAST(:now AS timestamptz)
+            END
+        FROM tiered t
+        JOIN customers prev ON prev.id = t.customer_id
+        WHERE c.id = t.customer_id
+          AND (c.order_count IS DISTINCT FROM t.order_count
+               OR c.total_spent IS DISTINCT FROM t.total_spent
+               OR c.last_order_at IS DISTINCT FROM t.last_order_at
+               OR c.rejected_quote_count IS DISTINCT FROM t.rejected_quote_count
+               OR (c.customer_type IS DISTINCT FROM t.tier
+                   AND COALESCE(c.customer_type, '') NOT IN ({_MANUAL_SQL})))
+        RETURNING c.id, c.tenant_id, prev.customer_type AS old_tier, c.customer_type AS new_tier,
+                  c.order_count, c.total_spent, c.last_order_at
+    ),
+    history AS (
+        INSERT INTO customer_tier_history (
+            tenant_id, customer_id, old_tier, new_tier, source,
+            order_count, total_spent, last_order_at, changed_at
+        )
+        SELECT tenant_id, id, old_tier, new_tier, :source,
+               order_count, total_spent, last_order_at, CAST(:now AS timestamptz)
+        FROM changed
+        WHERE old_tier IS DISTINCT FROM new_tier
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM changed) AS updated, (SELECT COUNT(*) FROM history) AS tier_changes
+"""
+
+# Running aggregates + per-customer deltas. GREATEST ignores NULLs.
+APPLY_DELTAS_SQL = text("""
+    WITH d AS (
+        SELECT *
+        FROM unnest(CAST(:customer_ids AS uuid[]), CAST(:order_deltas AS int[]),
+                    CAST(:spent_deltas AS numeric[]), CAST(:last_orders AS timestamptz[]),
+                    CAST(:rejected_deltas AS int[]))
+             AS d(customer_id, orders, spent, last_order_at, rejected)
+    ),
+    src AS (
+        SELECT c.id AS customer_id,
+               GREATEST(COALESCE(c.order_count, 0) + d.orders, 0) AS order_count,
+               COALESCE(c.total_spent, 0) + d.spent AS total_spent,
+               GREATEST(c.last_order_at, d.last_order_at) AS last_order_at,
+               GREATEST(COALESCE(c.rejected_quote_count, 0) + d.rejected, 0) AS rejected_quote_count
+        FROM customers c
+        JOIN d ON d.customer_id = c.id
+        WHERE c.tenant_id = CAST(:tenant_id AS uuid)
+    )
+""" + _RETIER_TAIL)
+
+
+def _exact_src(customer_filter: str) -> str:
+    # Aggregates from source tables; served by the partial indexes of migration 082
+    return f"""
+    WITH o AS (
+        SELECT customer_id, COUNT(*) AS order_count, SUM(final_amount) AS total_spent,
+               MAX(created_at) AS last_order_at
+        FROM orders
+        WHERE tenant_id = CAST(:tenant_id AS uuid)
+          AND status IN ({_COUNTED_SQL})
+          AND customer_id IS NOT NULL{customer_filter.format(col="customer_id")}
+        GROUP BY customer_id
+    ),
+    q AS (
+        SELECT customer_id, COUNT(*) AS rejected_quote_count
+        FROM quotes
+        WHERE tenant_id = CAST(:tenant_id AS uuid)
+          AND status = '{REJECTED_QUOTE_STATUS}'
+          AND customer_id IS NOT NULL{customer_filter.format(col="customer_id")}
+        GROUP BY customer_id
+    ),
+    src AS (
+        SELECT c.id AS customer_id,
+               COALESCE(o.order_count, 0) AS order_count,
+               COALESCE(o.total_spent, 0) AS total_spent,
+               o.last_order_at,
+               COALESCE(q.rejected_quote_count, 0) AS rejected_quote_count
+        FROM customers c
+        LEFT JOIN o ON o.customer_id = c.id
+        LEFT JOIN q ON q.customer_id = c.id
+        WHERE c.tenant_id = CAST(:tenant_id AS uuid){customer_filter.format(col="c.id")}
+    )
+"""
+
+
+# Exact recompute of some customers (reversals, recalculate_stats)
+REFRESH_CUSTOMERS_SQL = text(
+    _exact_src("\n          AND {col} = ANY(CAST(:customer_ids AS uuid[]))") + _RETIER_TAIL
+)
+
+# Nightly pass: every customer of the tenant in one statement
+RETIER_TENANT_SQL = text(_exact_src("") + _RETIER_TAIL)
+
+_BYPASS_RLS_SQL = text("SELECT set_config('app.bypass_rls', 'on', true)")
+
+# Serializes RFM writes of one tenant: deltas read the running aggregates
+LOCK_TENANT_SQL = tenant_lock_sql("crm_rfm")
+
+
+@dataclass
+class RetierResult:
+    updated: int = 0
+    tier_changes: int = 0
+
+
+# ============ CHANGE TRACKING ============
+
+@dataclass
+class CustomerDelta:
+    orders: int = 0
+    spent: Decimal = Decimal("0")
+    last_order_at: Optional[datetime] = None
+    rejected: int = 0
+    exact: bool = False  # not expressible as a delta: recompute from source
+
+    def add_order(self, amount: Any, created_at: Optional[datetime]) -> None:
+        self.orders += 1
+        self.spent += Decimal(str(amount or 0))
+        created_at = created_at or datetime.now(timezone.utc)
+        if self.last_order_at is None or created_at > self.last_order_at:
+            self.last_order_at = created_at
+
+
+def _old_new(state, column: str) -> Tuple[Any, Any]:
+    history = state.attrs[column].history
+    current = (list(history.added) + list(history.unchanged) or [None])[0]
+    previous = history.deleted[0] if history.deleted else current
+    return previous, current
+
+
+def _delta(session, tenant_id: Any, customer_id: Any) -> CustomerDelta:
+    deltas: Dict[Tuple[str, str], CustomerDelta] = _rfm_refresh.pending(session)
+    return deltas.setdefault((str(tenant_id), str(customer_id)), CustomerDelta())
+
+
+def _track_order(session, order: OrderModel, is_new: bool, is_deleted: bool) -> None:
+    state = inspect(order)
+    old_customer, new_customer = _old_new(state, "customer_id")
+    old_status, new_status = _old_new(state, "status")
+    old_amount, new_amount = _old_new(state, "final_amount")
+    old_created, new_created = _old_new(state, "created_at")
+
+    was_counted = not is_new and old_customer is not None and old_status in COUNTED_ORDER_STATUSES
+    is_counted = not is_deleted and new_customer is not None and new_status in COUNTED_ORDER_STATUSES
+    if not was_counted and not is_counted:
+        return
+
+    if was_counted and is_counted and old_customer == new_customer:
+        if old_created != new_created:
+            _delta(session, order.tenant_id, new_customer).exact = True
+        elif old_amount != new_amount:
+            _delta(session, order.tenant_id, new_customer).spent += (
+                Decimal(str(new_amount or 0)) - Decimal(str(old_amount or 0))
+            )
+        return
+    if was_counted:
+        # MAX(created_at) cannot be decremented
+        _delta(session, order.tenant_id, old_customer).exact = True
+    if is_counted:
+        _delta(session, order.tenant_id, new_customer).add_order(new_amount, new_created)
+
+
+def _track_quote(session, quote: QuoteModel, is_new: bool, is_deleted: bool) -> None:
+    state = inspect(quote)
+    old_customer, new_customer = _old_new(state, "customer_id")
+    old_status, new_status = _old_new(state, "status")
+
+    was_rejected = not is_new and old_customer is not None and old_status == REJECTED_QUOTE_STATUS
+    is_rejected = not is_deleted and new_customer is not None and new_status == REJECTED_QUOTE_STATUS
+    if was_rejected == is_rejected and old_customer == new_customer:
+        return
+    if was_rejected:
+        _delta(session, quote.tenant_id, old_customer).rejected -= 1
+    if is_rejected:
+        _delta(session, quote.tenant_id, new_customer).rejected += 1
+
+
+_TRACKED_MODELS = {
+    OrderModel: (_track_order, ("customer_id", "status", "final_amount", "created_at")),
+    QuoteModel: (_track_quote, ("customer_id", "status")),
+}
+
+
+def mark_customers_for_refresh(session: Any, tenant_id: UUID, customer_ids: Iterable[UUID]) -> None:
+    """Queue an exact recompute at commit (for Core writes to orders / quotes that skip ORM events)."""
+    for customer_id in customer_ids:
+        if customer_id:
+            _delta(session, tenant_id, customer_id).exact = True
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_customer_deltas(session, flush_context):
+    for collection, is_new, is_deleted in (
+        (session.new, True, False), (session.dirty, False, False), (session.deleted, False, True)
+    ):
+        for obj in collection:
+            tracked = _TRACKED_MODELS.get(type(obj))
+            if tracked is None or getattr(obj, "tenant_id", None) is None:
+                continue
+            track, watched = tracked
+            state = inspect(obj)
+            if not (is_new or is_deleted) and not any(state.attrs[c].history.has_changes() for c in watched):
+                continue
+            track(session, obj, is_new, is_deleted)
+
+
+def _delta_params(deltas: Dict[str, CustomerDelta]) -> Dict[str, list]:
+    customer_ids = sorted(deltas)
+    return {
+        "customer_ids": customer_ids,
+        "order_deltas": [deltas[c].orders for c in customer_ids],
+        "spent_deltas": [deltas[c].spent for c in customer_ids],
+        "last_orders": [deltas[c].last_order_at for c in customer_ids],
+        "rejected_deltas": [deltas[c].rejected for c in customer_ids],
+    }
+
+
+def _split_deltas(deltas: Dict[str, CustomerDelta]) -> Tuple[Dict[str, CustomerDelta], List[str]]:
+    """-> (customers updated by delta, customers recomputed exactly); no-op deltas are dropped."""
+    exact = sorted(c for c, d in deltas.items() if d.exact)
+    incremental = {
+        c: d for c, d in deltas.items()
+        if not d.exact and (d.orders or d.spent or d.rejected or d.last_order_at)
+    }
+    return incremental, exact
+
+
+def _prepare_tenant_deltas(pending: Dict[Tuple[str, str], CustomerDelta]):
+    incremental, exact = _split_deltas({customer_id: d for (_, customer_id), d in pending.items()})
+    return (incremental, exact) if incremental or exact else None
+
+
+def _apply_tenant_deltas(session: Session, tenant_id: str, work) -> None:
+    incremental, exact = work
+    params = {"tenant_id": tenant_id, "now": datetime.now(timezone.utc), "source": SOURCE_EVENT}
+    if incremental:
+        session.execute(APPLY_DELTAS_SQL, {**params, **_delta_params(incremental)})
+    if exact:
+        session.execute(REFRESH_CUSTOMERS_SQL, {**params, "customer_ids": exact})
+
+
+_rfm_refresh = CommitRefresh(
+    _DELTAS_KEY, LOCK_TENANT_SQL,
+    prepare=_prepare_tenant_deltas,
+    refresh=_apply_tenant_deltas,
+    container=dict,
+    label="CRM RFM update",
+)
+
+
+# ============ SERVICE ============
+
+class RfmEngine:
+    """Exact refresh and nightly re-tiering of one tenant's customers"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID):
+        self.db = db
+        self.tenant_id = tenant_id
+
+    async def _run(self, statement, source: str, now: Optional[datetime], **params) -> RetierResult:
+        base = {"tenant_id": str(self.tenant_id), "now": now or datetime.now(timezone.utc), "source": source}
+        await self.db.execute(LOCK_TENANT_SQL, {"tenant_id": base["tenant_id"]})
+        row = (await self.db.execute(statement, {**base, **params})).one()
+        return RetierResult(updated=row.updated or 0, tier_changes=row.tier_changes or 0)
+
+    async def refresh_customers(self, customer_ids: Iterable[UUID], now: Optional[datetime] = None) -> RetierResult:
+        """Recompute statistics and tier of the given customers from source tables (caller commits)."""
+        ids = sorted({str(c) for c in customer_ids if c})
+        if not ids:
+            return RetierResult()
+        return await self._run(REFRESH_CUSTOMERS_SQL, SOURCE_REFRESH, now, customer_ids=ids)
+
+    async def retier_tenant(self, now: Optional[datetime] = None) -> RetierResult:
+        """Nightly pass: every customer of the tenant in one UPDATE ... FROM (caller commits)."""
+        return await self._run(RETIER_TENANT_SQL, SOURCE_NIGHTLY, now)
+
+
+async def retier_all_tenants(session_factory=None, tenant_ids: Optional[Iterable[UUID]] = None) -> Dict[str, RetierResult]:
+    """Nightly pass over every tenant (or the given ones), one transaction per tenant."""
+    if session_factory is None:
+        from backend.core.database import AsyncSessionLocal
+        session_factory = AsyncSessionLocal
+
+    results: Dict[str, RetierResult] = {}
+    async with session_factory() as db:
+        if tenant_ids is None:
+            await db.execute(_BYPASS_RLS_SQL)
+            tenant_ids = [row[0] for row in (await db.execute(text("SELECT id FROM tenants ORDER BY id"))).fetchall()]
+            await db.commit()
+        for tenant_id in tenant_ids:
+            # Transaction-local, so the pooled connection does not keep it
+            await db.execute(_BYPASS_RLS_SQL)
+            results[str(tenant_id)] = result = await RfmEngine(db, tenant_id).retier_tenant()
+            await db.commit()
+            logger.info(f"RFM re-tier tenant {tenant_id}: {result.updated} customers updated, "
+                        f"{result.tier_changes} tier changes")
+    return results
+
+
+def get_rfm_engine(db: AsyncSession, tenant_id: UUID) -> RfmEngine:
+    """Factory function for dependency injection"""
+    return RfmEngine(db, tenant_id)
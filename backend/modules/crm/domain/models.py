@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, ForeignKey, TIMESTAMP, JSON, Numeric, Integer, Date
+from sqlalchemy import Column, String, Text, ForeignKey, TIMESTAMP, JSON, Numeric, Integer, Date, SmallInteger, Computed
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -21,11 +21,17 @@ class CustomerModel(Base):
     customer_type = Column(String(20), default='REGULAR')
     preferences = Column(JSONB, default={})
     birthday = Column(Date, nullable=True)
+    # month * 100 + day, indexed for /crm/upcoming-birthdays (migration 083)
+    birthday_key = Column(SmallInteger, Computed(
+        "CAST(EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday) AS smallint)", persisted=True
+    ))
     
     # Statistics (RFM)
     total_spent = Column(Numeric(15, 2), default=0)
     order_count = Column(Integer, default=0)
     last_order_at = Column(TIMESTAMP(timezone=True))
+    rejected_quote_count = Column(Integer, default=0)
+    tier_changed_at = Column(TIMESTAMP(timezone=True))  # last customer_type change by the RFM engine
     
     # Loyalty Program
     loyalty_points = Column(Integer, default=0)
@@ -54,6 +60,26 @@ class InteractionLogModel(Base):
     customer = relationship("CustomerModel", back_populates="interaction_logs")
 
 
+class CustomerTierHistoryModel(Base):
+    """customer_type changes made by the RFM engine (crm/application/rfm_engine.py)"""
+    __tablename__ = "customer_tier_history"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant_id = Column(UUID(as_uuid=True), nullable=False)
+    customer_id = Column(UUID(as_uuid=True), ForeignKey("customers.id", ondelete="CASCADE"), nullable=False)
+
+    old_tier = Column(String(20))
+    new_tier = Column(String(20), nullable=False)
+    source = Column(String(20), nullable=False)  # EVENT, REFRESH, NIGHTLY
+
+    # Statistics the new tier was derived from
+    order_count = Column(Integer, default=0)
+    total_spent = Column(Numeric(15, 2), default=0)
+    last_order_at = Column(TIMESTAMP(timezone=True))
+
+    changed_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+
 class LoyaltyPointsHistoryModel(Base):
     """Tracks all loyalty points transactions"""
     __tablename__ = "loyalty_points_history"
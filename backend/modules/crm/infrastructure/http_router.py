@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, desc, or_
 from typing import List, Optional
@@ -6,38 +6,51 @@ from uuid import UUID
 
 from backend.core.database import get_db
 from backend.core.dependencies import get_current_tenant, CurrentTenant
+from backend.common.utils.keyset_pagination import COUNT_NONE, KeysetPaginator, search_clause
 from backend.modules.crm.domain.models import CustomerModel, InteractionLogModel
 from backend.modules.crm.domain.entities import Customer, CustomerCreate, CustomerUpdate, InteractionLog, InteractionLogBase
 
 router = APIRouter(tags=["CRM"])
 
+customer_list_paginator = KeysetPaginator(CustomerModel.created_at, CustomerModel.id)
+
 
 @router.get("/customers", response_model=List[Customer])
 async def list_customers(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
     search: Optional[str] = None,
     sort_by: Optional[str] = 'created_at',
     sort_dir: Optional[str] = 'desc',
     customer_type: Optional[str] = None,
+    cursor: Optional[str] = None,
     tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
 ):
     query = select(CustomerModel).where(CustomerModel.tenant_id == tenant_id)
 
-    if search:
-        search_term = f"%{search}%"
+    if search and search.strip():
+        # Accent-insensitive, served by the trigram index of migration 081
         query = query.where(
-            or_(
-                CustomerModel.full_name.ilike(search_term),
-                CustomerModel.phone.ilike(search_term),
-                CustomerModel.email.ilike(search_term)
-            )
+            search_clause((CustomerModel.full_name, CustomerModel.phone, CustomerModel.email), search)
         )
     
     if customer_type:
         query = query.where(CustomerModel.customer_type == customer_type)
 
+    # Default order (newest first): keyset pagination, next page via X-Next-Cursor
+    if sort_by == 'created_at' and sort_dir != 'asc':
+        try:
+            page = await customer_list_paginator.paginate(
+                db, query, cursor=cursor, page_size=limit, count=COUNT_NONE, offset=skip
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if page.next_cursor:
+            response.headers["X-Next-Cursor"] = page.next_cursor
+        return page.items
+
     # Sorting
     if sort_dir == 'asc':
         query = query.order_by(getattr(CustomerModel, sort_by))
@@ -332,55 +345,30 @@ async def get_interaction_stats(
 
 @router.get("/upcoming-birthdays")
 async def get_upcoming_birthdays(
-    days: int = 30,
+    days: int = Query(30, ge=0, le=366),
+    limit: int = Query(500, ge=1, le=5000),
     tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Get customers with upcoming birthdays within the next N days.
-    Uses month-day comparison to find birthdays regardless of year.
+    Get customers with upcoming birthdays within the next N days, soonest first.
+    One indexed range query on birthday_key (month * 100 + day), windows
+    crossing the new year included.
     """
-    from datetime import datetime, timezone, timedelta
-    
-    today = datetime.now(timezone.utc).date()
-    
-    # Query customers with non-null birthdays
-    query = select(CustomerModel).where(
-        CustomerModel.tenant_id == tenant_id,
-        CustomerModel.birthday.isnot(None)
-    )
-    
-    result = await db.execute(query)
-    all_with_birthdays = result.scalars().all()
-    
-    # Filter in Python for cross-year birthday matching
-    upcoming = []
-    for c in all_with_birthdays:
-        if c.birthday:
-            try:
-                this_year_bday = c.birthday.replace(year=today.year)
-            except ValueError:
-                this_year_bday = c.birthday.replace(year=today.year, day=28)
-            
-            if this_year_bday < today:
-                try:
-                    this_year_bday = c.birthday.replace(year=today.year + 1)
-                except ValueError:
-                    this_year_bday = c.birthday.replace(year=today.year + 1, day=28)
-            
-            days_until = (this_year_bday - today).days
-            if 0 <= days_until <= days:
-                upcoming.append({
-                    "id": str(c.id),
-                    "full_name": c.full_name,
-                    "phone": c.phone,
-                    "birthday": c.birthday.isoformat(),
-                    "days_until": days_until,
-                    "customer_type": c.customer_type,
-                })
-    
-    upcoming.sort(key=lambda x: x["days_until"])
-    return upcoming
+    from backend.modules.crm.application.birthday_service import get_birthday_service
+
+    upcoming = await get_birthday_service(db, tenant_id).upcoming(days=days, limit=limit)
+    return [
+        {
+            "id": str(item.customer.id),
+            "full_name": item.customer.full_name,
+            "phone": item.customer.phone,
+            "birthday": item.customer.birthday.isoformat(),
+            "days_until": item.days_until,
+            "customer_type": item.customer.customer_type,
+        }
+        for item in upcoming
+    ]
 
 
 # ============ GROWTH STATS ============
@@ -507,3 +495,51 @@ async def get_customer_consumption(
         "top_items": top_items,
         "total_spend": total_spend,
     }
+
+
+# ============ RFM TIERS ============
+
+@router.post("/rfm/retier")
+async def retier_customers(tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
+    """
+    Recompute statistics and tier of every customer of the tenant now
+    (the arq worker runs the same pass nightly).
+    """
+    from backend.modules.crm.application.rfm_engine import get_rfm_engine
+
+    result = await get_rfm_engine(db, tenant_id).retier_tenant()
+    await db.commit()
+    return {"updated": result.updated, "tier_changes": result.tier_changes}
+
+
+@router.get("/customers/{customer_id}/tier-history")
+async def get_customer_tier_history(
+    customer_id: UUID,
+    limit: int = Query(50, ge=1, le=500),
+    tenant_id: UUID = Depends(get_current_tenant),
+    db: AsyncSession = Depends(get_db)
+):
+    """customer_type changes made by the RFM engine, newest first"""
+    from backend.modules.crm.domain.models import CustomerTierHistoryModel
+
+    result = await db.execute(
+        select(CustomerTierHistoryModel)
+        .where(
+            CustomerTierHistoryModel.tenant_id == tenant_id,
+            CustomerTierHistoryModel.customer_id == customer_id,
+        )
+        .order_by(CustomerTierHistoryModel.changed_at.desc())
+        .limit(limit)
+    )
+    return [
+        {
+            "old_tier": h.old_tier,
+            "new_tier": h.new_tier,
+            "source": h.source,
+            "order_count": h.order_count,
+            "total_spent": float(h.total_spent or 0),
+            "last_order_at": h.last_order_at,
+            "changed_at": h.changed_at,
+        }
+        for h in result.scalars().all()
+    ]
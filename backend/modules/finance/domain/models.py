@@ -3,7 +3,7 @@ SQLAlchemy ORM Models for Finance Module
 Database: PostgreSQL (catering_db)
 """
 
-from sqlalchemy import Column, String, Text, Boolean, Numeric, ForeignKey, DateTime, Date
+from sqlalchemy import Column, String, Text, Boolean, Numeric, ForeignKey, DateTime, Date, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -306,3 +306,34 @@ class PeriodCloseChecklistModel(Base):
     # Audit
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class FinanceDailyKpiModel(Base):
+    """
+    Per-tenant daily KPI rollup backing /finance/dashboard and /analytics/overview.
+    Maintained by FinanceKpiRollupService; any day can be rebuilt from source tables.
+    """
+    __tablename__ = "finance_daily_kpis"
+
+    # Composite key: one row per tenant per day
+    tenant_id = Column(UUID(as_uuid=True), ForeignKey("tenants.id", ondelete="CASCADE"), primary_key=True)
+    kpi_date = Column(Date, primary_key=True)
+
+    # Orders bucketed by created_at
+    paid_revenue = Column(Numeric(15, 2), nullable=False, default=0)        # paid_amount of COMPLETED/PAID orders
+    orders_created = Column(Integer, nullable=False, default=0)
+    receivables_amount = Column(Numeric(15, 2), nullable=False, default=0)  # open balance_amount (not CANCELLED)
+    receivables_count = Column(Integer, nullable=False, default=0)
+
+    # Orders bucketed by event_date
+    booked_revenue = Column(Numeric(15, 2), nullable=False, default=0)      # final_amount of active/completed orders
+
+    # Finance transactions bucketed by transaction_date
+    payment_amount = Column(Numeric(15, 2), nullable=False, default=0)      # type = PAYMENT
+    expense_amount = Column(Numeric(15, 2), nullable=False, default=0)      # type = EXPENSE
+
+    # Open purchase orders (total - paid): by due_date, or by created_at when undated
+    payables_dated = Column(Numeric(15, 2), nullable=False, default=0)
+    payables_undated = Column(Numeric(15, 2), nullable=False, default=0)
+
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now())
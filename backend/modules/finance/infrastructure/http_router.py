@@ -24,6 +24,7 @@ from backend.modules.finance.domain.models import (
     PeriodAuditLogModel, PeriodCloseChecklistModel
 )
 from backend.modules.finance.domain.entities import Account, AccountBase, Journal, JournalBase
+from backend.modules.finance.services.kpi_rollup_service import get_kpi_rollup_service
 from backend.modules.order.domain.models import OrderModel, OrderPaymentModel
 from backend.core.auth.permissions import require_permission
 from backend.modules.procurement.domain.models import PurchaseOrderModel, SupplierModel
@@ -84,29 +85,20 @@ async def get_dashboard_stats(tenant_id: UUID = Depends(get_current_tenant), db:
         prev_month_start = date(now.year, now.month - 1, 1)
         prev_month_end = current_month_start - timedelta(days=1)
     
-    # === REVENUE FROM ORDERS ===
-    # Current month revenue (from paid orders)
-    current_revenue_result = await db.execute(
-        select(func.coalesce(func.sum(OrderModel.paid_amount), 0))
-        .where(
-            OrderModel.tenant_id == tenant_id,
-            OrderModel.status.in_(['COMPLETED', 'PAID']),
-            func.date(OrderModel.created_at) >= current_month_start
-        )
-    )
-    current_revenue = current_revenue_result.scalar() or Decimal(0)
-    
-    # Previous month revenue
-    prev_revenue_result = await db.execute(
-        select(func.coalesce(func.sum(OrderModel.paid_amount), 0))
-        .where(
-            OrderModel.tenant_id == tenant_id,
-            OrderModel.status.in_(['COMPLETED', 'PAID']),
-            func.date(OrderModel.created_at) >= prev_month_start,
-            func.date(OrderModel.created_at) <= prev_month_end
-        )
-    )
-    prev_revenue = prev_revenue_result.scalar() or Decimal(0)
+    # === ROLLUP READ (finance_daily_kpis) ===
+    # Revenue (paid orders by created day), expenses (PAYMENT transactions),
+    # receivables and payables all come from one query over the daily rollup
+    # maintained by FinanceKpiRollupService.
+    kpis = await get_kpi_rollup_service(db, tenant_id).dashboard_totals(
+        current_start=current_month_start,
+        prev_start=prev_month_start,
+        prev_end=prev_month_end,
+        due_soon_until=now.date() + timedelta(days=7),
+    )
+    current_revenue = Decimal(kpis["revenue_current"] or 0)
+    prev_revenue = Decimal(kpis["revenue_previous"] or 0)
+    current_expenses = Decimal(kpis["expenses_current"] or 0)
+    prev_expenses = Decimal(kpis["expenses_previous"] or 0)
     
     # Revenue growth
     if prev_revenue > 0:
@@ -114,28 +106,6 @@ async def get_dashboard_stats(tenant_id: UUID = Depends(get_current_tenant), db:
     else:
         revenue_growth = Decimal(100) if current_revenue > 0 else Decimal(0)
     
-    # === EXPENSES (from finance_transactions) ===
-    current_expenses_result = await db.execute(
-        select(func.coalesce(func.sum(FinanceTransactionModel.amount), 0))
-        .where(
-            FinanceTransactionModel.tenant_id == tenant_id,
-            FinanceTransactionModel.type == 'PAYMENT',
-            FinanceTransactionModel.transaction_date >= current_month_start
-        )
-    )
-    current_expenses = current_expenses_result.scalar() or Decimal(0)
-    
-    prev_expenses_result = await db.execute(
-        select(func.coalesce(func.sum(FinanceTransactionModel.amount), 0))
-        .where(
-            FinanceTransactionModel.tenant_id == tenant_id,
-            FinanceTransactionModel.type == 'PAYMENT',
-            FinanceTransactionModel.transaction_date >= prev_month_start,
-            FinanceTransactionModel.transaction_date <= prev_month_end
-        )
-    )
-    prev_expenses = prev_expenses_result.scalar() or Decimal(0)
-    
     if prev_expenses > 0:
         expenses_growth = ((current_expenses - prev_expenses) / prev_expenses * 100)
     else:
@@ -148,51 +118,11 @@ async def get_dashboard_stats(tenant_id: UUID = Depends(get_current_tenant), db:
     else:
         margin_percent = Decimal(0)
     
-    # === RECEIVABLES (unpaid order amounts) ===
-    try:
-        receivables_total_result = await db.execute(
-            select(func.coalesce(func.sum(OrderModel.balance_amount), 0))
-            .where(
-                OrderModel.tenant_id == tenant_id,
-                OrderModel.balance_amount > 0,
-                OrderModel.status.notin_(['CANCELLED'])
-            )
-        )
-        receivables_total = receivables_total_result.scalar() or Decimal(0)
-        receivables_overdue = Decimal(0)  # Simplified for now
-    except Exception:
-        receivables_total = Decimal(0)
-        receivables_overdue = Decimal(0)
-    
-    # === PAYABLES (from Procurement POs) ===
-    try:
-        from backend.modules.procurement.domain.models import PurchaseOrderModel as POModel
-        
-        # Total unpaid POs
-        payables_result = await db.execute(
-            select(func.coalesce(func.sum(POModel.total_amount - func.coalesce(POModel.paid_amount, 0)), 0))
-            .where(
-                POModel.tenant_id == tenant_id,
-                POModel.status.notin_(['PAID', 'CANCELLED', 'DRAFT'])
-            )
-        )
-        payables_total = payables_result.scalar() or Decimal(0)
-        
-        # Due soon (within 7 days)
-        from datetime import timezone as tz
-        now_utc = datetime.now(tz.utc)
-        due_soon_result = await db.execute(
-            select(func.coalesce(func.sum(POModel.total_amount - func.coalesce(POModel.paid_amount, 0)), 0))
-            .where(
-                POModel.tenant_id == tenant_id,
-                POModel.status.notin_(['PAID', 'CANCELLED', 'DRAFT']),
-                POModel.due_date <= now_utc + timedelta(days=7)
-            )
-        )
-        payables_due_soon = due_soon_result.scalar() or Decimal(0)
-    except Exception:
-        payables_total = Decimal(0)
-        payables_due_soon = Decimal(0)
+    # === RECEIVABLES / PAYABLES ===
+    receivables_total = Decimal(kpis["receivables_total"] or 0)
+    receivables_overdue = Decimal(0)  # Simplified for now
+    payables_total = Decimal(kpis["payables_total"] or 0)
+    payables_due_soon = Decimal(kpis["payables_due_soon"] or 0)
     
     return DashboardStats(
         revenue={
@@ -220,6 +150,31 @@ async def get_dashboard_stats(tenant_id: UUID = Depends(get_current_tenant), db:
     )
 
 
+@router.post("/kpi-rollups/rebuild",
+              dependencies=[Depends(require_permission("finance", "edit"))])
+async def rebuild_kpi_rollups(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    tenant_id: UUID = Depends(get_current_tenant),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Reconcile the daily finance KPI rollup with source tables.
+    Without dates, rebuilds the tenant's full history.
+    """
+    service = get_kpi_rollup_service(db, tenant_id)
+    if from_date is None and to_date is None:
+        days = await service.rebuild_all()
+    else:
+        start = from_date or to_date
+        end = to_date or from_date
+        if start > end:
+            raise HTTPException(status_code=400, detail="from_date must be before to_date")
+        days = await service.rebuild_range(start, end)
+    await db.commit()
+    return {"rebuilt_days": days}
+
+
 @router.get("/recent-transactions", response_model=List[RecentTransaction],
               dependencies=[Depends(require_permission("finance", "view"))])
 async def get_recent_transactions(
@@ -727,6 +682,7 @@ class BulkPaymentItem(BaseModel):
 class BulkPaymentRequest(BaseModel):
     """Request for bulk payments"""
     payments: List[BulkPaymentItem]
+    all_or_nothing: bool = False  # reject the whole batch if any row is invalid
 
 class BulkPaymentResult(BaseModel):
     """Result of single payment in bulk"""
@@ -735,6 +691,7 @@ class BulkPaymentResult(BaseModel):
     amount: Decimal
     success: bool
     error: Optional[str] = None
+    payment_id: Optional[UUID] = None
 
 class BulkPaymentResponse(BaseModel):
     """Response for bulk payments"""
@@ -754,103 +711,46 @@ async def record_bulk_payments(
     """
     Record multiple payments at once.
     Used for bulk payment recording from receivables table.
+    Every row is validated before anything is written; valid rows are
+    applied together in one transaction (or none, with all_or_nothing).
     """
-    from datetime import timezone as tz
+    from backend.modules.finance.services.bulk_payment_service import BulkPaymentRow, get_bulk_payment_service
     
-    results = []
-    success_count = 0
-    failed_count = 0
-    total_amount = Decimal(0)
-    
-    for payment in request.payments:
-        try:
-            # Get order
-            order_result = await db.execute(
-                select(OrderModel).where(
-                    (OrderModel.id == payment.order_id) & 
-                    (OrderModel.tenant_id == tenant_id)
-                )
-            )
-            order = order_result.scalar_one_or_none()
-            
-            if not order:
-                results.append(BulkPaymentResult(
-                    order_id=payment.order_id,
-                    order_code="N/A",
-                    amount=payment.amount,
-                    success=False,
-                    error="Order not found"
-                ))
-                failed_count += 1
-                continue
-            
-            # Validate payment amount
-            if payment.amount <= 0:
-                results.append(BulkPaymentResult(
-                    order_id=payment.order_id,
-                    order_code=order.code,
-                    amount=payment.amount,
-                    success=False,
-                    error="Invalid payment amount"
-                ))
-                failed_count += 1
-                continue
-            
-            # Create payment record
-            payment_date = datetime.now(tz.utc)
-            if payment.payment_date:
-                try:
-                    payment_date = datetime.strptime(payment.payment_date, "%Y-%m-%d").replace(tzinfo=tz.utc)
-                except ValueError:
-                    pass
-            
-            new_payment = OrderPaymentModel(
-                tenant_id=tenant_id,
-                order_id=payment.order_id,
-                amount=payment.amount,
-                payment_method=payment.payment_method,
-                payment_date=payment_date
-            )
-            db.add(new_payment)
-            
-            # Update order totals
-            order.paid_amount = (order.paid_amount or Decimal(0)) + payment.amount
-            order.balance_amount = (order.final_amount or Decimal(0)) - order.paid_amount
-            
-            # Auto-transition to PAID if fully paid
-            if order.balance_amount <= 0:
-                order.status = 'PAID'
-            
-            order.updated_at = datetime.now(tz.utc)
-            
-            results.append(BulkPaymentResult(
-                order_id=payment.order_id,
-                order_code=order.code,
-                amount=payment.amount,
-                success=True
-            ))
-            success_count += 1
-            total_amount += payment.amount
-            
-        except Exception as e:
-            logger.error(f"Bulk payment error for order {payment.order_id}: {e}")
-            results.append(BulkPaymentResult(
-                order_id=payment.order_id,
-                order_code="N/A",
-                amount=payment.amount,
-                success=False,
-                error=str(e)
-            ))
-            failed_count += 1
-    
-    # Commit all successful payments
-    await db.commit()
+    rows = [
+        BulkPaymentRow(
+            order_id=p.order_id,
+            amount=p.amount,
+            payment_method=p.payment_method,
+            payment_date=p.payment_date
+        )
+        for p in request.payments
+    ]
+    try:
+        outcomes = await get_bulk_payment_service(db, tenant_id).record(rows, all_or_nothing=request.all_or_nothing)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Bulk payment batch failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Không thể ghi nhận thanh toán: {e}")
+    
+    results = [
+        BulkPaymentResult(
+            order_id=o.order_id,
+            order_code=o.order_code,
+            amount=o.amount,
+            success=o.success,
+            error=o.error,
+            payment_id=o.payment_id
+        )
+        for o in outcomes
+    ]
+    success_count = sum(1 for o in outcomes if o.success)
     
     return BulkPaymentResponse(
         total_processed=len(request.payments),
         success_count=success_count,
-        failed_count=failed_count,
-        total_amount=total_amount,
+        failed_count=len(outcomes) - success_count,
+        total_amount=sum((o.amount for o in outcomes if o.success), Decimal(0)),
         results=results
     )
 
@@ -2457,7 +2357,7 @@ async def get_labor_cost_summary(
 # ============ REPORT EXPORT ============
 
 from fastapi.responses import StreamingResponse
-import io
+from backend.modules.finance.services.report_export_service import get_report_exporter, iter_file_chunks
 
 @router.get("/reports/export",
               dependencies=[Depends(require_permission("finance", "export"))])
@@ -2489,139 +2389,22 @@ async def export_finance_report(
 
 
 async def _export_excel(db: AsyncSession, tenant_id: UUID, start_date: date, end_date: date, report_type: str):
-    """Generate Excel report using openpyxl"""
+    """Generate Excel report using openpyxl (write-only, streamed from a server-side cursor)"""
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+        import openpyxl  # noqa: F401
     except ImportError:
         raise HTTPException(
             status_code=500, 
             detail="openpyxl not installed. Run: pip install openpyxl"
         )
     
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Báo Cáo Tài Chính"
-    
-    # Styles
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    thin_border = Border(
-        left=Side(style='thin'), right=Side(style='thin'),
-        top=Side(style='thin'), bottom=Side(style='thin')
-    )
-    
-    # Title
-    ws.merge_cells('A1:F1')
-    ws['A1'] = f"BÁO CÁO TÀI CHÍNH - {report_type.upper()}"
-    ws['A1'].font = Font(bold=True, size=14)
-    ws['A1'].alignment = Alignment(horizontal='center')
-    
-    ws['A2'] = f"Từ ngày: {start_date.strftime('%d/%m/%Y')} đến ngày: {end_date.strftime('%d/%m/%Y')}"
-    ws.merge_cells('A2:F2')
-    
-    if report_type == "transactions":
-        # Query transactions
-        result = await db.execute(
-            select(FinanceTransactionModel)
-            .where(
-                FinanceTransactionModel.tenant_id == tenant_id,
-                FinanceTransactionModel.transaction_date >= start_date,
-                FinanceTransactionModel.transaction_date <= end_date
-            )
-            .order_by(FinanceTransactionModel.transaction_date.desc())
-        )
-        transactions = result.scalars().all()
-        
-        # Headers
-        headers = ["Mã GD", "Ngày", "Loại", "Danh mục", "Mô tả", "Số tiền"]
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=4, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = thin_border
-        
-        # Data
-        total_receipt = 0
-        total_payment = 0
-        for row, t in enumerate(transactions, 5):
-            ws.cell(row=row, column=1, value=t.code).border = thin_border
-            ws.cell(row=row, column=2, value=t.transaction_date.strftime('%d/%m/%Y')).border = thin_border
-            ws.cell(row=row, column=3, value="Thu" if t.type == "RECEIPT" else "Chi").border = thin_border
-            ws.cell(row=row, column=4, value=t.category or "").border = thin_border
-            ws.cell(row=row, column=5, value=t.description or "").border = thin_border
-            ws.cell(row=row, column=6, value=float(t.amount)).border = thin_border
-            ws.cell(row=row, column=6).number_format = '#,##0'
-            
-            if t.type == "RECEIPT":
-                total_receipt += float(t.amount)
-            else:
-                total_payment += float(t.amount)
-        
-        # Summary
-        summary_row = len(transactions) + 6
-        ws.cell(row=summary_row, column=5, value="Tổng Thu:").font = Font(bold=True)
-        ws.cell(row=summary_row, column=6, value=total_receipt).number_format = '#,##0'
-        ws.cell(row=summary_row + 1, column=5, value="Tổng Chi:").font = Font(bold=True)
-        ws.cell(row=summary_row + 1, column=6, value=total_payment).number_format = '#,##0'
-        ws.cell(row=summary_row + 2, column=5, value="Chênh lệch:").font = Font(bold=True)
-        ws.cell(row=summary_row + 2, column=6, value=total_receipt - total_payment).number_format = '#,##0'
-    
-    elif report_type == "receivables":
-        # Query unpaid orders
-        result = await db.execute(
-            select(OrderModel)
-            .where(
-                OrderModel.tenant_id == tenant_id,
-                OrderModel.balance_amount > 0,
-                OrderModel.status.in_(['CONFIRMED', 'COMPLETED'])
-            )
-            .order_by(OrderModel.event_date.desc())
-        )
-        orders = result.scalars().all()
-        
-        headers = ["Mã ĐH", "Khách hàng", "SĐT", "Ngày sự kiện", "Tổng tiền", "Đã thu", "Còn nợ"]
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=4, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-        
-        total_receivable = 0
-        for row, o in enumerate(orders, 5):
-            ws.cell(row=row, column=1, value=o.code)
-            ws.cell(row=row, column=2, value=o.customer_name)
-            ws.cell(row=row, column=3, value=o.customer_phone)
-            ws.cell(row=row, column=4, value=o.event_date.strftime('%d/%m/%Y') if o.event_date else "")
-            ws.cell(row=row, column=5, value=float(o.final_amount)).number_format = '#,##0'
-            ws.cell(row=row, column=6, value=float(o.paid_amount)).number_format = '#,##0'
-            ws.cell(row=row, column=7, value=float(o.balance_amount)).number_format = '#,##0'
-            total_receivable += float(o.balance_amount)
-        
-        summary_row = len(orders) + 6
-        ws.cell(row=summary_row, column=6, value="Tổng công nợ:").font = Font(bold=True)
-        ws.cell(row=summary_row, column=7, value=total_receivable).number_format = '#,##0'
-    
-    # Auto-width columns
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
-    
-    # Save to buffer
-    buffer = io.BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+    exporter = get_report_exporter(db, tenant_id, start_date, end_date)
+    output = await exporter.write_excel(report_type)
     
     filename = f"bao_cao_tai_chinh_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.xlsx"
     
     return StreamingResponse(
-        buffer,
+        iter_file_chunks(output),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
@@ -2631,88 +2414,13 @@ async def _export_pdf(db: AsyncSession, tenant_id: UUID, start_date: date, end_d
     """Generate PDF report - simplified HTML-based approach"""
     # For now, return a simple HTML that can be printed as PDF
     # In production, use reportlab or weasyprint
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Báo Cáo Tài Chính</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; margin: 40px; }}
-            h1 {{ text-align: center; color: #333; }}
-            table {{ width: 100%; border-collapse: collapse; margin-top: 20px; }}
-            th {{ background-color: #4472C4; color: white; padding: 10px; text-align: left; }}
-            td {{ padding: 8px; border-bottom: 1px solid #ddd; }}
-            .summary {{ margin-top: 20px; font-weight: bold; }}
-            .amount {{ text-align: right; }}
-            @media print {{ body {{ margin: 0; }} }}
-        </style>
-    </head>
-    <body>
-        <h1>BÁO CÁO TÀI CHÍNH - {report_type.upper()}</h1>
-        <p>Từ ngày: {start_date.strftime('%d/%m/%Y')} đến ngày: {end_date.strftime('%d/%m/%Y')}</p>
-    """
-    
-    if report_type == "transactions":
-        result = await db.execute(
-            select(FinanceTransactionModel)
-            .where(
-                FinanceTransactionModel.tenant_id == tenant_id,
-                FinanceTransactionModel.transaction_date >= start_date,
-                FinanceTransactionModel.transaction_date <= end_date
-            )
-            .order_by(FinanceTransactionModel.transaction_date.desc())
-        )
-        transactions = result.scalars().all()
-        
-        html_content += """
-        <table>
-            <tr><th>Mã GD</th><th>Ngày</th><th>Loại</th><th>Danh mục</th><th>Mô tả</th><th>Số tiền</th></tr>
-        """
-        
-        total_receipt = 0
-        total_payment = 0
-        for t in transactions:
-            type_label = "Thu" if t.type == "RECEIPT" else "Chi"
-            amount = float(t.amount)
-            if t.type == "RECEIPT":
-                total_receipt += amount
-            else:
-                total_payment += amount
-            
-            html_content += f"""
-            <tr>
-                <td>{t.code}</td>
-                <td>{t.transaction_date.strftime('%d/%m/%Y')}</td>
-                <td>{type_label}</td>
-                <td>{t.category or ''}</td>
-                <td>{t.description or ''}</td>
-                <td class="amount">{amount:,.0f}</td>
-            </tr>
-            """
-        
-        html_content += f"""
-        </table>
-        <div class="summary">
-            <p>Tổng Thu: {total_receipt:,.0f} VND</p>
-            <p>Tổng Chi: {total_payment:,.0f} VND</p>
-            <p>Chênh lệch: {total_receipt - total_payment:,.0f} VND</p>
-        </div>
-        """
-    
-    html_content += """
-    </body>
-    </html>
-    """
-    
-    buffer = io.BytesIO(html_content.encode('utf-8'))
-    buffer.seek(0)
+    exporter = get_report_exporter(db, tenant_id, start_date, end_date)
+    output = await exporter.write_html(report_type)
     
     filename = f"bao_cao_tai_chinh_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.html"
     
     return StreamingResponse(
-        buffer,
+        iter_file_chunks(output),
         media_type="text/html",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
@@ -3468,14 +3176,6 @@ async def update_checklist_item(
 
 # ============ E1: ACTUAL COGS FROM INVENTORY (PRD Gap Fix) ============
 
-from backend.modules.inventory.domain.models import (
-    InventoryTransactionModel as InvTxnModel,
-    InventoryItemModel as InvItemModel,
-    InventoryLotModel as InvLotModel,
-    InventoryStockModel as InvStockModel,
-)
-
-
 class COGSItem(BaseModel):
     """Single item COGS breakdown"""
     item_id: str
@@ -3514,47 +3214,25 @@ async def get_cogs_report(
     if not end_date:
         end_date = now.date()
 
-    # Query EXPORT transactions with actual unit_price
-    result = await db.execute(
-        select(
-            InvTxnModel.item_id,
-            InvItemModel.name.label('item_name'),
-            InvItemModel.category,
-            func.sum(InvTxnModel.quantity).label('total_qty'),
-            func.avg(InvTxnModel.unit_price).label('avg_cost'),
-            func.sum(InvTxnModel.quantity * func.coalesce(InvTxnModel.unit_price, InvItemModel.cost_price, 0)).label('total_cost')
-        )
-        .join(InvItemModel, InvTxnModel.item_id == InvItemModel.id)
-        .where(
-            InvTxnModel.tenant_id == tenant_id,
-            InvTxnModel.transaction_type == 'EXPORT',
-            InvTxnModel.is_reversed == False,
-            func.date(InvTxnModel.created_at) >= start_date,
-            func.date(InvTxnModel.created_at) <= end_date,
-        )
-        .group_by(InvTxnModel.item_id, InvItemModel.name, InvItemModel.category)
-        .order_by(desc('total_cost'))
-    )
-    rows = result.all()
+    from backend.modules.finance.services.inventory_valuation_service import get_inventory_valuation_service
 
-    items = []
-    total_cogs = 0.0
-    for row in rows:
-        cost = float(row.total_cost or 0)
-        total_cogs += cost
-        items.append(COGSItem(
-            item_id=str(row.item_id),
-            item_name=row.item_name or "N/A",
-            category=row.category,
-            total_qty_used=float(row.total_qty or 0),
-            avg_unit_cost=float(row.avg_cost or 0),
-            total_cost=cost,
-        ))
+    summary = await get_inventory_valuation_service(db, tenant_id).cogs(start_date, end_date)
+    items = [
+        COGSItem(
+            item_id=str(line.item_id),
+            item_name=line.item_name,
+            category=line.category,
+            total_qty_used=line.total_qty_used,
+            avg_unit_cost=line.avg_unit_cost,
+            total_cost=line.total_cost,
+        )
+        for line in summary.lines
+    ]
 
     return COGSReport(
         period_start=start_date,
         period_end=end_date,
-        total_cogs=total_cogs,
+        total_cogs=summary.total_cogs,
         items_count=len(items),
         items=items,
     )
@@ -3571,6 +3249,7 @@ class StockValuationItem(BaseModel):
     current_stock: float
     lot_based_value: float
     static_cost_value: float
+    weighted_avg_value: float = 0
     lot_count: int
 
 
@@ -3579,6 +3258,7 @@ class StockValuationReport(BaseModel):
     valuation_date: date
     total_value_lot_based: float
     total_value_static: float
+    total_value_weighted_avg: float = 0
     total_items: int
     items: List[StockValuationItem]
 
@@ -3588,75 +3268,38 @@ class StockValuationReport(BaseModel):
 async def get_stock_valuation(
     tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db),
+    as_of: Optional[date] = Query(None, description="Valuation date (default: today)"),
 ):
     """
     E2: Get stock valuation using lot-based unit_cost.
-    Compares lot-based valuation vs static cost_price valuation.
+    Compares lot-based (FIFO) valuation vs weighted-average and static cost_price valuation.
+    With as_of, quantities are rolled back to that date and valued with the FIFO
+    layers received up to it.
     Reference: PRD-luong-nghiep-vu-kho-hang-v2.md (E2)
     """
-    # Query all items with their current stock
-    items_result = await db.execute(
-        select(
-            InvItemModel,
-            func.coalesce(func.sum(InvStockModel.quantity), 0).label('current_stock')
-        )
-        .outerjoin(InvStockModel, InvItemModel.id == InvStockModel.item_id)
-        .where(InvItemModel.tenant_id == tenant_id)
-        .group_by(InvItemModel.id)
-    )
-    item_rows = items_result.all()
-
-    # Query active lots with remaining value
-    lots_result = await db.execute(
-        select(
-            InvLotModel.item_id,
-            func.sum(InvLotModel.remaining_quantity * InvLotModel.unit_cost).label('lot_value'),
-            func.count(InvLotModel.id).label('lot_count'),
-        )
-        .where(
-            InvLotModel.tenant_id == tenant_id,
-            InvLotModel.status == 'ACTIVE',
-            InvLotModel.remaining_quantity > 0,
-        )
-        .group_by(InvLotModel.item_id)
-    )
-    lot_map = {str(row.item_id): (float(row.lot_value or 0), int(row.lot_count or 0)) for row in lots_result.all()}
-
-    items = []
-    total_lot = 0.0
-    total_static = 0.0
-
-    for row in item_rows:
-        item = row[0]
-        stock = float(row.current_stock or 0)
-        static_val = stock * float(item.cost_price or 0)
-        lot_val, lot_count = lot_map.get(str(item.id), (0.0, 0))
-
-        # Use lot-based value if available, otherwise fallback to static
-        effective_lot_val = lot_val if lot_val > 0 else static_val
-
-        total_lot += effective_lot_val
-        total_static += static_val
-
-        if stock > 0:
-            items.append(StockValuationItem(
-                item_id=str(item.id),
-                item_name=item.name,
-                category=item.category,
-                uom=item.uom or "kg",
-                current_stock=stock,
-                lot_based_value=effective_lot_val,
-                static_cost_value=static_val,
-                lot_count=lot_count,
-            ))
-
-    # Sort by value descending
-    items.sort(key=lambda x: x.lot_based_value, reverse=True)
+    from backend.modules.finance.services.inventory_valuation_service import get_inventory_valuation_service
+
+    summary = await get_inventory_valuation_service(db, tenant_id).valuation(as_of)
+    items = [
+        StockValuationItem(
+            item_id=str(line.item_id),
+            item_name=line.item_name,
+            category=line.category,
+            uom=line.uom or "kg",
+            current_stock=line.current_stock,
+            lot_based_value=line.fifo_value,
+            static_cost_value=line.static_value,
+            weighted_avg_value=line.weighted_avg_value,
+            lot_count=line.lot_count,
+        )
+        for line in summary.lines
+    ]
 
     return StockValuationReport(
-        valuation_date=datetime.now().date(),
-        total_value_lot_based=total_lot,
-        total_value_static=total_static,
+        valuation_date=summary.valuation_date,
+        total_value_lot_based=summary.total_fifo,
+        total_value_static=summary.total_static,
+        total_value_weighted_avg=summary.total_weighted_avg,
         total_items=len(items),
         items=items,
     )
@@ -1,2 +1,5 @@
 # Finance services module
+from .bulk_payment_service import BulkPaymentService, get_bulk_payment_service
 from .journal_service import JournalService, get_journal_service
+from .kpi_rollup_service import FinanceKpiRollupService, get_kpi_rollup_service, mark_kpi_days_dirty
+from .report_export_service import FinanceReportExporter, get_report_exporter, iter_file_chunks
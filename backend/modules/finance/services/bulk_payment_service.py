@@ -0,0 +1,218 @@
+"""
+Bulk Payment Service
+Set-based recording for POST /finance/payments/bulk (bank statement reconciliation)
+
+The old loop loaded each order separately, applied rows one at a time and
+only logged failures, so a bad row left a half-applied batch behind.
+
+Pipeline (a fixed number of statements per batch):
+1. load every target order with one IN query, FOR UPDATE (id order, so
+   concurrent batches lock in the same order)
+2. validate every row up front, accumulating amounts per order in memory
+   (several rows may pay the same order)
+3. one multi-row INSERT into order_payments
+4. one UPDATE orders ... FROM (VALUES ...) with the new totals / status
+5. journals for all payments through JournalService, in a SAVEPOINT so a
+   journal failure never rolls back the payments (same as the single
+   payment endpoint)
+With all_or_nothing=True nothing is written if any row is invalid.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Set
+from uuid import UUID, uuid4
+
+from sqlalchemy import Numeric, String, column, insert, select, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import TIMESTAMP
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.finance.services.journal_service import JournalService, PaymentJournalEntry
+from backend.modules.finance.services.kpi_rollup_service import mark_kpi_days_dirty
+from backend.modules.order.domain.models import OrderModel, OrderPaymentModel
+
+logger = logging.getLogger(__name__)
+
+CLOSED_ORDER_STATUSES = ("CANCELLED",)
+
+
+@dataclass
+class BulkPaymentRow:
+    order_id: UUID
+    amount: Decimal
+    payment_method: str = "CASH"
+    payment_date: Optional[str] = None  # YYYY-MM-DD
+
+
+@dataclass
+class BulkPaymentOutcome:
+    """Per-row result, in request order"""
+    order_id: UUID
+    order_code: str
+    amount: Decimal
+    success: bool
+    error: Optional[str] = None
+    payment_id: Optional[UUID] = None
+
+
+@dataclass
+class _OrderState:
+    id: UUID
+    code: str
+    status: str
+    final_amount: Decimal
+    paid_amount: Decimal
+    created_at: Optional[datetime]
+    event_date: Optional[datetime]
+
+
+def parse_payment_date(value: Optional[str], now: datetime) -> datetime:
+    """YYYY-MM-DD at UTC midnight, or now when empty. Raises ValueError."""
+    if not value:
+        return now
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+
+class BulkPaymentService:
+    """Record many order payments of one tenant in one transaction"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID):
+        self.db = db
+        self.tenant_id = tenant_id
+
+    async def lock_orders(self, order_ids: Set[UUID]) -> Dict[UUID, _OrderState]:
+        result = await self.db.execute(
+            select(
+                OrderModel.id, OrderModel.code, OrderModel.status, OrderModel.final_amount,
+                OrderModel.paid_amount, OrderModel.created_at, OrderModel.event_date,
+            )
+            .where(OrderModel.tenant_id == self.tenant_id, OrderModel.id.in_(list(order_ids)))
+            .order_by(OrderModel.id)
+            .with_for_update()
+        )
+        return {
+            row.id: _OrderState(
+                id=row.id, code=row.code, status=row.status,
+                final_amount=row.final_amount or Decimal(0), paid_amount=row.paid_amount or Decimal(0),
+                created_at=row.created_at, event_date=row.event_date,
+            )
+            for row in result
+        }
+
+    def validate(self, rows: Sequence[BulkPaymentRow], orders: Dict[UUID, _OrderState], now: datetime):
+        """
+        -> (outcomes, accepted payments). Amounts are applied to the in-memory
+        order state in request order; the caller persists it.
+        """
+        outcomes: List[BulkPaymentOutcome] = []
+        payments: List[dict] = []
+        for row in rows:
+            order = orders.get(row.order_id)
+            outcome = BulkPaymentOutcome(row.order_id, order.code if order else "N/A", row.amount, success=False)
+            outcomes.append(outcome)
+
+            if not order:
+                outcome.error = "Order not found"
+                continue
+            if row.amount is None or row.amount <= 0:
+                outcome.error = "Invalid payment amount"
+                continue
+            if order.status in CLOSED_ORDER_STATUSES:
+                outcome.error = f"Order is {order.status}"
+                continue
+            try:
+                payment_date = parse_payment_date(row.payment_date, now)
+            except ValueError:
+                outcome.error = f"Invalid payment date: {row.payment_date}"
+                continue
+
+            order.paid_amount += row.amount
+            if order.final_amount - order.paid_amount <= 0:
+                # Auto-transition to PAID if fully paid
+                order.status = 'PAID'
+
+            outcome.success = True
+            outcome.payment_id = uuid4()
+            payments.append({
+                "id": outcome.payment_id,
+                "tenant_id": self.tenant_id,
+                "order_id": row.order_id,
+                "amount": row.amount,
+                "payment_method": row.payment_method,
+                "payment_date": payment_date,
+            })
+        return outcomes, payments
+
+    async def record(self, rows: Sequence[BulkPaymentRow], all_or_nothing: bool = False) -> List[BulkPaymentOutcome]:
+        """Validate and write the batch (caller commits)."""
+        if not rows:
+            return []
+        now = datetime.now(timezone.utc)
+        orders = await self.lock_orders({row.order_id for row in rows})
+        outcomes, payments = self.validate(rows, orders, now)
+
+        if all_or_nothing and len(payments) < len(rows):
+            for outcome in outcomes:
+                if outcome.success:
+                    outcome.success, outcome.payment_id = False, None
+                    outcome.error = "Batch rejected: other rows are invalid"
+            return outcomes
+        if not payments:
+            return outcomes
+
+        await self.db.execute(insert(OrderPaymentModel).values(payments))
+
+        touched = [orders[order_id] for order_id in dict.fromkeys(p["order_id"] for p in payments)]
+        new_totals = values(
+            column("id", PG_UUID(as_uuid=True)),
+            column("paid_amount", Numeric(15, 2)),
+            column("balance_amount", Numeric(15, 2)),
+            column("status", String(20)),
+            column("updated_at", TIMESTAMP(timezone=True)),
+            name="new_totals",
+        ).data([
+            (o.id, o.paid_amount, o.final_amount - o.paid_amount, o.status, now) for o in touched
+        ])
+        await self.db.execute(
+            update(OrderModel)
+            .where(OrderModel.id == new_totals.c.id, OrderModel.tenant_id == self.tenant_id)
+            .values(
+                paid_amount=new_totals.c.paid_amount,
+                balance_amount=new_totals.c.balance_amount,
+                status=new_totals.c.status,
+                updated_at=new_totals.c.updated_at,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        # Core UPDATE skips the ORM events the KPI rollup listens to
+        mark_kpi_days_dirty(self.db, self.tenant_id, {d for o in touched for d in (o.created_at, o.event_date)})
+
+        await self.create_journals(payments, orders)
+        return outcomes
+
+    async def create_journals(self, payments: Sequence[dict], orders: Dict[UUID, _OrderState]) -> None:
+        entries = [
+            PaymentJournalEntry(
+                payment_id=p["id"],
+                order_id=p["order_id"],
+                amount=p["amount"],
+                payment_method=p["payment_method"],
+                description=f"Thu tiền đơn hàng {orders[p['order_id']].code}",
+                transaction_date=p["payment_date"].date(),
+            )
+            for p in payments
+        ]
+        try:
+            async with self.db.begin_nested():
+                await JournalService(self.db, tenant_id=self.tenant_id).create_journals_from_payments(entries)
+        except Exception as e:
+            # Log error but don't fail the payments
+            logger.warning(f"Failed to create journal entries for bulk payments: {e}")
+
+
+def get_bulk_payment_service(db: AsyncSession, tenant_id: UUID) -> BulkPaymentService:
+    """Factory function for dependency injection"""
+    return BulkPaymentService(db, tenant_id)
@@ -0,0 +1,509 @@
+"""
+Inventory Valuation Service
+Vectorized COGS and stock valuation for /finance/reports/cogs and
+/finance/reports/stock-valuation
+
+The tenant's item master, lots and transaction history are loaded once into
+columnar NumPy arrays (InventoryColumns, 3 queries) and every report is a
+handful of grouped reductions (np.bincount) over all items at once:
+
+- period COGS: EXPORT transactions (not reversed) in [start, end], costed at
+  their recorded unit_price (weighted lot cost at export time), falling
+  back to the item's cost_price
+- on-hand quantity as of a date: current inventory_stock minus the signed
+  IMPORT/EXPORT movements after that date
+- FIFO value: on-hand quantity covered by the newest lot layers received
+  up to the date (ending inventory under FIFO); today it is simply the
+  remaining quantity of ACTIVE lots
+- weighted-average value: on-hand x (sum import qty*price / sum import qty)
+
+Quantity not covered by lots or priced imports is valued at cost_price.
+
+Caching: the columnar snapshot (per tenant) and each report (per tenant
+and period) are cached per process. Every request first reads a watermark
+of inventory_transactions (count, max(created_at), reversed count,
+max(updated_at) - one index-only query); any new, reversed, deleted or
+edited-in-place transaction changes it and invalidates the cached entries
+of that tenant. Item master writes are
+caught by an ORM listener on InventoryItemModel.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Any, Hashable, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.inventory.domain.models import (
+    InventoryItemModel,
+    InventoryLotModel,
+    InventoryStockModel,
+    InventoryTransactionModel,
+)
+
+VALUATION_CACHE_SIZE = int(os.getenv("INVENTORY_VALUATION_CACHE_SIZE", 256))
+
+MOVE_IMPORT = 1
+MOVE_EXPORT = -1
+MOVE_OTHER = 0
+
+Watermark = Tuple[int, Optional[datetime], int, Optional[datetime]]
+
+
+# ============ COLUMNAR SNAPSHOT ============
+
+@dataclass
+class InventoryColumns:
+    """Columnar snapshot of one tenant's inventory (item index = position in item_ids)"""
+    item_ids: List[UUID]
+    item_names: List[str]
+    item_categories: List[Optional[str]]
+    item_uoms: List[Optional[str]]
+    item_cost: np.ndarray          # float64 [n_items]
+    current_stock: np.ndarray      # float64 [n_items]
+
+    txn_item: np.ndarray           # int64 [n_txn]
+    txn_move: np.ndarray           # int8: +1 IMPORT, -1 EXPORT, 0 other
+    txn_qty: np.ndarray            # float64
+    txn_price: np.ndarray          # float64, NaN when unit_price is NULL
+    txn_at: np.ndarray             # datetime64[us]
+    txn_reversed: np.ndarray       # bool: undone by a later reversal
+    txn_reversal: np.ndarray       # bool: is itself a reversal (reverses_txn_id set)
+
+    lot_item: np.ndarray           # int64 [n_lots]
+    lot_initial: np.ndarray        # float64
+    lot_remaining: np.ndarray      # float64
+    lot_cost: np.ndarray           # float64
+    lot_received: np.ndarray       # datetime64[us]
+    lot_active: np.ndarray         # bool
+
+    @property
+    def n_items(self) -> int:
+        return len(self.item_ids)
+
+
+def _f64(values) -> np.ndarray:
+    return np.fromiter((float(v) if v is not None else np.nan for v in values), dtype=np.float64)
+
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+_NAT = np.iinfo(np.int64).min
+
+
+def _dt64(values) -> np.ndarray:
+    # Integer microseconds are ~5x faster than np.array(datetimes); columns are naive UTC
+    micros = (
+        _NAT if v is None else ((v if v.tzinfo is None else v.replace(tzinfo=None)) - _EPOCH) // _ONE_US
+        for v in values
+    )
+    return np.fromiter(micros, dtype=np.int64).view("datetime64[us]")
+
+
+def build_columns(items: List[tuple], transactions: List[tuple], lots: List[tuple]) -> InventoryColumns:
+    """
+    items:        (id, name, category, uom, cost_price, current_stock)
+    transactions: (item_id, transaction_type, quantity, unit_price, created_at, is_reversed, reverses_txn_id)
+    lots:         (item_id, initial_quantity, remaining_quantity, unit_cost, received_date, status)
+    Rows referring to unknown items are dropped.
+    """
+    position = {row[0]: i for i, row in enumerate(items)}
+
+    txns = [t for t in transactions if t[0] in position]
+    lot_rows = [l for l in lots if l[0] in position]
+    moves = {"IMPORT": MOVE_IMPORT, "EXPORT": MOVE_EXPORT}
+
+    return InventoryColumns(
+        item_ids=[r[0] for r in items],
+        item_names=[r[1] for r in items],
+        item_categories=[r[2] for r in items],
+        item_uoms=[r[3] for r in items],
+        item_cost=np.nan_to_num(_f64(r[4] for r in items)),
+        current_stock=np.nan_to_num(_f64(r[5] for r in items)),
+        txn_item=np.fromiter((position[t[0]] for t in txns), dtype=np.int64, count=len(txns)),
+        txn_move=np.fromiter((moves.get(t[1], MOVE_OTHER) for t in txns), dtype=np.int8, count=len(txns)),
+        txn_qty=np.nan_to_num(_f64(t[2] for t in txns)),
+        txn_price=_f64(t[3] for t in txns),
+        txn_at=_dt64(t[4] for t in txns),
+        txn_reversed=np.fromiter((bool(t[5]) for t in txns), dtype=bool, count=len(txns)),
+        txn_reversal=np.fromiter((t[6] is not None for t in txns), dtype=bool, count=len(txns)),
+        lot_item=np.fromiter((position[l[0]] for l in lot_rows), dtype=np.int64, count=len(lot_rows)),
+        lot_initial=np.nan_to_num(_f64(l[1] for l in lot_rows)),
+        lot_remaining=np.nan_to_num(_f64(l[2] for l in lot_rows)),
+        lot_cost=np.nan_to_num(_f64(l[3] for l in lot_rows)),
+        lot_received=_dt64(l[4] for l in lot_rows),
+        lot_active=np.fromiter((l[5] == 'ACTIVE' for l in lot_rows), dtype=bool, count=len(lot_rows)),
+    )
+
+
+def _day_start(day: date) -> np.datetime64:
+    return np.datetime64(datetime.combine(day, dt_time.min), "us")
+
+
+def _sum_by_item(cols: InventoryColumns, index: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    return np.bincount(index, weights=weights, minlength=cols.n_items)
+
+
+# ============ VECTORIZED REDUCTIONS ============
+
+@dataclass
+class CogsResult:
+    qty: np.ndarray
+    cost: np.ndarray
+    avg_unit_cost: np.ndarray
+
+    @property
+    def total(self) -> float:
+        return float(self.cost.sum())
+
+
+def compute_cogs(cols: InventoryColumns, start: date, end: date) -> CogsResult:
+    """COGS per item of non-reversed EXPORTs with start <= created_at < end + 1 day."""
+    mask = (
+        (cols.txn_move == MOVE_EXPORT)
+        & ~cols.txn_reversed
+        & (cols.txn_at >= _day_start(start))
+        & (cols.txn_at < _day_start(end + timedelta(days=1)))
+    )
+    item = cols.txn_item[mask]
+    qty = cols.txn_qty[mask]
+    price = cols.txn_price[mask]
+    priced = ~np.isnan(price)
+    unit_cost = np.where(priced, price, cols.item_cost[item])
+
+    qty_sum = _sum_by_item(cols, item, qty)
+    cost_sum = _sum_by_item(cols, item, qty * unit_cost)
+    # Same as SQL avg(unit_price): mean of recorded prices, NULLs ignored
+    price_sum = _sum_by_item(cols, item[priced], price[priced])
+    price_cnt = np.bincount(item[priced], minlength=cols.n_items)
+    avg = np.divide(price_sum, price_cnt, out=np.zeros(cols.n_items), where=price_cnt > 0)
+    return CogsResult(qty=qty_sum, cost=cost_sum, avg_unit_cost=avg)
+
+
+def on_hand_as_of(cols: InventoryColumns, as_of: Optional[date]) -> np.ndarray:
+    """Quantity on hand at the end of as_of: current stock minus later movements."""
+    if as_of is None:
+        return cols.current_stock.copy()
+    later = cols.txn_at >= _day_start(as_of + timedelta(days=1))
+    signed = cols.txn_qty[later] * cols.txn_move[later]
+    return cols.current_stock - _sum_by_item(cols, cols.txn_item[later], signed)
+
+
+def fifo_layers_value(cols: InventoryColumns, on_hand: np.ndarray, as_of: date) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Ending inventory under FIFO: the on-hand quantity is made of the newest
+    lots received up to as_of. Returns (value, covered qty, layer count) per item.
+    """
+    received = cols.lot_received < _day_start(as_of + timedelta(days=1))
+    item = cols.lot_item[received]
+    qty = cols.lot_initial[received]
+    cost = cols.lot_cost[received]
+    if not len(item):
+        zeros = np.zeros(cols.n_items)
+        return zeros, zeros.copy(), np.zeros(cols.n_items, dtype=np.int64)
+
+    # Newest first within each item
+    order = np.lexsort((-cols.lot_received[received].astype(np.int64), item))
+    item, qty, cost = item[order], qty[order], cost[order]
+
+    cum = np.cumsum(qty)
+    starts = np.r_[True, item[1:] != item[:-1]]
+    group_base = np.maximum.accumulate(np.where(starts, cum - qty, 0.0))
+    before = cum - qty - group_base
+    take = np.clip(np.maximum(on_hand[item], 0) - before, 0, qty)
+
+    value = _sum_by_item(cols, item, take * cost)
+    covered = _sum_by_item(cols, item, take)
+    layers = np.bincount(item[take > 0], minlength=cols.n_items)
+    return value, covered, layers
+
+
+def weighted_average_cost(cols: InventoryColumns, as_of: Optional[date]) -> np.ndarray:
+    """
+    Periodic weighted-average purchase cost per item (NaN without priced imports).
+    Reversed imports and reversal IMPORTs (stock returned on order reopen) are
+    not purchases and are left out.
+    """
+    mask = (
+        (cols.txn_move == MOVE_IMPORT)
+        & ~cols.txn_reversed
+        & ~cols.txn_reversal
+        & ~np.isnan(cols.txn_price)
+        & (cols.txn_qty > 0)
+    )
+    if as_of is not None:
+        mask &= cols.txn_at < _day_start(as_of + timedelta(days=1))
+    item = cols.txn_item[mask]
+    qty = cols.txn_qty[mask]
+    qty_sum = _sum_by_item(cols, item, qty)
+    value_sum = _sum_by_item(cols, item, qty * cols.txn_price[mask])
+    return np.divide(value_sum, qty_sum, out=np.full(cols.n_items, np.nan), where=qty_sum > 0)
+
+
+@dataclass
+class ValuationResult:
+    on_hand: np.ndarray
+    fifo_value: np.ndarray
+    weighted_avg_value: np.ndarray
+    static_value: np.ndarray
+    lot_count: np.ndarray
+
+
+def compute_valuation(cols: InventoryColumns, as_of: Optional[date] = None) -> ValuationResult:
+    """FIFO, weighted-average and static (cost_price) value per item."""
+    on_hand = on_hand_as_of(cols, as_of)
+    static = on_hand * cols.item_cost
+
+    if as_of is None:
+        # Today the FIFO layers are exactly the remaining ACTIVE lots
+        live = cols.lot_active & (cols.lot_remaining > 0)
+        lot_value = _sum_by_item(cols, cols.lot_item[live], cols.lot_remaining[live] * cols.lot_cost[live])
+        lot_count = np.bincount(cols.lot_item[live], minlength=cols.n_items)
+        fifo = np.where(lot_value > 0, lot_value, static)
+    else:
+        layer_value, covered, lot_count = fifo_layers_value(cols, on_hand, as_of)
+        uncovered = np.maximum(on_hand - covered, 0)
+        fifo = layer_value + uncovered * cols.item_cost
+
+    wac = weighted_average_cost(cols, as_of)
+    weighted = on_hand * np.where(np.isnan(wac), cols.item_cost, wac)
+    return ValuationResult(on_hand=on_hand, fifo_value=fifo, weighted_avg_value=weighted,
+                           static_value=static, lot_count=lot_count)
+
+
+# ============ CACHE ============
+
+class ValuationCache:
+    """Per-process LRU keyed by (tenant, report, period), validated by a transaction watermark"""
+
+    def __init__(self, maxsize: int = VALUATION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Tuple[Watermark, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, watermark: Watermark) -> Any:
+        with self._lock:
+            cached = self._data.get(key)
+            if cached is None or cached[0] != watermark:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return cached[1]
+
+    def put(self, key: Hashable, watermark: Watermark, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (watermark, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate_tenant(self, tenant_id: Any) -> None:
+        tenant_id = str(tenant_id)
+        with self._lock:
+            for key in [k for k in self._data if k[0] == tenant_id]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# Process-wide singleton
+valuation_cache = ValuationCache()
+
+
+# Item master edits (cost_price, name) do not move the transaction watermark
+@event.listens_for(InventoryItemModel, "after_insert")
+@event.listens_for(InventoryItemModel, "after_update")
+@event.listens_for(InventoryItemModel, "after_delete")
+def _invalidate_on_item_write(mapper, connection, target):
+    valuation_cache.invalidate_tenant(target.tenant_id)
+
+
+# ============ REPORT ROWS ============
+
+@dataclass
+class CogsLine:
+    item_id: UUID
+    item_name: str
+    category: Optional[str]
+    total_qty_used: float
+    avg_unit_cost: float
+    total_cost: float
+
+
+@dataclass
+class CogsSummary:
+    start: date
+    end: date
+    total_cogs: float
+    lines: List[CogsLine] = field(default_factory=list)
+
+
+@dataclass
+class ValuationLine:
+    item_id: UUID
+    item_name: str
+    category: Optional[str]
+    uom: Optional[str]
+    current_stock: float
+    fifo_value: float
+    weighted_avg_value: float
+    static_value: float
+    lot_count: int
+
+
+@dataclass
+class ValuationSummary:
+    valuation_date: date
+    total_fifo: float
+    total_weighted_avg: float
+    total_static: float
+    lines: List[ValuationLine] = field(default_factory=list)
+
+
+def summarize_cogs(cols: InventoryColumns, start: date, end: date) -> CogsSummary:
+    result = compute_cogs(cols, start, end)
+    used = np.flatnonzero(result.qty != 0)
+    used = used[np.argsort(-result.cost[used], kind="stable")]
+    lines = [
+        CogsLine(
+            item_id=cols.item_ids[i],
+            item_name=cols.item_names[i] or "N/A",
+            category=cols.item_categories[i],
+            total_qty_used=float(result.qty[i]),
+            avg_unit_cost=float(result.avg_unit_cost[i]),
+            total_cost=float(result.cost[i]),
+        )
+        for i in used
+    ]
+    return CogsSummary(start=start, end=end, total_cogs=result.total, lines=lines)
+
+
+def summarize_valuation(cols: InventoryColumns, as_of: Optional[date] = None) -> ValuationSummary:
+    result = compute_valuation(cols, as_of)
+    in_stock = np.flatnonzero(result.on_hand > 0)
+    in_stock = in_stock[np.argsort(-result.fifo_value[in_stock], kind="stable")]
+    lines = [
+        ValuationLine(
+            item_id=cols.item_ids[i],
+            item_name=cols.item_names[i],
+            category=cols.item_categories[i],
+            uom=cols.item_uoms[i],
+            current_stock=float(result.on_hand[i]),
+            fifo_value=float(result.fifo_value[i]),
+            weighted_avg_value=float(result.weighted_avg_value[i]),
+            static_value=float(result.static_value[i]),
+            lot_count=int(result.lot_count[i]),
+        )
+        for i in in_stock
+    ]
+    return ValuationSummary(
+        valuation_date=as_of or date.today(),
+        total_fifo=float(result.fifo_value.sum()),
+        total_weighted_avg=float(result.weighted_avg_value.sum()),
+        total_static=float(result.static_value.sum()),
+        lines=lines,
+    )
+
+
+# ============ SERVICE ============
+
+class InventoryValuationService:
+    """Cached, vectorized inventory reports of one tenant"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID, cache: ValuationCache = valuation_cache):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.cache = cache
+
+    async def watermark(self) -> Watermark:
+        result = await self.db.execute(
+            select(
+                func.count(),
+                func.max(InventoryTransactionModel.created_at),
+                func.count().filter(InventoryTransactionModel.is_reversed == True),
+                # In-place edits (trigger-maintained, migration 087)
+                func.max(InventoryTransactionModel.updated_at),
+            ).where(InventoryTransactionModel.tenant_id == self.tenant_id)
+        )
+        count, last_at, reversed_count, updated_at = result.one()
+        return int(count or 0), last_at, int(reversed_count or 0), updated_at
+
+    async def load_columns(self) -> InventoryColumns:
+        stock_sq = (
+            select(InventoryStockModel.item_id, func.sum(InventoryStockModel.quantity).label("qty"))
+            .where(InventoryStockModel.tenant_id == self.tenant_id)
+            .group_by(InventoryStockModel.item_id)
+            .subquery()
+        )
+        items = (await self.db.execute(
+            select(
+                InventoryItemModel.id, InventoryItemModel.name, InventoryItemModel.category,
+                InventoryItemModel.uom, InventoryItemModel.cost_price, func.coalesce(stock_sq.c.qty, 0),
+            )
+            .outerjoin(stock_sq, stock_sq.c.item_id == InventoryItemModel.id)
+            .where(InventoryItemModel.tenant_id == self.tenant_id)
+        )).all()
+        transactions = (await self.db.execute(
+            select(
+                InventoryTransactionModel.item_id, InventoryTransactionModel.transaction_type,
+                InventoryTransactionModel.quantity, InventoryTransactionModel.unit_price,
+                InventoryTransactionModel.created_at, InventoryTransactionModel.is_reversed,
+                InventoryTransactionModel.reverses_txn_id,
+            ).where(InventoryTransactionModel.tenant_id == self.tenant_id)
+        )).all()
+        lots = (await self.db.execute(
+            select(
+                InventoryLotModel.item_id, InventoryLotModel.initial_quantity,
+                InventoryLotModel.remaining_quantity, InventoryLotModel.unit_cost,
+                InventoryLotModel.received_date, InventoryLotModel.status,
+            ).where(InventoryLotModel.tenant_id == self.tenant_id)
+        )).all()
+        return build_columns(items, transactions, lots)
+
+    async def _cached(self, key: tuple, build):
+        watermark = await self.watermark()
+        key = (str(self.tenant_id),) + key
+        value = self.cache.get(key, watermark)
+        if value is not None:
+            return value
+
+        cols_key = (str(self.tenant_id), "columns")
+        cols = self.cache.get(cols_key, watermark)
+        if cols is None:
+            cols = await self.load_columns()
+            self.cache.put(cols_key, watermark, cols)
+        value = build(cols)
+        self.cache.put(key, watermark, value)
+        return value
+
+    async def cogs(self, start: date, end: date) -> CogsSummary:
+        return await self._cached(("cogs", start, end), lambda cols: summarize_cogs(cols, start, end))
+
+    async def valuation(self, as_of: Optional[date] = None) -> ValuationSummary:
+        # "today" must not be served from yesterday's cache entry
+        key_date = as_of if as_of is not None and as_of < date.today() else None
+        return await self._cached(
+            ("valuation", key_date, date.today()),
+            lambda cols: summarize_valuation(cols, key_date),
+        )
+
+    def invalidate(self) -> None:
+        self.cache.invalidate_tenant(self.tenant_id)
+
+
+def get_inventory_valuation_service(db: AsyncSession, tenant_id: UUID) -> InventoryValuationService:
+    """Factory function for dependency injection"""
+    return InventoryValuationService(db, tenant_id)
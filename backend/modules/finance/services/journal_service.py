@@ -4,17 +4,31 @@ Sprint 17.1: Auto-create Journal entries from Order Payments
 """
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select
 from sqlalchemy.orm import selectinload
-from uuid import UUID
+from uuid import UUID, uuid4
 from decimal import Decimal
-from datetime import datetime
+from datetime import date, datetime
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
 
+from backend.common.utils.code_allocator import get_code_allocator
 from backend.modules.finance.domain.models import (
     JournalModel, JournalLineModel, AccountModel, FinanceTransactionModel
 )
 
 
+@dataclass
+class PaymentJournalEntry:
+    """One order payment to journal in a batch (see create_journals_from_payments)"""
+    payment_id: UUID
+    order_id: UUID
+    amount: Decimal
+    payment_method: str
+    description: str
+    transaction_date: Optional[date] = None
+
+
 class JournalService:
     """Service for auto-creating journal entries from business transactions"""
     
@@ -57,19 +71,8 @@ class JournalService:
         return account
     
     async def generate_journal_code(self, prefix: str = "JNL") -> str:
-        """Generate unique journal code like JNL-202601-001"""
-        year_month = datetime.now().strftime("%Y%m")
-        
-        # Count existing journals for this month
-        result = await self.db.execute(
-            select(func.count(JournalModel.id)).where(
-                JournalModel.tenant_id == self.tenant_id,
-                JournalModel.code.like(f"{prefix}-{year_month}%")
-            )
-        )
-        count = result.scalar() or 0
-        
-        return f"{prefix}-{year_month}-{str(count + 1).zfill(3)}"
+        """Generate unique journal code like JNL-202601-001 (per-tenant monthly counter)"""
+        return await get_code_allocator(self.db, self.tenant_id).next_code(prefix)
     
     async def create_journal_from_payment(
         self,
@@ -155,6 +158,83 @@ class JournalService:
         await self.db.flush()
         return journal
     
+    async def next_journal_codes(self, prefix: str, count: int) -> List[str]:
+        """count consecutive codes like generate_journal_code, reserved with one statement"""
+        block = await get_code_allocator(self.db, self.tenant_id).reserve_block(prefix, count)
+        return block.codes()
+    
+    async def create_journals_from_payments(self, entries: Sequence[PaymentJournalEntry]) -> List[JournalModel]:
+        """
+        Batch version of create_journal_from_payment (same accounts, lines and
+        finance transaction per payment). Accounts and journal codes are
+        resolved once; journals, then lines and transactions, are written as
+        batched INSERTs in two flushes.
+        """
+        if not entries:
+            return []
+        
+        accounts = {}
+        for method in {e.payment_method for e in entries}:
+            if method in ['CASH', 'TIEN_MAT']:
+                accounts[method] = await self.get_or_create_account(self.ACCOUNT_CASH, "Tiền mặt", "ASSET")
+            else:
+                accounts[method] = await self.get_or_create_account(self.ACCOUNT_BANK, "Tiền gửi ngân hàng", "ASSET")
+        credit_account = await self.get_or_create_account(
+            self.ACCOUNT_REVENUE, "Doanh thu bán hàng", "REVENUE"
+        )
+        codes = await self.next_journal_codes("THU", len(entries))
+        
+        journals = []
+        rows = []
+        for entry, journal_code in zip(entries, codes):
+            debit_account = accounts[entry.payment_method]
+            journal = JournalModel(
+                id=uuid4(),
+                tenant_id=self.tenant_id,
+                code=journal_code,
+                description=entry.description or f"Thu tiền đơn hàng #{entry.order_id}",
+                total_amount=entry.amount,
+                reference_id=entry.order_id,
+                reference_type="ORDER_PAYMENT"
+            )
+            journals.append(journal)
+            rows.append(JournalLineModel(
+                tenant_id=self.tenant_id,
+                journal_id=journal.id,
+                account_id=debit_account.id,
+                debit=entry.amount,
+                credit=Decimal("0"),
+                description=f"Thu tiền - {debit_account.name}"
+            ))
+            rows.append(JournalLineModel(
+                tenant_id=self.tenant_id,
+                journal_id=journal.id,
+                account_id=credit_account.id,
+                debit=Decimal("0"),
+                credit=entry.amount,
+                description=f"Doanh thu - {credit_account.name}"
+            ))
+            rows.append(FinanceTransactionModel(
+                tenant_id=self.tenant_id,
+                code=journal_code,
+                type="RECEIPT",
+                category="ORDER",
+                amount=entry.amount,
+                payment_method=entry.payment_method,
+                reference_id=entry.order_id,
+                reference_type="ORDER",
+                description=entry.description or f"Thu tiền đơn hàng",
+                transaction_date=entry.transaction_date or datetime.now().date(),
+                journal_id=journal.id
+            ))
+        
+        # Journals first: finance_transactions has no relationship to order it after them
+        self.db.add_all(journals)
+        await self.db.flush()
+        self.db.add_all(rows)
+        await self.db.flush()
+        return journals
+    
     async def create_journal_from_payroll(
         self,
         payroll_period_id: UUID,
@@ -0,0 +1,341 @@
+"""
+Finance KPI Rollup Service
+Materialized per-tenant daily KPIs for /finance/dashboard and /analytics/overview
+
+Dashboards read a handful of finance_daily_kpis rows instead of scanning
+orders / finance_transactions / purchase_orders with date() casts.
+
+Maintenance:
+- Incremental: ORM changes to OrderModel, FinanceTransactionModel and
+  PurchaseOrderModel mark the affected (tenant, day) keys on the session;
+  right before COMMIT those days are recomputed from source tables inside
+  the same transaction (one statement per tenant, see
+  common/utils/commit_refresh.py).
+- Explicit: code paths that write with Core UPDATE/INSERT (bypassing the ORM)
+  call mark_kpi_days_dirty() or FinanceKpiRollupService.refresh_days().
+- Failed refreshes: the days are queued as a finance.refresh_kpi_days outbox
+  job in the same transaction and retried by the outbox drain.
+- Reconciliation: rebuild_range() recomputes any range of days from source
+  tables (scripts/rebuild_finance_kpis.py, POST /finance/kpi-rollups/rebuild).
+"""
+
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.common.utils.commit_refresh import CommitRefresh, as_utc_day, tenant_lock_sql
+from backend.core.tasks.outbox import enqueue_job_statement, job
+from backend.modules.finance.domain.models import FinanceDailyKpiModel, FinanceTransactionModel
+from backend.modules.order.domain.models import OrderModel
+from backend.modules.procurement.domain.models import PurchaseOrderModel
+
+logger = logging.getLogger(__name__)
+
+# Same status sets as the legacy live queries
+PAID_REVENUE_STATUSES = ("COMPLETED", "PAID")
+BOOKED_REVENUE_STATUSES = ("CONFIRMED", "IN_PROGRESS", "COMPLETED", "DELIVERED", "PAID")
+CLOSED_PO_STATUSES = ("PAID", "CANCELLED", "DRAFT")
+
+_DIRTY_KEY = "finance_kpi_dirty_days"
+JOB_REFRESH_KPI_DAYS = "finance.refresh_kpi_days"
+
+# Recompute the given days of one tenant from source tables and upsert them.
+# Every lookup is a half-open [day, day + 1) range so (tenant_id, <date col>)
+# indexes are usable. Days are UTC days (as bucketed by as_utc_day): timestamptz
+# columns are compared with explicit UTC midnights, never the session TimeZone.
+REFRESH_DAYS_SQL = text(f"""
+    INSERT INTO finance_daily_kpis (
+        tenant_id, kpi_date, paid_revenue, orders_created, receivables_amount,
+        receivables_count, booked_revenue, payment_amount, expense_amount,
+        payables_dated, payables_undated, refreshed_at
+    )
+    SELECT CAST(:tenant_id AS uuid), d.day,
+           oc.paid_revenue, oc.orders_created, oc.receivables_amount, oc.receivables_count,
+           ev.booked_revenue, ft.payment_amount, ft.expense_amount,
+           pd.payables_dated, pu.payables_undated, NOW()
+    FROM unnest(CAST(:days AS date[])) AS d(day)
+    CROSS JOIN LATERAL (
+        SELECT d.day::timestamp AT TIME ZONE 'UTC' AS day_start,
+               (d.day + 1)::timestamp AT TIME ZONE 'UTC' AS day_end
+    ) b
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(o.paid_amount) FILTER (WHERE o.status IN {PAID_REVENUE_STATUSES}), 0) AS paid_revenue,
+               COUNT(*) AS orders_created,
+               COALESCE(SUM(o.balance_amount) FILTER (WHERE o.balance_amount > 0 AND o.status <> 'CANCELLED'), 0) AS receivables_amount,
+               COUNT(*) FILTER (WHERE o.balance_amount > 0 AND o.status <> 'CANCELLED') AS receivables_count
+        FROM orders o
+        WHERE o.tenant_id = CAST(:tenant_id AS uuid)
+          AND o.created_at >= b.day_start AND o.created_at < b.day_end
+    ) oc
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(o.final_amount), 0) AS booked_revenue
+        FROM orders o
+        WHERE o.tenant_id = CAST(:tenant_id AS uuid)
+          AND o.status IN {BOOKED_REVENUE_STATUSES}
+          AND o.event_date >= b.day_start AND o.event_date < b.day_end
+    ) ev
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(t.amount) FILTER (WHERE t.type = 'PAYMENT'), 0) AS payment_amount,
+               COALESCE(SUM(t.amount) FILTER (WHERE t.type = 'EXPENSE'), 0) AS expense_amount
+        FROM finance_transactions t
+        WHERE t.tenant_id = CAST(:tenant_id AS uuid) AND t.transaction_date = d.day
+    ) ft
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(p.total_amount - COALESCE(p.paid_amount, 0)), 0) AS payables_dated
+        FROM purchase_orders p
+        WHERE p.tenant_id = CAST(:tenant_id AS uuid)
+          AND p.status NOT IN {CLOSED_PO_STATUSES}
+          -- due_date is a naive timestamp: its wall-clock date is the bucket
+          AND p.due_date >= d.day AND p.due_date < d.day + 1
+    ) pd
+    CROSS JOIN LATERAL (
+        SELECT COALESCE(SUM(p.total_amount - COALESCE(p.paid_amount, 0)), 0) AS payables_undated
+        FROM purchase_orders p
+        WHERE p.tenant_id = CAST(:tenant_id AS uuid)
+          AND p.status NOT IN {CLOSED_PO_STATUSES}
+          AND p.due_date IS NULL
+          AND p.created_at >= b.day_start AND p.created_at < b.day_end
+    ) pu
+    ON CONFLICT (tenant_id, kpi_date) DO UPDATE SET
+        paid_revenue = EXCLUDED.paid_revenue,
+        orders_created = EXCLUDED.orders_created,
+        receivables_amount = EXCLUDED.receivables_amount,
+        receivables_count = EXCLUDED.receivables_count,
+        booked_revenue = EXCLUDED.booked_revenue,
+        payment_amount = EXCLUDED.payment_amount,
+        expense_amount = EXCLUDED.expense_amount,
+        payables_dated = EXCLUDED.payables_dated,
+        payables_undated = EXCLUDED.payables_undated,
+        refreshed_at = NOW()
+""")
+
+# Serializes refreshes of one tenant so a later transaction recomputes with
+# the earlier one's committed rows (READ COMMITTED takes a new snapshot per statement)
+LOCK_TENANT_SQL = tenant_lock_sql("finance_kpi")
+
+
+# ============ CHANGE TRACKING ============
+
+# Model -> (columns that affect KPIs, columns whose date is a rollup bucket)
+_TRACKED_MODELS = {
+    OrderModel: (
+        ("status", "paid_amount", "balance_amount", "final_amount", "created_at", "event_date"),
+        ("created_at", "event_date"),
+    ),
+    FinanceTransactionModel: (
+        ("type", "amount", "transaction_date"),
+        ("transaction_date",),
+    ),
+    PurchaseOrderModel: (
+        ("status", "total_amount", "paid_amount", "due_date", "created_at"),
+        ("created_at", "due_date"),
+    ),
+}
+
+
+def _affected_days(obj: Any, is_new_or_deleted: bool) -> Set[date]:
+    """Old and new bucket days of a changed row (empty if no KPI column changed)."""
+    watched, bucket_columns = _TRACKED_MODELS[type(obj)]
+    state = inspect(obj)
+    if not is_new_or_deleted and not any(state.attrs[c].history.has_changes() for c in watched):
+        return set()
+
+    days: Set[date] = set()
+    for column in bucket_columns:
+        history = state.attrs[column].history
+        values = list(history.added) + list(history.unchanged) + list(history.deleted)
+        for value in values:
+            day = as_utc_day(value)
+            if day:
+                days.add(day)
+        if column == "created_at" and not values:
+            # New row: created_at is a server default, bucket it on today
+            days.add(datetime.now(timezone.utc).date())
+    return days
+
+
+def _defer_refresh(session: Session, tenant_id: str, days: List[date], error: Exception) -> None:
+    """Queue a failed refresh as an outbox job (committed with the business write)."""
+    day_list = [d.isoformat() for d in days]
+    try:
+        with session.begin_nested():
+            session.execute(enqueue_job_statement(
+                UUID(tenant_id), JOB_REFRESH_KPI_DAYS, payload={"days": day_list},
+            ))
+        logger.warning(f"Finance KPI rollup refresh deferred for tenant {tenant_id} days {day_list}: {error}")
+    except Exception as e:
+        logger.error(
+            f"Finance KPI rollup refresh failed for tenant {tenant_id} days {day_list}: {error}; "
+            f"could not queue a retry ({e}) - rebuild these days with scripts/rebuild_finance_kpis.py"
+        )
+
+
+def _refresh_tenant_days(session: Session, tenant_id: str, days: List[date]) -> None:
+    session.execute(REFRESH_DAYS_SQL, {"tenant_id": tenant_id, "days": days})
+
+
+_kpi_refresh = CommitRefresh(
+    _DIRTY_KEY, LOCK_TENANT_SQL,
+    prepare=lambda keys: sorted(day for _, day in keys),
+    refresh=_refresh_tenant_days,
+    on_error=_defer_refresh,
+)
+
+
+def mark_kpi_days_dirty(session: Any, tenant_id: UUID, days: Iterable[date]) -> None:
+    """Queue days for refresh at commit (for Core UPDATE/INSERT paths that skip ORM events)."""
+    dirty: Set[Tuple[str, date]] = _kpi_refresh.pending(session)
+    for day in days:
+        day = as_utc_day(day)
+        if day:
+            dirty.add((str(tenant_id), day))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_dirty_kpi_days(session, flush_context):
+    for collection, is_new_or_deleted in ((session.new, True), (session.dirty, False), (session.deleted, True)):
+        for obj in collection:
+            if type(obj) not in _TRACKED_MODELS or getattr(obj, "tenant_id", None) is None:
+                continue
+            days = _affected_days(obj, is_new_or_deleted)
+            if days:
+                mark_kpi_days_dirty(session, obj.tenant_id, days)
+
+
+@job(JOB_REFRESH_KPI_DAYS)
+async def refresh_kpi_days(db: AsyncSession, tenant_id: UUID, payload: Dict[str, Any]) -> None:
+    """Retry of a refresh that failed at commit (idempotent: recomputes from source tables)."""
+    await FinanceKpiRollupService(db, tenant_id).refresh_days(date.fromisoformat(d) for d in payload["days"])
+
+
+# ============ SERVICE ============
+
+class FinanceKpiRollupService:
+    """Read and rebuild the finance_daily_kpis rollup of one tenant"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID):
+        self.db = db
+        self.tenant_id = tenant_id
+
+    async def refresh_days(self, days: Iterable[date]) -> int:
+        """Recompute the given days from source tables (caller commits)."""
+        days = sorted({d for d in days if d})
+        if not days:
+            return 0
+        params = {"tenant_id": str(self.tenant_id)}
+        await self.db.execute(LOCK_TENANT_SQL, params)
+        await self.db.execute(REFRESH_DAYS_SQL, {**params, "days": days})
+        return len(days)
+
+    async def rebuild_range(self, start: date, end: date, chunk_days: int = 366) -> int:
+        """Reconciliation: rebuild every day in [start, end] from source tables (caller commits)."""
+        rebuilt = 0
+        day = start
+        while day <= end:
+            chunk_end = min(end, day + timedelta(days=chunk_days - 1))
+            rebuilt += await self.refresh_days(
+                day + timedelta(days=i) for i in range((chunk_end - day).days + 1)
+            )
+            day = chunk_end + timedelta(days=1)
+        return rebuilt
+
+    async def source_date_bounds(self) -> Tuple[Optional[date], Optional[date]]:
+        """Earliest and latest day referenced by any source row (for full rebuilds)."""
+        result = await self.db.execute(text("""
+            SELECT LEAST(
+                       (SELECT MIN(created_at AT TIME ZONE 'UTC')::date FROM orders WHERE tenant_id = CAST(:t AS uuid)),
+                       (SELECT MIN(event_date AT TIME ZONE 'UTC')::date FROM orders WHERE tenant_id = CAST(:t AS uuid)),
+                       (SELECT MIN(transaction_date) FROM finance_transactions WHERE tenant_id = CAST(:t AS uuid)),
+                       (SELECT MIN(LEAST((created_at AT TIME ZONE 'UTC')::date, due_date::date)) FROM purchase_orders WHERE tenant_id = CAST(:t AS uuid))
+                   ),
+                   GREATEST(
+                       (SELECT MAX(created_at AT TIME ZONE 'UTC')::date FROM orders WHERE tenant_id = CAST(:t AS uuid)),
+                       (SELECT MAX(event_date AT TIME ZONE 'UTC')::date FROM orders WHERE tenant_id = CAST(:t AS uuid)),
+                       (SELECT MAX(transaction_date) FROM finance_transactions WHERE tenant_id = CAST(:t AS uuid)),
+                       (SELECT MAX(GREATEST((created_at AT TIME ZONE 'UTC')::date, due_date::date)) FROM purchase_orders WHERE tenant_id = CAST(:t AS uuid))
+                   )
+        """), {"t": str(self.tenant_id)})
+        row = result.one()
+        return row[0], row[1]
+
+    async def rebuild_all(self) -> int:
+        start, end = await self.source_date_bounds()
+        if not start or not end:
+            return 0
+        return await self.rebuild_range(start, end)
+
+    async def dashboard_totals(
+        self,
+        current_start: date,
+        prev_start: date,
+        prev_end: date,
+        due_soon_until: date,
+    ) -> Dict[str, Any]:
+        """All /finance/dashboard figures in a single query over rollup rows."""
+        K = FinanceDailyKpiModel
+        result = await self.db.execute(
+            select(
+                func.coalesce(func.sum(K.paid_revenue).filter(K.kpi_date >= current_start), 0),
+                func.coalesce(func.sum(K.paid_revenue).filter(K.kpi_date.between(prev_start, prev_end)), 0),
+                func.coalesce(func.sum(K.payment_amount).filter(K.kpi_date >= current_start), 0),
+                func.coalesce(func.sum(K.payment_amount).filter(K.kpi_date.between(prev_start, prev_end)), 0),
+                func.coalesce(func.sum(K.receivables_amount), 0),
+                func.coalesce(func.sum(K.payables_dated + K.payables_undated), 0),
+                func.coalesce(func.sum(K.payables_dated).filter(K.kpi_date <= due_soon_until), 0),
+            ).where(K.tenant_id == self.tenant_id)
+        )
+        row = result.one()
+        return {
+            "revenue_current": row[0],
+            "revenue_previous": row[1],
+            "expenses_current": row[2],
+            "expenses_previous": row[3],
+            "receivables_total": row[4],
+            "payables_total": row[5],
+            "payables_due_soon": row[6],
+        }
+
+    async def overview_totals(
+        self,
+        cur_start: date,
+        cur_end: date,
+        prev_start: date,
+        prev_end: date,
+    ) -> Dict[str, Any]:
+        """Revenue / expense / order / receivable figures of /analytics/overview in one query."""
+        K = FinanceDailyKpiModel
+        cur = K.kpi_date.between(cur_start, cur_end)
+        prev = K.kpi_date.between(prev_start, prev_end)
+        result = await self.db.execute(
+            select(
+                func.coalesce(func.sum(K.booked_revenue).filter(cur), 0),
+                func.coalesce(func.sum(K.booked_revenue).filter(prev), 0),
+                func.coalesce(func.sum(K.expense_amount).filter(cur), 0),
+                func.coalesce(func.sum(K.expense_amount).filter(prev), 0),
+                func.coalesce(func.sum(K.orders_created).filter(cur), 0),
+                func.coalesce(func.sum(K.orders_created).filter(prev), 0),
+                func.coalesce(func.sum(K.receivables_amount), 0),
+                func.coalesce(func.sum(K.receivables_count), 0),
+            ).where(K.tenant_id == self.tenant_id)
+        )
+        row = result.one()
+        return {
+            "revenue_current": row[0],
+            "revenue_previous": row[1],
+            "expenses_current": row[2],
+            "expenses_previous": row[3],
+            "orders_current": row[4],
+            "orders_previous": row[5],
+            "receivables_total": row[6],
+            "receivables_count": row[7],
+        }
+
+
+def get_kpi_rollup_service(db: AsyncSession, tenant_id: UUID) -> FinanceKpiRollupService:
+    """Factory function for dependency injection"""
+    return FinanceKpiRollupService(db, tenant_id)
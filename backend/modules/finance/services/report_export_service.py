@@ -0,0 +1,329 @@
+"""
+Finance Report Export Service
+Constant-memory Excel / HTML(PDF) export for /finance/reports/export
+
+Rows are paged from PostgreSQL with a server-side cursor (AsyncSession.stream
++ yield_per) and written straight to the output:
+- Excel: openpyxl write-only workbook with named (shared) styles, rows
+  appended and the file saved in the threadpool so the event loop stays free
+- PDF: printable HTML, written chunk by chunk
+
+The output is spooled to a temporary file (in memory up to SPOOL_MAX_SIZE,
+on disk beyond) and sent as a chunked StreamingResponse, so worker memory
+stays flat regardless of how many rows the range contains.
+"""
+
+import html
+import tempfile
+from datetime import date
+from typing import Any, AsyncIterator, Iterator, List, Sequence, Tuple
+from uuid import UUID
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.finance.domain.models import FinanceTransactionModel
+from backend.modules.order.domain.models import OrderModel
+
+EXPORT_BATCH_SIZE = 1000           # rows per server-side cursor fetch
+STREAM_CHUNK_SIZE = 64 * 1024      # bytes per response chunk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024   # spill output to disk beyond this size
+
+REPORT_TYPES = ("transactions", "receivables", "summary")
+RECEIVABLE_STATUSES = ("CONFIRMED", "COMPLETED")
+
+# (header, column width, kind) - widths are fixed because write-only sheets
+# cannot be auto-fitted after the rows are written
+TRANSACTION_COLUMNS = [
+    ("Mã GD", 18, "text"), ("Ngày", 12, "text"), ("Loại", 8, "text"),
+    ("Danh mục", 20, "text"), ("Mô tả", 50, "text"), ("Số tiền", 16, "money"),
+]
+RECEIVABLE_COLUMNS = [
+    ("Mã ĐH", 18, "text"), ("Khách hàng", 30, "text"), ("SĐT", 15, "text"), ("Ngày sự kiện", 14, "text"),
+    ("Tổng tiền", 16, "money"), ("Đã thu", 16, "money"), ("Còn nợ", 16, "money"),
+]
+SUMMARY_COLUMNS = [
+    ("Loại", 8, "text"), ("Danh mục", 30, "text"), ("Số giao dịch", 14, "text"), ("Số tiền", 18, "money"),
+]
+
+
+def _fmt_date(value: Any) -> str:
+    return value.strftime('%d/%m/%Y') if value else ""
+
+
+def _type_label(tx_type: str) -> str:
+    return "Thu" if tx_type == "RECEIPT" else "Chi"
+
+
+def iter_file_chunks(fileobj, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield a spooled file in chunks and close it once fully sent."""
+    try:
+        fileobj.seek(0)
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+class FinanceReportExporter:
+    """Stream one finance report of a tenant into an Excel or HTML file"""
+
+    def __init__(
+        self,
+        db: AsyncSession,
+        tenant_id: UUID,
+        start_date: date,
+        end_date: date,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.start_date = start_date
+        self.end_date = end_date
+        self.batch_size = batch_size
+
+    # ============ QUERIES ============
+
+    def transactions_query(self):
+        T = FinanceTransactionModel
+        return (
+            select(T.code, T.transaction_date, T.type, T.category, T.description, T.amount)
+            .where(
+                T.tenant_id == self.tenant_id,
+                T.transaction_date >= self.start_date,
+                T.transaction_date <= self.end_date,
+            )
+            .order_by(T.transaction_date.desc(), T.code)
+        )
+
+    def receivables_query(self):
+        O = OrderModel
+        return (
+            select(O.code, O.customer_name, O.customer_phone, O.event_date,
+                   O.final_amount, O.paid_amount, O.balance_amount)
+            .where(
+                O.tenant_id == self.tenant_id,
+                O.balance_amount > 0,
+                O.status.in_(RECEIVABLE_STATUSES),
+            )
+            .order_by(O.event_date.desc(), O.code)
+        )
+
+    def summary_query(self):
+        T = FinanceTransactionModel
+        return (
+            select(T.type, func.coalesce(T.category, ""), func.count(), func.coalesce(func.sum(T.amount), 0))
+            .where(
+                T.tenant_id == self.tenant_id,
+                T.transaction_date >= self.start_date,
+                T.transaction_date <= self.end_date,
+            )
+            .group_by(T.type, func.coalesce(T.category, ""))
+            .order_by(T.type, func.coalesce(T.category, ""))
+        )
+
+    async def iter_batches(self, stmt) -> AsyncIterator[Sequence[Any]]:
+        """Page through a query with a server-side cursor, batch_size rows at a time."""
+        result = await self.db.stream(stmt.execution_options(yield_per=self.batch_size))
+        async for partition in result.partitions():
+            yield partition
+
+    async def iter_report_rows(self, report_type: str) -> AsyncIterator[List[List[Any]]]:
+        """Batches of display rows for a report (plain values, no ORM entities)."""
+        if report_type == "transactions":
+            async for batch in self.iter_batches(self.transactions_query()):
+                yield [
+                    [r.code, _fmt_date(r.transaction_date), _type_label(r.type),
+                     r.category or "", r.description or "", float(r.amount or 0)]
+                    for r in batch
+                ]
+        elif report_type == "receivables":
+            async for batch in self.iter_batches(self.receivables_query()):
+                yield [
+                    [r.code, r.customer_name, r.customer_phone, _fmt_date(r.event_date),
+                     float(r.final_amount or 0), float(r.paid_amount or 0), float(r.balance_amount or 0)]
+                    for r in batch
+                ]
+        elif report_type == "summary":
+            async for batch in self.iter_batches(self.summary_query()):
+                yield [[_type_label(r[0]), r[1], int(r[2]), float(r[3] or 0)] for r in batch]
+
+    @staticmethod
+    def columns_for(report_type: str):
+        return {
+            "transactions": TRANSACTION_COLUMNS,
+            "receivables": RECEIVABLE_COLUMNS,
+            "summary": SUMMARY_COLUMNS,
+        }.get(report_type, [])
+
+    @staticmethod
+    def footer_for(report_type: str, rows_seen: "ReportTotals") -> List[Tuple[str, float]]:
+        if report_type == "receivables":
+            return [("Tổng công nợ:", rows_seen.receivable)]
+        if report_type in ("transactions", "summary"):
+            return [
+                ("Tổng Thu:", rows_seen.receipt),
+                ("Tổng Chi:", rows_seen.payment),
+                ("Chênh lệch:", rows_seen.receipt - rows_seen.payment),
+            ]
+        return []
+
+    @property
+    def period_label(self) -> str:
+        return f"Từ ngày: {_fmt_date(self.start_date)} đến ngày: {_fmt_date(self.end_date)}"
+
+    # ============ EXCEL ============
+
+    async def write_excel(self, report_type: str):
+        """Write the report to a spooled .xlsx file (positioned at 0)."""
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+
+        thin = Side(style='thin')
+        border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        styles = {
+            "report_title": NamedStyle("report_title", font=Font(bold=True, size=14),
+                                       alignment=Alignment(horizontal='left')),
+            "report_header": NamedStyle("report_header", font=Font(bold=True, color="FFFFFF"), border=border,
+                                        fill=PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")),
+            "report_text": NamedStyle("report_text", border=border),
+            "report_money": NamedStyle("report_money", border=border, number_format='#,##0'),
+            "report_label": NamedStyle("report_label", font=Font(bold=True)),
+            "report_total": NamedStyle("report_total", font=Font(bold=True), number_format='#,##0'),
+        }
+
+        wb = Workbook(write_only=True)
+        for style in styles.values():
+            wb.add_named_style(style)
+        ws = wb.create_sheet("Báo Cáo Tài Chính")
+
+        def cell(value, style):
+            c = WriteOnlyCell(ws, value=value)
+            c.style = style
+            return c
+
+        columns = self.columns_for(report_type)
+        for idx, (_, width, _) in enumerate(columns, 1):
+            ws.column_dimensions[_column_letter(idx)].width = width
+
+        ws.append([cell(f"BÁO CÁO TÀI CHÍNH - {report_type.upper()}", "report_title")])
+        ws.append([self.period_label])
+        ws.append([])
+        if columns:
+            ws.append([cell(header, "report_header") for header, _, _ in columns])
+
+        row_styles = ["report_money" if kind == "money" else "report_text" for _, _, kind in columns]
+        totals = ReportTotals()
+
+        def append_rows(rows):
+            for row in rows:
+                totals.add(report_type, row)
+                ws.append([cell(v, s) for v, s in zip(row, row_styles)])
+
+        # Cell building and XML serialisation are CPU-bound: keep them off the
+        # event loop, one batch at a time (the sheet is only touched by one
+        # thread at once, the next fetch waits for the previous batch)
+        async for rows in self.iter_report_rows(report_type):
+            await run_in_threadpool(append_rows, rows)
+
+        footer = self.footer_for(report_type, totals)
+        if footer:
+            ws.append([])
+            pad = [None] * (len(columns) - 2)
+            for label, amount in footer:
+                ws.append(pad + [cell(label, "report_label"), cell(amount, "report_total")])
+
+        out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        await run_in_threadpool(wb.save, out)
+        out.seek(0)
+        return out
+
+    # ============ HTML (PDF) ============
+
+    async def write_html(self, report_type: str):
+        """Write the report as printable HTML to a spooled file (positioned at 0)."""
+        out = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        write = lambda s: out.write(s.encode('utf-8'))
+        esc = lambda v: html.escape("" if v is None else str(v))
+
+        write(f"""<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>Báo Cáo Tài Chính</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 40px; }}
+        h1 {{ text-align: center; color: #333; }}
+        table {{ width: 100%; border-collapse: collapse; margin-top: 20px; }}
+        th {{ background-color: #4472C4; color: white; padding: 10px; text-align: left; }}
+        td {{ padding: 8px; border-bottom: 1px solid #ddd; }}
+        .summary {{ margin-top: 20px; font-weight: bold; }}
+        .amount {{ text-align: right; }}
+        @media print {{ body {{ margin: 0; }} }}
+    </style>
+</head>
+<body>
+    <h1>BÁO CÁO TÀI CHÍNH - {esc(report_type.upper())}</h1>
+    <p>{esc(self.period_label)}</p>
+""")
+        columns = self.columns_for(report_type)
+        if columns:
+            write("<table>\n<tr>" + "".join(f"<th>{esc(h)}</th>" for h, _, _ in columns) + "</tr>\n")
+            kinds = [kind for _, _, kind in columns]
+            totals = ReportTotals()
+            async for rows in self.iter_report_rows(report_type):
+                chunk = []
+                for row in rows:
+                    totals.add(report_type, row)
+                    chunk.append("<tr>" + "".join(
+                        f'<td class="amount">{v:,.0f}</td>' if kind == "money" else f"<td>{esc(v)}</td>"
+                        for v, kind in zip(row, kinds)
+                    ) + "</tr>\n")
+                write("".join(chunk))
+            write("</table>\n<div class=\"summary\">\n")
+            for label, amount in self.footer_for(report_type, totals):
+                write(f"<p>{esc(label)} {amount:,.0f} VND</p>\n")
+            write("</div>\n")
+        write("</body>\n</html>\n")
+        out.seek(0)
+        return out
+
+
+class ReportTotals:
+    """Running footer totals, accumulated while rows stream past"""
+
+    __slots__ = ("receipt", "payment", "receivable")
+
+    def __init__(self):
+        self.receipt = 0.0
+        self.payment = 0.0
+        self.receivable = 0.0
+
+    def add(self, report_type: str, row: List[Any]) -> None:
+        if report_type == "transactions":
+            if row[2] == "Thu":
+                self.receipt += row[5]
+            else:
+                self.payment += row[5]
+        elif report_type == "summary":
+            if row[0] == "Thu":
+                self.receipt += row[3]
+            else:
+                self.payment += row[3]
+        elif report_type == "receivables":
+            self.receivable += row[6]
+
+
+def _column_letter(idx: int) -> str:
+    from openpyxl.utils import get_column_letter
+    return get_column_letter(idx)
+
+
+def get_report_exporter(db: AsyncSession, tenant_id: UUID, start_date: date, end_date: date) -> FinanceReportExporter:
+    """Factory function for dependency injection"""
+    return FinanceReportExporter(db, tenant_id, start_date, end_date)
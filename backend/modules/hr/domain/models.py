@@ -132,6 +132,33 @@ class TimesheetModel(Base):
     assignment = relationship("StaffAssignmentModel", back_populates="timesheets")
 
 
+class EmployeeDailyMetricModel(Base):
+    """
+    Per-employee daily counters backing /hr/employees/{id}/performance.
+    Maintained by EmployeeMetricsService; any day can be rebuilt from source tables.
+    """
+    __tablename__ = "hr_employee_daily_metrics"
+
+    # Composite key: one row per employee per day
+    tenant_id = Column(UUID(as_uuid=True), primary_key=True)
+    employee_id = Column(UUID(as_uuid=True), ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    metric_date = Column(Date, primary_key=True)
+
+    # Timesheets bucketed by work_date
+    timesheets = Column(Integer, nullable=False, default=0)
+    approved_timesheets = Column(Integer, nullable=False, default=0)
+    approved_hours = Column(DECIMAL(10, 2), nullable=False, default=0)
+    approved_overtime_hours = Column(DECIMAL(10, 2), nullable=False, default=0)
+    checked_in = Column(Integer, nullable=False, default=0)       # actual_start set
+    late_checkins = Column(Integer, nullable=False, default=0)    # actual_start after scheduled_start + grace
+
+    # Staff assignments bucketed by created_at
+    assignments = Column(Integer, nullable=False, default=0)
+    completed_assignments = Column(Integer, nullable=False, default=0)
+
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class PayrollPeriodModel(Base):
     """Payroll period (monthly)"""
     __tablename__ = "payroll_periods"
@@ -30,6 +30,8 @@ from backend.core.auth.security import get_password_hash
 from backend.core.auth.permissions import require_permission
 from backend.modules.hr.domain.models import EmployeeModel, StaffAssignmentModel, TimesheetModel, PayrollSettingsModel, PayrollItemModel, PayrollPeriodModel, LeaveTypeModel, LeaveBalanceModel, LeaveRequestModel, LeaveApprovalHistoryModel, PayrollAuditLogModel, VietnamHolidayModel
 from backend.modules.order.domain.models import OrderModel
+from backend.modules.hr.services.payroll_engine import get_payroll_engine
+from backend.modules.hr.services.employee_metrics_service import get_employee_metrics_service, performance_metrics
 
 router = APIRouter(tags=["HR Management"])
 
@@ -240,6 +242,66 @@ async def get_employee_stats(tenant_id: UUID = Depends(get_current_tenant), db:
     }
 
 
+@router.get("/employees/performance",
+             dependencies=[Depends(require_permission("hr", "view"))])
+async def get_all_employee_performance(
+    tenant_id: UUID = Depends(get_current_tenant),
+    db: AsyncSession = Depends(get_db),
+    period_days: int = Query(30, ge=7, le=365, description="Period in days for metrics calculation"),
+    include_inactive: bool = Query(False)
+):
+    """Performance metrics of every employee (HR dashboards), from the daily metrics store"""
+    await set_tenant_context(db, str(tenant_id))
+    
+    emp_query = select(EmployeeModel.id, EmployeeModel.full_name, EmployeeModel.role_type).where(
+        EmployeeModel.tenant_id == tenant_id
+    )
+    if not include_inactive:
+        emp_query = emp_query.where(EmployeeModel.is_active == True)
+    employees = (await db.execute(emp_query.order_by(EmployeeModel.full_name))).all()
+    
+    since = date.today() - timedelta(days=period_days)
+    metrics = await get_employee_metrics_service(db, tenant_id).all_employee_metrics(since)
+    
+    results = [
+        {
+            "employee_id": str(emp.id),
+            "employee_name": emp.full_name,
+            "role_type": emp.role_type,
+            "metrics": metrics.get(emp.id) or performance_metrics(None)
+        }
+        for emp in employees
+    ]
+    
+    return {"period_days": period_days, "total": len(results), "employees": results}
+
+
+@router.post("/employee-metrics/rebuild",
+              dependencies=[Depends(require_permission("hr", "edit"))])
+async def rebuild_employee_metrics(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    tenant_id: UUID = Depends(get_current_tenant),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Reconcile the employee daily metrics store with timesheets and assignments.
+    Without dates, rebuilds the tenant's full history.
+    """
+    await set_tenant_context(db, str(tenant_id))
+    service = get_employee_metrics_service(db, tenant_id)
+    if from_date is None and to_date is None:
+        days = await service.rebuild_all()
+    else:
+        start = from_date or to_date
+        end = to_date or from_date
+        if start > end:
+            raise HTTPException(status_code=400, detail="from_date must be before to_date")
+        days = await service.rebuild_range(start, end)
+    await db.commit()
+    return {"rebuilt_days": days}
+
+
 @router.get("/employees/{employee_id}", response_model=EmployeeResponse,
              dependencies=[Depends(require_permission("hr", "view"))])
 async def get_employee(employee_id: UUID, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
@@ -280,84 +342,15 @@ async def get_employee_performance(
     if not employee:
         raise HTTPException(status_code=404, detail="Employee not found")
     
-    from datetime import timedelta
-    period_start = datetime.now() - timedelta(days=period_days)
-    
-    # Count total timesheets in period
-    ts_count_query = select(func.count(TimesheetModel.id)).where(
-        TimesheetModel.employee_id == employee_id,
-        TimesheetModel.tenant_id == tenant_id,
-        TimesheetModel.work_date >= period_start.date()
-    )
-    ts_count_result = await db.execute(ts_count_query)
-    total_timesheets = ts_count_result.scalar() or 0
-    
-    # Sum total hours worked
-    hours_query = select(func.sum(TimesheetModel.total_hours)).where(
-        TimesheetModel.employee_id == employee_id,
-        TimesheetModel.tenant_id == tenant_id,
-        TimesheetModel.work_date >= period_start.date(),
-        TimesheetModel.status == 'APPROVED'
-    )
-    hours_result = await db.execute(hours_query)
-    total_hours = float(hours_result.scalar() or 0)
-    
-    # Sum overtime hours
-    ot_query = select(func.sum(TimesheetModel.overtime_hours)).where(
-        TimesheetModel.employee_id == employee_id,
-        TimesheetModel.tenant_id == tenant_id,
-        TimesheetModel.work_date >= period_start.date(),
-        TimesheetModel.status == 'APPROVED'
-    )
-    ot_result = await db.execute(ot_query)
-    total_overtime = float(ot_result.scalar() or 0)
-    
-    # Count orders assigned
-    from backend.modules.hr.domain.models import StaffAssignmentModel
-    assignments_query = select(func.count(StaffAssignmentModel.id)).where(
-        StaffAssignmentModel.employee_id == employee_id,
-        StaffAssignmentModel.tenant_id == tenant_id,
-        StaffAssignmentModel.created_at >= period_start
-    )
-    assignments_result = await db.execute(assignments_query)
-    total_assignments = assignments_result.scalar() or 0
-    
-    # Count completed assignments (checked out)
-    completed_query = select(func.count(StaffAssignmentModel.id)).where(
-        StaffAssignmentModel.employee_id == employee_id,
-        StaffAssignmentModel.tenant_id == tenant_id,
-        StaffAssignmentModel.created_at >= period_start,
-        StaffAssignmentModel.status == 'COMPLETED'
-    )
-    completed_result = await db.execute(completed_query)
-    completed_assignments = completed_result.scalar() or 0
-    
-    # Calculate on-time rate (approximation based on approved timesheets)
-    approved_query = select(func.count(TimesheetModel.id)).where(
-        TimesheetModel.employee_id == employee_id,
-        TimesheetModel.tenant_id == tenant_id,
-        TimesheetModel.work_date >= period_start.date(),
-        TimesheetModel.status == 'APPROVED'
-    )
-    approved_result = await db.execute(approved_query)
-    approved_count = approved_result.scalar() or 0
-    
-    on_time_rate = (approved_count / total_timesheets * 100) if total_timesheets > 0 else 0
-    completion_rate = (completed_assignments / total_assignments * 100) if total_assignments > 0 else 0
+    # One SUM over <= period_days rows of the daily metrics store
+    since = date.today() - timedelta(days=period_days)
+    metrics = await get_employee_metrics_service(db, tenant_id).employee_metrics(employee_id, since)
     
     return {
         "employee_id": str(employee_id),
         "employee_name": employee.full_name,
         "period_days": period_days,
-        "metrics": {
-            "total_hours": round(total_hours, 1),
-            "total_overtime": round(total_overtime, 1),
-            "total_timesheets": total_timesheets,
-            "total_assignments": total_assignments,
-            "completed_assignments": completed_assignments,
-            "on_time_rate": round(on_time_rate, 1),
-            "completion_rate": round(completion_rate, 1)
-        }
+        "metrics": metrics
     }
 
 @router.post("/employees", response_model=EmployeeResponse,
@@ -1175,38 +1168,44 @@ async def check_assignment_conflict(
     exclude_assignment_id: Optional[UUID] = None,
     tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)
 ):
-    """Check if employee has conflicting assignments during the time range"""
-    await set_tenant_context(db, str(tenant_id))
-    
-    # Find overlapping assignments
-    query = select(StaffAssignmentModel).where(
-        StaffAssignmentModel.tenant_id == tenant_id,
-        StaffAssignmentModel.employee_id == employee_id,
-        StaffAssignmentModel.status.in_(['ASSIGNED', 'CONFIRMED']),
-        # Overlap condition: existing.start < end AND existing.end > start
-        StaffAssignmentModel.start_time < end_time,
-        StaffAssignmentModel.end_time > start_time
-    )
+    """
+    Check if employee has conflicting assignments or approved leave during the time range.
+    Uses the availability matrix, so HR shifts and order staffing are both seen.
+    """
+    from backend.modules.hr.services.availability_engine import AvailabilityEngine
     
-    if exclude_assignment_id:
-        query = query.where(StaffAssignmentModel.id != exclude_assignment_id)
+    await set_tenant_context(db, str(tenant_id))
+    if end_time <= start_time:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
     
-    result = await db.execute(query)
-    conflicts = result.scalars().all()
+    try:
+        matrix = await AvailabilityEngine(db, tenant_id).load_window(start_time, end_time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    busy, leaves = matrix.conflicts(employee_id, start_time, end_time, exclude_assignment_id=exclude_assignment_id)
     
-    return ConflictCheckResponse(
-        has_conflict=len(conflicts) > 0,
-        conflicts=[
-            {
-                "assignment_id": str(c.id),
-                "event_id": str(c.event_id) if c.event_id else None,
-                "start_time": c.start_time.isoformat() if c.start_time else None,
-                "end_time": c.end_time.isoformat() if c.end_time else None,
-                "status": c.status
-            }
-            for c in conflicts
-        ]
-    )
+    conflicts = [
+        {
+            "type": "SHIFT",
+            "source": b.source,
+            "assignment_id": str(b.assignment_id) if b.assignment_id else None,
+            "event_id": str(b.order_id) if b.order_id else None,
+            "order_code": b.order_code,
+            "start_time": b.start.isoformat(),
+            "end_time": b.end.isoformat(),
+            "status": b.status
+        }
+        for b in busy
+    ] + [
+        {
+            "type": "LEAVE",
+            "leave_type": leave.leave_type,
+            "start_date": leave.start_date.isoformat(),
+            "end_date": leave.end_date.isoformat()
+        }
+        for leave in leaves
+    ]
+    return ConflictCheckResponse(has_conflict=len(conflicts) > 0, conflicts=conflicts)
 
 
 @router.post("/assignments", response_model=AssignmentDetailResponse,
@@ -1507,44 +1506,27 @@ async def get_available_employees(
     role_type: Optional[str] = None,
     tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)
 ):
-    """Get employees available during a specific time range"""
-    await set_tenant_context(db, str(tenant_id))
-    
-    # Find employees with conflicting assignments
-    busy_employees_query = select(StaffAssignmentModel.employee_id).where(
-        StaffAssignmentModel.tenant_id == tenant_id,
-        StaffAssignmentModel.status.in_(['ASSIGNED', 'CONFIRMED']),
-        StaffAssignmentModel.start_time < end_time,
-        StaffAssignmentModel.end_time > start_time
-    ).distinct()
+    """Get employees available (no shift, order staffing or approved leave) during a specific time range"""
+    from backend.modules.hr.services.availability_engine import AvailabilityEngine
     
-    busy_result = await db.execute(busy_employees_query)
-    busy_ids = [row[0] for row in busy_result.all()]
-    
-    # Get all active employees not busy
-    emp_query = select(EmployeeModel).where(
-        EmployeeModel.tenant_id == tenant_id,
-        EmployeeModel.is_active == True,
-        ~EmployeeModel.id.in_(busy_ids) if busy_ids else True
-    )
-    
-    if role_type:
-        emp_query = emp_query.where(EmployeeModel.role_type == role_type)
-    
-    emp_query = emp_query.order_by(EmployeeModel.role_type, EmployeeModel.full_name)
+    await set_tenant_context(db, str(tenant_id))
+    if end_time <= start_time:
+        raise HTTPException(status_code=400, detail="end_time must be after start_time")
     
-    result = await db.execute(emp_query)
-    employees = result.scalars().all()
+    try:
+        matrix = await AvailabilityEngine(db, tenant_id).load_window(start_time, end_time, role_type=role_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return [
         {
-            "id": str(emp.id),
+            "id": str(emp.employee_id),
             "full_name": emp.full_name,
             "role_type": emp.role_type,
             "phone": emp.phone,
             "is_fulltime": emp.is_fulltime
         }
-        for emp in employees
+        for emp in matrix.available(start_time, end_time)
     ]
 
 
@@ -2933,226 +2915,13 @@ async def calculate_payroll(period_id: UUID, tenant_id: UUID = Depends(get_curre
         if period.status not in ['DRAFT', 'CALCULATED']:
             raise HTTPException(status_code=400, detail="Cannot recalculate approved/paid period")
         
-        # Get all active employees
-        emp_query = select(EmployeeModel).where(
-            EmployeeModel.tenant_id == tenant_id,
-            EmployeeModel.is_active == True
-        )
-        emp_result = await db.execute(emp_query)
-        employees = emp_result.scalars().all()
-        
-        # Get holidays in this period
-        holiday_query = select(VietnamHolidayModel.holiday_date).where(
-            VietnamHolidayModel.tenant_id == tenant_id,
-            VietnamHolidayModel.holiday_date >= period.start_date,
-            VietnamHolidayModel.holiday_date <= period.end_date
-        )
-        holiday_result = await db.execute(holiday_query)
-        holidays = set(row[0] for row in holiday_result.all())
-        
-        # Get pending salary advances — BUG-1 FIX: use list to support multiple advances per employee
-        from collections import defaultdict
-        advance_query = select(SalaryAdvanceModel).where(
-            SalaryAdvanceModel.tenant_id == tenant_id,
-            SalaryAdvanceModel.status == 'PAID',
-            SalaryAdvanceModel.deducted_in_period == None
-        )
-        advance_result = await db.execute(advance_query)
-        advances_map = defaultdict(list)
-        for a in advance_result.scalars().all():
-            advances_map[a.employee_id].append(a)
-        
-        # Delete existing items for recalculation
-        from sqlalchemy import delete
-        await db.execute(
-            delete(PayrollItemModel).where(PayrollItemModel.period_id == period_id)
-        )
-        
-        total_gross = Decimal(0)
-        total_deductions = Decimal(0)
-        total_net = Decimal(0)
-        total_employer = Decimal(0)
-        items_created = 0
-        
-        for emp in employees:
-            # Get timesheets for this employee in the period
-            ts_query = select(TimesheetModel).where(
-                TimesheetModel.tenant_id == tenant_id,
-                TimesheetModel.employee_id == emp.id,
-                TimesheetModel.work_date >= period.start_date,
-                TimesheetModel.work_date <= period.end_date,
-                TimesheetModel.status == 'APPROVED'
-            )
-            ts_result = await db.execute(ts_query)
-            timesheets = ts_result.scalars().all()
-            
-            # Calculate hours by type
-            regular_hours = Decimal(0)
-            overtime_hours = Decimal(0)
-            weekend_hours = Decimal(0)
-            holiday_hours = Decimal(0)
-            night_hours = Decimal(0)
-            work_dates_set = set()  # GAP-P2: Count distinct working days
-            
-            for ts in timesheets:
-                hours = Decimal(str(ts.total_hours or 0))
-                ts_ot = Decimal(str(ts.overtime_hours or 0))  # GAP-P4: Use timesheet's own OT
-                work_date = ts.work_date
-                work_dates_set.add(work_date)
-                
-                if work_date in holidays:
-                    holiday_hours += hours
-                elif work_date.weekday() >= 5:  # Saturday=5, Sunday=6
-                    weekend_hours += hours
-                else:
-                    # GAP-P4: Use timesheet's overtime_hours directly
-                    # This preserves manager-approved OT from timesheet editing
-                    regular = hours - ts_ot if hours > ts_ot else hours
-                    regular_hours += regular
-                    overtime_hours += ts_ot
-                
-                # GAP-P1: Calculate actual night hours from check-in/check-out
-                # Night shift window: 22:00 - 06:00 (+30% bonus per Vietnam Labor Law)
-                if ts.actual_start and ts.actual_end:
-                    from datetime import time as dt_time, timedelta
-                    start_dt = ts.actual_start
-                    end_dt = ts.actual_end
-                    
-                    # Night window for this work_date: 22:00 same day to 06:00 next day
-                    night_start_22 = datetime.combine(work_date, dt_time(22, 0))
-                    night_end_06 = datetime.combine(work_date + timedelta(days=1), dt_time(6, 0))
-                    
-                    # Calculate overlap with night window
-                    overlap_start = max(start_dt.replace(tzinfo=None), night_start_22)
-                    overlap_end = min(end_dt.replace(tzinfo=None), night_end_06)
-                    
-                    if overlap_end > overlap_start:
-                        night_delta = (overlap_end - overlap_start).total_seconds() / 3600
-                        night_hours += Decimal(str(round(night_delta, 2)))
-            
-            working_days = len(work_dates_set)  # GAP-P2: Distinct working days
-            
-            # Get hourly rate - use employee's custom or calculate from salary
-            hourly_rate = emp.hourly_rate or Decimal(0)
-            if emp.is_fulltime and not hourly_rate:
-                # Use employee's base_salary or tenant default from settings
-                base = emp.base_salary if emp.base_salary else Decimal(str(settings.default_base_salary or 8000000))
-                days_per_month = settings.standard_working_days_per_month or 26
-                hours_per_day = settings.standard_hours_per_day or 8
-                hourly_rate = base / days_per_month / hours_per_day
-            
-            # Calculate pay using configurable multipliers from settings
-            regular_pay = regular_hours * hourly_rate
-            overtime_pay = overtime_hours * hourly_rate * Decimal(str(settings.multiplier_overtime or 1.5))
-            weekend_pay = weekend_hours * hourly_rate * Decimal(str(settings.multiplier_weekend or 2.0))
-            holiday_pay = holiday_hours * hourly_rate * Decimal(str(settings.multiplier_holiday or 3.0))
-            night_pay = night_hours * hourly_rate * Decimal(str(settings.multiplier_night or 0.3))
-            
-            # Allowances: Use employee-level if set, else tenant default (for fulltime employees)
-            if emp.is_fulltime:
-                allowance_meal = emp.allowance_meal if emp.allowance_meal is not None else Decimal(str(settings.default_allowance_meal or 0))
-                allowance_transport = emp.allowance_transport if emp.allowance_transport is not None else Decimal(str(settings.default_allowance_transport or 0))
-                allowance_phone = emp.allowance_phone if emp.allowance_phone is not None else Decimal(str(settings.default_allowance_phone or 0))
-                allowance_other = emp.allowance_other if emp.allowance_other is not None else Decimal(0)
-            else:
-                allowance_meal = Decimal(0)
-                allowance_transport = Decimal(0)
-                allowance_phone = Decimal(0)
-                allowance_other = Decimal(0)
-            
-            # Gross (including allowance_other)
-            gross = (regular_pay + overtime_pay + weekend_pay + 
-                     holiday_pay + night_pay + allowance_meal + allowance_transport + allowance_phone + allowance_other)
-            
-            # Insurance base: Use employee's insurance_salary_base if set, else use gross
-            insurance_base = emp.insurance_salary_base if emp.insurance_salary_base is not None else gross
-            
-            # Deductions: Use employee rate override if set, else tenant default
-            if emp.is_fulltime:
-                social_rate = emp.rate_social_override if emp.rate_social_override is not None else Decimal(str(settings.rate_social_insurance or 0.08))
-                health_rate = emp.rate_health_override if emp.rate_health_override is not None else Decimal(str(settings.rate_health_insurance or 0.015))
-                unemployment_rate = emp.rate_unemployment_override if emp.rate_unemployment_override is not None else Decimal(str(settings.rate_unemployment or 0.01))
-                
-                social_ins = insurance_base * social_rate
-                health_ins = insurance_base * health_rate
-                unemployment = insurance_base * unemployment_rate
-            else:
-                social_ins = Decimal(0)
-                health_ins = Decimal(0)
-                unemployment = Decimal(0)
-            
-            # Check for advance to deduct — BUG-1 FIX: deduct ALL advances, not just one
-            advance_deduction = Decimal(0)
-            if emp.id in advances_map:
-                for adv in advances_map[emp.id]:
-                    advance_deduction += Decimal(str(adv.amount))
-                    adv.deducted_in_period = period_id
-                    adv.deducted_at = datetime.now()
-                    adv.status = 'DEDUCTED'
-            
-            total_ded = social_ins + health_ins + unemployment + advance_deduction
-            net = gross - total_ded
-            
-            # Employer contributions (Vietnam Labor Law)
-            if emp.is_fulltime:
-                emp_social_rate = Decimal(str(settings.rate_employer_social or 0.175))
-                emp_health_rate = Decimal(str(settings.rate_employer_health or 0.03))
-                emp_unemp_rate = Decimal(str(settings.rate_employer_unemployment or 0.01))
-                emp_union_rate = Decimal(str(settings.rate_union_fee or 0.02))
-                
-                employer_social = insurance_base * emp_social_rate
-                employer_health = insurance_base * emp_health_rate
-                employer_unemp = insurance_base * emp_unemp_rate
-                employer_union = insurance_base * emp_union_rate
-            else:
-                employer_social = Decimal(0)
-                employer_health = Decimal(0)
-                employer_unemp = Decimal(0)
-                employer_union = Decimal(0)
-            
-            employer_total_cost = employer_social + employer_health + employer_unemp + employer_union
-            
-            # Create payroll item
-            # NOTE: gross_salary and total_deductions are GENERATED columns in DB,
-            # so we don't set them here - Postgres calculates them automatically
-            item = PayrollItemModel(
-                tenant_id=tenant_id,
-                period_id=period_id,
-                employee_id=emp.id,
-                regular_hours=regular_hours,
-                overtime_hours=overtime_hours,
-                weekend_hours=weekend_hours,
-                holiday_hours=holiday_hours,
-                night_hours=night_hours,
-                base_salary=emp.base_salary if emp.base_salary else Decimal(str(settings.default_base_salary or 8000000)) if emp.is_fulltime else Decimal(0),
-                hourly_rate=hourly_rate,
-                regular_pay=regular_pay,
-                overtime_pay=overtime_pay,
-                weekend_pay=weekend_pay,
-                holiday_pay=holiday_pay,
-                night_pay=night_pay,
-                allowance_meal=allowance_meal,
-                allowance_transport=allowance_transport,
-                # gross_salary - GENERATED column, calculated by DB
-                deduction_social_ins=social_ins,
-                deduction_advance=advance_deduction,
-                # Employer contributions
-                employer_social_ins=employer_social,
-                employer_health_ins=employer_health,
-                employer_unemployment=employer_unemp,
-                employer_union_fee=employer_union,
-                employer_total=employer_total_cost,
-                # total_deductions - GENERATED column, calculated by DB
-                net_salary=net
-            )
-            
-            db.add(item)
-            items_created += 1
-            
-            total_gross += gross
-            total_deductions += total_ded
-            total_net += net
-            total_employer += employer_total_cost
+        # Set-based engine: one timesheet query, one bulk insert (see payroll_engine)
+        run = await get_payroll_engine(db, tenant_id).calculate(period, settings)
+        items_created = run.items_created
+        total_gross = run.total_gross
+        total_deductions = run.total_deductions
+        total_net = run.total_net
+        total_employer = run.total_employer
         
         # Update period
         period.status = 'CALCULATED'
@@ -3451,11 +3220,15 @@ async def reopen_payroll_period(
         
         # Find FinanceTransaction(s) linked to this payroll period
         txn_result = await db.execute(sql_text(
-            "SELECT id, journal_id FROM finance_transactions "
+            "SELECT id, journal_id, transaction_date FROM finance_transactions "
             "WHERE reference_id = :period_id AND reference_type = 'PAYROLL' AND tenant_id = :tenant_id"
         ), {"period_id": str(period_id), "tenant_id": str(tenant_id)})
         salary_txns = txn_result.fetchall()
         
+        # Raw DELETEs skip ORM events: refresh the KPI rollup of those days at commit
+        from backend.modules.finance.services.kpi_rollup_service import mark_kpi_days_dirty
+        mark_kpi_days_dirty(db, tenant_id, [txn[2] for txn in salary_txns])
+        
         for txn in salary_txns:
             txn_id = txn[0]
             journal_id = txn[1]
@@ -5573,94 +5346,91 @@ async def get_employee_availability(
     Useful for assignment planning.
     """
     from datetime import datetime as dt
-    from sqlalchemy import cast, Date
-    from backend.modules.order.domain.models import OrderModel, OrderStaffAssignmentModel
+    from backend.modules.hr.services.availability_engine import AvailabilityEngine
     
     try:
         check_date = dt.strptime(date, "%Y-%m-%d").date()
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
     
-    # Get all active employees
-    emp_result = await db.execute(
-        select(EmployeeModel).where(
-            EmployeeModel.tenant_id == tenant_id,
-            EmployeeModel.is_active == True
-        )
-    )
-    employees = emp_result.scalars().all()
+    await set_tenant_context(db, str(tenant_id))
+    matrix = await AvailabilityEngine(db, tenant_id).load(check_date)
     
     availability = []
-    
-    for emp in employees:
-        status = "AVAILABLE"
-        conflicts = []
-        
-        # Check leaves
-        leave_result = await db.execute(
-            select(LeaveRequestModel, LeaveTypeModel)
-            .join(LeaveTypeModel, LeaveRequestModel.leave_type_id == LeaveTypeModel.id)
-            .where(
-                LeaveRequestModel.employee_id == emp.id,
-                LeaveRequestModel.status == 'APPROVED',
-                LeaveRequestModel.start_date <= check_date,
-                LeaveRequestModel.end_date >= check_date
-            )
-        )
-        leave_row = leave_result.first()
-        if leave_row:
-            status = "ON_LEAVE"
-            conflicts.append({
-                "type": "LEAVE",
-                "description": leave_row[1].name
-            })
-        
-        # Check assignments
-        assignment_result = await db.execute(
-            select(OrderStaffAssignmentModel, OrderModel)
-            .join(OrderModel, OrderStaffAssignmentModel.order_id == OrderModel.id)
-            .where(
-                OrderStaffAssignmentModel.staff_id == emp.id,
-                OrderStaffAssignmentModel.tenant_id == tenant_id,
-                OrderModel.status.in_(['PENDING', 'CONFIRMED', 'IN_PROGRESS']),
-                cast(OrderModel.event_date, Date) == check_date
-            )
-        )
-        assignments = assignment_result.all()
-        
-        if assignments and status != "ON_LEAVE":
-            status = "ASSIGNED"
-        
-        for row in assignments:
-            assignment, order = row
-            conflicts.append({
-                "type": "SHIFT",
-                "description": f"{order.code} - {order.event_time or 'TBD'}"
-            })
-        
+    for emp in matrix.employees.values():
+        busy, leaves = matrix.day_conflicts(emp.employee_id, check_date)
+        conflicts = [{"type": "LEAVE", "description": leave.leave_type} for leave in leaves]
+        conflicts += [{"type": "SHIFT", "description": b.label} for b in busy]
         availability.append({
-            "employee_id": str(emp.id),
+            "employee_id": str(emp.employee_id),
             "employee_name": emp.full_name,
             "role_type": emp.role_type,
-            "status": status,
-            "assignment_count": len([c for c in conflicts if c["type"] == "SHIFT"]),
+            "status": matrix.status(emp.employee_id, check_date),
+            "assignment_count": len(busy),
             "conflicts": conflicts
         })
     
     # Sort by status priority
-    status_order = {"AVAILABLE": 0, "ASSIGNED": 1, "ON_LEAVE": 2}
-    availability.sort(key=lambda x: status_order.get(x["status"], 3))
+    status_order = {"AVAILABLE": 0, "ASSIGNED": 1, "ON_LEAVE": 2, "CONFLICT": 3}
+    availability.sort(key=lambda x: status_order.get(x["status"], 4))
     
+    counts = matrix.day_counts(check_date)
     return {
         "date": date,
         "total_employees": len(availability),
-        "available": len([e for e in availability if e["status"] == "AVAILABLE"]),
-        "assigned": len([e for e in availability if e["status"] == "ASSIGNED"]),
-        "on_leave": len([e for e in availability if e["status"] == "ON_LEAVE"]),
+        "available": counts["AVAILABLE"],
+        "assigned": counts["ASSIGNED"],
+        "on_leave": counts["ON_LEAVE"],
+        "conflict": counts["CONFLICT"],
         "employees": availability
     }
 
 
+@router.get("/calendar/employee-availability/matrix",
+             dependencies=[Depends(require_permission("hr", "view"))])
+async def get_employee_availability_matrix(
+    start_date: str = Query(..., description="First day (YYYY-MM-DD)"),
+    end_date: str = Query(..., description="Last day, inclusive (YYYY-MM-DD)"),
+    role_type: Optional[str] = Query(None),
+    tenant_id: UUID = Depends(get_current_tenant),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Employee x day availability (AVAILABLE / ASSIGNED / ON_LEAVE / CONFLICT)
+    for a date range, loaded with three range queries.
+    """
+    from datetime import datetime as dt
+    from backend.modules.hr.services.availability_engine import AvailabilityEngine
+    
+    try:
+        first_day = dt.strptime(start_date, "%Y-%m-%d").date()
+        last_day = dt.strptime(end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    
+    await set_tenant_context(db, str(tenant_id))
+    try:
+        matrix = await AvailabilityEngine(db, tenant_id).load(first_day, last_day, role_type=role_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "days": [day.isoformat() for day in matrix.days],
+        "employees": [
+            {
+                "employee_id": str(emp.employee_id),
+                "employee_name": emp.full_name,
+                "role_type": emp.role_type,
+                "statuses": matrix.row(emp.employee_id)
+            }
+            for emp in matrix.employees.values()
+        ],
+        "totals": [matrix.day_counts(day) for day in matrix.days]
+    }
+
+
 # ============================================
 # SPRINT 18.1: UNIFIED STAFF ASSIGNMENTS
 # ============================================
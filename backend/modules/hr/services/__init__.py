@@ -1,2 +1,5 @@
 # HR services
 from .unified_staff_service import UnifiedStaffAssignmentService, get_unified_staff_service
+from .staff_recommendation import StaffRecommendationEngine, get_staff_recommendation_engine
+from .availability_engine import AvailabilityEngine, AvailabilityMatrix, get_availability_engine
+from .employee_metrics_service import EmployeeMetricsService, get_employee_metrics_service, mark_employee_days_dirty
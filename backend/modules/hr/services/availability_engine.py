@@ -0,0 +1,372 @@
+"""
+Employee Availability Engine
+One answer to "who is free when" for:
+- GET  /hr/calendar/employee-availability (+ /matrix for a date range)
+- GET  /hr/assignments/available-employees
+- POST /hr/assignments/check-conflict
+- GET  /orders/{order_id}/suggest-staff (via StaffRecommendationEngine)
+
+Three range queries load everything for [first_day, last_day] (Vietnam
+calendar days, half-open UTC windows so the indexes of migration 076 apply):
+1. active employees
+2. approved leave overlapping the range
+3. busy intervals: staff_assignments that are ASSIGNED or CONFIRMED plus
+   order_staff_assignments of PENDING, CONFIRMED or IN_PROGRESS orders in
+   the range (the filters the conflict check and the availability calendar
+   always used)
+and are joined in memory into an AvailabilityMatrix:
+- per employee, busy intervals sorted by start (time-range checks)
+- per employee, day bitsets (bit i = day i of the range) for leave,
+  assignments and conflicts (assigned while on leave, or double-booked)
+
+A staff_assignment without times covers its order's event day; an
+order_staff_assignment always covers the whole event day. When an
+employee has both for the same order only the staff_assignment is kept.
+
+Day ranges (load) are limited to MAX_RANGE_DAYS; time windows
+(load_window, for conflict checks) are not. Naive datetimes are Vietnam
+local time everywhere.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+VN_TIMEZONE = timezone(timedelta(hours=7))
+MAX_RANGE_DAYS = 62
+
+STATUS_AVAILABLE = "AVAILABLE"
+STATUS_ASSIGNED = "ASSIGNED"
+STATUS_ON_LEAVE = "ON_LEAVE"
+STATUS_CONFLICT = "CONFLICT"
+
+SOURCE_HR = "HR"        # staff_assignments
+SOURCE_ORDER = "ORDER"  # order_staff_assignments
+
+
+def local_day(value) -> date:
+    """Vietnam calendar day of a datetime (naive = local) or date."""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            return value.date()
+        return value.astimezone(VN_TIMEZONE).date()
+    return value
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, dt_time.min, VN_TIMEZONE)
+
+
+def _aware(value: datetime) -> datetime:
+    return value.replace(tzinfo=VN_TIMEZONE) if value.tzinfo is None else value
+
+
+def days_between(start: datetime, end: datetime) -> Tuple[date, date]:
+    """Local days touched by the half-open window [start, end)."""
+    first = local_day(start)
+    last = local_day(_aware(end) - timedelta(microseconds=1)) if end > start else first
+    return first, max(first, last)
+
+
+# ============ QUERIES ============
+
+EMPLOYEES_SQL = text("""
+    SELECT e.id, e.user_id, e.full_name, COALESCE(e.role_type, 'STAFF') AS role_type, e.phone,
+           COALESCE(e.is_fulltime, false) AS is_fulltime, COALESCE(e.hourly_rate, 0) AS hourly_rate
+    FROM employees e
+    WHERE e.tenant_id = CAST(:tenant_id AS uuid)
+      AND e.is_active = true
+      AND (CAST(:role_type AS varchar) IS NULL OR e.role_type = CAST(:role_type AS varchar))
+    ORDER BY e.role_type, e.full_name, e.id
+""")
+
+LEAVES_SQL = text("""
+    SELECT lr.employee_id, lr.start_date, lr.end_date, lt.name AS leave_type
+    FROM leave_requests lr
+    LEFT JOIN leave_types lt ON lt.id = lr.leave_type_id
+    WHERE lr.tenant_id = CAST(:tenant_id AS uuid)
+      AND lr.status = 'APPROVED'
+      AND lr.start_date <= CAST(:last_day AS date)
+      AND lr.end_date >= CAST(:first_day AS date)
+""")
+
+BUSY_SQL = text("""
+    SELECT 'HR' AS source, sa.id AS assignment_id, sa.employee_id, sa.event_id AS order_id,
+           o.code AS order_code, o.event_time, o.event_date, sa.start_time, sa.end_time, sa.status
+    FROM staff_assignments sa
+    LEFT JOIN orders o ON o.id = sa.event_id
+    WHERE sa.tenant_id = CAST(:tenant_id AS uuid)
+      AND sa.status IN ('ASSIGNED', 'CONFIRMED')
+      AND sa.employee_id IS NOT NULL
+      AND (
+            (sa.start_time < CAST(:range_end AS timestamptz)
+             AND (sa.end_time > CAST(:range_start AS timestamptz)
+                  OR (sa.end_time IS NULL AND sa.start_time >= CAST(:range_start AS timestamptz))))
+         OR (sa.start_time IS NULL
+             AND o.event_date >= CAST(:range_start AS timestamptz)
+             AND o.event_date < CAST(:range_end AS timestamptz))
+      )
+    UNION ALL
+    -- order_staff_assignments.staff_id holds employees.id or users.id
+    SELECT 'ORDER', osa.id, e.id, o.id, o.code, o.event_time, o.event_date, NULL, NULL, o.status
+    FROM order_staff_assignments osa
+    JOIN orders o ON o.id = osa.order_id
+    JOIN employees e ON e.tenant_id = o.tenant_id AND (e.id = osa.staff_id OR e.user_id = osa.staff_id)
+    WHERE o.tenant_id = CAST(:tenant_id AS uuid)
+      AND o.status IN ('PENDING', 'CONFIRMED', 'IN_PROGRESS')
+      AND o.event_date >= CAST(:range_start AS timestamptz)
+      AND o.event_date < CAST(:range_end AS timestamptz)
+""")
+
+
+# ============ MATRIX ============
+
+@dataclass(frozen=True)
+class BusyInterval:
+    start: datetime
+    end: datetime
+    source: str
+    assignment_id: Optional[UUID] = None
+    order_id: Optional[UUID] = None
+    order_code: Optional[str] = None
+    event_time: Optional[str] = None
+    status: Optional[str] = None
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        return self.start < end and self.end > start
+
+    @property
+    def label(self) -> str:
+        if self.order_code:
+            return f"{self.order_code} - {self.event_time or 'TBD'}"
+        local_start, local_end = self.start.astimezone(VN_TIMEZONE), self.end.astimezone(VN_TIMEZONE)
+        return f"Ca {local_start:%H:%M}-{local_end:%H:%M}"
+
+
+@dataclass(frozen=True)
+class LeaveSpan:
+    start_date: date
+    end_date: date
+    leave_type: Optional[str] = None
+
+    def covers(self, first: date, last: date) -> bool:
+        return self.start_date <= last and self.end_date >= first
+
+
+@dataclass
+class EmployeeAvailability:
+    employee_id: UUID
+    full_name: str
+    role_type: str
+    phone: Optional[str] = None
+    is_fulltime: bool = False
+    hourly_rate: Decimal = Decimal(0)
+    busy: List[BusyInterval] = field(default_factory=list)  # sorted by start
+    leaves: List[LeaveSpan] = field(default_factory=list)
+    leave_mask: int = 0
+    assigned_mask: int = 0
+    conflict_mask: int = 0
+
+    def busy_between(self, start: datetime, end: datetime) -> List[BusyInterval]:
+        start, end = _aware(start), _aware(end)
+        overlapping = []
+        for interval in self.busy:
+            if interval.start >= end:
+                break  # sorted by start: nothing later can overlap
+            if interval.end > start:
+                overlapping.append(interval)
+        return overlapping
+
+
+class AvailabilityMatrix:
+    """Employees x days of one tenant, built from the three range queries"""
+
+    def __init__(self, first_day: date, last_day: date, employees: Iterable[EmployeeAvailability]):
+        self.first_day = first_day
+        self.last_day = last_day
+        self.days: List[date] = [first_day + timedelta(days=n) for n in range((last_day - first_day).days + 1)]
+        self.employees: Dict[UUID, EmployeeAvailability] = {e.employee_id: e for e in employees}
+
+    # ---- building ----
+
+    def _day_bits(self, first: date, last: date) -> int:
+        lo = max(0, (first - self.first_day).days)
+        hi = min(len(self.days) - 1, (last - self.first_day).days)
+        if hi < lo:
+            return 0
+        return ((1 << (hi - lo + 1)) - 1) << lo
+
+    def _interval_bits(self, start: datetime, end: datetime) -> int:
+        return self._day_bits(*days_between(start, end))
+
+    @classmethod
+    def build(cls, first_day: date, last_day: date, employees: Iterable, leaves: Iterable, busy: Iterable) -> "AvailabilityMatrix":
+        matrix = cls(first_day, last_day, (
+            EmployeeAvailability(
+                employee_id=e.id, full_name=e.full_name, role_type=e.role_type, phone=e.phone,
+                is_fulltime=bool(e.is_fulltime), hourly_rate=Decimal(e.hourly_rate or 0),
+            )
+            for e in employees
+        ))
+        for row in leaves:
+            emp = matrix.employees.get(row.employee_id)
+            if emp is None:
+                continue
+            emp.leaves.append(LeaveSpan(row.start_date, row.end_date, row.leave_type))
+            emp.leave_mask |= matrix._day_bits(row.start_date, row.end_date)
+
+        hr_orders = set()
+        intervals: Dict[UUID, List[BusyInterval]] = {}
+        rows = sorted(busy, key=lambda r: r.source != SOURCE_HR)  # HR rows first
+        for row in rows:
+            if row.employee_id not in matrix.employees:
+                continue
+            if row.source == SOURCE_HR:
+                if row.order_id is not None:
+                    hr_orders.add((row.employee_id, row.order_id))
+            elif (row.employee_id, row.order_id) in hr_orders:
+                continue
+            interval = _interval_from_row(row)
+            if interval is not None:
+                intervals.setdefault(row.employee_id, []).append(interval)
+
+        for employee_id, items in intervals.items():
+            emp = matrix.employees[employee_id]
+            items.sort(key=lambda b: (b.start, b.end))
+            emp.busy = items
+            latest_end: Optional[datetime] = None
+            for interval in items:
+                emp.assigned_mask |= matrix._interval_bits(interval.start, interval.end)
+                if latest_end is not None and interval.start < latest_end:
+                    # Double-booked for the overlapping part
+                    emp.conflict_mask |= matrix._interval_bits(interval.start, min(interval.end, latest_end))
+                latest_end = interval.end if latest_end is None else max(latest_end, interval.end)
+
+        for emp in matrix.employees.values():
+            emp.conflict_mask |= emp.leave_mask & emp.assigned_mask
+        return matrix
+
+    # ---- reading ----
+
+    def day_index(self, day: date) -> int:
+        index = (day - self.first_day).days
+        if not 0 <= index < len(self.days):
+            raise ValueError(f"{day} is outside the loaded range {self.first_day}..{self.last_day}")
+        return index
+
+    def status(self, employee_id: UUID, day: date) -> str:
+        emp = self.employees[employee_id]
+        bit = 1 << self.day_index(day)
+        if emp.conflict_mask & bit:
+            return STATUS_CONFLICT
+        if emp.leave_mask & bit:
+            return STATUS_ON_LEAVE
+        if emp.assigned_mask & bit:
+            return STATUS_ASSIGNED
+        return STATUS_AVAILABLE
+
+    def row(self, employee_id: UUID) -> List[str]:
+        return [self.status(employee_id, day) for day in self.days]
+
+    def conflicts(
+        self,
+        employee_id: UUID,
+        start: datetime,
+        end: datetime,
+        exclude_assignment_id: Optional[UUID] = None,
+        exclude_order_id: Optional[UUID] = None,
+    ) -> Tuple[List[BusyInterval], List[LeaveSpan]]:
+        """Busy intervals overlapping [start, end) and leave covering any day of it."""
+        start, end = _aware(start), _aware(end)
+        emp = self.employees.get(employee_id)
+        if emp is None:
+            return [], []
+        busy = [
+            b for b in emp.busy_between(start, end)
+            if (exclude_assignment_id is None or b.assignment_id != exclude_assignment_id)
+            and (exclude_order_id is None or b.order_id != exclude_order_id)
+        ]
+        first, last = days_between(start, end)
+        return busy, [leave for leave in emp.leaves if leave.covers(first, last)]
+
+    def day_conflicts(self, employee_id: UUID, day: date, exclude_order_id: Optional[UUID] = None):
+        start = day_start(day)
+        return self.conflicts(employee_id, start, start + timedelta(days=1), exclude_order_id=exclude_order_id)
+
+    def is_available(self, employee_id: UUID, start: datetime, end: datetime, **exclude) -> bool:
+        busy, leaves = self.conflicts(employee_id, start, end, **exclude)
+        return not busy and not leaves
+
+    def available(self, start: datetime, end: datetime) -> List[EmployeeAvailability]:
+        return [emp for emp in self.employees.values() if self.is_available(emp.employee_id, start, end)]
+
+    def day_counts(self, day: date) -> Dict[str, int]:
+        counts = {STATUS_AVAILABLE: 0, STATUS_ASSIGNED: 0, STATUS_ON_LEAVE: 0, STATUS_CONFLICT: 0}
+        for employee_id in self.employees:
+            counts[self.status(employee_id, day)] += 1
+        return counts
+
+
+def _interval_from_row(row) -> Optional[BusyInterval]:
+    if row.source == SOURCE_HR and row.start_time is not None:
+        start = _aware(row.start_time)
+        end = _aware(row.end_time) if row.end_time is not None else day_start(local_day(start)) + timedelta(days=1)
+    elif row.event_date is not None:
+        # Whole event day
+        start = day_start(local_day(row.event_date))
+        end = start + timedelta(days=1)
+    else:
+        return None
+    if end <= start:
+        end = start + timedelta(minutes=1)
+    return BusyInterval(
+        start=start, end=end, source=row.source, assignment_id=row.assignment_id,
+        order_id=row.order_id, order_code=row.order_code, event_time=row.event_time, status=row.status,
+    )
+
+
+# ============ ENGINE ============
+
+class AvailabilityEngine:
+    """Load an AvailabilityMatrix for a tenant and day range with three queries"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID):
+        self.db = db
+        self.tenant_id = tenant_id
+
+    async def load(
+        self,
+        first_day: date,
+        last_day: Optional[date] = None,
+        role_type: Optional[str] = None,
+        max_days: Optional[int] = MAX_RANGE_DAYS,
+    ) -> AvailabilityMatrix:
+        last_day = last_day or first_day
+        if last_day < first_day:
+            raise ValueError("last_day must not be before first_day")
+        if max_days is not None and (last_day - first_day).days >= max_days:
+            raise ValueError(f"Range is limited to {max_days} days")
+
+        params = {"tenant_id": str(self.tenant_id)}
+        employees = (await self.db.execute(EMPLOYEES_SQL, {**params, "role_type": role_type})).fetchall()
+        leaves = (await self.db.execute(LEAVES_SQL, {**params, "first_day": first_day, "last_day": last_day})).fetchall()
+        busy = (await self.db.execute(BUSY_SQL, {
+            **params,
+            "range_start": day_start(first_day),
+            "range_end": day_start(last_day) + timedelta(days=1),
+        })).fetchall()
+        return AvailabilityMatrix.build(first_day, last_day, employees, leaves, busy)
+
+    async def load_window(self, start: datetime, end: datetime, role_type: Optional[str] = None) -> AvailabilityMatrix:
+        """Matrix covering every local day touched by [start, end), whatever its length."""
+        return await self.load(*days_between(_aware(start), _aware(end)), role_type=role_type, max_days=None)
+
+
+def get_availability_engine(db: AsyncSession, tenant_id: UUID) -> AvailabilityEngine:
+    """Factory function for dependency injection"""
+    return AvailabilityEngine(db, tenant_id)
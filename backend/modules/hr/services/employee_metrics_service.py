@@ -0,0 +1,320 @@
+"""
+Employee Metrics Service
+Per-employee daily counters for /hr/employees/{employee_id}/performance
+and the all-employees variant /hr/employees/performance
+
+The profile used to run seven aggregate queries over timesheets and
+staff_assignments per call (and per employee on dashboards); reads are now
+one SUM over at most period_days rows of hr_employee_daily_metrics.
+
+Maintenance (same scheme as the finance KPI rollup):
+- Incremental: ORM changes to TimesheetModel (check-in/out, edits,
+  approval) and StaffAssignmentModel (creation, status changes) mark the
+  affected (tenant, employee, day) keys on the session; right before COMMIT
+  those keys are recomputed from source tables inside the same transaction
+  (common/utils/commit_refresh.py).
+- Explicit: Core writes call mark_employee_days_dirty() or refresh_keys().
+- Reconciliation: rebuild_range() recomputes a range of days from source
+  tables (scripts/rebuild_employee_metrics.py, POST /hr/employee-metrics/rebuild).
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.common.utils.commit_refresh import CommitRefresh, as_utc_day, tenant_lock_sql
+from backend.modules.hr.domain.models import EmployeeDailyMetricModel, StaffAssignmentModel, TimesheetModel
+
+# A check-in later than scheduled_start + grace counts as late
+LATE_GRACE_MINUTES = 15
+
+_DIRTY_KEY = "hr_employee_metrics_dirty"
+
+# Recompute the rows of the (employee, day) pairs in the "keys" CTE from
+# source tables and upsert them. Timesheets bucket on work_date, assignments
+# on a half-open created_at range between the day's UTC midnights (days are
+# UTC days, as bucketed by as_utc_day - never the session TimeZone).
+_UPSERT_FROM_KEYS = f"""
+    INSERT INTO hr_employee_daily_metrics (
+        tenant_id, employee_id, metric_date, timesheets, approved_timesheets, approved_hours,
+        approved_overtime_hours, checked_in, late_checkins, assignments, completed_assignments, refreshed_at
+    )
+    SELECT CAST(:tenant_id AS uuid), k.employee_id, k.day,
+           ts.timesheets, ts.approved_timesheets, ts.approved_hours, ts.approved_overtime_hours,
+           ts.checked_in, ts.late_checkins, sa.assignments, sa.completed_assignments, NOW()
+    FROM keys k
+    CROSS JOIN LATERAL (
+        SELECT k.day::timestamp AT TIME ZONE 'UTC' AS day_start,
+               (k.day + 1)::timestamp AT TIME ZONE 'UTC' AS day_end
+    ) b
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) AS timesheets,
+               COUNT(*) FILTER (WHERE t.status = 'APPROVED') AS approved_timesheets,
+               COALESCE(SUM(t.total_hours) FILTER (WHERE t.status = 'APPROVED'), 0) AS approved_hours,
+               COALESCE(SUM(t.overtime_hours) FILTER (WHERE t.status = 'APPROVED'), 0) AS approved_overtime_hours,
+               COUNT(*) FILTER (WHERE t.actual_start IS NOT NULL) AS checked_in,
+               COUNT(*) FILTER (
+                   WHERE t.actual_start > t.scheduled_start + interval '{LATE_GRACE_MINUTES} minutes'
+               ) AS late_checkins
+        FROM timesheets t
+        WHERE t.tenant_id = CAST(:tenant_id AS uuid)
+          AND t.employee_id = k.employee_id
+          AND t.work_date = k.day
+    ) ts
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) AS assignments,
+               COUNT(*) FILTER (WHERE s.status = 'COMPLETED') AS completed_assignments
+        FROM staff_assignments s
+        WHERE s.tenant_id = CAST(:tenant_id AS uuid)
+          AND s.employee_id = k.employee_id
+          AND s.created_at >= b.day_start AND s.created_at < b.day_end
+    ) sa
+    ON CONFLICT (tenant_id, employee_id, metric_date) DO UPDATE SET
+        timesheets = EXCLUDED.timesheets,
+        approved_timesheets = EXCLUDED.approved_timesheets,
+        approved_hours = EXCLUDED.approved_hours,
+        approved_overtime_hours = EXCLUDED.approved_overtime_hours,
+        checked_in = EXCLUDED.checked_in,
+        late_checkins = EXCLUDED.late_checkins,
+        assignments = EXCLUDED.assignments,
+        completed_assignments = EXCLUDED.completed_assignments,
+        refreshed_at = NOW()
+"""
+
+REFRESH_KEYS_SQL = text("""
+    WITH keys AS (
+        SELECT DISTINCT k.employee_id, k.day
+        FROM unnest(CAST(:employee_ids AS uuid[]), CAST(:days AS date[])) AS k(employee_id, day)
+    )
+""" + _UPSERT_FROM_KEYS)
+
+# Every (employee, day) with source rows in [start_date, end_date], plus
+# existing rows of the range so deleted sources are zeroed out
+REBUILD_RANGE_SQL = text("""
+    WITH keys AS (
+        SELECT t.employee_id, t.work_date AS day
+        FROM timesheets t
+        WHERE t.tenant_id = CAST(:tenant_id AS uuid)
+          AND t.work_date >= CAST(:start_date AS date) AND t.work_date <= CAST(:end_date AS date)
+        UNION
+        SELECT s.employee_id, CAST(s.created_at AT TIME ZONE 'UTC' AS date)
+        FROM staff_assignments s
+        WHERE s.tenant_id = CAST(:tenant_id AS uuid)
+          AND s.employee_id IS NOT NULL
+          AND s.created_at >= CAST(:start_date AS date)::timestamp AT TIME ZONE 'UTC'
+          AND s.created_at < (CAST(:end_date AS date) + 1)::timestamp AT TIME ZONE 'UTC'
+        UNION
+        SELECT m.employee_id, m.metric_date
+        FROM hr_employee_daily_metrics m
+        WHERE m.tenant_id = CAST(:tenant_id AS uuid)
+          AND m.metric_date >= CAST(:start_date AS date) AND m.metric_date <= CAST(:end_date AS date)
+    )
+""" + _UPSERT_FROM_KEYS)
+
+# Serializes refreshes of one tenant (see the finance KPI rollup)
+LOCK_TENANT_SQL = tenant_lock_sql("hr_employee_metrics")
+
+
+# ============ CHANGE TRACKING ============
+
+# Model -> (columns that affect metrics, column whose date is the bucket)
+_TRACKED_MODELS = {
+    TimesheetModel: (
+        ("employee_id", "work_date", "status", "total_hours", "overtime_hours", "actual_start", "scheduled_start"),
+        "work_date",
+    ),
+    StaffAssignmentModel: (
+        ("employee_id", "status", "created_at"),
+        "created_at",
+    ),
+}
+
+
+def _history_values(state, column: str) -> list:
+    history = state.attrs[column].history
+    return list(history.added) + list(history.unchanged) + list(history.deleted)
+
+
+def _affected_keys(obj: Any, is_new_or_deleted: bool) -> Set[Tuple[UUID, date]]:
+    """Old and new (employee, day) keys of a changed row (empty if no metric column changed)."""
+    watched, bucket_column = _TRACKED_MODELS[type(obj)]
+    state = inspect(obj)
+    if not is_new_or_deleted and not any(state.attrs[c].history.has_changes() for c in watched):
+        return set()
+
+    employee_ids = [e for e in _history_values(state, "employee_id") if e is not None]
+    values = _history_values(state, bucket_column)
+    days = {d for d in (as_utc_day(v) for v in values) if d}
+    if bucket_column == "created_at" and not values:
+        # New row: created_at is a server default, bucket it on today
+        days.add(datetime.now(timezone.utc).date())
+    return {(employee_id, day) for employee_id in employee_ids for day in days}
+
+
+def _key_params(keys: Iterable[Tuple[Any, date]]) -> Dict[str, list]:
+    keys = sorted({(str(employee_id), day) for employee_id, day in keys})
+    return {"employee_ids": [k[0] for k in keys], "days": [k[1] for k in keys]}
+
+
+def _refresh_tenant_keys(session: Session, tenant_id: str, params: Dict[str, list]) -> None:
+    session.execute(REFRESH_KEYS_SQL, {"tenant_id": tenant_id, **params})
+
+
+_metrics_refresh = CommitRefresh(
+    _DIRTY_KEY, LOCK_TENANT_SQL,
+    prepare=lambda keys: _key_params((employee_id, day) for _, employee_id, day in keys),
+    refresh=_refresh_tenant_keys,
+    label="Employee metrics refresh",
+)
+
+
+def mark_employee_days_dirty(session: Any, tenant_id: UUID, keys: Iterable[Tuple[UUID, Any]]) -> None:
+    """Queue (employee_id, day) keys for refresh at commit (for Core writes that skip ORM events)."""
+    dirty: Set[Tuple[str, str, date]] = _metrics_refresh.pending(session)
+    for employee_id, day in keys:
+        day = as_utc_day(day)
+        if employee_id and day:
+            dirty.add((str(tenant_id), str(employee_id), day))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_dirty_employee_days(session, flush_context):
+    for collection, is_new_or_deleted in ((session.new, True), (session.dirty, False), (session.deleted, True)):
+        for obj in collection:
+            if type(obj) not in _TRACKED_MODELS or getattr(obj, "tenant_id", None) is None:
+                continue
+            keys = _affected_keys(obj, is_new_or_deleted)
+            if keys:
+                mark_employee_days_dirty(session, obj.tenant_id, keys)
+
+
+# ============ READ MODEL ============
+
+def performance_metrics(row: Any) -> Dict[str, Any]:
+    """Summed counters -> the "metrics" block of the performance endpoints (None = no activity)."""
+    def total(name: str):
+        return getattr(row, name, None) or 0
+
+    timesheets = int(total("timesheets"))
+    approved = int(total("approved_timesheets"))
+    checked_in = int(total("checked_in"))
+    late = int(total("late_checkins"))
+    assignments = int(total("assignments"))
+    completed = int(total("completed_assignments"))
+
+    if checked_in > 0:
+        on_time_rate = (checked_in - late) / checked_in * 100
+    else:
+        # No check-in data: approximation based on approved timesheets (as before)
+        on_time_rate = (approved / timesheets * 100) if timesheets > 0 else 0
+    completion_rate = (completed / assignments * 100) if assignments > 0 else 0
+
+    return {
+        "total_hours": round(float(total("approved_hours")), 1),
+        "total_overtime": round(float(total("approved_overtime_hours")), 1),
+        "total_timesheets": timesheets,
+        "approved_timesheets": approved,
+        "late_checkins": late,
+        "total_assignments": assignments,
+        "completed_assignments": completed,
+        "on_time_rate": round(on_time_rate, 1),
+        "completion_rate": round(completion_rate, 1),
+    }
+
+
+# ============ SERVICE ============
+
+class EmployeeMetricsService:
+    """Read and rebuild the hr_employee_daily_metrics store of one tenant"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID):
+        self.db = db
+        self.tenant_id = tenant_id
+
+    @staticmethod
+    def _sums():
+        M = EmployeeDailyMetricModel
+        return (
+            func.coalesce(func.sum(M.timesheets), 0).label("timesheets"),
+            func.coalesce(func.sum(M.approved_timesheets), 0).label("approved_timesheets"),
+            func.coalesce(func.sum(M.approved_hours), 0).label("approved_hours"),
+            func.coalesce(func.sum(M.approved_overtime_hours), 0).label("approved_overtime_hours"),
+            func.coalesce(func.sum(M.checked_in), 0).label("checked_in"),
+            func.coalesce(func.sum(M.late_checkins), 0).label("late_checkins"),
+            func.coalesce(func.sum(M.assignments), 0).label("assignments"),
+            func.coalesce(func.sum(M.completed_assignments), 0).label("completed_assignments"),
+        )
+
+    async def employee_metrics(self, employee_id: UUID, since: date) -> Dict[str, Any]:
+        """Metrics of one employee from `since` (inclusive) on: one query over <= N day rows."""
+        M = EmployeeDailyMetricModel
+        result = await self.db.execute(
+            select(*self._sums()).where(
+                M.tenant_id == self.tenant_id,
+                M.employee_id == employee_id,
+                M.metric_date >= since,
+            )
+        )
+        return performance_metrics(result.one())
+
+    async def all_employee_metrics(self, since: date) -> Dict[UUID, Dict[str, Any]]:
+        """{employee_id: metrics} for every employee with activity since `since`, one grouped query."""
+        M = EmployeeDailyMetricModel
+        result = await self.db.execute(
+            select(M.employee_id, *self._sums())
+            .where(M.tenant_id == self.tenant_id, M.metric_date >= since)
+            .group_by(M.employee_id)
+        )
+        return {row.employee_id: performance_metrics(row) for row in result}
+
+    async def refresh_keys(self, keys: Iterable[Tuple[UUID, date]]) -> int:
+        """Recompute the given (employee_id, day) keys from source tables (caller commits)."""
+        params = _key_params((e, d) for e, d in keys if e and d)
+        if not params["days"]:
+            return 0
+        await self.db.execute(LOCK_TENANT_SQL, {"tenant_id": str(self.tenant_id)})
+        await self.db.execute(REFRESH_KEYS_SQL, {"tenant_id": str(self.tenant_id), **params})
+        return len(params["days"])
+
+    async def rebuild_range(self, start: date, end: date, chunk_days: int = 366) -> int:
+        """Reconciliation: rebuild every day in [start, end] from source tables (caller commits)."""
+        params = {"tenant_id": str(self.tenant_id)}
+        rebuilt = 0
+        day = start
+        while day <= end:
+            chunk_end = min(end, day + timedelta(days=chunk_days - 1))
+            await self.db.execute(LOCK_TENANT_SQL, params)
+            await self.db.execute(REBUILD_RANGE_SQL, {**params, "start_date": day, "end_date": chunk_end})
+            rebuilt += (chunk_end - day).days + 1
+            day = chunk_end + timedelta(days=1)
+        return rebuilt
+
+    async def source_date_bounds(self) -> Tuple[Optional[date], Optional[date]]:
+        """Earliest and latest day referenced by any source row (for full rebuilds)."""
+        result = await self.db.execute(text("""
+            SELECT LEAST(
+                       (SELECT MIN(work_date) FROM timesheets WHERE tenant_id = CAST(:t AS uuid)),
+                       (SELECT MIN(created_at AT TIME ZONE 'UTC')::date FROM staff_assignments WHERE tenant_id = CAST(:t AS uuid))
+                   ),
+                   GREATEST(
+                       (SELECT MAX(work_date) FROM timesheets WHERE tenant_id = CAST(:t AS uuid)),
+                       (SELECT MAX(created_at AT TIME ZONE 'UTC')::date FROM staff_assignments WHERE tenant_id = CAST(:t AS uuid))
+                   )
+        """), {"t": str(self.tenant_id)})
+        row = result.one()
+        return row[0], row[1]
+
+    async def rebuild_all(self) -> int:
+        start, end = await self.source_date_bounds()
+        if not start or not end:
+            return 0
+        return await self.rebuild_range(start, end)
+
+
+def get_employee_metrics_service(db: AsyncSession, tenant_id: UUID) -> EmployeeMetricsService:
+    """Factory function for dependency injection"""
+    return EmployeeMetricsService(db, tenant_id)
@@ -0,0 +1,384 @@
+"""
+Set-based Payroll Engine
+Replaces the per-employee loop in POST /hr/payroll/periods/{period_id}/calculate
+
+- Loads ALL approved timesheets of the period in one query (ordered by employee)
+- Splits hours into regular / OT / weekend / holiday / night in a single pass
+- Converts tenant settings to Decimal rates once per run (not once per row)
+- Inserts every PayrollItem with one bulk INSERT and marks advances with one UPDATE
+
+Pay rules are unchanged (Vietnam Labor Law):
+- Regular: 100%, Overtime (weekday): 150%, Weekend: 200%, Holiday: 300%
+- Night shift (22h-6h): +30%
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.hr.domain.models import (
+    EmployeeModel,
+    PayrollItemModel,
+    PayrollPeriodModel,
+    PayrollSettingsModel,
+    SalaryAdvanceModel,
+    TimesheetModel,
+    VietnamHolidayModel,
+)
+
+
+ZERO = Decimal(0)
+NIGHT_START = dt_time(22, 0)
+NIGHT_END = dt_time(6, 0)
+
+
+def _dec(value: Any, default: Any = 0) -> Decimal:
+    """Numeric columns already come back as Decimal — only convert when needed."""
+    if isinstance(value, Decimal):
+        return value
+    if value is None:
+        value = default
+    return Decimal(str(value))
+
+
+@dataclass
+class HourBuckets:
+    """Hours of one employee split by pay type"""
+    regular: Decimal = ZERO
+    overtime: Decimal = ZERO
+    weekend: Decimal = ZERO
+    holiday: Decimal = ZERO
+    night: Decimal = ZERO
+    work_dates: Set[date] = field(default_factory=set)
+
+    @property
+    def working_days(self) -> int:
+        return len(self.work_dates)
+
+
+@dataclass(frozen=True)
+class PayrollRates:
+    """Tenant payroll settings resolved to Decimal once per calculation run"""
+    default_base_salary: Decimal
+    days_per_month: int
+    hours_per_day: int
+    multiplier_overtime: Decimal
+    multiplier_weekend: Decimal
+    multiplier_holiday: Decimal
+    multiplier_night: Decimal
+    default_allowance_meal: Decimal
+    default_allowance_transport: Decimal
+    default_allowance_phone: Decimal
+    rate_social: Decimal
+    rate_health: Decimal
+    rate_unemployment: Decimal
+    rate_employer_social: Decimal
+    rate_employer_health: Decimal
+    rate_employer_unemployment: Decimal
+    rate_union_fee: Decimal
+
+    @classmethod
+    def from_settings(cls, settings: PayrollSettingsModel) -> "PayrollRates":
+        return cls(
+            default_base_salary=_dec(settings.default_base_salary or 8000000),
+            days_per_month=settings.standard_working_days_per_month or 26,
+            hours_per_day=settings.standard_hours_per_day or 8,
+            multiplier_overtime=_dec(settings.multiplier_overtime or 1.5),
+            multiplier_weekend=_dec(settings.multiplier_weekend or 2.0),
+            multiplier_holiday=_dec(settings.multiplier_holiday or 3.0),
+            multiplier_night=_dec(settings.multiplier_night or 0.3),
+            default_allowance_meal=_dec(settings.default_allowance_meal or 0),
+            default_allowance_transport=_dec(settings.default_allowance_transport or 0),
+            default_allowance_phone=_dec(settings.default_allowance_phone or 0),
+            rate_social=_dec(settings.rate_social_insurance or 0.08),
+            rate_health=_dec(settings.rate_health_insurance or 0.015),
+            rate_unemployment=_dec(settings.rate_unemployment or 0.01),
+            rate_employer_social=_dec(settings.rate_employer_social or 0.175),
+            rate_employer_health=_dec(settings.rate_employer_health or 0.03),
+            rate_employer_unemployment=_dec(settings.rate_employer_unemployment or 0.01),
+            rate_union_fee=_dec(settings.rate_union_fee or 0.02),
+        )
+
+
+@dataclass
+class PayrollRunResult:
+    """Summary of one calculation run (used for period totals and audit log)"""
+    items_created: int = 0
+    total_gross: Decimal = ZERO
+    total_deductions: Decimal = ZERO
+    total_net: Decimal = ZERO
+    total_employer: Decimal = ZERO
+
+
+def night_hours_for(work_date: date, actual_start: Optional[datetime], actual_end: Optional[datetime]) -> Decimal:
+    """GAP-P1: Overlap of check-in/check-out with the 22:00 - 06:00 night window."""
+    if not actual_start or not actual_end:
+        return ZERO
+    night_start = datetime.combine(work_date, NIGHT_START)
+    night_end = datetime.combine(work_date + timedelta(days=1), NIGHT_END)
+    overlap_start = max(actual_start.replace(tzinfo=None), night_start)
+    overlap_end = min(actual_end.replace(tzinfo=None), night_end)
+    if overlap_end <= overlap_start:
+        return ZERO
+    night_delta = (overlap_end - overlap_start).total_seconds() / 3600
+    return Decimal(str(round(night_delta, 2)))
+
+
+def bucket_timesheet_hours(rows: Iterable[Sequence[Any]], holidays: Set[date]) -> Dict[UUID, HourBuckets]:
+    """
+    Split approved timesheet hours by pay type in one pass over all rows.
+
+    Each row is (employee_id, work_date, total_hours, overtime_hours, actual_start, actual_end),
+    i.e. exactly the column list fetched by load_period_timesheets().
+    """
+    buckets: Dict[UUID, HourBuckets] = defaultdict(HourBuckets)
+    for employee_id, work_date, total_hours, overtime_hours, actual_start, actual_end in rows:
+        b = buckets[employee_id]
+        hours = _dec(total_hours)
+        ts_ot = _dec(overtime_hours)  # GAP-P4: Use timesheet's own OT
+        b.work_dates.add(work_date)
+
+        if work_date in holidays:
+            b.holiday += hours
+        elif work_date.weekday() >= 5:  # Saturday=5, Sunday=6
+            b.weekend += hours
+        else:
+            # GAP-P4: manager-approved OT from timesheet editing is kept as-is
+            b.regular += hours - ts_ot if hours > ts_ot else hours
+            b.overtime += ts_ot
+
+        b.night += night_hours_for(work_date, actual_start, actual_end)
+    return buckets
+
+
+def compute_payroll_item(
+    emp: EmployeeModel,
+    hours: HourBuckets,
+    rates: PayrollRates,
+    advance_deduction: Decimal = ZERO,
+) -> Dict[str, Any]:
+    """
+    Compute pay, deductions and employer cost of one employee.
+
+    Returns the PayrollItem column values plus the '_gross' / '_deductions'
+    keys used for period totals (popped before insert).
+    """
+    # Hourly rate - employee's custom or derived from monthly salary
+    hourly_rate = emp.hourly_rate or ZERO
+    if emp.is_fulltime and not hourly_rate:
+        base = emp.base_salary if emp.base_salary else rates.default_base_salary
+        hourly_rate = base / rates.days_per_month / rates.hours_per_day
+
+    regular_pay = hours.regular * hourly_rate
+    overtime_pay = hours.overtime * hourly_rate * rates.multiplier_overtime
+    weekend_pay = hours.weekend * hourly_rate * rates.multiplier_weekend
+    holiday_pay = hours.holiday * hourly_rate * rates.multiplier_holiday
+    night_pay = hours.night * hourly_rate * rates.multiplier_night
+
+    # Allowances: employee-level if set, else tenant default (fulltime only)
+    if emp.is_fulltime:
+        allowance_meal = emp.allowance_meal if emp.allowance_meal is not None else rates.default_allowance_meal
+        allowance_transport = emp.allowance_transport if emp.allowance_transport is not None else rates.default_allowance_transport
+        allowance_phone = emp.allowance_phone if emp.allowance_phone is not None else rates.default_allowance_phone
+        allowance_other = emp.allowance_other if emp.allowance_other is not None else ZERO
+    else:
+        allowance_meal = allowance_transport = allowance_phone = allowance_other = ZERO
+
+    gross = (regular_pay + overtime_pay + weekend_pay + holiday_pay + night_pay
+             + allowance_meal + allowance_transport + allowance_phone + allowance_other)
+
+    # Insurance base: employee's insurance_salary_base if set, else gross
+    insurance_base = emp.insurance_salary_base if emp.insurance_salary_base is not None else gross
+
+    if emp.is_fulltime:
+        social_rate = emp.rate_social_override if emp.rate_social_override is not None else rates.rate_social
+        health_rate = emp.rate_health_override if emp.rate_health_override is not None else rates.rate_health
+        unemployment_rate = emp.rate_unemployment_override if emp.rate_unemployment_override is not None else rates.rate_unemployment
+        social_ins = insurance_base * social_rate
+        health_ins = insurance_base * health_rate
+        unemployment = insurance_base * unemployment_rate
+
+        employer_social = insurance_base * rates.rate_employer_social
+        employer_health = insurance_base * rates.rate_employer_health
+        employer_unemp = insurance_base * rates.rate_employer_unemployment
+        employer_union = insurance_base * rates.rate_union_fee
+    else:
+        social_ins = health_ins = unemployment = ZERO
+        employer_social = employer_health = employer_unemp = employer_union = ZERO
+
+    total_ded = social_ins + health_ins + unemployment + advance_deduction
+    net = gross - total_ded
+    employer_total_cost = employer_social + employer_health + employer_unemp + employer_union
+
+    if emp.base_salary:
+        base_salary = emp.base_salary
+    else:
+        base_salary = rates.default_base_salary if emp.is_fulltime else ZERO
+
+    # NOTE: gross_salary and total_deductions are GENERATED columns in DB,
+    # so they are not part of the insert payload
+    return {
+        "employee_id": emp.id,
+        "regular_hours": hours.regular,
+        "overtime_hours": hours.overtime,
+        "weekend_hours": hours.weekend,
+        "holiday_hours": hours.holiday,
+        "night_hours": hours.night,
+        "base_salary": base_salary,
+        "hourly_rate": hourly_rate,
+        "regular_pay": regular_pay,
+        "overtime_pay": overtime_pay,
+        "weekend_pay": weekend_pay,
+        "holiday_pay": holiday_pay,
+        "night_pay": night_pay,
+        "allowance_meal": allowance_meal,
+        "allowance_transport": allowance_transport,
+        "deduction_social_ins": social_ins,
+        "deduction_advance": advance_deduction,
+        "employer_social_ins": employer_social,
+        "employer_health_ins": employer_health,
+        "employer_unemployment": employer_unemp,
+        "employer_union_fee": employer_union,
+        "employer_total": employer_total_cost,
+        "net_salary": net,
+        "_gross": gross,
+        "_deductions": total_ded,
+    }
+
+
+def build_payroll_items(
+    employees: Iterable[EmployeeModel],
+    hours_by_employee: Dict[UUID, HourBuckets],
+    rates: PayrollRates,
+    advance_totals: Dict[UUID, Decimal],
+    tenant_id: UUID,
+    period_id: UUID,
+) -> Tuple[List[Dict[str, Any]], PayrollRunResult]:
+    """Compute insert payloads for all employees and accumulate the period totals."""
+    result = PayrollRunResult()
+    rows: List[Dict[str, Any]] = []
+    for emp in employees:
+        item = compute_payroll_item(
+            emp,
+            hours_by_employee.get(emp.id) or HourBuckets(),
+            rates,
+            advance_totals.get(emp.id, ZERO),
+        )
+        gross = item.pop("_gross")
+        total_ded = item.pop("_deductions")
+        item["tenant_id"] = tenant_id
+        item["period_id"] = period_id
+        rows.append(item)
+
+        result.items_created += 1
+        result.total_gross += gross
+        result.total_deductions += total_ded
+        result.total_net += item["net_salary"]
+        result.total_employer += item["employer_total"]
+    return rows, result
+
+
+class PayrollEngine:
+    """
+    Set-based payroll calculation for one tenant.
+
+    Round-trips per run are constant (employees, holidays, timesheets, advances,
+    delete, bulk insert, advance update) regardless of headcount.
+    """
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID):
+        self.db = db
+        self.tenant_id = tenant_id
+
+    async def load_period_timesheets(self, period: PayrollPeriodModel) -> List[Sequence[Any]]:
+        """All APPROVED timesheets of the period in one query, grouped by employee."""
+        result = await self.db.execute(
+            select(
+                TimesheetModel.employee_id,
+                TimesheetModel.work_date,
+                TimesheetModel.total_hours,
+                TimesheetModel.overtime_hours,
+                TimesheetModel.actual_start,
+                TimesheetModel.actual_end,
+            ).where(
+                TimesheetModel.tenant_id == self.tenant_id,
+                TimesheetModel.work_date >= period.start_date,
+                TimesheetModel.work_date <= period.end_date,
+                TimesheetModel.status == 'APPROVED'
+            ).order_by(TimesheetModel.employee_id, TimesheetModel.work_date)
+        )
+        return result.all()
+
+    async def load_holidays(self, period: PayrollPeriodModel) -> Set[date]:
+        result = await self.db.execute(
+            select(VietnamHolidayModel.holiday_date).where(
+                VietnamHolidayModel.tenant_id == self.tenant_id,
+                VietnamHolidayModel.holiday_date >= period.start_date,
+                VietnamHolidayModel.holiday_date <= period.end_date
+            )
+        )
+        return set(row[0] for row in result.all())
+
+    async def load_pending_advances(self) -> Tuple[Dict[UUID, Decimal], List[Any]]:
+        """BUG-1 FIX preserved: ALL paid-but-undeducted advances per employee are deducted."""
+        result = await self.db.execute(
+            select(SalaryAdvanceModel.id, SalaryAdvanceModel.employee_id, SalaryAdvanceModel.amount).where(
+                SalaryAdvanceModel.tenant_id == self.tenant_id,
+                SalaryAdvanceModel.status == 'PAID',
+                SalaryAdvanceModel.deducted_in_period == None
+            )
+        )
+        totals: Dict[UUID, Decimal] = defaultdict(lambda: ZERO)
+        advances: List[Any] = result.all()
+        for _, employee_id, amount in advances:
+            totals[employee_id] += _dec(amount)
+        return totals, advances
+
+    async def calculate(self, period: PayrollPeriodModel, settings: PayrollSettingsModel) -> PayrollRunResult:
+        """Recalculate every active employee's PayrollItem for the period (caller commits)."""
+        emp_result = await self.db.execute(
+            select(EmployeeModel).where(
+                EmployeeModel.tenant_id == self.tenant_id,
+                EmployeeModel.is_active == True
+            )
+        )
+        employees = emp_result.scalars().all()
+        active_ids = {emp.id for emp in employees}
+
+        holidays = await self.load_holidays(period)
+        hours_by_employee = bucket_timesheet_hours(await self.load_period_timesheets(period), holidays)
+        advance_totals, advances = await self.load_pending_advances()
+
+        # Delete existing items for recalculation
+        await self.db.execute(
+            delete(PayrollItemModel).where(PayrollItemModel.period_id == period.id)
+        )
+
+        rows, result = build_payroll_items(
+            employees, hours_by_employee, PayrollRates.from_settings(settings),
+            advance_totals, self.tenant_id, period.id,
+        )
+        if rows:
+            await self.db.execute(insert(PayrollItemModel), rows)
+
+        # Only advances of employees that got a payroll item are marked deducted
+        deducted_ids = [adv_id for adv_id, employee_id, _ in advances if employee_id in active_ids]
+        if deducted_ids:
+            await self.db.execute(
+                update(SalaryAdvanceModel)
+                .where(SalaryAdvanceModel.id.in_(deducted_ids))
+                .values(deducted_in_period=period.id, deducted_at=datetime.now(), status='DEDUCTED')
+                .execution_options(synchronize_session=False)
+            )
+        return result
+
+
+def get_payroll_engine(db: AsyncSession, tenant_id: UUID) -> PayrollEngine:
+    """Factory function for dependency injection"""
+    return PayrollEngine(db, tenant_id)
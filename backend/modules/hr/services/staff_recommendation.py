@@ -0,0 +1,228 @@
+"""
+Staff Recommendation Engine
+Backs GET /orders/{order_id}/suggest-staff (GAP-M3)
+
+Availability comes from the AvailabilityEngine matrix for the event day,
+so suggest-staff agrees with /hr/assignments/check-conflict and the HR
+availability calendar:
+- same-day conflicts across staff_assignments AND order_staff_assignments
+  (other orders only)
+- approved leave covering the event day
+The busy and on-leave employee ids are then passed to one SQL statement
+that computes, for every active employee of the tenant:
+- already assigned to this order (excluded)
+- workload (non-cancelled assignments created in the last N days)
+- score, ranking and top-K (ORDER BY ... LIMIT in SQL)
+
+The event day is a half-open window [day_start, day_end) in Vietnam time
+instead of date(event_date) casts, so orders(tenant_id, event_date) and
+the indexes of migration 076 can be used.
+
+Scoring (0-100, unchanged from the original endpoint):
+- base 50, fulltime +15, role filter match +10
+- workload 0: +20, 1-2: +10, >= 5: -10
+- unavailable (conflict or on leave): -30
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from decimal import Decimal
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.hr.services.availability_engine import VN_TIMEZONE, AvailabilityEngine, AvailabilityMatrix
+
+DEFAULT_WORKLOAD_DAYS = 7
+
+CONFLICT_REASON = "Đã có lịch cùng ngày"
+LEAVE_REASON = "Đang nghỉ phép"
+
+RECOMMEND_STAFF_SQL = text("""
+    WITH assigned AS (
+        SELECT sa.employee_id
+        FROM staff_assignments sa
+        WHERE sa.tenant_id = CAST(:tenant_id AS uuid)
+          AND sa.event_id = CAST(:order_id AS uuid)
+          AND sa.status <> 'CANCELLED'
+        UNION
+        -- order_staff_assignments.staff_id holds employees.id or users.id
+        SELECT e.id
+        FROM order_staff_assignments osa
+        JOIN employees e ON e.id = osa.staff_id OR e.user_id = osa.staff_id
+        WHERE osa.order_id = CAST(:order_id AS uuid)
+    ),
+    workload AS (
+        SELECT sa.employee_id, COUNT(*) AS n
+        FROM staff_assignments sa
+        WHERE sa.tenant_id = CAST(:tenant_id AS uuid)
+          AND sa.status <> 'CANCELLED'
+          AND sa.created_at >= CAST(:workload_since AS timestamptz)
+        GROUP BY sa.employee_id
+    ),
+    candidates AS (
+        SELECT e.id, e.full_name, COALESCE(e.role_type, 'STAFF') AS role_type, e.phone,
+               COALESCE(e.is_fulltime, false) AS is_fulltime,
+               COALESCE(e.hourly_rate, 0) AS hourly_rate,
+               COALESCE(w.n, 0) AS workload,
+               (e.id = ANY(CAST(:busy_ids AS uuid[]))) AS has_conflict,
+               (e.id = ANY(CAST(:leave_ids AS uuid[]))) AS on_leave
+        FROM employees e
+        LEFT JOIN workload w ON w.employee_id = e.id
+        WHERE e.tenant_id = CAST(:tenant_id AS uuid)
+          AND e.is_active = true
+          AND (CAST(:role_filter AS varchar) IS NULL OR e.role_type = CAST(:role_filter AS varchar))
+          AND NOT EXISTS (SELECT 1 FROM assigned a WHERE a.employee_id = e.id)
+    ),
+    scored AS (
+        SELECT c.*,
+               NOT (c.has_conflict OR c.on_leave) AS is_available,
+               GREATEST(0, LEAST(100,
+                   50
+                   + CASE WHEN c.is_fulltime THEN 15 ELSE 0 END
+                   + CASE WHEN c.workload = 0 THEN 20
+                          WHEN c.workload <= 2 THEN 10
+                          WHEN c.workload >= 5 THEN -10
+                          ELSE 0 END
+                   - CASE WHEN c.has_conflict OR c.on_leave THEN 30 ELSE 0 END
+                   + CASE WHEN CAST(:role_filter AS varchar) IS NOT NULL THEN 10 ELSE 0 END
+               )) AS score
+        FROM candidates c
+    )
+    SELECT s.id, s.full_name, s.role_type, s.phone, s.is_fulltime, s.hourly_rate,
+           s.workload, s.has_conflict, s.on_leave, s.is_available, s.score,
+           COUNT(*) FILTER (WHERE s.is_available) OVER () AS total_available,
+           (SELECT array_agg(DISTINCT role_type) FROM candidates) AS roles
+    FROM scored s
+    ORDER BY s.is_available DESC, s.score DESC, s.workload, s.full_name
+    LIMIT :limit
+""")
+
+
+@dataclass
+class StaffRecommendation:
+    employee_id: UUID
+    employee_name: str
+    role_type: str
+    phone: Optional[str]
+    is_fulltime: bool
+    hourly_rate: Decimal
+    workload: int
+    has_conflict: bool
+    on_leave: bool
+    is_available: bool
+    score: int
+
+    @property
+    def conflict_reason(self) -> Optional[str]:
+        if self.has_conflict:
+            return CONFLICT_REASON
+        if self.on_leave:
+            return LEAVE_REASON
+        return None
+
+
+@dataclass
+class StaffRecommendationResult:
+    suggestions: List[StaffRecommendation] = field(default_factory=list)
+    total_available: int = 0
+    roles: List[str] = field(default_factory=list)
+
+
+def event_day_window(event_date) -> Tuple[Optional[date], Optional[datetime], Optional[datetime]]:
+    """
+    Local (Vietnam) calendar day of an event and its half-open UTC window.
+    Naive datetimes are taken as local time. Returns (None, None, None) without a date.
+    """
+    if event_date is None:
+        return None, None, None
+    if isinstance(event_date, datetime):
+        local = event_date.replace(tzinfo=VN_TIMEZONE) if event_date.tzinfo is None else event_date.astimezone(VN_TIMEZONE)
+        day = local.date()
+    else:
+        day = event_date
+    day_start = datetime.combine(day, dt_time.min, VN_TIMEZONE)
+    return day, day_start, day_start + timedelta(days=1)
+
+
+def unavailable_employees(matrix: AvailabilityMatrix, day: date, order_id: UUID) -> Tuple[List[UUID], List[UUID]]:
+    """-> (employees busy with another order or shift that day, employees on leave)"""
+    busy: List[UUID] = []
+    on_leave: List[UUID] = []
+    for employee_id in matrix.employees:
+        shifts, leaves = matrix.day_conflicts(employee_id, day, exclude_order_id=order_id)
+        if shifts:
+            busy.append(employee_id)
+        if leaves:
+            on_leave.append(employee_id)
+    return busy, on_leave
+
+
+class StaffRecommendationEngine:
+    """Rank employees for an order: matrix availability, scoring and top-K in one indexed query"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID):
+        self.db = db
+        self.tenant_id = tenant_id
+
+    async def recommend(
+        self,
+        order_id: UUID,
+        event_date,
+        role_filter: Optional[str] = None,
+        limit: int = 10,
+        workload_days: int = DEFAULT_WORKLOAD_DAYS,
+        now: Optional[datetime] = None,
+        matrix: Optional[AvailabilityMatrix] = None,
+    ) -> StaffRecommendationResult:
+        event_day, _, _ = event_day_window(event_date)
+        now = now or datetime.now(timezone.utc)
+        busy_ids: List[UUID] = []
+        leave_ids: List[UUID] = []
+        if event_day is not None:
+            # Without an event date nobody can clash
+            if matrix is None:
+                matrix = await AvailabilityEngine(self.db, self.tenant_id).load(event_day, role_type=role_filter)
+            busy_ids, leave_ids = unavailable_employees(matrix, event_day, order_id)
+
+        result = await self.db.execute(RECOMMEND_STAFF_SQL, {
+            "tenant_id": str(self.tenant_id),
+            "order_id": str(order_id),
+            "busy_ids": busy_ids,
+            "leave_ids": leave_ids,
+            "workload_since": now - timedelta(days=workload_days),
+            "role_filter": role_filter,
+            "limit": limit,
+        })
+        rows = result.fetchall()
+        if not rows:
+            return StaffRecommendationResult()
+
+        suggestions = [
+            StaffRecommendation(
+                employee_id=r.id,
+                employee_name=r.full_name,
+                role_type=r.role_type,
+                phone=r.phone,
+                is_fulltime=r.is_fulltime,
+                hourly_rate=Decimal(r.hourly_rate or 0),
+                workload=int(r.workload),
+                has_conflict=r.has_conflict,
+                on_leave=r.on_leave,
+                is_available=r.is_available,
+                score=int(r.score),
+            )
+            for r in rows
+        ]
+        return StaffRecommendationResult(
+            suggestions=suggestions,
+            total_available=int(rows[0].total_available),
+            roles=sorted(rows[0].roles or []),
+        )
+
+
+def get_staff_recommendation_engine(db: AsyncSession, tenant_id: UUID) -> StaffRecommendationEngine:
+    """Factory function for dependency injection"""
+    return StaffRecommendationEngine(db, tenant_id)
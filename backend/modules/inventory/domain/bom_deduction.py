@@ -0,0 +1,194 @@
+"""
+Bill of Materials Deduction - batched recipe explosion + stock/lot deduction
+
+Used by complete_order (order module) and prepare_materials (inventory).
+The number of statements is fixed regardless of how many dishes or
+ingredients an order has:
+
+1. one recipes query for all menu items of the order (explode_order_items)
+2. one inventory_items query (names, existence)
+3. one ordered FOR UPDATE over the affected stock rows
+4. one UPDATE ... FROM unnest() for all stock rows
+5. one UPDATE for all FIFO lots (StockLedger.consume_fifo_lots_many)
+6. one bulk INSERT of the EXPORT transactions
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.inventory.domain.models import InventoryItemModel, InventoryTransactionModel
+from backend.modules.inventory.domain.stock_ledger import LotConsumption, StockLedger, weighted_unit_cost
+from backend.modules.menu.domain.models import RecipeModel
+
+
+@dataclass
+class MaterialDeductionLine:
+    """Outcome for one ingredient"""
+    item_id: UUID
+    item_name: str
+    requested: Decimal
+    deducted: Decimal = Decimal(0)
+    unit_cost: Optional[Decimal] = None
+    lots: List[LotConsumption] = field(default_factory=list)
+    transaction_id: Optional[UUID] = None
+    found: bool = True
+
+    @property
+    def shortfall(self) -> Decimal:
+        return max(Decimal(0), self.requested - self.deducted)
+
+    @property
+    def cogs(self) -> Decimal:
+        return (self.unit_cost or Decimal(0)) * self.deducted
+
+
+@dataclass
+class MaterialDeductionResult:
+    lines: List[MaterialDeductionLine]
+
+    @property
+    def shortfalls(self) -> List[MaterialDeductionLine]:
+        return [line for line in self.lines if line.shortfall > 0]
+
+    @property
+    def deducted_count(self) -> int:
+        return sum(1 for line in self.lines if line.deducted > 0)
+
+    @property
+    def total_cogs(self) -> Decimal:
+        return sum((line.cogs for line in self.lines), Decimal(0))
+
+
+def aggregate_recipe_requirements(order_items: Iterable, recipes: Iterable) -> Dict[UUID, Decimal]:
+    """
+    Sum required quantity per ingredient:
+    order_item.quantity * recipe.quantity_per_unit over every recipe line of its menu item.
+    """
+    recipes_by_menu_item: Dict[UUID, list] = {}
+    for recipe in recipes:
+        recipes_by_menu_item.setdefault(recipe.menu_item_id, []).append(recipe)
+
+    required: Dict[UUID, Decimal] = {}
+    for order_item in order_items:
+        if not order_item.menu_item_id:
+            continue
+        portions = Decimal(str(order_item.quantity or 0))
+        for recipe in recipes_by_menu_item.get(order_item.menu_item_id, []):
+            qty = portions * Decimal(str(recipe.quantity_per_unit or 0))
+            if qty > 0:
+                required[recipe.ingredient_id] = required.get(recipe.ingredient_id, Decimal(0)) + qty
+    return required
+
+
+class BillOfMaterialsService:
+    """Explode order dishes into ingredients and deduct them in bulk"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.ledger = StockLedger(db, tenant_id)
+
+    async def explode_order_items(self, order_items: Iterable) -> Dict[UUID, Decimal]:
+        """Load all recipes of the order's menu items in one query and aggregate per ingredient."""
+        order_items = list(order_items)
+        menu_item_ids = {oi.menu_item_id for oi in order_items if oi.menu_item_id}
+        if not menu_item_ids:
+            return {}
+        result = await self.db.execute(
+            select(RecipeModel.menu_item_id, RecipeModel.ingredient_id, RecipeModel.quantity_per_unit)
+            .where(
+                RecipeModel.tenant_id == self.tenant_id,
+                RecipeModel.menu_item_id.in_(menu_item_ids),
+            )
+        )
+        return aggregate_recipe_requirements(order_items, result.all())
+
+    async def deduct(
+        self,
+        warehouse_id: UUID,
+        requirements: Dict[UUID, Decimal],
+        reference_doc: Optional[str] = None,
+        notes: Optional[str] = None,
+        allow_partial: bool = True,
+    ) -> MaterialDeductionResult:
+        """
+        Deduct required quantities from one warehouse with FIFO lots.
+
+        allow_partial=True deducts whatever is available (prepare_materials);
+        False skips an ingredient entirely when stock does not cover it
+        (complete_order). Either way the shortfall is reported per line.
+        The caller commits.
+        """
+        requirements = {k: Decimal(v) for k, v in requirements.items() if v and v > 0}
+        if not requirements:
+            return MaterialDeductionResult(lines=[])
+
+        names_result = await self.db.execute(
+            select(InventoryItemModel.id, InventoryItemModel.name).where(
+                InventoryItemModel.tenant_id == self.tenant_id,
+                InventoryItemModel.id.in_(list(requirements)),
+            )
+        )
+        names = {row.id: row.name for row in names_result}
+
+        lines: Dict[UUID, MaterialDeductionLine] = {}
+        for item_id, qty in requirements.items():
+            found = item_id in names
+            lines[item_id] = MaterialDeductionLine(
+                item_id=item_id,
+                item_name=names[item_id] if found else f"Unknown ({str(item_id)[:8]})",
+                requested=qty,
+                found=found,
+            )
+
+        available = await self.ledger.lock_stock_rows((item_id, warehouse_id) for item_id in names)
+
+        to_issue: Dict[UUID, Decimal] = {}
+        for item_id in names:
+            requested = requirements[item_id]
+            on_hand = available.get((item_id, warehouse_id), Decimal(0))
+            take = min(requested, on_hand) if allow_partial else (requested if on_hand >= requested else Decimal(0))
+            if take > 0:
+                to_issue[item_id] = take
+
+        issued = await self.ledger.issue_many(warehouse_id, to_issue)
+        issued_qty = {item_id: to_issue[item_id] for item_id in issued}
+        lots_by_item = await self.ledger.consume_fifo_lots_many(warehouse_id, issued_qty)
+
+        now = datetime.utcnow()
+        txn_rows = []
+        for item_id, qty in issued_qty.items():
+            line = lines[item_id]
+            line.deducted = qty
+            line.lots = lots_by_item.get(item_id, [])
+            line.unit_cost = weighted_unit_cost(line.lots)
+            line.transaction_id = uuid4()
+            txn_rows.append({
+                "id": line.transaction_id,
+                "tenant_id": self.tenant_id,
+                "item_id": item_id,
+                "warehouse_id": warehouse_id,
+                "lot_id": line.lots[0].lot_id if line.lots else None,
+                "transaction_type": "EXPORT",
+                "quantity": qty,
+                "unit_price": line.unit_cost,
+                "reference_doc": reference_doc,
+                "notes": notes,
+                "is_reversed": False,
+                "created_at": now,
+            })
+        if txn_rows:
+            await self.db.execute(insert(InventoryTransactionModel), txn_rows)
+
+        return MaterialDeductionResult(lines=list(lines.values()))
+
+
+def get_bom_service(db: AsyncSession, tenant_id: UUID) -> BillOfMaterialsService:
+    """Factory function for dependency injection"""
+    return BillOfMaterialsService(db, tenant_id)
@@ -50,6 +50,9 @@ class InventoryItemModel(Base):
 
 class InventoryStockModel(Base):
     __tablename__ = "inventory_stock"
+    __table_args__ = (
+        UniqueConstraint('item_id', 'warehouse_id', name='uq_stock_item_warehouse'),  # ON CONFLICT target
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     tenant_id = Column(UUID(as_uuid=True), nullable=False)
@@ -86,6 +89,7 @@ class InventoryTransactionModel(Base):
     reverses_txn_id = Column(UUID(as_uuid=True), nullable=True)
     
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # migration 087
 
 
 class InventoryLotModel(Base):
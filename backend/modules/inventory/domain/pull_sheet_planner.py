@@ -0,0 +1,330 @@
+"""
+Pull Sheet Planner - batched recipe explosion + FIFO lot picking
+Backs GET /orders/{order_id}/pull-sheet and GET /orders/pull-sheets/daily
+
+The number of statements is fixed regardless of how many orders, dishes,
+ingredients or lots are involved:
+
+1. one order_items LEFT JOIN recipes query for all orders (explode)
+2. one inventory_lots query for all ingredients, in FIFO (expiry) order
+3. only when some dish has no recipe: one EXISTS over inventory_items
+4. warehouse names from a per-tenant cache (one query on a miss)
+
+Picks are allocated in memory from one shared pool of lots, so when
+several dishes - or several orders on the same day - use the same
+ingredient, a lot is never booked twice. Orders are served in event
+order, dishes in their sort order.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.inventory.domain.models import InventoryItemModel, InventoryLotModel, WarehouseModel
+from backend.modules.menu.domain.models import RecipeModel
+from backend.modules.order.domain.models import OrderItemModel
+
+WAREHOUSE_CACHE_TTL = float(os.getenv("WAREHOUSE_CACHE_TTL", 300))
+DEFAULT_WAREHOUSE_NAME = "Kho chính"
+
+STATUS_SUFFICIENT = "SUFFICIENT"
+STATUS_INSUFFICIENT = "INSUFFICIENT"
+STATUS_NOT_LINKED = "NOT_LINKED"
+
+
+# ============ RESULT TYPES ============
+
+@dataclass
+class LotPick:
+    lot_id: UUID
+    lot_number: str
+    expiry_date: Optional[datetime]
+    available_qty: Decimal  # remaining in the lot before this pick
+    to_pick_qty: Decimal
+
+
+@dataclass
+class PullLine:
+    order_id: UUID
+    inventory_item_id: Optional[UUID]
+    item_name: str
+    quantity_needed: Decimal
+    uom: str
+    warehouse: Optional[str]
+    status: str
+    lots: List[LotPick] = field(default_factory=list)
+    shortfall: Optional[Decimal] = None
+
+
+@dataclass
+class IngredientTotal:
+    """One ingredient across every line of the plan"""
+    inventory_item_id: UUID
+    item_name: str
+    uom: str
+    quantity_needed: Decimal = Decimal(0)
+    quantity_picked: Decimal = Decimal(0)
+    order_ids: List[UUID] = field(default_factory=list)
+
+    @property
+    def shortfall(self) -> Decimal:
+        return max(Decimal(0), self.quantity_needed - self.quantity_picked)
+
+
+@dataclass
+class OrderPullPlan:
+    order_id: UUID
+    lines: List[PullLine] = field(default_factory=list)
+
+    def count(self, status: str) -> int:
+        return sum(1 for line in self.lines if line.status == status)
+
+
+@dataclass
+class PullSheetPlan:
+    orders: List[OrderPullPlan]
+    ingredients: List[IngredientTotal]
+
+    def for_order(self, order_id: UUID) -> OrderPullPlan:
+        return next(plan for plan in self.orders if plan.order_id == order_id)
+
+
+# ============ IN-MEMORY FIFO POOL ============
+
+@dataclass
+class _Lot:
+    id: UUID
+    lot_number: str
+    expiry_date: Optional[datetime]
+    warehouse_id: UUID
+    remaining: Decimal
+
+
+class LotPool:
+    """Candidate lots per ingredient in FIFO order; picks deplete the shared pool"""
+
+    def __init__(self, lots: Iterable[Any]):
+        self._lots: Dict[UUID, List[_Lot]] = defaultdict(list)
+        for lot in lots:
+            self._lots[lot.item_id].append(_Lot(
+                id=lot.id, lot_number=lot.lot_number, expiry_date=lot.expiry_date,
+                warehouse_id=lot.warehouse_id, remaining=Decimal(lot.remaining_quantity),
+            ))
+
+    def __bool__(self) -> bool:
+        return bool(self._lots)
+
+    def pick(self, item_id: UUID, quantity: Decimal) -> Tuple[List[LotPick], Optional[UUID], Decimal]:
+        """FIFO picks for quantity -> (picks, warehouse of the first lot, shortfall)."""
+        lots = self._lots.get(item_id, [])
+        warehouse_id = lots[0].warehouse_id if lots else None
+        picks: List[LotPick] = []
+        need = quantity
+        while need > 0 and lots:
+            lot = lots[0]
+            take = min(lot.remaining, need)
+            picks.append(LotPick(lot.id, lot.lot_number, lot.expiry_date, lot.remaining, take))
+            lot.remaining -= take
+            need -= take
+            if lot.remaining <= 0:
+                lots.pop(0)
+        return picks, warehouse_id, need
+
+
+# ============ WAREHOUSE NAME CACHE ============
+
+class WarehouseNameCache:
+    """Thread-safe per-tenant {warehouse_id: name} with TTL"""
+
+    def __init__(self, ttl: float = WAREHOUSE_CACHE_TTL):
+        self.ttl = ttl
+        self._data: Dict[str, Tuple[Dict[UUID, str], float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, tenant_id: Any) -> Optional[Dict[UUID, str]]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            cached = self._data.get(str(tenant_id))
+            if cached is None or cached[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return cached[0]
+
+    def put(self, tenant_id: Any, names: Dict[UUID, str]) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[str(tenant_id)] = (names, time.monotonic() + self.ttl)
+
+    def invalidate(self, tenant_id: Any) -> None:
+        with self._lock:
+            self._data.pop(str(tenant_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# Process-wide singleton
+warehouse_name_cache = WarehouseNameCache()
+
+
+@event.listens_for(WarehouseModel, "after_insert")
+@event.listens_for(WarehouseModel, "after_update")
+@event.listens_for(WarehouseModel, "after_delete")
+def _invalidate_on_warehouse_write(mapper, connection, target):
+    warehouse_name_cache.invalidate(target.tenant_id)
+
+
+# ============ PLANNER ============
+
+class PullSheetPlanner:
+    """Plan inventory picks for one or more orders with a fixed number of queries"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID, warehouse_cache: WarehouseNameCache = warehouse_name_cache):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.warehouse_cache = warehouse_cache
+
+    async def explode(self, order_ids: Sequence[UUID]) -> list:
+        """Order lines joined to their recipe lines (NULL ingredient = no recipe)."""
+        result = await self.db.execute(
+            select(
+                OrderItemModel.order_id, OrderItemModel.id.label("order_item_id"),
+                OrderItemModel.item_name, OrderItemModel.quantity, OrderItemModel.uom,
+                OrderItemModel.menu_item_id,
+                RecipeModel.ingredient_id, RecipeModel.ingredient_name,
+                RecipeModel.quantity_per_unit, RecipeModel.uom.label("recipe_uom"),
+            )
+            .outerjoin(RecipeModel, (RecipeModel.menu_item_id == OrderItemModel.menu_item_id)
+                       & (RecipeModel.tenant_id == self.tenant_id))
+            .where(OrderItemModel.order_id.in_(list(order_ids)))
+            .order_by(
+                OrderItemModel.order_id, OrderItemModel.sort_order, OrderItemModel.created_at,
+                OrderItemModel.id, RecipeModel.created_at, RecipeModel.id,
+            )
+        )
+        return result.all()
+
+    async def load_lots(self, ingredient_ids: Iterable[UUID]) -> list:
+        ingredient_ids = list(set(ingredient_ids))
+        if not ingredient_ids:
+            return []
+        result = await self.db.execute(
+            select(
+                InventoryLotModel.id, InventoryLotModel.item_id, InventoryLotModel.lot_number,
+                InventoryLotModel.expiry_date, InventoryLotModel.warehouse_id,
+                InventoryLotModel.remaining_quantity,
+            )
+            .where(
+                InventoryLotModel.tenant_id == self.tenant_id,
+                InventoryLotModel.item_id.in_(ingredient_ids),
+                InventoryLotModel.status == 'ACTIVE',
+                InventoryLotModel.remaining_quantity > 0,
+            )
+            # FIFO by expiry (NULLs last, as before), then oldest receipt
+            .order_by(InventoryLotModel.item_id, InventoryLotModel.expiry_date.asc(),
+                      InventoryLotModel.received_date, InventoryLotModel.id)
+        )
+        return result.all()
+
+    async def has_inventory_items(self) -> bool:
+        result = await self.db.execute(
+            select(exists().where(
+                InventoryItemModel.tenant_id == self.tenant_id,
+                InventoryItemModel.is_active == True,
+            ))
+        )
+        return bool(result.scalar())
+
+    async def warehouse_names(self) -> Dict[UUID, str]:
+        names = self.warehouse_cache.get(self.tenant_id)
+        if names is None:
+            result = await self.db.execute(
+                select(WarehouseModel.id, WarehouseModel.name).where(WarehouseModel.tenant_id == self.tenant_id)
+            )
+            names = {row.id: row.name for row in result}
+            self.warehouse_cache.put(self.tenant_id, names)
+        return names
+
+    async def plan(self, order_ids: Sequence[UUID]) -> PullSheetPlan:
+        """
+        order_ids in allocation priority (earliest event first); each order
+        gets its lines, the totals cover all of them.
+        """
+        order_ids = list(dict.fromkeys(order_ids))
+        rows = await self.explode(order_ids) if order_ids else []
+        rows_by_order: Dict[UUID, list] = defaultdict(list)
+        for row in rows:
+            rows_by_order[row.order_id].append(row)
+
+        pool = LotPool(await self.load_lots(r.ingredient_id for r in rows if r.ingredient_id))
+        warehouses = await self.warehouse_names() if pool else {}
+        any_inventory: Optional[bool] = None
+
+        plans: List[OrderPullPlan] = []
+        totals: Dict[UUID, IngredientTotal] = {}
+        for order_id in order_ids:
+            plan = OrderPullPlan(order_id=order_id)
+            for row in rows_by_order.get(order_id, []):
+                portions = Decimal(row.quantity or 1)
+
+                if row.ingredient_id is None:
+                    # Dish without recipe: NOT_LINKED, wording depends on whether inventory exists at all
+                    if any_inventory is None:
+                        any_inventory = await self.has_inventory_items()
+                    plan.lines.append(PullLine(
+                        order_id=order_id,
+                        inventory_item_id=row.menu_item_id if any_inventory else None,
+                        item_name=f"{row.item_name} (chưa có công thức)" if any_inventory else row.item_name,
+                        quantity_needed=portions,
+                        uom=row.uom or "bàn",
+                        warehouse="Cần thiết lập Recipe" if any_inventory else None,
+                        status=STATUS_NOT_LINKED,
+                    ))
+                    continue
+
+                needed = Decimal(row.quantity_per_unit or 0) * portions
+                picks, warehouse_id, shortfall = pool.pick(row.ingredient_id, needed)
+                plan.lines.append(PullLine(
+                    order_id=order_id,
+                    inventory_item_id=row.ingredient_id,
+                    item_name=f"{row.ingredient_name} (cho {row.item_name})",
+                    quantity_needed=needed,
+                    uom=row.recipe_uom,
+                    warehouse=warehouses.get(warehouse_id, DEFAULT_WAREHOUSE_NAME),
+                    status=STATUS_SUFFICIENT if shortfall <= 0 else STATUS_INSUFFICIENT,
+                    lots=picks,
+                    shortfall=shortfall if shortfall > 0 else None,
+                ))
+
+                total = totals.get(row.ingredient_id)
+                if total is None:
+                    total = totals[row.ingredient_id] = IngredientTotal(
+                        inventory_item_id=row.ingredient_id, item_name=row.ingredient_name, uom=row.recipe_uom,
+                    )
+                total.quantity_needed += needed
+                total.quantity_picked += needed - shortfall
+                if order_id not in total.order_ids:
+                    total.order_ids.append(order_id)
+            plans.append(plan)
+
+        return PullSheetPlan(orders=plans, ingredients=list(totals.values()))
+
+
+def get_pull_sheet_planner(db: AsyncSession, tenant_id: UUID) -> PullSheetPlanner:
+    """Factory function for dependency injection"""
+    return PullSheetPlanner(db, tenant_id)
@@ -1,5 +1,4 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, asc
 from uuid import UUID
 from typing import Optional
 from decimal import Decimal
@@ -7,9 +6,11 @@ from datetime import datetime
 from fastapi import HTTPException
 
 from backend.modules.inventory.domain.models import (
-    InventoryItemModel, InventoryStockModel, InventoryTransactionModel, InventoryLotModel
+    InventoryItemModel, InventoryTransactionModel, InventoryLotModel
 )
 from backend.modules.inventory.domain.entities import InventoryTransactionBase
+from backend.modules.inventory.domain.stock_ledger import StockLedger, weighted_unit_cost
+from backend.modules.menu.domain.recipe_costing import invalidate_recipe_costs
 
 
 class InventoryService:
@@ -40,35 +41,23 @@ class InventoryService:
         if not item:
             raise HTTPException(status_code=404, detail=f"Item not found: {data.item_id}")
 
-        # 2. Update Stock (Upsert)
-        stmt = select(InventoryStockModel).where(
-            InventoryStockModel.item_id == data.item_id,
-            InventoryStockModel.warehouse_id == data.warehouse_id
-        )
-        result = await db.execute(stmt)
-        stock = result.scalar_one_or_none()
-        
-        if not stock:
-            stock = InventoryStockModel(
-                tenant_id=tenant_id,
-                item_id=data.item_id,
-                warehouse_id=data.warehouse_id,
-                quantity=0
-            )
-            db.add(stock)
+        # 2. Update Stock atomically (see StockLedger: conditional UPDATE / upsert
+        #    with RETURNING, so concurrent movements cannot oversell or lose updates)
+        ledger = StockLedger(db, tenant_id)
         
         # Track lot_id for linking transaction to lot
         linked_lot_id = None
         
-        # Calculate new quantity
         if data.transaction_type == "IMPORT":
-            stock.quantity += data.quantity
+            await ledger.receive(data.item_id, data.warehouse_id, data.quantity)
             # Update latest price if provided (either from DTO or explicit arg)
             price_to_update = unit_price or (data.unit_price if hasattr(data, 'unit_price') else None)
             
             if price_to_update and price_to_update > 0:
                 item.latest_purchase_price = price_to_update
                 item.cost_price = price_to_update
+                # Recipe food costs are priced from cost_price
+                invalidate_recipe_costs(tenant_id)
 
             # ========================================
             # AUTO-CREATE LOT ON IMPORT
@@ -100,57 +89,25 @@ class InventoryService:
                 linked_lot_id = new_lot.id
                 
         elif data.transaction_type == "EXPORT":
-            if stock.quantity < data.quantity:
-                 raise HTTPException(status_code=400, detail=f"Insufficient stock for item {item.name}. Current: {stock.quantity}")
-            stock.quantity -= data.quantity
+            # Check-and-decrement in one statement; the stock row stays locked
+            # until commit, which also serializes the lot deduction below
+            if await ledger.issue(data.item_id, data.warehouse_id, data.quantity) is None:
+                current = await ledger.current_quantity(data.item_id, data.warehouse_id)
+                raise HTTPException(status_code=400, detail=f"Insufficient stock for item {item.name}. Current: {current}")
 
             # ========================================
             # AUTO-DEDUCT LOTS (FIFO) ON EXPORT
             # ========================================
             if auto_deduct_lots:
-                remaining_to_deduct = data.quantity
-                
-                # Get active lots ordered by received_date ASC (FIFO)
-                fifo_stmt = select(InventoryLotModel).where(
-                    InventoryLotModel.tenant_id == tenant_id,
-                    InventoryLotModel.item_id == data.item_id,
-                    InventoryLotModel.warehouse_id == data.warehouse_id,
-                    InventoryLotModel.status == 'ACTIVE',
-                    InventoryLotModel.remaining_quantity > 0
-                ).order_by(asc(InventoryLotModel.received_date))
-                
-                fifo_result = await db.execute(fifo_stmt)
-                lots = fifo_result.scalars().all()
-                
-                # Track cost for weighted average COGS (FIX-2: GAP-5.1)
-                total_cost = Decimal(0)
-                total_qty_deducted = Decimal(0)
+                consumptions = await ledger.consume_fifo_lots(data.item_id, data.warehouse_id, data.quantity)
                 
-                for lot in lots:
-                    if remaining_to_deduct <= 0:
-                        break
-                    
-                    deduct_from_lot = min(lot.remaining_quantity, remaining_to_deduct)
-                    lot.remaining_quantity -= deduct_from_lot
-                    remaining_to_deduct -= deduct_from_lot
-                    
-                    # Accumulate actual lot cost for COGS
-                    lot_unit_cost = Decimal(str(lot.unit_cost or 0))
-                    total_cost += lot_unit_cost * deduct_from_lot
-                    total_qty_deducted += deduct_from_lot
-                    
-                    # Mark as DEPLETED if fully consumed
-                    if lot.remaining_quantity <= 0:
-                        lot.status = 'DEPLETED'
-                    
-                    # Link transaction to the first lot used
-                    if linked_lot_id is None:
-                        linked_lot_id = lot.id
+                # Link transaction to the first lot used
+                if consumptions:
+                    linked_lot_id = consumptions[0].lot_id
                 
-                # Calculate weighted average COGS from actual lot costs
-                if total_qty_deducted > 0:
-                    weighted_avg_cost = total_cost / total_qty_deducted
-                    # Use actual lot cost instead of static item.cost_price
+                # Weighted average COGS from actual lot costs (FIX-2: GAP-5.1)
+                weighted_avg_cost = weighted_unit_cost(consumptions)
+                if weighted_avg_cost is not None:
                     unit_price = weighted_avg_cost
         
         # 3. Create Transaction Record
@@ -0,0 +1,238 @@
+"""
+Stock Ledger - atomic stock movements for inventory_stock / inventory_lots
+
+Every movement is a single conditional statement, so concurrent callers
+(complete_order, prepare_materials, goods receipts, manual exports) can
+neither oversell nor lose updates:
+
+- receive(): INSERT ... ON CONFLICT (item_id, warehouse_id) DO UPDATE
+  SET quantity = quantity + :q RETURNING quantity
+- issue():   UPDATE ... SET quantity = quantity - :q
+  WHERE quantity >= :q RETURNING quantity  (no row = insufficient stock)
+- consume_fifo_lots(): one UPDATE ... FROM (locked lots + running SUM window)
+- issue_many() / consume_fifo_lots_many(): the same for many items at once
+  (bill-of-materials deduction, see bom_deduction.py)
+
+Lock order is always stock row -> lots of that stock row. Callers that move
+several items in one transaction should call lock_stock_rows() first: it
+locks all rows in (item_id, warehouse_id) order so two transactions
+touching the same items cannot deadlock.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.inventory.domain.models import InventoryStockModel
+
+StockKey = Tuple[UUID, UUID]  # (item_id, warehouse_id)
+
+
+@dataclass
+class LotConsumption:
+    lot_id: UUID
+    quantity: Decimal
+    unit_cost: Decimal
+    fifo_rank: int
+    lot_number: Optional[str] = None
+    remaining_quantity: Optional[Decimal] = None
+    status: Optional[str] = None
+
+
+# Lock the active lots of the requested items (FOR UPDATE cannot be combined
+# with window functions, hence the separate CTE), compute how much of each
+# item's requested quantity every lot covers in FIFO order, and deduct them
+# all in one UPDATE.
+CONSUME_FIFO_LOTS_SQL = text("""
+    WITH req AS (
+        SELECT r.item_id, r.quantity
+        FROM unnest(CAST(:item_ids AS uuid[]), CAST(:quantities AS numeric[])) AS r(item_id, quantity)
+    ),
+    locked AS (
+        SELECT l.id, l.item_id, l.remaining_quantity, l.unit_cost, l.received_date
+        FROM inventory_lots l
+        JOIN req ON req.item_id = l.item_id
+        WHERE l.tenant_id = CAST(:tenant_id AS uuid)
+          AND l.warehouse_id = CAST(:warehouse_id AS uuid)
+          AND l.status = 'ACTIVE'
+          AND l.remaining_quantity > 0
+        ORDER BY l.item_id, l.received_date, l.id
+        FOR UPDATE OF l
+    ),
+    ranked AS (
+        SELECT id, item_id, remaining_quantity, unit_cost,
+               ROW_NUMBER() OVER fifo AS fifo_rank,
+               SUM(remaining_quantity) OVER fifo - remaining_quantity AS consumed_before
+        FROM locked
+        WINDOW fifo AS (PARTITION BY item_id ORDER BY received_date, id
+                        ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW)
+    ),
+    take AS (
+        SELECT ranked.id, ranked.fifo_rank, COALESCE(ranked.unit_cost, 0) AS unit_cost,
+               LEAST(ranked.remaining_quantity, req.quantity - ranked.consumed_before) AS taken
+        FROM ranked
+        JOIN req ON req.item_id = ranked.item_id
+        WHERE ranked.consumed_before < req.quantity
+    )
+    UPDATE inventory_lots l
+    SET remaining_quantity = l.remaining_quantity - take.taken,
+        status = CASE WHEN l.remaining_quantity - take.taken <= 0 THEN 'DEPLETED' ELSE l.status END,
+        updated_at = NOW()
+    FROM take
+    WHERE l.id = take.id
+    RETURNING l.id, l.item_id, take.taken, take.unit_cost, take.fifo_rank,
+              l.lot_number, l.remaining_quantity, l.status
+""")
+
+# Decrement several stock rows of one warehouse; rows without enough stock
+# are left untouched and simply not returned.
+ISSUE_MANY_SQL = text("""
+    UPDATE inventory_stock s
+    SET quantity = s.quantity - r.quantity,
+        updated_at = NOW()
+    FROM unnest(CAST(:item_ids AS uuid[]), CAST(:quantities AS numeric[])) AS r(item_id, quantity)
+    WHERE s.item_id = r.item_id
+      AND s.warehouse_id = CAST(:warehouse_id AS uuid)
+      AND s.quantity >= r.quantity
+    RETURNING s.item_id, s.quantity
+""")
+
+
+def _ordered(quantities: Dict[UUID, Decimal]) -> Tuple[List[str], List[Decimal]]:
+    items = sorted(quantities, key=str)
+    return [str(i) for i in items], [quantities[i] for i in items]
+
+
+def weighted_unit_cost(consumptions: List[LotConsumption]) -> Optional[Decimal]:
+    """Weighted average cost of the consumed lots (None if nothing was consumed)."""
+    total_qty = sum((c.quantity for c in consumptions), Decimal(0))
+    if total_qty <= 0:
+        return None
+    total_cost = sum((c.unit_cost * c.quantity for c in consumptions), Decimal(0))
+    return total_cost / total_qty
+
+
+class StockLedger:
+    """Atomic stock movements of one tenant"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID):
+        self.db = db
+        self.tenant_id = tenant_id
+
+    async def lock_stock_rows(self, keys: Iterable[StockKey]) -> Dict[StockKey, Decimal]:
+        """
+        Lock the stock rows of several items in deterministic order (FOR UPDATE).
+        Returns current quantities; missing rows are simply absent.
+        """
+        ordered = sorted(set(keys), key=lambda k: (str(k[0]), str(k[1])))
+        if not ordered:
+            return {}
+        result = await self.db.execute(
+            select(InventoryStockModel.item_id, InventoryStockModel.warehouse_id, InventoryStockModel.quantity)
+            .where(tuple_(InventoryStockModel.item_id, InventoryStockModel.warehouse_id).in_(ordered))
+            .order_by(InventoryStockModel.item_id, InventoryStockModel.warehouse_id)
+            .with_for_update()
+        )
+        return {(r.item_id, r.warehouse_id): Decimal(r.quantity or 0) for r in result}
+
+    async def receive(self, item_id: UUID, warehouse_id: UUID, quantity: Decimal) -> Decimal:
+        """Add stock (creating the stock row if needed). Returns the new quantity."""
+        stmt = pg_insert(InventoryStockModel).values(
+            id=uuid4(),
+            tenant_id=self.tenant_id,
+            item_id=item_id,
+            warehouse_id=warehouse_id,
+            quantity=quantity,
+            updated_at=datetime.utcnow(),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[InventoryStockModel.item_id, InventoryStockModel.warehouse_id],
+            set_={
+                "quantity": InventoryStockModel.quantity + stmt.excluded.quantity,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ).returning(InventoryStockModel.quantity)
+        result = await self.db.execute(stmt)
+        return result.scalar_one()
+
+    async def issue(self, item_id: UUID, warehouse_id: UUID, quantity: Decimal) -> Optional[Decimal]:
+        """
+        Remove stock only if enough is available.
+        Returns the new quantity, or None when stock is insufficient (nothing changed).
+        """
+        result = await self.db.execute(
+            update(InventoryStockModel)
+            .where(
+                InventoryStockModel.item_id == item_id,
+                InventoryStockModel.warehouse_id == warehouse_id,
+                InventoryStockModel.quantity >= quantity,
+            )
+            .values(
+                quantity=InventoryStockModel.quantity - quantity,
+                updated_at=datetime.utcnow(),
+            )
+            .returning(InventoryStockModel.quantity)
+            .execution_options(synchronize_session="fetch")
+        )
+        return result.scalar_one_or_none()
+
+    async def current_quantity(self, item_id: UUID, warehouse_id: UUID) -> Decimal:
+        result = await self.db.execute(
+            select(InventoryStockModel.quantity).where(
+                InventoryStockModel.item_id == item_id,
+                InventoryStockModel.warehouse_id == warehouse_id,
+            )
+        )
+        return Decimal(result.scalar_one_or_none() or 0)
+
+    async def issue_many(self, warehouse_id: UUID, quantities: Dict[UUID, Decimal]) -> Dict[UUID, Decimal]:
+        """
+        Remove stock for several items of one warehouse in one statement.
+        Returns the new quantity of every item that had enough stock; items
+        missing from the result were not changed.
+        """
+        quantities = {k: v for k, v in quantities.items() if v > 0}
+        if not quantities:
+            return {}
+        item_ids, qtys = _ordered(quantities)
+        result = await self.db.execute(ISSUE_MANY_SQL, {
+            "warehouse_id": str(warehouse_id),
+            "item_ids": item_ids,
+            "quantities": qtys,
+        })
+        return {UUID(str(r[0])): Decimal(r[1]) for r in result.fetchall()}
+
+    async def consume_fifo_lots_many(
+        self, warehouse_id: UUID, quantities: Dict[UUID, Decimal]
+    ) -> Dict[UUID, List[LotConsumption]]:
+        """Deduct several items from their ACTIVE lots, oldest first, in one statement."""
+        quantities = {k: v for k, v in quantities.items() if v > 0}
+        if not quantities:
+            return {}
+        item_ids, qtys = _ordered(quantities)
+        result = await self.db.execute(CONSUME_FIFO_LOTS_SQL, {
+            "tenant_id": str(self.tenant_id),
+            "warehouse_id": str(warehouse_id),
+            "item_ids": item_ids,
+            "quantities": qtys,
+        })
+        by_item: Dict[UUID, List[LotConsumption]] = {}
+        for r in result.fetchall():
+            by_item.setdefault(UUID(str(r[1])), []).append(LotConsumption(
+                lot_id=r[0], quantity=Decimal(r[2]), unit_cost=Decimal(r[3]), fifo_rank=int(r[4]),
+                lot_number=r[5], remaining_quantity=Decimal(r[6]), status=r[7],
+            ))
+        for consumptions in by_item.values():
+            consumptions.sort(key=lambda c: c.fifo_rank)
+        return by_item
+
+    async def consume_fifo_lots(self, item_id: UUID, warehouse_id: UUID, quantity: Decimal) -> List[LotConsumption]:
+        """Deduct quantity from ACTIVE lots of one item, oldest first, in one statement."""
+        by_item = await self.consume_fifo_lots_many(warehouse_id, {item_id: quantity})
+        return by_item.get(item_id, [])
@@ -165,6 +165,9 @@ async def update_item(id: UUID, data: InventoryItemBase, tenant_id: UUID = Depen
     
     await db.commit()
     await db.refresh(item)
+
+    from backend.modules.menu.domain.recipe_costing import invalidate_recipe_costs
+    invalidate_recipe_costs(tenant_id)
     return item
 
 @router.delete("/items/{id}", dependencies=[Depends(require_permission("inventory", "delete"))])
@@ -760,117 +763,62 @@ async def prepare_materials(
     Deduct materials from inventory for order preparation.
     Uses FIFO lot deduction and calculates actual COGS per item.
     Called by Order module during production workflow.
+    All items are deducted in one batch (see BillOfMaterialsService).
     """
-    from backend.modules.inventory.domain.services import InventoryService
-    from backend.modules.inventory.domain.entities import InventoryTransactionBase
+    from backend.modules.inventory.domain.bom_deduction import BillOfMaterialsService
     from decimal import Decimal
     
-    results = []
-    total_cogs = Decimal(0)
-    items_fulfilled = 0
-    items_with_shortfall = 0
-    
     try:
+        # Aggregate repeated items into one requirement per item
+        requirements = {}
         for mat_item in data.items:
-            item = await db.get(InventoryItemModel, mat_item.item_id)
-            if not item:
-                results.append(MaterialItemResult(
-                    item_id=str(mat_item.item_id),
-                    item_name=f"Unknown ({str(mat_item.item_id)[:8]})",
-                    requested_qty=float(mat_item.quantity),
-                    deducted_qty=0,
-                    shortfall=float(mat_item.quantity),
-                    lots_used=[],
-                    actual_cogs=0
-                ))
-                items_with_shortfall += 1
-                continue
-            
-            # Check stock availability
-            stock_result = await db.execute(
-                select(InventoryStockModel).where(
-                    InventoryStockModel.item_id == mat_item.item_id,
-                    InventoryStockModel.warehouse_id == data.warehouse_id,
-                    InventoryStockModel.tenant_id == tenant_id
-                )
-            )
-            stock = stock_result.scalar_one_or_none()
-            current_qty = Decimal(str(stock.quantity)) if stock else Decimal(0)
-            
-            # Calculate how much we can actually deduct
-            deduct_qty = min(mat_item.quantity, current_qty)
-            shortfall = max(Decimal(0), mat_item.quantity - current_qty)
-            
-            lots_used = []
-            item_cogs = Decimal(0)
-            
-            if deduct_qty > 0:
-                # Create EXPORT transaction with FIFO lot deduction
-                txn_data = InventoryTransactionBase(
-                    item_id=mat_item.item_id,
-                    warehouse_id=data.warehouse_id,
-                    transaction_type="EXPORT",
-                    quantity=deduct_qty,
-                    reference_doc=f"ORDER-{data.order_id}" if data.order_id else "MATERIAL-PREP",
-                    notes=f"Chuẩn bị nguyên liệu cho đơn hàng {data.order_id or ''}"
-                )
-                
-                txn = await InventoryService.create_transaction(
-                    db=db,
-                    data=txn_data,
-                    tenant_id=tenant_id,
-                    auto_deduct_lots=True
-                )
-                
-                # Get actual COGS from the transaction
-                item_cogs = Decimal(str(txn.unit_price or 0)) * deduct_qty
-                
-                # Collect lot deduction info
-                # Query lots that were recently modified
-                lots_q = select(InventoryLotModel).where(
-                    InventoryLotModel.item_id == mat_item.item_id,
-                    InventoryLotModel.tenant_id == tenant_id,
-                    InventoryLotModel.warehouse_id == data.warehouse_id,
-                ).order_by(InventoryLotModel.received_date.asc())
-                lots_result = await db.execute(lots_q)
-                for lot in lots_result.scalars().all():
-                    lots_used.append({
-                        "lot_id": str(lot.id),
+            requirements[mat_item.item_id] = requirements.get(mat_item.item_id, Decimal(0)) + mat_item.quantity
+        
+        deduction = await BillOfMaterialsService(db, tenant_id).deduct(
+            data.warehouse_id,
+            requirements,
+            reference_doc=f"ORDER-{data.order_id}" if data.order_id else "MATERIAL-PREP",
+            notes=f"Chuẩn bị nguyên liệu cho đơn hàng {data.order_id or ''}",
+            allow_partial=True,
+        )
+        
+        results = [
+            MaterialItemResult(
+                item_id=str(line.item_id),
+                item_name=line.item_name,
+                requested_qty=float(line.requested),
+                deducted_qty=float(line.deducted),
+                shortfall=float(line.shortfall),
+                lots_used=[
+                    {
+                        "lot_id": str(lot.lot_id),
                         "lot_number": lot.lot_number,
-                        "remaining": float(lot.remaining_quantity),
+                        "quantity_deducted": float(lot.quantity),
+                        "remaining": float(lot.remaining_quantity or 0),
                         "status": lot.status,
-                    })
-            
-            total_cogs += item_cogs
-            
-            if shortfall > 0:
-                items_with_shortfall += 1
-            else:
-                items_fulfilled += 1
-            
-            results.append(MaterialItemResult(
-                item_id=str(mat_item.item_id),
-                item_name=item.name,
-                requested_qty=float(mat_item.quantity),
-                deducted_qty=float(deduct_qty),
-                shortfall=float(shortfall),
-                lots_used=lots_used,
-                actual_cogs=float(item_cogs)
-            ))
+                    }
+                    for lot in line.lots
+                ],
+                actual_cogs=float(line.cogs)
+            )
+            for line in deduction.lines
+        ]
         
         await db.commit()
         
+        items_with_shortfall = len(deduction.shortfalls)
+        items_fulfilled = len(results) - items_with_shortfall
         all_fulfilled = items_with_shortfall == 0
         
         return MaterialPreparationResult(
             success=all_fulfilled,
             order_id=data.order_id,
-            total_items=len(data.items),
+            total_items=len(results),
             items_fulfilled=items_fulfilled,
             items_with_shortfall=items_with_shortfall,
             results=results,
-            total_cogs=float(total_cogs),
-            message=f"{'Hoàn tất' if all_fulfilled else 'Một phần'}: {items_fulfilled}/{len(data.items)} nguyên liệu đã xuất kho"
+            total_cogs=float(deduction.total_cogs),
+            message=f"{'Hoàn tất' if all_fulfilled else 'Một phần'}: {items_fulfilled}/{len(results)} nguyên liệu đã xuất kho"
         )
     except HTTPException:
         raise
@@ -0,0 +1,121 @@
+"""
+Unit Tests for batched Bill of Materials deduction
+Inventory Module
+
+Tests:
+1. Recipe explosion aggregates required quantity per ingredient
+2. Partial vs all-or-nothing planning and shortfall reporting
+3. One bulk INSERT for all EXPORT transactions (fixed statement count)
+"""
+import pytest
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+from backend.modules.inventory.domain.bom_deduction import (
+    BillOfMaterialsService,
+    aggregate_recipe_requirements,
+)
+from backend.modules.inventory.domain.stock_ledger import LotConsumption, StockLedger
+
+
+# ==================== RECIPE EXPLOSION ====================
+
+class TestAggregateRecipeRequirements:
+
+    def test_sums_shared_ingredients_across_dishes(self):
+        beef, rice = uuid4(), uuid4()
+        pho, com = uuid4(), uuid4()
+        order_items = [
+            SimpleNamespace(menu_item_id=pho, quantity=10),
+            SimpleNamespace(menu_item_id=com, quantity=4),
+            SimpleNamespace(menu_item_id=pho, quantity=2),   # same dish twice
+            SimpleNamespace(menu_item_id=None, quantity=50),  # custom line without recipe
+        ]
+        recipes = [
+            SimpleNamespace(menu_item_id=pho, ingredient_id=beef, quantity_per_unit=Decimal("0.15")),
+            SimpleNamespace(menu_item_id=com, ingredient_id=beef, quantity_per_unit=Decimal("0.1")),
+            SimpleNamespace(menu_item_id=com, ingredient_id=rice, quantity_per_unit=Decimal("0.2")),
+        ]
+
+        required = aggregate_recipe_requirements(order_items, recipes)
+
+        assert required == {beef: Decimal("2.20"), rice: Decimal("0.8")}
+
+    def test_zero_quantities_are_dropped(self):
+        dish, salt = uuid4(), uuid4()
+        required = aggregate_recipe_requirements(
+            [SimpleNamespace(menu_item_id=dish, quantity=3)],
+            [SimpleNamespace(menu_item_id=dish, ingredient_id=salt, quantity_per_unit=0)],
+        )
+        assert required == {}
+
+
+# ==================== DEDUCTION ====================
+
+def _db_with_items(*items):
+    """execute() #1 returns item names, later calls (bulk insert) return a MagicMock"""
+    db = MagicMock()
+    names = MagicMock()
+    names.__iter__ = lambda self: iter([SimpleNamespace(id=i, name=n) for i, n in items])
+    db.execute = AsyncMock(side_effect=[names, MagicMock()])
+    return db
+
+
+@pytest.mark.asyncio
+class TestDeduct:
+
+    async def _run(self, db, warehouse, requirements, available, allow_partial):
+        async def issue_many(self, wh, quantities):
+            return {k: available[(k, wh)] - v for k, v in quantities.items()}
+
+        async def consume(self, wh, quantities):
+            return {k: [LotConsumption(lot_id=uuid4(), quantity=v, unit_cost=Decimal("100"), fifo_rank=1)]
+                    for k, v in quantities.items()}
+
+        with patch.object(StockLedger, "lock_stock_rows", AsyncMock(return_value=available)), \
+             patch.object(StockLedger, "issue_many", issue_many), \
+             patch.object(StockLedger, "consume_fifo_lots_many", consume):
+            return await BillOfMaterialsService(db, uuid4()).deduct(
+                warehouse, requirements, reference_doc="ORDER-DH1", allow_partial=allow_partial
+            )
+
+    async def test_partial_deducts_what_is_available(self):
+        wh, beef, rice = uuid4(), uuid4(), uuid4()
+        db = _db_with_items((beef, "Thịt bò"), (rice, "Gạo"))
+
+        result = await self._run(db, wh, {beef: Decimal("5"), rice: Decimal("2")},
+                                 {(beef, wh): Decimal("3"), (rice, wh): Decimal("10")}, allow_partial=True)
+
+        lines = {line.item_id: line for line in result.lines}
+        assert lines[beef].deducted == Decimal("3")
+        assert lines[beef].shortfall == Decimal("2")
+        assert lines[rice].shortfall == 0
+        assert result.total_cogs == Decimal("500")
+        # names query + one bulk insert carrying both transactions
+        assert db.execute.await_count == 2
+        assert len(db.execute.await_args_list[1].args[1]) == 2
+
+    async def test_all_or_nothing_skips_short_ingredient(self):
+        wh, beef, rice = uuid4(), uuid4(), uuid4()
+        db = _db_with_items((beef, "Thịt bò"), (rice, "Gạo"))
+
+        result = await self._run(db, wh, {beef: Decimal("5"), rice: Decimal("2")},
+                                 {(beef, wh): Decimal("3"), (rice, wh): Decimal("10")}, allow_partial=False)
+
+        lines = {line.item_id: line for line in result.lines}
+        assert lines[beef].deducted == 0
+        assert [line.item_id for line in result.shortfalls] == [beef]
+        assert lines[rice].transaction_id is not None
+        assert result.deducted_count == 1
+
+    async def test_unknown_item_is_full_shortfall(self):
+        wh, ghost = uuid4(), uuid4()
+        db = _db_with_items()
+
+        result = await self._run(db, wh, {ghost: Decimal("1")}, {}, allow_partial=True)
+
+        assert result.lines[0].found is False
+        assert result.lines[0].shortfall == Decimal("1")
+        assert db.execute.await_count == 1  # nothing to insert
@@ -0,0 +1,134 @@
+"""
+Unit Tests for the atomic Stock Ledger
+Inventory Module
+
+Tests:
+1. Statements are conditional / upserts (no read-modify-write in Python)
+2. create_transaction EXPORT rejects insufficient stock without touching lots
+3. FIFO lot consumption links the first lot and prices at weighted cost
+"""
+import pytest
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from backend.modules.inventory.domain.entities import InventoryTransactionBase
+from backend.modules.inventory.domain.services import InventoryService
+from backend.modules.inventory.domain.stock_ledger import (
+    LotConsumption,
+    StockLedger,
+    weighted_unit_cost,
+)
+
+
+def _compiled(db):
+    stmt = db.execute.await_args.args[0]
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def _result(scalar=None):
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = scalar
+    result.scalar_one.return_value = scalar
+    return result
+
+
+# ==================== STATEMENT SHAPE ====================
+
+@pytest.mark.asyncio
+class TestLedgerStatements:
+
+    async def test_issue_is_conditional_update_with_returning(self):
+        db = AsyncMock()
+        db.execute.return_value = _result(Decimal("7"))
+
+        new_qty = await StockLedger(db, uuid4()).issue(uuid4(), uuid4(), Decimal("3"))
+
+        sql = _compiled(db)
+        assert new_qty == Decimal("7")
+        assert sql.startswith("UPDATE inventory_stock")
+        assert "inventory_stock.quantity >= " in sql
+        assert "RETURNING inventory_stock.quantity" in sql
+
+    async def test_issue_returns_none_when_insufficient(self):
+        db = AsyncMock()
+        db.execute.return_value = _result(None)
+        assert await StockLedger(db, uuid4()).issue(uuid4(), uuid4(), Decimal("3")) is None
+
+    async def test_receive_is_upsert(self):
+        db = AsyncMock()
+        db.execute.return_value = _result(Decimal("13"))
+
+        assert await StockLedger(db, uuid4()).receive(uuid4(), uuid4(), Decimal("3")) == Decimal("13")
+
+        sql = _compiled(db)
+        assert "ON CONFLICT (item_id, warehouse_id) DO UPDATE" in sql
+        assert "quantity = (inventory_stock.quantity + excluded.quantity)" in sql
+
+    async def test_lock_stock_rows_orders_keys_and_locks(self):
+        db = AsyncMock()
+        db.execute.return_value = []
+        keys = [(uuid4(), uuid4()) for _ in range(3)]
+
+        await StockLedger(db, uuid4()).lock_stock_rows(keys + keys[:1])
+
+        sql = _compiled(db)
+        assert "ORDER BY inventory_stock.item_id, inventory_stock.warehouse_id" in sql
+        assert sql.rstrip().endswith("FOR UPDATE")
+
+    async def test_lock_stock_rows_empty_sends_nothing(self):
+        db = AsyncMock()
+        assert await StockLedger(db, uuid4()).lock_stock_rows([]) == {}
+        db.execute.assert_not_awaited()
+
+
+# ==================== CREATE TRANSACTION ====================
+
+def _export(quantity="5"):
+    return InventoryTransactionBase(
+        item_id=uuid4(), warehouse_id=uuid4(), transaction_type="EXPORT", quantity=Decimal(quantity)
+    )
+
+
+@pytest.mark.asyncio
+class TestCreateTransactionExport:
+
+    async def test_insufficient_stock_raises_and_skips_lots(self):
+        db = MagicMock()
+        db.get = AsyncMock(return_value=SimpleNamespace(name="Thịt bò"))
+
+        with patch.object(StockLedger, "issue", AsyncMock(return_value=None)), \
+             patch.object(StockLedger, "current_quantity", AsyncMock(return_value=Decimal("2"))), \
+             patch.object(StockLedger, "consume_fifo_lots", AsyncMock()) as consume:
+            with pytest.raises(HTTPException) as exc:
+                await InventoryService.create_transaction(db, _export(), uuid4(), auto_deduct_lots=True)
+
+        assert exc.value.status_code == 400
+        assert "Current: 2" in exc.value.detail
+        consume.assert_not_awaited()
+        db.add.assert_not_called()
+
+    async def test_fifo_links_first_lot_and_weighted_cost(self):
+        db = MagicMock()
+        db.get = AsyncMock(return_value=SimpleNamespace(name="Gạo"))
+        first_lot, second_lot = uuid4(), uuid4()
+        consumptions = [
+            LotConsumption(lot_id=first_lot, quantity=Decimal("2"), unit_cost=Decimal("100"), fifo_rank=1),
+            LotConsumption(lot_id=second_lot, quantity=Decimal("3"), unit_cost=Decimal("200"), fifo_rank=2),
+        ]
+
+        with patch.object(StockLedger, "issue", AsyncMock(return_value=Decimal("10"))), \
+             patch.object(StockLedger, "consume_fifo_lots", AsyncMock(return_value=consumptions)):
+            txn = await InventoryService.create_transaction(db, _export(), uuid4(), auto_deduct_lots=True)
+
+        assert txn.lot_id == first_lot
+        assert txn.unit_price == Decimal("160")
+        db.add.assert_called_once_with(txn)
+
+
+def test_weighted_unit_cost_empty():
+    assert weighted_unit_cost([]) is None
@@ -0,0 +1,318 @@
+"""
+Recipe Costing Engine - food cost, margin and menu engineering per tenant
+Backs GET /menu/items/{item_id}/cost and GET /menu/stats/menu-engineering
+
+The old endpoints queried recipes per menu item and inventory cost per
+recipe line: O(items x recipes) sequential round-trips.
+
+RecipeGraph is the tenant's menu in memory: every menu item with its
+category, its recipe lines and the current unit cost of each ingredient
+(inventory_items.cost_price), loaded with ONE joined query. Food cost per
+item is summed once when the graph is built. Graphs are cached per process
+(RECIPE_COST_CACHE_TTL seconds, default 300) and invalidated when recipes,
+menu items or inventory item prices change (ORM listeners, plus an explicit
+hook in InventoryService where purchases update latest_purchase_price).
+
+Popularity for menu engineering is units sold in the last N days (one
+aggregated query over order_items, not cached); tenants without sales in
+the window fall back to the selling-price proxy used before.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.menu.domain.models import MenuItemModel, RecipeModel
+
+RECIPE_COST_CACHE_TTL = float(os.getenv("RECIPE_COST_CACHE_TTL", 300))
+POPULARITY_WINDOW_DAYS = 90
+# Kasavana-Smith: an item is popular when its sales mix reaches 70% of an equal share
+POPULARITY_MIX_FACTOR = 0.7
+DEFAULT_FOOD_COST_PCT = 30
+UNCATEGORIZED = "Chưa phân loại"
+
+QUADRANT_STAR = "star"
+QUADRANT_PUZZLE = "puzzle"
+QUADRANT_WORKHORSE = "workhorse"
+QUADRANT_DOG = "dog"
+QUADRANTS = (QUADRANT_STAR, QUADRANT_PUZZLE, QUADRANT_WORKHORSE, QUADRANT_DOG)
+
+POPULARITY_SALES = "sales"
+POPULARITY_PRICE = "price"
+
+
+# ============ RECIPE GRAPH ============
+
+@dataclass(frozen=True)
+class RecipeLine:
+    ingredient_id: UUID
+    ingredient_name: str
+    quantity_per_unit: Decimal
+    uom: str
+    unit_cost: Decimal
+
+    @property
+    def line_cost(self) -> Decimal:
+        return self.quantity_per_unit * self.unit_cost
+
+
+@dataclass
+class CostedMenuItem:
+    id: UUID
+    name: str
+    category_id: Optional[UUID]
+    category_name: Optional[str]
+    item_type: Optional[str]
+    is_active: bool
+    selling_price: Decimal
+    recipe: List[RecipeLine] = field(default_factory=list)
+    food_cost: Decimal = Decimal(0)  # per portion
+
+    @property
+    def food_cost_pct(self) -> float:
+        selling = float(self.selling_price)
+        return float(self.food_cost) / selling * 100 if selling > 0 else 0
+
+    @property
+    def profit_margin(self) -> float:
+        return float(self.selling_price) - float(self.food_cost)
+
+    @property
+    def is_food(self) -> bool:
+        """Menu engineering covers FOOD categories and uncategorized items"""
+        return self.item_type is None or self.item_type == 'FOOD'
+
+
+class RecipeGraph:
+    """Menu items of one tenant with their recipe lines and ingredient costs"""
+
+    def __init__(self, items: Iterable[CostedMenuItem]):
+        self.items: Dict[UUID, CostedMenuItem] = {item.id: item for item in items}
+        for item in self.items.values():
+            item.food_cost = sum((line.line_cost for line in item.recipe), Decimal(0))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def get(self, item_id: UUID) -> Optional[CostedMenuItem]:
+        return self.items.get(item_id)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Any]) -> "RecipeGraph":
+        """Rows of RECIPE_GRAPH_SQL: one per (menu item, recipe line), NULL recipe columns when none."""
+        items: Dict[UUID, CostedMenuItem] = {}
+        for row in rows:
+            item = items.get(row.id)
+            if item is None:
+                item = items[row.id] = CostedMenuItem(
+                    id=row.id, name=row.name, category_id=row.category_id,
+                    category_name=row.category_name, item_type=row.item_type,
+                    is_active=bool(row.is_active), selling_price=Decimal(row.selling_price or 0),
+                )
+            if row.ingredient_id is not None:
+                item.recipe.append(RecipeLine(
+                    ingredient_id=row.ingredient_id, ingredient_name=row.ingredient_name,
+                    quantity_per_unit=Decimal(row.quantity_per_unit or 0), uom=row.uom,
+                    unit_cost=Decimal(row.unit_cost or 0),
+                ))
+        return cls(items.values())
+
+
+# ============ PER-TENANT CACHE ============
+
+class RecipeGraphCache:
+    """Thread-safe per-tenant cache of RecipeGraph with TTL"""
+
+    def __init__(self, ttl: float = RECIPE_COST_CACHE_TTL):
+        self.ttl = ttl
+        self._data: Dict[str, Tuple[RecipeGraph, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, tenant_id: Any) -> Optional[RecipeGraph]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            cached = self._data.get(str(tenant_id))
+            if cached is None or cached[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return cached[0]
+
+    def put(self, tenant_id: Any, graph: RecipeGraph) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[str(tenant_id)] = (graph, time.monotonic() + self.ttl)
+
+    def invalidate(self, tenant_id: Any) -> None:
+        with self._lock:
+            if self._data.pop(str(tenant_id), None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# Process-wide singleton
+recipe_cost_cache = RecipeGraphCache()
+
+
+def invalidate_recipe_costs(tenant_id: Any) -> None:
+    recipe_cost_cache.invalidate(tenant_id)
+
+
+@event.listens_for(RecipeModel, "after_insert")
+@event.listens_for(RecipeModel, "after_update")
+@event.listens_for(RecipeModel, "after_delete")
+@event.listens_for(MenuItemModel, "after_insert")
+@event.listens_for(MenuItemModel, "after_update")
+@event.listens_for(MenuItemModel, "after_delete")
+def _invalidate_on_recipe_write(mapper, connection, target):
+    recipe_cost_cache.invalidate(target.tenant_id)
+
+
+# ============ ENGINE ============
+
+# inventory_items is read as a plain table (no ORM import across modules),
+# like the per-line cost lookup this replaces
+RECIPE_GRAPH_SQL = text("""
+    SELECT mi.id, mi.name, mi.category_id, c.name AS category_name, c.item_type,
+           mi.is_active, mi.selling_price,
+           r.ingredient_id, r.ingredient_name, r.quantity_per_unit, r.uom,
+           ii.cost_price AS unit_cost
+    FROM menu_items mi
+    LEFT JOIN categories c ON c.id = mi.category_id AND c.tenant_id = mi.tenant_id
+    LEFT JOIN recipes r ON r.menu_item_id = mi.id AND r.tenant_id = mi.tenant_id
+    LEFT JOIN inventory_items ii ON ii.id = r.ingredient_id AND ii.tenant_id = mi.tenant_id
+    WHERE mi.tenant_id = CAST(:tenant_id AS uuid)
+    ORDER BY mi.created_at, mi.id, r.created_at, r.id
+""")
+
+UNITS_SOLD_SQL = text("""
+    SELECT oi.menu_item_id, SUM(COALESCE(oi.quantity, 1)) AS units_sold
+    FROM order_items oi
+    JOIN orders o ON o.id = oi.order_id
+    WHERE o.tenant_id = CAST(:tenant_id AS uuid)
+      AND o.status != 'CANCELLED'
+      AND o.event_date >= :since
+      AND oi.menu_item_id IS NOT NULL
+    GROUP BY oi.menu_item_id
+""")
+
+
+def classify(profitable: bool, popular: bool) -> str:
+    if profitable and popular:
+        return QUADRANT_STAR
+    if profitable:
+        return QUADRANT_PUZZLE
+    if popular:
+        return QUADRANT_WORKHORSE
+    return QUADRANT_DOG
+
+
+def menu_engineering(graph: RecipeGraph, units_sold: Optional[Dict[UUID, float]] = None) -> Dict[str, Any]:
+    """
+    4-quadrant analysis of the active food items:
+    profitability = food cost % below the average (of items with a cost),
+    popularity    = sales mix >= 70% of an equal share when there are sales,
+                    else selling price >= the average price (legacy proxy).
+    """
+    items = [item for item in graph.items.values() if item.is_active and item.is_food]
+    if not items:
+        return {"items": [], "avg_food_cost": 0, "avg_selling_price": 0, "quadrants": {q: 0 for q in QUADRANTS}}
+
+    units_sold = units_sold or {}
+    basis = POPULARITY_SALES if any(units_sold.get(item.id) for item in items) else POPULARITY_PRICE
+
+    data = []
+    for item in items:
+        sold = float(units_sold.get(item.id, 0))
+        data.append({
+            "id": str(item.id),
+            "name": item.name,
+            "category_name": item.category_name or UNCATEGORIZED,
+            "category_id": str(item.category_id) if item.category_id else None,
+            "selling_price": float(item.selling_price),
+            "food_cost": float(item.food_cost),
+            "food_cost_pct": round(item.food_cost_pct, 1),
+            "profit_margin": round(item.profit_margin, 0),
+            "units_sold": sold,
+            "popularity_score": sold if basis == POPULARITY_SALES else float(item.selling_price),
+        })
+
+    food_costs = [d["food_cost_pct"] for d in data if d["food_cost_pct"] > 0]
+    selling_prices = [d["selling_price"] for d in data]
+    avg_food_cost = sum(food_costs) / len(food_costs) if food_costs else DEFAULT_FOOD_COST_PCT
+    avg_selling_price = sum(selling_prices) / len(selling_prices)
+
+    if basis == POPULARITY_SALES:
+        popularity_threshold = sum(d["units_sold"] for d in data) / len(data) * POPULARITY_MIX_FACTOR
+    else:
+        popularity_threshold = avg_selling_price
+
+    quadrant_counts = {q: 0 for q in QUADRANTS}
+    for d in data:
+        d["quadrant"] = classify(
+            profitable=d["food_cost_pct"] < avg_food_cost,  # Low food cost = high profit
+            popular=d["popularity_score"] >= popularity_threshold,
+        )
+        quadrant_counts[d["quadrant"]] += 1
+
+    return {
+        "items": data,
+        "avg_food_cost": round(avg_food_cost, 1),
+        "avg_selling_price": round(avg_selling_price, 0),
+        "quadrants": quadrant_counts,
+        "total_items": len(data),
+        "popularity_basis": basis,
+    }
+
+
+class RecipeCostingService:
+    """Food cost and menu engineering for one tenant from the cached recipe graph"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID, cache: RecipeGraphCache = recipe_cost_cache):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.cache = cache
+
+    async def build_graph(self) -> RecipeGraph:
+        result = await self.db.execute(RECIPE_GRAPH_SQL, {"tenant_id": str(self.tenant_id)})
+        return RecipeGraph.from_rows(result.fetchall())
+
+    async def get_graph(self) -> RecipeGraph:
+        graph = self.cache.get(self.tenant_id)
+        if graph is None:
+            graph = await self.build_graph()
+            self.cache.put(self.tenant_id, graph)
+        return graph
+
+    async def item_cost(self, item_id: UUID) -> Optional[CostedMenuItem]:
+        return (await self.get_graph()).get(item_id)
+
+    async def units_sold(self, days: int = POPULARITY_WINDOW_DAYS) -> Dict[UUID, float]:
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        result = await self.db.execute(UNITS_SOLD_SQL, {"tenant_id": str(self.tenant_id), "since": since})
+        return {row.menu_item_id: float(row.units_sold or 0) for row in result.fetchall()}
+
+    async def menu_engineering(self, days: int = POPULARITY_WINDOW_DAYS) -> Dict[str, Any]:
+        graph = await self.get_graph()
+        return menu_engineering(graph, await self.units_sold(days))
+
+
+def get_recipe_costing_service(db: AsyncSession, tenant_id: UUID) -> RecipeCostingService:
+    """Factory function for dependency injection"""
+    return RecipeCostingService(db, tenant_id)
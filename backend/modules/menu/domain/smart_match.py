@@ -0,0 +1,306 @@
+"""
+Menu Smart Match - batched fuzzy matching of free-text dish names
+Backs POST /menu/smart-match (paste a menu from a customer chat)
+
+The old endpoint ran up to three queries per input line (lower() equality,
+unaccent equality, pg_trgm similarity), none tenant-scoped: a 60-line
+menu meant up to 180 sequential round-trips.
+
+Default path - MenuMatchIndex, an in-memory index per tenant:
+- exact:    lower(name)                       -> items   (score 1.0)
+- unaccent: lower(name) without diacritics    -> items   (score 0.9)
+- fuzzy:    trigram postings of the unaccented name, Jaccard similarity
+            like pg_trgm's similarity(), threshold 0.3, top 3
+All inputs are matched in one pass with exact -> unaccent -> fuzzy fallback.
+Building the index costs one query per tenant; it is cached per process
+(MENU_MATCH_INDEX_TTL seconds, default 300) and invalidated when menu items
+are created, updated or deleted (explicit hooks in the router plus an ORM
+listener on MenuItemModel).
+
+Optional SQL path - SmartMatchService.match_sql(): all inputs in one
+unnest() statement with the same three tiers (pg_trgm / unaccent in the
+database, GIN trigram index from migration 077).
+"""
+
+import os
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.menu.domain.models import MenuItemModel
+
+MENU_MATCH_INDEX_TTL = float(os.getenv("MENU_MATCH_INDEX_TTL", 300))
+FUZZY_THRESHOLD = 0.3  # pg_trgm.similarity_threshold default
+FUZZY_LIMIT = 3
+
+MATCH_EXACT = "exact"
+MATCH_UNACCENT = "unaccent"
+MATCH_FUZZY = "fuzzy"
+MATCH_NONE = "none"
+
+
+# ============ NORMALIZATION ============
+
+def normalize_name(value: str) -> str:
+    """Lowercase and collapse whitespace."""
+    return " ".join((value or "").lower().split())
+
+
+def strip_diacritics(value: str) -> str:
+    """Remove Vietnamese diacritics ("Gà nướng" -> "ga nuong")."""
+    decomposed = unicodedata.normalize("NFD", value.replace("đ", "d").replace("Đ", "D"))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def trigrams(value: str) -> Set[str]:
+    """
+    pg_trgm-style trigrams: alphanumeric words padded with two leading
+    spaces and one trailing space.
+    """
+    grams: Set[str] = set()
+    word = []
+    for ch in value + " ":
+        if ch.isalnum():
+            word.append(ch)
+        elif word:
+            padded = "  " + "".join(word) + " "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+            word = []
+    return grams
+
+
+# ============ INDEX ============
+
+@dataclass(frozen=True)
+class MenuMatchEntry:
+    id: UUID
+    name: str
+    selling_price: Optional[Decimal]
+
+
+@dataclass
+class MatchOutcome:
+    input_text: str
+    match_type: str
+    matches: List[Dict[str, Any]] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"input_text": self.input_text, "match_type": self.match_type, "matches": self.matches}
+
+
+def _candidate(entry: MenuMatchEntry, score: float) -> Dict[str, Any]:
+    return {"id": str(entry.id), "name": entry.name, "score": score, "price": entry.selling_price}
+
+
+class MenuMatchIndex:
+    """Immutable lookup structures over the menu items of one tenant"""
+
+    def __init__(self, entries: Iterable[MenuMatchEntry]):
+        self.entries: List[MenuMatchEntry] = list(entries)
+        self._exact: Dict[str, int] = {}
+        self._unaccent: Dict[str, List[int]] = defaultdict(list)
+        self._grams: List[Set[str]] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+
+        for idx, entry in enumerate(self.entries):
+            key = normalize_name(entry.name)
+            self._exact.setdefault(key, idx)  # first wins, like .first()
+            plain = strip_diacritics(key)
+            self._unaccent[plain].append(idx)
+            grams = trigrams(plain)
+            self._grams.append(grams)
+            for gram in grams:
+                self._postings[gram].append(idx)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def fuzzy(self, plain: str, threshold: float = FUZZY_THRESHOLD, limit: int = FUZZY_LIMIT) -> List[Tuple[MenuMatchEntry, float]]:
+        query = trigrams(plain)
+        if not query:
+            return []
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in query:
+            for idx in self._postings.get(gram, ()):
+                shared[idx] += 1
+        scored = []
+        for idx, common in shared.items():
+            score = common / (len(query) + len(self._grams[idx]) - common)
+            if score >= threshold:
+                scored.append((score, idx))
+        scored.sort(key=lambda s: (-s[0], self.entries[s[1]].name))
+        return [(self.entries[idx], round(score, 4)) for score, idx in scored[:limit]]
+
+    def match(self, input_text: str) -> MatchOutcome:
+        key = normalize_name(input_text)
+        idx = self._exact.get(key)
+        if idx is not None:
+            return MatchOutcome(input_text, MATCH_EXACT, [_candidate(self.entries[idx], 1.0)])
+
+        plain = strip_diacritics(key)
+        same = self._unaccent.get(plain)
+        if same:
+            return MatchOutcome(input_text, MATCH_UNACCENT, [_candidate(self.entries[i], 0.9) for i in same])
+
+        fuzzy = self.fuzzy(plain)
+        if fuzzy:
+            return MatchOutcome(input_text, MATCH_FUZZY, [_candidate(entry, score) for entry, score in fuzzy])
+
+        return MatchOutcome(input_text, MATCH_NONE, [])
+
+    def match_many(self, inputs: Iterable[str]) -> List[MatchOutcome]:
+        return [self.match(i) for i in inputs]
+
+
+# ============ PER-TENANT CACHE ============
+
+class MenuMatchIndexCache:
+    """Thread-safe per-tenant cache of MenuMatchIndex with TTL"""
+
+    def __init__(self, ttl: float = MENU_MATCH_INDEX_TTL):
+        self.ttl = ttl
+        self._data: Dict[str, Tuple[MenuMatchIndex, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, tenant_id: Any) -> Optional[MenuMatchIndex]:
+        if self.ttl <= 0:
+            return None
+        with self._lock:
+            cached = self._data.get(str(tenant_id))
+            if cached is None or cached[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return cached[0]
+
+    def put(self, tenant_id: Any, index: MenuMatchIndex) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[str(tenant_id)] = (index, time.monotonic() + self.ttl)
+
+    def invalidate(self, tenant_id: Any) -> None:
+        with self._lock:
+            if self._data.pop(str(tenant_id), None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# Process-wide singleton
+menu_match_cache = MenuMatchIndexCache()
+
+
+def invalidate_menu_match_index(tenant_id: Any) -> None:
+    menu_match_cache.invalidate(tenant_id)
+
+
+@event.listens_for(MenuItemModel, "after_insert")
+@event.listens_for(MenuItemModel, "after_update")
+@event.listens_for(MenuItemModel, "after_delete")
+def _invalidate_on_menu_item_write(mapper, connection, target):
+    menu_match_cache.invalidate(target.tenant_id)
+
+
+# ============ SERVICE ============
+
+# One statement for all inputs; every tier is evaluated per input and the
+# caller keeps the best tier (exact < unaccent < fuzzy).
+SMART_MATCH_SQL = text("""
+    WITH inp AS (
+        SELECT t.term, t.ord
+        FROM unnest(CAST(:terms AS text[])) WITH ORDINALITY AS t(term, ord)
+    )
+    SELECT inp.ord, m.tier, m.id, m.name, m.score, m.selling_price
+    FROM inp
+    JOIN LATERAL (
+        (SELECT 1 AS tier, mi.id, mi.name, 1.0::float8 AS score, mi.selling_price
+         FROM menu_items mi
+         WHERE mi.tenant_id = CAST(:tenant_id AS uuid) AND lower(mi.name) = lower(inp.term)
+         LIMIT 1)
+        UNION ALL
+        (SELECT 2, mi.id, mi.name, 0.9::float8, mi.selling_price
+         FROM menu_items mi
+         WHERE mi.tenant_id = CAST(:tenant_id AS uuid)
+           AND unaccent(lower(mi.name)) = unaccent(lower(inp.term)))
+        UNION ALL
+        (SELECT 3, mi.id, mi.name, similarity(mi.name, inp.term)::float8, mi.selling_price
+         FROM menu_items mi
+         WHERE mi.tenant_id = CAST(:tenant_id AS uuid) AND mi.name % inp.term
+         ORDER BY 4 DESC
+         LIMIT 3)
+    ) m ON true
+    ORDER BY inp.ord, m.tier, m.score DESC
+""")
+
+_TIER_TYPES = {1: MATCH_EXACT, 2: MATCH_UNACCENT, 3: MATCH_FUZZY}
+
+
+class SmartMatchService:
+    """Match pasted dish names against the menu of one tenant"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID, cache: MenuMatchIndexCache = menu_match_cache):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.cache = cache
+
+    async def build_index(self) -> MenuMatchIndex:
+        result = await self.db.execute(
+            select(MenuItemModel.id, MenuItemModel.name, MenuItemModel.selling_price)
+            .where(MenuItemModel.tenant_id == self.tenant_id)
+            .order_by(MenuItemModel.created_at, MenuItemModel.id)
+        )
+        return MenuMatchIndex(MenuMatchEntry(r.id, r.name, r.selling_price) for r in result)
+
+    async def get_index(self) -> MenuMatchIndex:
+        index = self.cache.get(self.tenant_id)
+        if index is None:
+            index = await self.build_index()
+            self.cache.put(self.tenant_id, index)
+        return index
+
+    async def match(self, inputs: Iterable[str]) -> List[MatchOutcome]:
+        """In-memory path (default)"""
+        index = await self.get_index()
+        return index.match_many(inputs)
+
+    async def match_sql(self, inputs: Iterable[str]) -> List[MatchOutcome]:
+        """Database path: one unnest() statement for all inputs"""
+        inputs = list(inputs)
+        if not inputs:
+            return []
+        result = await self.db.execute(SMART_MATCH_SQL, {"tenant_id": str(self.tenant_id), "terms": inputs})
+
+        best: Dict[int, Tuple[int, List[Dict[str, Any]]]] = {}
+        for r in result.fetchall():
+            ord_ = int(r.ord)
+            tier = int(r.tier)
+            current = best.get(ord_)
+            if current is None or tier < current[0]:
+                current = best[ord_] = (tier, [])
+            if tier == current[0]:
+                current[1].append(_candidate(MenuMatchEntry(r.id, r.name, r.selling_price), round(float(r.score), 4)))
+
+        outcomes = []
+        for ord_, input_text in enumerate(inputs, start=1):
+            tier, matches = best.get(ord_, (None, []))
+            outcomes.append(MatchOutcome(input_text, _TIER_TYPES.get(tier, MATCH_NONE), matches))
+        return outcomes
+
+
+def get_smart_match_service(db: AsyncSession, tenant_id: UUID) -> SmartMatchService:
+    """Factory function for dependency injection"""
+    return SmartMatchService(db, tenant_id)
@@ -8,14 +8,17 @@ from uuid import UUID
 import json
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, text, or_, delete as sql_delete
+from sqlalchemy import select, func, or_, delete as sql_delete
 from sqlalchemy.orm import selectinload
 
 from backend.core.database import get_db
 from backend.core.auth.permissions import require_permission
 from backend.core.auth.router import get_current_user
 from backend.core.auth.schemas import User as UserSchema
+from backend.core.dependencies import get_current_tenant
 from backend.modules.menu.domain.models import CategoryModel, MenuItemModel, RecipeModel, SetMenuModel, SetMenuItemModel, MenuAuditLogModel
+from backend.modules.menu.domain.smart_match import SmartMatchService, invalidate_menu_match_index
+from backend.modules.menu.domain.recipe_costing import POPULARITY_WINDOW_DAYS, get_recipe_costing_service
 from backend.modules.menu.domain.entities import (
     MenuItem, MenuItemBase, Category, CategoryBase, CategoryUpdate,
     SetMenuCreate, SetMenuUpdate, SetMenu, SetMenuItemResponse,
@@ -24,12 +27,10 @@ from backend.modules.menu.domain.entities import (
 
 router = APIRouter(tags=["Menu Management"])
 
-# Default tenant for development
-DEFAULT_TENANT_ID = UUID("a0eebc99-9c0b-4ef8-bb6d-6bb9bd380a11")
-
 
 async def _log_menu_audit(
     db: AsyncSession,
+    tenant_id: UUID,
     action: str,
     entity_type: str,
     entity_id: UUID = None,
@@ -42,7 +43,7 @@ async def _log_menu_audit(
     Failures are silently ignored to avoid disrupting user workflows."""
     try:
         audit = MenuAuditLogModel(
-            tenant_id=DEFAULT_TENANT_ID,
+            tenant_id=tenant_id,
             action=action,
             entity_type=entity_type,
             entity_id=entity_id,
@@ -99,10 +100,11 @@ def model_to_menu_item(model: MenuItemModel, category_name: str = None) -> MenuI
               dependencies=[Depends(require_permission("menu", "view"))])
 async def list_categories(
     item_type: Optional[str] = None,
+    tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
 ):
     """Get all menu categories, optionally filtered by item_type (FOOD|SERVICE)"""
-    query = select(CategoryModel).where(CategoryModel.tenant_id == DEFAULT_TENANT_ID)
+    query = select(CategoryModel).where(CategoryModel.tenant_id == tenant_id)
     if item_type:
         query = query.where(CategoryModel.item_type == item_type.upper())
     query = query.order_by(CategoryModel.sort_order, CategoryModel.name)
@@ -113,12 +115,12 @@ async def list_categories(
 
 @router.get("/categories/{category_id}", response_model=Category,
               dependencies=[Depends(require_permission("menu", "view"))])
-async def get_category(category_id: UUID, db: AsyncSession = Depends(get_db)):
+async def get_category(category_id: UUID, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Get category by ID"""
     result = await db.execute(
         select(CategoryModel)
         .where(CategoryModel.id == category_id)
-        .where(CategoryModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(CategoryModel.tenant_id == tenant_id)
     )
     category = result.scalar_one_or_none()
     if not category:
@@ -128,10 +130,10 @@ async def get_category(category_id: UUID, db: AsyncSession = Depends(get_db)):
 
 @router.post("/categories", response_model=Category,
               dependencies=[Depends(require_permission("menu", "create"))])
-async def create_category(data: CategoryBase, db: AsyncSession = Depends(get_db)):
+async def create_category(data: CategoryBase, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Create new category"""
     new_category = CategoryModel(
-        tenant_id=DEFAULT_TENANT_ID,
+        tenant_id=tenant_id,
         name=data.name,
         code=data.code,
         description=data.description,
@@ -144,7 +146,7 @@ async def create_category(data: CategoryBase, db: AsyncSession = Depends(get_db)
 
     # Audit: log category creation
     await _log_menu_audit(
-        db, action='CATEGORY_CREATE', entity_type='CATEGORY',
+        db, tenant_id, action='CATEGORY_CREATE', entity_type='CATEGORY',
         entity_id=new_category.id, entity_name=new_category.name,
         details=f'Category "{new_category.name}" ({new_category.item_type}) created',
     )
@@ -154,12 +156,12 @@ async def create_category(data: CategoryBase, db: AsyncSession = Depends(get_db)
 
 @router.put("/categories/{category_id}", response_model=Category,
               dependencies=[Depends(require_permission("menu", "edit"))])
-async def update_category(category_id: UUID, data: CategoryUpdate, db: AsyncSession = Depends(get_db)):
+async def update_category(category_id: UUID, data: CategoryUpdate, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Update category"""
     result = await db.execute(
         select(CategoryModel)
         .where(CategoryModel.id == category_id)
-        .where(CategoryModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(CategoryModel.tenant_id == tenant_id)
     )
     category = result.scalar_one_or_none()
     if not category:
@@ -183,7 +185,7 @@ async def update_category(category_id: UUID, data: CategoryUpdate, db: AsyncSess
 
     # Audit: log category update
     await _log_menu_audit(
-        db, action='CATEGORY_UPDATE', entity_type='CATEGORY',
+        db, tenant_id, action='CATEGORY_UPDATE', entity_type='CATEGORY',
         entity_id=category_id, entity_name=category.name,
         details=f'Category "{old_name}" updated',
     )
@@ -193,12 +195,12 @@ async def update_category(category_id: UUID, data: CategoryUpdate, db: AsyncSess
 
 @router.delete("/categories/{category_id}",
               dependencies=[Depends(require_permission("menu", "delete"))])
-async def delete_category(category_id: UUID, db: AsyncSession = Depends(get_db)):
+async def delete_category(category_id: UUID, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Delete category (fails if items reference it)"""
     result = await db.execute(
         select(CategoryModel)
         .where(CategoryModel.id == category_id)
-        .where(CategoryModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(CategoryModel.tenant_id == tenant_id)
     )
     category = result.scalar_one_or_none()
     if not category:
@@ -222,7 +224,7 @@ async def delete_category(category_id: UUID, db: AsyncSession = Depends(get_db))
 
     # Audit: log category deletion
     await _log_menu_audit(
-        db, action='CATEGORY_DELETE', entity_type='CATEGORY',
+        db, tenant_id, action='CATEGORY_DELETE', entity_type='CATEGORY',
         entity_id=category_id, entity_name=category_name,
         details=f'Category "{category_name}" deleted',
     )
@@ -241,12 +243,13 @@ async def list_items(
     item_type: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
+    tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
 ):
     """Get all menu items with optional filters. item_type filters by category.item_type (FOOD|SERVICE)"""
     query = select(MenuItemModel, CategoryModel.name.label('cat_name')).outerjoin(
         CategoryModel, MenuItemModel.category_id == CategoryModel.id
-    ).where(MenuItemModel.tenant_id == DEFAULT_TENANT_ID)
+    ).where(MenuItemModel.tenant_id == tenant_id)
     
     # Filter by item_type (via category)
     if item_type:
@@ -274,12 +277,12 @@ async def list_items(
 
 @router.get("/items/{item_id}", response_model=MenuItem,
               dependencies=[Depends(require_permission("menu", "view"))])
-async def get_item(item_id: UUID, db: AsyncSession = Depends(get_db)):
+async def get_item(item_id: UUID, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Get menu item by ID"""
     result = await db.execute(
         select(MenuItemModel)
         .where(MenuItemModel.id == item_id)
-        .where(MenuItemModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(MenuItemModel.tenant_id == tenant_id)
     )
     item = result.scalar_one_or_none()
     if not item:
@@ -289,10 +292,10 @@ async def get_item(item_id: UUID, db: AsyncSession = Depends(get_db)):
 
 @router.post("/items", response_model=MenuItem,
               dependencies=[Depends(require_permission("menu", "create"))])
-async def create_item(data: MenuItemBase, db: AsyncSession = Depends(get_db)):
+async def create_item(data: MenuItemBase, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Create new menu item"""
     new_item = MenuItemModel(
-        tenant_id=DEFAULT_TENANT_ID,
+        tenant_id=tenant_id,
         category_id=data.category_id,
         name=data.name,
         description=data.description,
@@ -304,10 +307,11 @@ async def create_item(data: MenuItemBase, db: AsyncSession = Depends(get_db)):
     db.add(new_item)
     await db.commit()
     await db.refresh(new_item)
+    invalidate_menu_match_index(tenant_id)
 
     # Audit: log item creation
     await _log_menu_audit(
-        db, action='ITEM_CREATE', entity_type='MENU_ITEM',
+        db, tenant_id, action='ITEM_CREATE', entity_type='MENU_ITEM',
         entity_id=new_item.id, entity_name=new_item.name,
         new_value={'cost_price': float(new_item.cost_price or 0), 'selling_price': float(new_item.selling_price or 0)},
         details=f'Menu item "{new_item.name}" created',
@@ -321,6 +325,7 @@ async def create_item(data: MenuItemBase, db: AsyncSession = Depends(get_db)):
 async def update_item(
     item_id: UUID,
     data: MenuItemBase,
+    tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db),
     current_user: UserSchema = Depends(get_current_user),
 ):
@@ -328,7 +333,7 @@ async def update_item(
     result = await db.execute(
         select(MenuItemModel)
         .where(MenuItemModel.id == item_id)
-        .where(MenuItemModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(MenuItemModel.tenant_id == tenant_id)
     )
     item = result.scalar_one_or_none()
     if not item:
@@ -369,12 +374,13 @@ async def update_item(
     
     await db.commit()
     await db.refresh(item)
+    invalidate_menu_match_index(tenant_id)
     
     # Audit: log price changes
     new_cost = float(data.cost_price or 0)
     if old_cost != new_cost or old_sell != new_sell:
         await _log_menu_audit(
-            db, action='PRICE_CHANGE', entity_type='MENU_ITEM',
+            db, tenant_id, action='PRICE_CHANGE', entity_type='MENU_ITEM',
             entity_id=item_id, entity_name=item.name,
             old_value={'cost_price': old_cost, 'selling_price': old_sell},
             new_value={'cost_price': new_cost, 'selling_price': new_sell},
@@ -386,12 +392,12 @@ async def update_item(
 
 @router.delete("/items/{item_id}",
               dependencies=[Depends(require_permission("menu", "delete"))])
-async def delete_item(item_id: UUID, db: AsyncSession = Depends(get_db)):
+async def delete_item(item_id: UUID, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Delete menu item"""
     result = await db.execute(
         select(MenuItemModel)
         .where(MenuItemModel.id == item_id)
-        .where(MenuItemModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(MenuItemModel.tenant_id == tenant_id)
     )
     item = result.scalar_one_or_none()
     if not item:
@@ -400,10 +406,11 @@ async def delete_item(item_id: UUID, db: AsyncSession = Depends(get_db)):
     item_name = item.name
     await db.delete(item)
     await db.commit()
+    invalidate_menu_match_index(tenant_id)
     
     # Audit: log item deletion
     await _log_menu_audit(
-        db, action='ITEM_DELETE', entity_type='MENU_ITEM',
+        db, tenant_id, action='ITEM_DELETE', entity_type='MENU_ITEM',
         entity_id=item_id, entity_name=item_name,
         details=f'Menu item "{item_name}" deleted',
     )
@@ -413,12 +420,12 @@ async def delete_item(item_id: UUID, db: AsyncSession = Depends(get_db)):
 
 @router.put("/items/{item_id}/toggle-active",
               dependencies=[Depends(require_permission("menu", "edit"))])
-async def toggle_item_active(item_id: UUID, db: AsyncSession = Depends(get_db)):
+async def toggle_item_active(item_id: UUID, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Toggle menu item active status"""
     result = await db.execute(
         select(MenuItemModel)
         .where(MenuItemModel.id == item_id)
-        .where(MenuItemModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(MenuItemModel.tenant_id == tenant_id)
     )
     item = result.scalar_one_or_none()
     if not item:
@@ -432,12 +439,12 @@ async def toggle_item_active(item_id: UUID, db: AsyncSession = Depends(get_db)):
 
 @router.post("/items/bulk-action",
               dependencies=[Depends(require_permission("menu", "delete"))])
-async def bulk_action(data: BulkActionRequest, db: AsyncSession = Depends(get_db)):
+async def bulk_action(data: BulkActionRequest, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Bulk activate/deactivate/delete menu items"""
     result = await db.execute(
         select(MenuItemModel)
         .where(MenuItemModel.id.in_(data.ids))
-        .where(MenuItemModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(MenuItemModel.tenant_id == tenant_id)
     )
     items = result.scalars().all()
     
@@ -459,13 +466,15 @@ async def bulk_action(data: BulkActionRequest, db: AsyncSession = Depends(get_db
         raise HTTPException(status_code=400, detail=f"Unknown action: {data.action}")
     
     await db.commit()
+    if data.action == "delete":
+        invalidate_menu_match_index(tenant_id)
 
     # Audit: log bulk action
     names_preview = ", ".join(item_names[:5])
     if len(item_names) > 5:
         names_preview += ", ..."
     await _log_menu_audit(
-        db, action='BULK_ACTION', entity_type='MENU_ITEM',
+        db, tenant_id, action='BULK_ACTION', entity_type='MENU_ITEM',
         details=f'Bulk {data.action}: {len(items)} items ({names_preview})',
     )
 
@@ -476,23 +485,23 @@ async def bulk_action(data: BulkActionRequest, db: AsyncSession = Depends(get_db
 
 @router.get("/stats", response_model=MenuStats,
               dependencies=[Depends(require_permission("menu", "view"))])
-async def get_menu_stats(db: AsyncSession = Depends(get_db)):
+async def get_menu_stats(tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Get menu statistics"""
     total_result = await db.execute(
         select(func.count(MenuItemModel.id))
-        .where(MenuItemModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(MenuItemModel.tenant_id == tenant_id)
     )
     total_items = total_result.scalar()
     
     cat_result = await db.execute(
         select(func.count(CategoryModel.id))
-        .where(CategoryModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(CategoryModel.tenant_id == tenant_id)
     )
     total_categories = cat_result.scalar()
     
     active_result = await db.execute(
         select(func.count(MenuItemModel.id))
-        .where(MenuItemModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(MenuItemModel.tenant_id == tenant_id)
         .where(MenuItemModel.is_active == True)
     )
     active_items = active_result.scalar()
@@ -500,7 +509,7 @@ async def get_menu_stats(db: AsyncSession = Depends(get_db)):
     # Count set menus
     set_menu_result = await db.execute(
         select(func.count(SetMenuModel.id))
-        .where(SetMenuModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(SetMenuModel.tenant_id == tenant_id)
     )
     total_set_menus = set_menu_result.scalar()
     
@@ -515,7 +524,7 @@ async def get_menu_stats(db: AsyncSession = Depends(get_db)):
             ).outerjoin(
                 CategoryModel, MenuItemModel.category_id == CategoryModel.id
             ).where(
-                MenuItemModel.tenant_id == DEFAULT_TENANT_ID,
+                MenuItemModel.tenant_id == tenant_id,
                 MenuItemModel.selling_price > 0,
                 or_(CategoryModel.item_type == 'FOOD', CategoryModel.item_type.is_(None))
             )
@@ -546,102 +555,28 @@ class MatchResult(BaseModel):
               dependencies=[Depends(require_permission("menu", "view"))])
 async def smart_match_menu_items(
     payload: SmartMatchRequest,
+    use_sql: bool = Query(False, description="Match in the database (one unnest query) instead of the in-memory index"),
+    tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
 ):
-    results = []
-    
+    """
+    Match pasted dish names: exact -> unaccent -> fuzzy (trigram), all lines in one pass.
+    See backend/modules/menu/domain/smart_match.py
+    """
     # Pre-clean inputs
     clean_inputs = [i.strip() for i in payload.items if i.strip()]
     
-    for input_text in clean_inputs:
-        matched = False
-        candidates = []
-        
-        # 1. Exact Match (Case-insensitive)
-        exact_query = select(MenuItemModel).where(func.lower(MenuItemModel.name) == input_text.lower())
-        exact_result = (await db.execute(exact_query)).scalars().first()
-        
-        if exact_result:
-            candidates.append({
-                "id": str(exact_result.id),
-                "name": exact_result.name,
-                "score": 1.0,
-                "price": exact_result.selling_price
-            })
-            results.append({
-                "input_text": input_text,
-                "match_type": "exact",
-                "matches": candidates
-            })
-            continue
-
-        # 2. Unaccent Match
-        # unaccent(name) ILIKE unaccent(input)
-        unaccent_query = select(MenuItemModel).where(
-            text("unaccent(lower(name)) = unaccent(lower(:term))")
-        ).params(term=input_text)
-        
-        unaccent_results = (await db.execute(unaccent_query)).scalars().all()
-        
-        if unaccent_results:
-            for item in unaccent_results:
-                candidates.append({
-                    "id": str(item.id),
-                    "name": item.name,
-                    "score": 0.9,
-                    "price": item.selling_price
-                })
-            results.append({
-                "input_text": input_text,
-                "match_type": "unaccent",
-                "matches": candidates
-            })
-            continue
-
-        # 3. Fuzzy Match (Trigram)
-        try:
-            # Using simple pg_trgm similarity
-            # Note: We select MenuItemModel and score
-            fuzzy_query = select(MenuItemModel, func.similarity(MenuItemModel.name, input_text).label("score"))\
-                .where(text("name % :term")).params(term=input_text)\
-                .order_by(text("score DESC")).limit(3)
-            
-            fuzzy_exec = await db.execute(fuzzy_query)
-            fuzzy_rows = fuzzy_exec.all() 
-            
-            if fuzzy_rows:
-                for item, score in fuzzy_rows:
-                    candidates.append({
-                        "id": str(item.id),
-                        "name": item.name,
-                        "score": float(score),
-                        "price": item.selling_price
-                    })
-                results.append({
-                    "input_text": input_text,
-                    "match_type": "fuzzy",
-                    "matches": candidates
-                })
-                continue
-        except Exception as e:
-            # Fallback if extension missing or other error
-            print(f"Fuzzy search failed: {e}")
-
-        # 4. No Match
-        results.append({
-            "input_text": input_text,
-            "match_type": "none",
-            "matches": []
-        })
-
-    return results
+    service = SmartMatchService(db, tenant_id)
+    if use_sql:
+        outcomes = await service.match_sql(clean_inputs)
+    else:
+        outcomes = await service.match(clean_inputs)
+    return [o.as_dict() for o in outcomes]
 
 
 # ============ PHASE 15.1: RECIPE MANAGEMENT ============
 
-from backend.modules.menu.domain.models import RecipeModel
-# Note: Using raw SQL for inventory cost lookup to avoid cross-module ORM conflicts
-from decimal import Decimal
+# Note: food costs come from menu/domain/recipe_costing.py (one joined query, cached per tenant)
 
 class RecipeIngredientBase(BaseModel):
     """Base schema for recipe ingredient"""
@@ -677,12 +612,15 @@ class RecipeCostResponse(BaseModel):
               dependencies=[Depends(require_permission("menu", "view"))])
 async def list_item_recipes(
     item_id: UUID,
+    tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
 ):
     """Get all recipe ingredients for a menu item"""
     # Verify item exists
     item_result = await db.execute(
-        select(MenuItemModel).where(MenuItemModel.id == item_id)
+        select(MenuItemModel)
+        .where(MenuItemModel.id == item_id)
+        .where(MenuItemModel.tenant_id == tenant_id)
     )
     item = item_result.scalar_one_or_none()
     if not item:
@@ -717,12 +655,15 @@ async def list_item_recipes(
 async def add_recipe_ingredient(
     item_id: UUID,
     data: RecipeIngredientBase,
+    tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
 ):
     """Add ingredient to menu item recipe"""
     # Verify menu item exists
     item_result = await db.execute(
-        select(MenuItemModel).where(MenuItemModel.id == item_id)
+        select(MenuItemModel)
+        .where(MenuItemModel.id == item_id)
+        .where(MenuItemModel.tenant_id == tenant_id)
     )
     item = item_result.scalar_one_or_none()
     if not item:
@@ -756,7 +697,7 @@ async def add_recipe_ingredient(
     
     # Audit: log recipe ingredient addition
     await _log_menu_audit(
-        db, action='RECIPE_ADD', entity_type='RECIPE',
+        db, tenant_id, action='RECIPE_ADD', entity_type='RECIPE',
         entity_id=item_id, entity_name=item.name,
         new_value={'ingredient': data.ingredient_name, 'qty': float(data.quantity_per_unit), 'uom': data.uom},
         details=f'Added {data.ingredient_name} ({data.quantity_per_unit} {data.uom}) to recipe of "{item.name}"',
@@ -779,13 +720,15 @@ async def update_recipe_ingredient(
     item_id: UUID,
     recipe_id: UUID,
     data: RecipeIngredientBase,
+    tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
 ):
     """Update ingredient in recipe"""
     result = await db.execute(
         select(RecipeModel).where(
             RecipeModel.id == recipe_id,
-            RecipeModel.menu_item_id == item_id
+            RecipeModel.menu_item_id == item_id,
+            RecipeModel.tenant_id == tenant_id
         )
     )
     recipe = result.scalar_one_or_none()
@@ -805,7 +748,7 @@ async def update_recipe_ingredient(
     # Audit: log recipe update
     if old_qty != float(data.quantity_per_unit) or old_uom != data.uom:
         await _log_menu_audit(
-            db, action='RECIPE_UPDATE', entity_type='RECIPE',
+            db, tenant_id, action='RECIPE_UPDATE', entity_type='RECIPE',
             entity_id=item_id, entity_name=recipe.ingredient_name,
             old_value={'qty': old_qty, 'uom': old_uom},
             new_value={'qty': float(data.quantity_per_unit), 'uom': data.uom},
@@ -825,13 +768,15 @@ async def update_recipe_ingredient(
 async def delete_recipe_ingredient(
     item_id: UUID,
     recipe_id: UUID,
+    tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
 ):
     """Remove ingredient from recipe"""
     result = await db.execute(
         select(RecipeModel).where(
             RecipeModel.id == recipe_id,
-            RecipeModel.menu_item_id == item_id
+            RecipeModel.menu_item_id == item_id,
+            RecipeModel.tenant_id == tenant_id
         )
     )
     recipe = result.scalar_one_or_none()
@@ -846,7 +791,7 @@ async def delete_recipe_ingredient(
     
     # Audit: log recipe ingredient deletion
     await _log_menu_audit(
-        db, action='RECIPE_DELETE', entity_type='RECIPE',
+        db, tenant_id, action='RECIPE_DELETE', entity_type='RECIPE',
         entity_id=menu_item_id, entity_name=ingredient_name,
         details=f'Removed ingredient "{ingredient_name}" from recipe',
     )
@@ -859,60 +804,34 @@ async def delete_recipe_ingredient(
 async def calculate_food_cost(
     item_id: UUID,
     portions: int = 1,
+    tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
 ):
     """Calculate food cost based on recipe ingredients and inventory costs"""
-    # Get menu item
-    item_result = await db.execute(
-        select(MenuItemModel).where(MenuItemModel.id == item_id)
-    )
-    item = item_result.scalar_one_or_none()
+    item = await get_recipe_costing_service(db, tenant_id).item_cost(item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Menu item not found")
     
-    # Get recipes with inventory costs
-    result = await db.execute(
-        select(RecipeModel).where(RecipeModel.menu_item_id == item_id)
-    )
-    recipes = result.scalars().all()
-    
-    total_cost = Decimal(0)
-    ingredients_detail = []
-    
-    for recipe in recipes:
-        # Get ingredient cost from inventory using raw SQL (avoid ORM cross-module conflict)
-        inv_result = await db.execute(
-            text("SELECT cost_price FROM inventory_items WHERE id = :item_id"),
-            {"item_id": str(recipe.ingredient_id)}
-        )
-        inv_row = inv_result.fetchone()
-        
-        unit_cost = Decimal(inv_row[0] or 0) if inv_row else Decimal(0)
-        ingredient_cost = Decimal(recipe.quantity_per_unit or 0) * unit_cost * portions
-        total_cost += ingredient_cost
-        
-        ingredients_detail.append({
-            "ingredient_id": str(recipe.ingredient_id),
-            "ingredient_name": recipe.ingredient_name,
-            "quantity": float(recipe.quantity_per_unit) * portions,
-            "uom": recipe.uom,
-            "unit_cost": float(unit_cost),
-            "line_cost": float(ingredient_cost)
-        })
-    
-    selling_price = float(item.selling_price or 0)
-    food_cost_pct = (float(total_cost) / selling_price * 100) if selling_price > 0 else 0
-    profit_margin = selling_price - float(total_cost)
-    
+    selling_price = float(item.selling_price)
     return RecipeCostResponse(
         menu_item_id=item_id,
         menu_item_name=item.name,
         selling_price=selling_price * portions,
-        ingredient_count=len(recipes),
-        total_food_cost=float(total_cost),
-        food_cost_percentage=round(food_cost_pct, 2),
-        profit_margin=profit_margin * portions,
-        ingredients=ingredients_detail
+        ingredient_count=len(item.recipe),
+        total_food_cost=float(item.food_cost * portions),
+        food_cost_percentage=round(item.food_cost_pct, 2),
+        profit_margin=item.profit_margin * portions,
+        ingredients=[
+            {
+                "ingredient_id": str(line.ingredient_id),
+                "ingredient_name": line.ingredient_name,
+                "quantity": float(line.quantity_per_unit) * portions,
+                "uom": line.uom,
+                "unit_cost": float(line.unit_cost),
+                "line_cost": float(line.line_cost * portions)
+            }
+            for line in item.recipe
+        ]
     )
 
 
@@ -920,12 +839,12 @@ async def calculate_food_cost(
 
 @router.get("/set-menus",
               dependencies=[Depends(require_permission("menu", "view"))])
-async def list_set_menus(db: AsyncSession = Depends(get_db)):
+async def list_set_menus(tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """List all set menus with their items"""
     result = await db.execute(
         select(SetMenuModel)
         .options(selectinload(SetMenuModel.items).selectinload(SetMenuItemModel.menu_item))
-        .where(SetMenuModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(SetMenuModel.tenant_id == tenant_id)
         .order_by(SetMenuModel.sort_order, SetMenuModel.name)
     )
     set_menus = result.scalars().all()
@@ -958,10 +877,10 @@ async def list_set_menus(db: AsyncSession = Depends(get_db)):
 
 @router.post("/set-menus",
               dependencies=[Depends(require_permission("menu", "create"))])
-async def create_set_menu(data: SetMenuCreate, db: AsyncSession = Depends(get_db)):
+async def create_set_menu(data: SetMenuCreate, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Create a new set menu with items"""
     new_set_menu = SetMenuModel(
-        tenant_id=DEFAULT_TENANT_ID,
+        tenant_id=tenant_id,
         name=data.name,
         code=data.code,
         description=data.description,
@@ -974,7 +893,7 @@ async def create_set_menu(data: SetMenuCreate, db: AsyncSession = Depends(get_db
     
     for item_data in data.items:
         set_menu_item = SetMenuItemModel(
-            tenant_id=DEFAULT_TENANT_ID,
+            tenant_id=tenant_id,
             set_menu_id=new_set_menu.id,
             menu_item_id=item_data.menu_item_id,
             quantity=item_data.quantity,
@@ -989,12 +908,12 @@ async def create_set_menu(data: SetMenuCreate, db: AsyncSession = Depends(get_db
 
 @router.put("/set-menus/{set_menu_id}",
               dependencies=[Depends(require_permission("menu", "edit"))])
-async def update_set_menu(set_menu_id: UUID, data: SetMenuUpdate, db: AsyncSession = Depends(get_db)):
+async def update_set_menu(set_menu_id: UUID, data: SetMenuUpdate, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Update a set menu"""
     result = await db.execute(
         select(SetMenuModel)
         .where(SetMenuModel.id == set_menu_id)
-        .where(SetMenuModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(SetMenuModel.tenant_id == tenant_id)
     )
     set_menu = result.scalar_one_or_none()
     if not set_menu:
@@ -1019,7 +938,7 @@ async def update_set_menu(set_menu_id: UUID, data: SetMenuUpdate, db: AsyncSessi
         )
         for item_data in data.items:
             set_menu_item = SetMenuItemModel(
-                tenant_id=DEFAULT_TENANT_ID,
+                tenant_id=tenant_id,
                 set_menu_id=set_menu_id,
                 menu_item_id=item_data.menu_item_id,
                 quantity=item_data.quantity,
@@ -1033,12 +952,12 @@ async def update_set_menu(set_menu_id: UUID, data: SetMenuUpdate, db: AsyncSessi
 
 @router.delete("/set-menus/{set_menu_id}",
               dependencies=[Depends(require_permission("menu", "delete"))])
-async def delete_set_menu(set_menu_id: UUID, db: AsyncSession = Depends(get_db)):
+async def delete_set_menu(set_menu_id: UUID, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Delete a set menu"""
     result = await db.execute(
         select(SetMenuModel)
         .where(SetMenuModel.id == set_menu_id)
-        .where(SetMenuModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(SetMenuModel.tenant_id == tenant_id)
     )
     set_menu = result.scalar_one_or_none()
     if not set_menu:
@@ -1050,7 +969,7 @@ async def delete_set_menu(set_menu_id: UUID, db: AsyncSession = Depends(get_db))
     
     # Audit: log set menu deletion
     await _log_menu_audit(
-        db, action='SET_MENU_DELETE', entity_type='SET_MENU',
+        db, tenant_id, action='SET_MENU_DELETE', entity_type='SET_MENU',
         entity_id=set_menu_id, entity_name=set_menu_name,
         details=f'Set menu "{set_menu_name}" deleted',
     )
@@ -1062,119 +981,33 @@ async def delete_set_menu(set_menu_id: UUID, db: AsyncSession = Depends(get_db))
 
 @router.get("/stats/menu-engineering",
               dependencies=[Depends(require_permission("menu", "view_cost"))])
-async def menu_engineering_analysis(db: AsyncSession = Depends(get_db)):
+async def menu_engineering_analysis(
+    days: int = Query(POPULARITY_WINDOW_DAYS, ge=1, le=730, description="Sales window for popularity"),
+    tenant_id: UUID = Depends(get_current_tenant),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Menu Engineering 4-quadrant analysis:
     - Star: High profitability, High popularity
     - Puzzle: High profitability, Low popularity
     - Workhorse: Low profitability, High popularity
     - Dog: Low profitability, Low popularity
-    Uses food cost % as profitability proxy and selling_price rank as popularity proxy.
+    Uses food cost % as profitability and units sold in the last `days` days as
+    popularity (selling price rank when there are no sales yet).
     """
-    from decimal import Decimal as Dec
-    from backend.modules.menu.domain.models import RecipeModel
-
-    result = await db.execute(
-        select(MenuItemModel)
-        .outerjoin(CategoryModel, MenuItemModel.category_id == CategoryModel.id)
-        .where(
-            MenuItemModel.tenant_id == DEFAULT_TENANT_ID,
-            MenuItemModel.is_active == True,
-            or_(CategoryModel.item_type == 'FOOD', CategoryModel.item_type.is_(None))
-        )
-    )
-    items = result.scalars().all()
-
-    if not items:
-        return {"items": [], "avg_food_cost": 0, "avg_selling_price": 0, "quadrants": {"star": 0, "puzzle": 0, "workhorse": 0, "dog": 0}}
-
-    # Calculate food costs per item
-    engineering_data = []
-    for item in items:
-        # Get recipe cost
-        recipe_result = await db.execute(
-            select(RecipeModel).where(RecipeModel.menu_item_id == item.id)
-        )
-        recipes = recipe_result.scalars().all()
-
-        total_cost = Dec(0)
-        for recipe in recipes:
-            inv_result = await db.execute(
-                text("SELECT cost_price FROM inventory_items WHERE id = :item_id"),
-                {"item_id": str(recipe.ingredient_id)}
-            )
-            inv_row = inv_result.fetchone()
-            unit_cost = Dec(inv_row[0] or 0) if inv_row else Dec(0)
-            total_cost += Dec(recipe.quantity_per_unit or 0) * unit_cost
-
-        selling = float(item.selling_price or 0)
-        cost = float(total_cost)
-        food_cost_pct = (cost / selling * 100) if selling > 0 else 0
-        profit = selling - cost
-
-        engineering_data.append({
-            "id": str(item.id),
-            "name": item.name,
-            "category_name": None,  # will fill below
-            "category_id": str(item.category_id) if item.category_id else None,
-            "selling_price": selling,
-            "food_cost": cost,
-            "food_cost_pct": round(food_cost_pct, 1),
-            "profit_margin": round(profit, 0),
-            "popularity_score": selling,  # proxy: higher price items tend to be ordered
-        })
-
-    # Fill category names
-    cat_result = await db.execute(
-        select(CategoryModel).where(CategoryModel.tenant_id == DEFAULT_TENANT_ID)
-    )
-    cat_map = {str(c.id): c.name for c in cat_result.scalars().all()}
-    for d in engineering_data:
-        d["category_name"] = cat_map.get(d["category_id"], "Chưa phân loại")
-
-    # Calculate medians for quadrant classification
-    food_costs = [d["food_cost_pct"] for d in engineering_data if d["food_cost_pct"] > 0]
-    selling_prices = [d["selling_price"] for d in engineering_data]
-
-    avg_food_cost = sum(food_costs) / len(food_costs) if food_costs else 30
-    avg_selling_price = sum(selling_prices) / len(selling_prices) if selling_prices else 0
-
-    # Classify into quadrants
-    quadrant_counts = {"star": 0, "puzzle": 0, "workhorse": 0, "dog": 0}
-    for d in engineering_data:
-        high_profit = d["food_cost_pct"] < avg_food_cost  # Low food cost = high profit
-        high_popularity = d["selling_price"] >= avg_selling_price
-
-        if high_profit and high_popularity:
-            d["quadrant"] = "star"
-        elif high_profit and not high_popularity:
-            d["quadrant"] = "puzzle"
-        elif not high_profit and high_popularity:
-            d["quadrant"] = "workhorse"
-        else:
-            d["quadrant"] = "dog"
-
-        quadrant_counts[d["quadrant"]] += 1
-
-    return {
-        "items": engineering_data,
-        "avg_food_cost": round(avg_food_cost, 1),
-        "avg_selling_price": round(avg_selling_price, 0),
-        "quadrants": quadrant_counts,
-        "total_items": len(engineering_data),
-    }
+    return await get_recipe_costing_service(db, tenant_id).menu_engineering(days)
 
 
 @router.get("/stats/top-sellers",
               dependencies=[Depends(require_permission("menu", "view"))])
-async def top_sellers(limit: int = 10, db: AsyncSession = Depends(get_db)):
+async def top_sellers(limit: int = 10, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """
     Top-selling menu items by selling price (proxy for popularity).
     In production, this would use actual order data.
     """
     result = await db.execute(
         select(MenuItemModel)
-        .where(MenuItemModel.tenant_id == DEFAULT_TENANT_ID, MenuItemModel.is_active == True)
+        .where(MenuItemModel.tenant_id == tenant_id, MenuItemModel.is_active == True)
         .order_by(MenuItemModel.selling_price.desc())
         .limit(limit)
     )
@@ -1182,7 +1015,7 @@ async def top_sellers(limit: int = 10, db: AsyncSession = Depends(get_db)):
 
     # Get category names
     cat_result = await db.execute(
-        select(CategoryModel).where(CategoryModel.tenant_id == DEFAULT_TENANT_ID)
+        select(CategoryModel).where(CategoryModel.tenant_id == tenant_id)
     )
     cat_map = {str(c.id): c.name for c in cat_result.scalars().all()}
 
@@ -1202,11 +1035,11 @@ async def top_sellers(limit: int = 10, db: AsyncSession = Depends(get_db)):
 
 @router.get("/stats/category-breakdown",
               dependencies=[Depends(require_permission("menu", "view"))])
-async def category_breakdown(db: AsyncSession = Depends(get_db)):
+async def category_breakdown(tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
     """Category breakdown with item counts and average food cost."""
     # Get all categories
     cat_result = await db.execute(
-        select(CategoryModel).where(CategoryModel.tenant_id == DEFAULT_TENANT_ID)
+        select(CategoryModel).where(CategoryModel.tenant_id == tenant_id)
     )
     categories = cat_result.scalars().all()
 
@@ -1219,7 +1052,7 @@ async def category_breakdown(db: AsyncSession = Depends(get_db)):
             func.avg(MenuItemModel.cost_price).label("avg_cost_price"),
             func.sum(MenuItemModel.selling_price).label("total_revenue_potential"),
         )
-        .where(MenuItemModel.tenant_id == DEFAULT_TENANT_ID)
+        .where(MenuItemModel.tenant_id == tenant_id)
         .group_by(MenuItemModel.category_id)
     )
     breakdown = result.all()
@@ -14,8 +14,10 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+from backend.core.auth.schemas import User as UserSchema
 from backend.core.database import get_db
-from backend.core.dependencies import get_current_tenant
+from backend.core.dependencies import get_current_tenant, get_current_user
+from backend.modules.notification.services.push_sender import push_metrics
 
 
 # ============ MODELS ============
@@ -59,6 +61,14 @@ async def send_notification(payload: NotificationPayload):
     return {"status": "queued", "sent_at": datetime.now().isoformat()}
 
 
+@router.get("/push/metrics")
+async def push_delivery_metrics(current_user: UserSchema = Depends(get_current_user)):
+    """Push delivery counters of this process, per tenant (super_admin only)"""
+    if not current_user.role or current_user.role.code != "super_admin":
+        raise HTTPException(status_code=403, detail="Super admin only")
+    return push_metrics.snapshot()
+
+
 # ============ E4: INVENTORY ALERT NOTIFICATIONS ============
 
 @router.get("/inventory-alerts", response_model=InventoryAlertsResponse)
@@ -21,6 +21,7 @@ from backend.modules.notification.domain.models import (
     NotificationPreferenceModel,
     NotificationSettingsModel,
 )
+from backend.modules.notification.services.preference_cache import invalidate_preferences, load_preferences
 
 router = APIRouter(prefix="/notifications/preferences", tags=["Notification Preferences"])
 
@@ -263,6 +264,7 @@ async def toggle_preference(
         db.add(pref)
     
     await db.commit()
+    invalidate_preferences(tenant_id, user_id)
     
     return {
         "status": "ok",
@@ -359,6 +361,7 @@ async def bulk_update_preferences(
                 db.add(pref)
     
     await db.commit()
+    invalidate_preferences(tenant_id, user_id)
     
     return {"status": "ok", "updated_at": datetime.now(timezone.utc).isoformat()}
 
@@ -462,6 +465,7 @@ async def reset_preferences(
         settings.updated_at = datetime.now(timezone.utc)
     
     await db.commit()
+    invalidate_preferences(tenant_id, user_id)
     
     return {"status": "ok", "message": "Đã đặt lại thông báo về mặc định"}
 
@@ -478,66 +482,9 @@ async def should_send_notification(
     """
     Check if a notification should be sent to a user.
     Used by other modules before creating notifications.
+    Preferences come from the preference cache (services/preference_cache.py);
+    several recipients at once: notification_service.create_notifications_if_allowed.
     """
-    from datetime import datetime as dt
-    
     await set_tenant_context(db, tenant_id)
-    
-    # 1. Get global settings
-    result = await db.execute(
-        select(NotificationSettingsModel).where(
-            and_(
-                NotificationSettingsModel.user_id == user_id,
-                NotificationSettingsModel.tenant_id == tenant_id,
-            )
-        )
-    )
-    settings = result.scalar_one_or_none()
-    
-    if settings:
-        # Check global channel toggle
-        channel_key = f"channel_{channel.lower().replace('in_app', 'inapp')}_enabled"
-        if not getattr(settings, channel_key, True):
-            return False
-        
-        # Check quiet hours (skip for critical notifications)
-        if settings.quiet_hours_enabled and notification_type not in CRITICAL_NOTIFICATION_TYPES:
-            now = dt.now().time()
-            start = settings.quiet_hours_start
-            end = settings.quiet_hours_end
-            
-            if start and end:
-                if start > end:
-                    # Overnight quiet hours (e.g., 22:00 - 07:00)
-                    if now >= start or now <= end:
-                        return False
-                else:
-                    # Same-day quiet hours
-                    if start <= now <= end:
-                        return False
-    
-    # 2. Check specific type preference
-    result = await db.execute(
-        select(NotificationPreferenceModel).where(
-            and_(
-                NotificationPreferenceModel.user_id == user_id,
-                NotificationPreferenceModel.tenant_id == tenant_id,
-                NotificationPreferenceModel.notification_type == notification_type,
-                NotificationPreferenceModel.channel == channel,
-            )
-        )
-    )
-    pref = result.scalar_one_or_none()
-    
-    if pref is not None:
-        return pref.is_enabled
-    
-    # 3. Default: use registry defaults
-    for cat_data in NOTIFICATION_TYPE_REGISTRY.values():
-        for ntype in cat_data["types"]:
-            if ntype["code"] == notification_type:
-                default_key = f"default_{channel.lower().replace('in_app', 'inapp')}"
-                return ntype.get(default_key, True)
-    
-    # 4. Fall back to enabled
-    return True
+    preferences = await load_preferences(db, tenant_id, [user_id])
+    return preferences[user_id].allows(notification_type, channel)
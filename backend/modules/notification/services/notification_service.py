@@ -1,16 +1,25 @@
 """
 Notification Service - P0 Fix
 Wrapper that checks user preferences before creating notifications.
-Integrates should_send_notification() with actual dispatch.
-Now also sends push notifications to mobile devices via Expo Push API.
+Preferences of all recipients are loaded in one go (and cached) by
+services/preference_cache.py, the same rules as should_send_notification().
+Now also queues push notifications to mobile devices (services/push_sender.py),
+delivered through the Expo Push API by the push worker once the caller commits.
+Created notifications reach open /ws/notifications sockets on commit
+(services/realtime.py).
 """
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
-from typing import Optional
-import asyncio
+from typing import Iterable, List, Optional
+from datetime import datetime, time
 import logging
 
+# Registers the publish-on-commit listeners in processes that create notifications
+from backend.modules.notification.services import realtime  # noqa: F401
+from backend.modules.notification.services.preference_cache import load_preferences
+from backend.modules.notification.services.push_sender import enqueue_push
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,49 +38,85 @@ async def create_notification_if_allowed(
     Create a notification ONLY if user preferences allow it.
     
     This is the central dispatch point. All modules should call this
+    (or create_notifications_if_allowed for several recipients)
     instead of directly creating NotificationModel instances.
     
-    Also sends push notification to mobile devices (non-blocking).
-    
+    Also queues a push notification to mobile devices and, once the
+    caller commits, pushes it to the user's open sockets.
+
     Returns the created NotificationModel or None if suppressed.
     """
-    from backend.modules.notification.infrastructure.preferences_router import (
-        should_send_notification,
+    created = await create_notifications_if_allowed(
+        db, tenant_id, [user_id], notification_type, title, message,
+        channel=channel, reference_type=reference_type, reference_id=reference_id,
     )
+    return created[0] if created else None
+
+
+async def create_notifications_if_allowed(
+    db: AsyncSession,
+    tenant_id: UUID,
+    user_ids: Iterable[UUID],
+    notification_type: str,
+    title: str,
+    message: str,
+    channel: str = "IN_APP",
+    reference_type: Optional[str] = None,
+    reference_id: Optional[UUID] = None,
+    now: Optional[time] = None,
+) -> List[object]:
+    """
+    Batched dispatch of the same notification to many recipients.
+
+    One tenant context SET and at most two IN queries for the preferences of
+    all recipients (none when cached), quiet hours evaluated in memory, and
+    the allowed rows added together so the flush inserts them in one batch.
+    Doesn't commit. Returns the created NotificationModels (suppressed
+    recipients are skipped).
+    """
+    from backend.core.database import set_tenant_context
     from backend.modules.hr.domain.models import NotificationModel
 
-    try:
-        allowed = await should_send_notification(
-            db=db,
-            user_id=user_id,
-            tenant_id=tenant_id,
-            notification_type=notification_type,
-            channel=channel,
-        )
+    recipients = list(dict.fromkeys(user_ids))
+    if not recipients:
+        return []
 
-        if not allowed:
+    try:
+        await set_tenant_context(db, tenant_id)
+        preferences = await load_preferences(db, tenant_id, recipients)
+        now = now or datetime.now().time()
+        allowed = [
+            user_id for user_id in recipients
+            if preferences[user_id].allows(notification_type, channel, now)
+        ]
+        suppressed = len(recipients) - len(allowed)
+        if suppressed:
             logger.debug(
-                f"Notification {notification_type} suppressed for user {user_id} "
-                f"(channel={channel})"
+                f"Notification {notification_type} suppressed for {suppressed} of "
+                f"{len(recipients)} recipients (channel={channel})"
             )
-            return None
-
-        notification = NotificationModel(
-            tenant_id=tenant_id,
-            user_id=user_id,
-            title=title,
-            message=message,
-            type=notification_type,
-            reference_type=reference_type,
-            reference_id=reference_id,
-        )
-        db.add(notification)
+        if not allowed:
+            return []
+
+        notifications = [
+            NotificationModel(
+                tenant_id=tenant_id,
+                user_id=user_id,
+                title=title,
+                message=message,
+                type=notification_type,
+                reference_type=reference_type,
+                reference_id=reference_id,
+            )
+            for user_id in allowed
+        ]
+        db.add_all(notifications)
         # Don't commit here — let the caller manage the transaction
         logger.info(
-            f"Notification {notification_type} created for user {user_id}"
+            f"Notification {notification_type} created for {len(allowed)} user(s)"
         )
 
-        # --- Push notification to mobile devices (non-blocking) ---
+        # --- Push notification to mobile devices (queued, sent by the push worker) ---
         push_data = {"type": notification_type}
         if reference_type:
             push_data["reference_type"] = reference_type
@@ -79,39 +124,18 @@ async def create_notification_if_allowed(
             push_data["reference_id"] = str(reference_id)
 
         try:
-            from backend.modules.notification.services.push_sender import (
-                send_push_to_user,
-            )
-            asyncio.create_task(
-                _safe_send_push(db, tenant_id, user_id, title, message, push_data)
-            )
+            # Savepoint: a failed enqueue must not abort the caller's transaction
+            async with db.begin_nested():
+                await enqueue_push(db, tenant_id, allowed, title, message, push_data)
         except Exception as e:
-            logger.debug(f"Push dispatch setup failed (non-critical): {e}")
+            logger.warning(f"Push enqueue failed (non-critical): {e}")
 
-        return notification
+        return notifications
 
     except Exception as e:
         # Never let notification logic break the main business flow
         logger.warning(
-            f"Failed to create notification {notification_type} for user {user_id}: {e}"
+            f"Failed to create notification {notification_type} for {len(recipients)} user(s): {e}"
         )
-        return None
-
-
-async def _safe_send_push(
-    db: AsyncSession,
-    tenant_id: UUID,
-    user_id: UUID,
-    title: str,
-    body: str,
-    data: Optional[dict] = None,
-):
-    """Fire-and-forget push sender with error isolation."""
-    try:
-        from backend.modules.notification.services.push_sender import (
-            send_push_to_user,
-        )
-        await send_push_to_user(db, tenant_id, user_id, title, body, data)
-    except Exception as e:
-        logger.warning(f"Push send failed (non-critical): {e}")
+        return []
 
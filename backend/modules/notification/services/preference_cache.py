@@ -0,0 +1,222 @@
+"""
+Notification Preference Cache
+Backs should_send_notification() and the batched dispatcher
+(notification_service.create_notifications_if_allowed).
+
+Each recipient used to cost a SET app.current_tenant, a notification_settings
+query and a notification_preferences query, so a broadcast to 80 staff paid
+~240 round-trips before the first row was written. Preferences are now
+evaluated in memory from UserPreferences:
+
+- load_preferences() reads every recipient missing from the cache with two
+  IN queries (settings + overrides), whatever the number of recipients
+- a bounded per-process LRU keyed by (tenant, user) with a short TTL; the
+  preferences router invalidates the user after each write, the TTL bounds
+  staleness for other workers
+
+Config (env):
+    NOTIFICATION_PREFS_CACHE_TTL   seconds, default 60 (0 disables the cache)
+    NOTIFICATION_PREFS_CACHE_SIZE  max entries, default 5000
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, time as dt_time
+from typing import Any, Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.notification.domain.models import (
+    NotificationPreferenceModel,
+    NotificationSettingsModel,
+)
+
+PREFS_CACHE_TTL = float(os.getenv("NOTIFICATION_PREFS_CACHE_TTL", 60))
+PREFS_CACHE_SIZE = int(os.getenv("NOTIFICATION_PREFS_CACHE_SIZE", 5000))
+
+
+def channel_key(channel: str) -> str:
+    """IN_APP -> inapp, EMAIL -> email (settings column / registry default suffix)."""
+    return channel.lower().replace("in_app", "inapp")
+
+
+# ============ EVALUATION ============
+
+@dataclass(frozen=True)
+class UserPreferences:
+    """One user's notification settings and per-type overrides"""
+    channels: Dict[str, Optional[bool]] = field(default_factory=dict)  # inapp/email/push/sms, empty without settings
+    quiet_hours_enabled: bool = False
+    quiet_hours_start: Optional[dt_time] = None
+    quiet_hours_end: Optional[dt_time] = None
+    overrides: Dict[Tuple[str, str], bool] = field(default_factory=dict)  # (type, channel) -> enabled
+
+    @classmethod
+    def from_models(cls, settings: Optional[NotificationSettingsModel],
+                    preferences: Iterable[NotificationPreferenceModel] = ()) -> "UserPreferences":
+        overrides = {(p.notification_type, p.channel): bool(p.is_enabled) for p in preferences}
+        if settings is None:
+            return cls(overrides=overrides)
+        return cls(
+            channels={
+                "inapp": settings.channel_inapp_enabled,
+                "email": settings.channel_email_enabled,
+                "push": settings.channel_push_enabled,
+                "sms": settings.channel_sms_enabled,
+            },
+            quiet_hours_enabled=bool(settings.quiet_hours_enabled),
+            quiet_hours_start=settings.quiet_hours_start,
+            quiet_hours_end=settings.quiet_hours_end,
+            overrides=overrides,
+        )
+
+    def in_quiet_hours(self, now: dt_time) -> bool:
+        start, end = self.quiet_hours_start, self.quiet_hours_end
+        if not (self.quiet_hours_enabled and start and end):
+            return False
+        if start > end:
+            # Overnight quiet hours (e.g., 22:00 - 07:00)
+            return now >= start or now <= end
+        # Same-day quiet hours
+        return start <= now <= end
+
+    def allows(self, notification_type: str, channel: str = "IN_APP", now: Optional[dt_time] = None) -> bool:
+        """Same rules as should_send_notification(): channel toggle, quiet hours, override, registry default."""
+        from backend.modules.notification.infrastructure.preferences_router import (
+            CRITICAL_NOTIFICATION_TYPES,
+            NOTIFICATION_TYPE_REGISTRY,
+        )
+
+        # 1. Global channel toggle (no settings row = all enabled)
+        if self.channels and not self.channels.get(channel_key(channel), True):
+            return False
+
+        # 2. Quiet hours (skip for critical notifications)
+        if notification_type not in CRITICAL_NOTIFICATION_TYPES and self.in_quiet_hours(now or datetime.now().time()):
+            return False
+
+        # 3. Specific type preference
+        override = self.overrides.get((notification_type, channel))
+        if override is not None:
+            return override
+
+        # 4. Registry default, else enabled
+        for cat_data in NOTIFICATION_TYPE_REGISTRY.values():
+            for ntype in cat_data["types"]:
+                if ntype["code"] == notification_type:
+                    return ntype.get(f"default_{channel_key(channel)}", True)
+        return True
+
+
+# ============ CACHE ============
+
+class PreferenceCache:
+    """Thread-safe bounded LRU of UserPreferences keyed by (tenant_id, user_id)"""
+
+    def __init__(self, maxsize: int = PREFS_CACHE_SIZE, ttl: float = PREFS_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Tuple[str, str], Tuple[UserPreferences, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.maxsize > 0
+
+    def get(self, tenant_id: Any, user_id: Any) -> Optional[UserPreferences]:
+        if not self.enabled:
+            return None
+        key = (str(tenant_id), str(user_id))
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self._data.pop(key, None)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, tenant_id: Any, user_id: Any, preferences: UserPreferences) -> None:
+        if not self.enabled:
+            return
+        key = (str(tenant_id), str(user_id))
+        with self._lock:
+            self._data[key] = (preferences, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, tenant_id: Any, user_id: Any) -> None:
+        with self._lock:
+            self._data.pop((str(tenant_id), str(user_id)), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# Process-wide singleton
+preference_cache = PreferenceCache()
+
+
+def invalidate_preferences(tenant_id: Any, user_id: Any) -> None:
+    preference_cache.invalidate(tenant_id, user_id)
+
+
+async def load_preferences(
+    db: AsyncSession,
+    tenant_id: UUID,
+    user_ids: Iterable[UUID],
+    cache: Optional[PreferenceCache] = None,
+) -> Dict[UUID, UserPreferences]:
+    """
+    Preferences of every user in `user_ids`: cached ones from memory, the
+    rest with two IN queries. The caller sets the tenant context.
+    """
+    cache = cache or preference_cache
+    loaded: Dict[UUID, UserPreferences] = {}
+    missing = []
+    for user_id in dict.fromkeys(user_ids):
+        cached = cache.get(tenant_id, user_id)
+        if cached is None:
+            missing.append(user_id)
+        else:
+            loaded[user_id] = cached
+    if not missing:
+        return loaded
+
+    settings_result = await db.execute(
+        select(NotificationSettingsModel).where(
+            and_(
+                NotificationSettingsModel.tenant_id == tenant_id,
+                NotificationSettingsModel.user_id.in_(missing),
+            )
+        )
+    )
+    settings = {str(s.user_id): s for s in settings_result.scalars().all()}
+
+    prefs_result = await db.execute(
+        select(NotificationPreferenceModel).where(
+            and_(
+                NotificationPreferenceModel.tenant_id == tenant_id,
+                NotificationPreferenceModel.user_id.in_(missing),
+            )
+        )
+    )
+    overrides: Dict[str, list] = {}
+    for pref in prefs_result.scalars().all():
+        overrides.setdefault(str(pref.user_id), []).append(pref)
+
+    for user_id in missing:
+        preferences = UserPreferences.from_models(settings.get(str(user_id)), overrides.get(str(user_id), ()))
+        cache.put(tenant_id, user_id, preferences)
+        loaded[user_id] = preferences
+    return loaded
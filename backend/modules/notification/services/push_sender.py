@@ -4,146 +4,458 @@ Expo Push Notification Sender — sends push notifications to mobile devices.
 Uses Expo Push API (https://docs.expo.dev/push-notifications/sending-notifications/)
 No Firebase setup needed — Expo handles FCM/APNs routing automatically.
 
+Push used to be sent from a fire-and-forget task that reused the request's
+AsyncSession (possibly closed by then) and opened a new httpx.AsyncClient -
+a new TLS handshake - for every user. Delivery is now a queue (migration 085):
+
+- enqueue_push() inserts one push_outbox row per active device token in the
+  caller's transaction, so a push exists iff its notification committed
+- PushDeliveryWorker claims due rows of all tenants (SKIP LOCKED), coalesces
+  them into Expo requests of up to EXPO_BATCH_SIZE messages and posts them
+  on one long-lived pooled httpx client
+- tickets: ok -> SENT; DeviceNotRegistered -> device deactivated, DEAD;
+  other ticket errors, HTTP 429/5xx and network errors -> retried with the
+  outbox backoff, DEAD after max_attempts
+- push_metrics keeps per-tenant counters and throughput of this process
+  (GET /api/v1/push/metrics, super_admin only)
+
 Usage:
-    from backend.modules.notification.services.push_sender import send_push_to_user
-    await send_push_to_user(db, tenant_id, user_id, title, body, data)
+    from backend.modules.notification.services.push_sender import enqueue_push
+    await enqueue_push(db, tenant_id, [user_id], title, body, data)
+
+Each web process drains the queue from its lifespan (core/tasks/background.py,
+PUSH_IN_APP_WORKER); the arq worker (core/tasks/worker.py) and
+scripts/run_push_worker.py can drain it too. EXPO_PUSH_URL may point at a
+local stub server.
 """
 
-import httpx
+import asyncio
 import logging
+import os
+import socket
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+import httpx
+from sqlalchemy import Column, DateTime, Integer, String, Text, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID as PG_UUID
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
-from uuid import UUID
-from typing import Optional
+from sqlalchemy.sql import func
+
+from backend.core.database import AsyncSessionLocal, Base
+from backend.core.tasks.outbox import DEFAULT_MAX_ATTEMPTS, backoff_seconds
 
 logger = logging.getLogger(__name__)
 
-EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
+EXPO_PUSH_URL = os.getenv("EXPO_PUSH_URL", "https://exp.host/--/api/v2/push/send")
+EXPO_ACCESS_TOKEN = os.getenv("EXPO_ACCESS_TOKEN")  # only with Expo enhanced push security
+EXPO_BATCH_SIZE = 100  # Expo's limit per request
 
+PUSH_CLAIM_SIZE = int(os.getenv("PUSH_CLAIM_SIZE", 500))
+PUSH_LEASE_SECONDS = int(os.getenv("PUSH_LEASE_SECONDS", 120))
+PUSH_CONCURRENCY = int(os.getenv("PUSH_CONCURRENCY", 4))  # parallel Expo requests per worker
+PUSH_TIMEOUT_SECONDS = 10.0
 
-async def get_active_push_tokens(
-    db: AsyncSession,
-    tenant_id: UUID,
-    user_id: UUID,
-) -> list[str]:
-    """Get all active push tokens for a user from device_registrations."""
-    result = await db.execute(
-        text("""
-            SELECT device_token FROM device_registrations
-            WHERE user_id = :user_id
-              AND tenant_id = :tenant_id
-              AND is_active = true
-        """),
-        {"user_id": str(user_id), "tenant_id": str(tenant_id)},
-    )
-    return [row[0] for row in result.fetchall()]
+PUSH_PENDING = "PENDING"
+PUSH_SENDING = "SENDING"
+PUSH_SENT = "SENT"
+PUSH_DEAD = "DEAD"
+
+# Ticket errors that retrying cannot fix
+PERMANENT_TICKET_ERRORS = {"DeviceNotRegistered", "MessageTooBig", "InvalidCredentials"}
+
+
+class PushOutboxModel(Base):
+    """Queued push message - see migration 085"""
+    __tablename__ = "push_outbox"
+
+    id = Column(PG_UUID(as_uuid=True), primary_key=True, default=uuid4)
+    tenant_id = Column(PG_UUID(as_uuid=True), nullable=False)
+    user_id = Column(PG_UUID(as_uuid=True), nullable=False)
+    device_token = Column(Text, nullable=False)
+    title = Column(String(255), nullable=False)
+    body = Column(Text)
+    data = Column(JSONB, nullable=False, default=dict)
+    status = Column(String(20), nullable=False, default=PUSH_PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=DEFAULT_MAX_ATTEMPTS)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    locked_by = Column(String(100), nullable=True)
+    ticket_id = Column(String(100), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+
+# ============ PRODUCER ============
+
+ENQUEUE_PUSH_SQL = text("""
+    INSERT INTO push_outbox (tenant_id, user_id, device_token, title, body, data)
+    SELECT d.tenant_id, d.user_id, d.device_token, :title, :body, :data
+    FROM device_registrations d
+    WHERE d.tenant_id = :tenant_id
+      AND d.user_id = ANY(:user_ids)
+      AND d.is_active = true
+      AND (d.device_token LIKE 'ExponentPushToken[%' OR d.device_token LIKE 'ExpoPushToken[%')
+""").bindparams(
+    bindparam("user_ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("data", type_=JSONB),
+)
 
 
-async def send_push_to_user(
+async def enqueue_push(
     db: AsyncSession,
     tenant_id: UUID,
-    user_id: UUID,
+    user_ids: Iterable[UUID],
     title: str,
     body: str,
     data: Optional[dict] = None,
 ) -> int:
     """
-    Send push notification to all active devices of a user.
-    Returns number of notifications sent successfully.
+    Queue a push to every active device of the users, in the caller's
+    transaction (one statement). Returns the number of messages queued.
     """
-    tokens = await get_active_push_tokens(db, tenant_id, user_id)
-
-    if not tokens:
-        logger.debug(f"No active push tokens for user {user_id}")
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
         return 0
+    result = await db.execute(ENQUEUE_PUSH_SQL, {
+        "tenant_id": tenant_id,
+        "user_ids": user_ids,
+        "title": title[:255],
+        "body": body,
+        "data": data or {},
+    })
+    return result.rowcount or 0
+
+
+# ============ METRICS ============
+
+@dataclass
+class TenantPushStats:
+    sent: int = 0
+    retried: int = 0
+    dead: int = 0
+    unregistered: int = 0
+    recent: Deque[Tuple[float, int]] = field(default_factory=deque)  # (monotonic, sent)
+
+
+class PushMetrics:
+    """Per-tenant delivery counters and sent/minute over a sliding window (per process)"""
+
+    def __init__(self, window_seconds: float = 300):
+        self.window_seconds = window_seconds
+        self.tenants: Dict[str, TenantPushStats] = {}
+        self.requests = 0
+        self.request_seconds = 0.0
+
+    def record_request(self, seconds: float) -> None:
+        self.requests += 1
+        self.request_seconds += seconds
 
-    # Build Expo push messages
-    messages = []
-    for token in tokens:
-        if not token.startswith("ExponentPushToken["):
-            logger.warning(f"Invalid push token format: {token[:20]}...")
-            continue
+    def record(self, tenant_id: Any, sent: int = 0, retried: int = 0, dead: int = 0, unregistered: int = 0) -> None:
+        stats = self.tenants.setdefault(str(tenant_id), TenantPushStats())
+        stats.sent += sent
+        stats.retried += retried
+        stats.dead += dead
+        stats.unregistered += unregistered
+        if sent:
+            stats.recent.append((time.monotonic(), sent))
 
+    def _sent_per_minute(self, stats: TenantPushStats, now: float) -> float:
+        while stats.recent and stats.recent[0][0] < now - self.window_seconds:
+            stats.recent.popleft()
+        return round(sum(n for _, n in stats.recent) * 60 / self.window_seconds, 2)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "requests": self.requests,
+            "avg_request_ms": round(self.request_seconds * 1000 / self.requests, 1) if self.requests else 0.0,
+            "tenants": {
+                tenant_id: {
+                    "sent": s.sent, "retried": s.retried, "dead": s.dead, "unregistered": s.unregistered,
+                    "sent_per_minute": self._sent_per_minute(s, now),
+                }
+                for tenant_id, s in self.tenants.items()
+            },
+        }
+
+
+# Process-wide singleton
+push_metrics = PushMetrics()
+
+
+# ============ CONSUMER ============
+
+CLAIM_PUSH_SQL = text("""
+    UPDATE push_outbox
+    SET status = 'SENDING', attempts = attempts + 1, locked_at = NOW(), locked_by = :worker_id
+    WHERE id IN (
+        SELECT id FROM push_outbox
+        WHERE (status = 'PENDING' AND run_after <= NOW())
+           OR (status = 'SENDING' AND locked_at < NOW() - make_interval(secs => :lease_seconds))
+        ORDER BY run_after
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, tenant_id, device_token, title, body, data, attempts, max_attempts
+""")
+
+MARK_SENT_SQL = text("""
+    UPDATE push_outbox p
+    SET status = 'SENT', sent_at = NOW(), locked_at = NULL, last_error = NULL, ticket_id = t.ticket_id
+    FROM unnest(:ids, :ticket_ids) AS t(id, ticket_id)
+    WHERE p.id = t.id AND p.locked_by = :worker_id
+""").bindparams(
+    bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))),
+    bindparam("ticket_ids", type_=ARRAY(String)),
+)
+
+MARK_FAILED_SQL = text("""
+    UPDATE push_outbox
+    SET status = :status, run_after = NOW() + make_interval(secs => :delay_seconds),
+        locked_at = NULL, last_error = :error
+    WHERE id = ANY(:ids) AND locked_by = :worker_id
+""").bindparams(bindparam("ids", type_=ARRAY(PG_UUID(as_uuid=True))))
+
+DEACTIVATE_TOKENS_SQL = text("""
+    UPDATE device_registrations SET is_active = false, updated_at = NOW()
+    WHERE tenant_id = :tenant_id AND device_token = ANY(:tokens)
+""").bindparams(bindparam("tokens", type_=ARRAY(Text)))
+
+
+@dataclass
+class ClaimedPush:
+    id: UUID
+    tenant_id: UUID
+    device_token: str
+    title: str
+    body: Optional[str]
+    data: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+
+    def message(self) -> Dict[str, Any]:
         message = {
-            "to": token,
-            "title": title,
-            "body": body,
+            "to": self.device_token,
+            "title": self.title,
+            "body": self.body,
             "sound": "default",
             "priority": "high",
         }
-        if data:
-            message["data"] = data
-        messages.append(message)
+        if self.data:
+            message["data"] = self.data
+        return message
 
-    if not messages:
-        return 0
 
-    # Send via Expo Push API (batched)
-    sent_count = 0
-    try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                EXPO_PUSH_URL,
-                json=messages,
-                headers={
-                    "Accept": "application/json",
-                    "Content-Type": "application/json",
-                },
+@dataclass
+class DeliveryOutcome:
+    sent: List[Tuple[ClaimedPush, Optional[str]]] = field(default_factory=list)  # (push, ticket id)
+    failed: List[Tuple[ClaimedPush, str]] = field(default_factory=list)  # (push, error) - retried
+    dead: List[Tuple[ClaimedPush, str]] = field(default_factory=list)
+    unregistered: List[ClaimedPush] = field(default_factory=list)
+
+    def merge(self, other: "DeliveryOutcome") -> None:
+        self.sent += other.sent
+        self.failed += other.failed
+        self.dead += other.dead
+        self.unregistered += other.unregistered
+
+
+class PushDeliveryWorker:
+    """Claims queued pushes and delivers them to Expo in batches over a pooled client"""
+
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        client: Optional[httpx.AsyncClient] = None,
+        push_url: str = EXPO_PUSH_URL,
+        worker_id: Optional[str] = None,
+        claim_size: int = PUSH_CLAIM_SIZE,
+        batch_size: int = EXPO_BATCH_SIZE,
+        lease_seconds: int = PUSH_LEASE_SECONDS,
+        concurrency: int = PUSH_CONCURRENCY,
+        metrics: Optional[PushMetrics] = None,
+    ):
+        self.session_factory = session_factory
+        self.push_url = push_url
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:push"
+        self.claim_size = claim_size
+        self.batch_size = min(batch_size, EXPO_BATCH_SIZE)
+        self.lease_seconds = lease_seconds
+        self.concurrency = concurrency
+        self.metrics = metrics or push_metrics
+        self._client = client
+        self._owns_client = client is None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Long-lived: connections (and TLS sessions) are reused across batches
+        if self._client is None:
+            headers = {"Accept": "application/json", "Accept-Encoding": "gzip, deflate"}
+            if EXPO_ACCESS_TOKEN:
+                headers["Authorization"] = f"Bearer {EXPO_ACCESS_TOKEN}"
+            self._client = httpx.AsyncClient(
+                timeout=PUSH_TIMEOUT_SECONDS,
+                headers=headers,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
             )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+            self._client = None
+
+    async def _bypass_rls(self, db: AsyncSession) -> None:
+        # Transaction-local, so the pooled connection does not keep it
+        await db.execute(text("SELECT set_config('app.bypass_rls', 'on', true)"))
+
+    async def claim(self) -> List[ClaimedPush]:
+        async with self.session_factory() as db:
+            await self._bypass_rls(db)
+            result = await db.execute(CLAIM_PUSH_SQL, {
+                "worker_id": self.worker_id,
+                "lease_seconds": self.lease_seconds,
+                "batch_size": self.claim_size,
+            })
+            rows = result.fetchall()
+            await db.commit()
+        return [
+            ClaimedPush(id=r[0], tenant_id=r[1], device_token=r[2], title=r[3], body=r[4],
+                        data=r[5] or {}, attempts=r[6], max_attempts=r[7])
+            for r in rows
+        ]
+
+    async def send_batch(self, batch: List[ClaimedPush]) -> DeliveryOutcome:
+        """One Expo request for up to batch_size messages."""
+        outcome = DeliveryOutcome()
+        started = time.perf_counter()
+        try:
+            response = await self.client.post(self.push_url, json=[push.message() for push in batch])
+        except httpx.HTTPError as e:
+            outcome.failed = [(push, f"{type(e).__name__}: {e}") for push in batch]
+            return outcome
+        finally:
+            self.metrics.record_request(time.perf_counter() - started)
 
-            if response.status_code == 200:
-                result = response.json()
-                tickets = result.get("data", [])
-                for ticket in tickets:
-                    if ticket.get("status") == "ok":
-                        sent_count += 1
-                    elif ticket.get("status") == "error":
-                        error_msg = ticket.get("message", "Unknown")
-                        detail = ticket.get("details", {})
-                        # Handle invalid token — deactivate it
-                        if detail.get("error") == "DeviceNotRegistered":
-                            await _deactivate_token(db, ticket.get("__token", ""))
-                        logger.warning(f"Push ticket error: {error_msg}")
-                logger.info(
-                    f"Push sent to user {user_id}: {sent_count}/{len(messages)} delivered"
-                )
+        if response.status_code != 200:
+            error = f"Expo Push API error: {response.status_code} {response.text[:200]}"
+            logger.warning(error)
+            outcome.failed = [(push, error) for push in batch]
+            return outcome
+
+        tickets = response.json().get("data", [])
+        if isinstance(tickets, dict):
+            tickets = [tickets]
+        for index, push in enumerate(batch):
+            ticket = tickets[index] if index < len(tickets) else {"status": "error", "message": "Missing ticket"}
+            if ticket.get("status") == "ok":
+                outcome.sent.append((push, ticket.get("id")))
+                continue
+            error_code = (ticket.get("details") or {}).get("error")
+            error = f"{error_code or 'Error'}: {ticket.get('message', 'Unknown')}"
+            if error_code == "DeviceNotRegistered":
+                outcome.unregistered.append(push)
+            if error_code in PERMANENT_TICKET_ERRORS:
+                outcome.dead.append((push, error))
             else:
-                logger.error(
-                    f"Expo Push API error: {response.status_code} {response.text[:200]}"
-                )
-    except httpx.TimeoutException:
-        logger.warning(f"Push send timeout for user {user_id}")
-    except Exception as e:
-        # Never let push logic break the main business flow
-        logger.warning(f"Push send failed for user {user_id}: {e}")
+                outcome.failed.append((push, error))
+        return outcome
 
-    return sent_count
+    async def record(self, outcome: DeliveryOutcome) -> Dict[str, int]:
+        """Persist an outcome; returns the number of messages per new status."""
+        groups: Dict[Tuple[str, int, str], List[UUID]] = {}
+        for push, error in outcome.failed:
+            dead = push.attempts >= push.max_attempts
+            status = PUSH_DEAD if dead else PUSH_PENDING
+            key = (status, 0 if dead else backoff_seconds(push.attempts), error[:4000])
+            groups.setdefault(key, []).append(push.id)
+        for push, error in outcome.dead:
+            groups.setdefault((PUSH_DEAD, 0, error[:4000]), []).append(push.id)
 
+        unregistered: Dict[str, List[str]] = {}
+        for push in outcome.unregistered:
+            unregistered.setdefault(str(push.tenant_id), []).append(push.device_token)
 
-async def send_push_to_users(
-    db: AsyncSession,
-    tenant_id: UUID,
-    user_ids: list[UUID],
-    title: str,
-    body: str,
-    data: Optional[dict] = None,
-) -> int:
-    """Send push notification to multiple users."""
-    total = 0
-    for uid in user_ids:
-        total += await send_push_to_user(db, tenant_id, uid, title, body, data)
-    return total
-
-
-async def _deactivate_token(db: AsyncSession, token: str):
-    """Deactivate a push token that is no longer registered."""
-    if not token:
-        return
-    try:
-        await db.execute(
-            text("UPDATE device_registrations SET is_active = false WHERE device_token = :token"),
-            {"token": token},
-        )
-        logger.info(f"Deactivated unregistered push token: {token[:30]}...")
-    except Exception as e:
-        logger.warning(f"Failed to deactivate token: {e}")
+        async with self.session_factory() as db:
+            await self._bypass_rls(db)
+            if outcome.sent:
+                await db.execute(MARK_SENT_SQL, {
+                    "ids": [push.id for push, _ in outcome.sent],
+                    "ticket_ids": [ticket_id for _, ticket_id in outcome.sent],
+                    "worker_id": self.worker_id,
+                })
+            for (status, delay_seconds, error), ids in groups.items():
+                await db.execute(MARK_FAILED_SQL, {
+                    "ids": ids, "status": status, "delay_seconds": delay_seconds,
+                    "error": error, "worker_id": self.worker_id,
+                })
+            for tenant_id, tokens in unregistered.items():
+                # device_registrations has no RLS bypass: use the tenant context
+                await db.execute(text("SELECT set_config('app.current_tenant', :tenant_id, true)"),
+                                 {"tenant_id": tenant_id})
+                await db.execute(DEACTIVATE_TOKENS_SQL, {"tenant_id": tenant_id, "tokens": tokens})
+            await db.commit()
+
+        counts = {PUSH_SENT: len(outcome.sent), PUSH_PENDING: 0, PUSH_DEAD: 0}
+        for (status, _, _), ids in groups.items():
+            counts[status] += len(ids)
+        self._record_metrics(outcome)
+        if unregistered:
+            logger.info(f"Deactivated {len(outcome.unregistered)} unregistered push token(s)")
+        return counts
+
+    def _record_metrics(self, outcome: DeliveryOutcome) -> None:
+        per_tenant: Dict[str, Dict[str, int]] = {}
+
+        def bump(push: ClaimedPush, key: str) -> None:
+            counters = per_tenant.setdefault(str(push.tenant_id), {})
+            counters[key] = counters.get(key, 0) + 1
+
+        for push, _ in outcome.sent:
+            bump(push, "sent")
+        for push, _ in outcome.failed:
+            bump(push, "dead" if push.attempts >= push.max_attempts else "retried")
+        for push, _ in outcome.dead:
+            bump(push, "dead")
+        for push in outcome.unregistered:
+            bump(push, "unregistered")
+        for tenant_id, counters in per_tenant.items():
+            self.metrics.record(tenant_id, **counters)
+
+    async def process_batch(self) -> Dict[str, int]:
+        """Claim due messages, send them in Expo batches and record the outcome."""
+        claimed = await self.claim()
+        counts = {"claimed": len(claimed), PUSH_SENT: 0, PUSH_PENDING: 0, PUSH_DEAD: 0}
+        if not claimed:
+            return counts
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def send(batch: List[ClaimedPush]) -> DeliveryOutcome:
+            async with semaphore:
+                return await self.send_batch(batch)
+
+        batches = [claimed[i:i + self.batch_size] for i in range(0, len(claimed), self.batch_size)]
+        outcome = DeliveryOutcome()
+        for batch_outcome in await asyncio.gather(*(send(batch) for batch in batches)):
+            outcome.merge(batch_outcome)
+        for status, count in (await self.record(outcome)).items():
+            counts[status] += count
+        return counts
+
+    async def drain(self, max_batches: int = 20) -> Dict[str, int]:
+        """Process batches until nothing is due (bounded)."""
+        totals = {"claimed": 0, PUSH_SENT: 0, PUSH_PENDING: 0, PUSH_DEAD: 0}
+        for _ in range(max_batches):
+            counts = await self.process_batch()
+            for key, value in counts.items():
+                totals[key] += value
+            if counts["claimed"] < self.claim_size:
+                break
+        return totals
@@ -0,0 +1,269 @@
+"""
+Notification Realtime Events
+Backs the /ws/notifications push channel (backend/api/websocket/notifications_ws.py).
+
+NotificationBell polled /notifications/count every 30 s and the sidebar
+badge polled /quotes/expiring-soon; each poll paid JWT validation, RLS setup
+and a query. Sockets now get a snapshot once, then deltas:
+
+- after_flush collects new notifications, is_read flips and deletions of
+  NotificationModel rows and publishes them on commit to the user's topic,
+  so every creation path (create_notification_if_allowed, routers adding
+  NotificationModel directly) is pushed
+- quote writes touching status/valid_until mark the tenant's badges stale;
+  BadgeMonitor recounts once per tenant per process (not per socket),
+  debounced, plus every BADGE_REFRESH_SECONDS because quotes also enter the
+  expiring window as time passes, and fans out only changed counts
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from backend.core.pubsub import InProcessPubSub, Subscription, get_pubsub, publish_after_commit
+from backend.modules.hr.domain.models import NotificationModel
+from backend.modules.quote.application.expiring import count_expiring_quotes
+from backend.modules.quote.domain.models import QuoteModel
+
+logger = logging.getLogger(__name__)
+
+EVENT_SNAPSHOT = "snapshot"
+EVENT_NOTIFICATION = "notification"
+EVENT_NOTIFICATIONS_READ = "notifications_read"
+EVENT_BADGES = "badges"
+EVENT_BADGES_STALE = "badges_stale"
+
+MESSAGE_PREVIEW_CHARS = 500  # keeps events well under the NOTIFY payload cap
+BADGE_REFRESH_SECONDS = float(os.getenv("REALTIME_BADGE_REFRESH_SECONDS", 300))
+BADGE_DEBOUNCE_SECONDS = 1.0
+
+# badge -> (module the user needs access to, counter)
+BADGE_COUNTERS: Dict[str, Tuple[str, Callable[[AsyncSession, UUID], Awaitable[int]]]] = {
+    "quotes_expiring": ("quote", count_expiring_quotes),
+}
+
+_QUOTE_BADGE_COLUMNS = ("status", "valid_until")
+
+
+# ============ TOPICS ============
+
+def user_topic(tenant_id: Any, user_id: Any) -> str:
+    return f"user:{tenant_id}:{user_id}"
+
+
+def badges_topic(tenant_id: Any) -> str:
+    """Recounted badges (BadgeMonitor output, delivered locally)."""
+    return f"badges:{tenant_id}"
+
+
+def badges_stale_topic(tenant_id: Any) -> str:
+    """Quote writes of a tenant (BadgeMonitor input, from any process)."""
+    return f"badges-stale:{tenant_id}"
+
+
+# ============ EVENTS ============
+
+def notification_event(notification: NotificationModel) -> Dict[str, Any]:
+    # created_at is a server default, not loaded after the INSERT
+    created_at = notification.__dict__.get("created_at") or datetime.now(timezone.utc)
+    message = notification.message[:MESSAGE_PREVIEW_CHARS] if notification.message else notification.message
+    return {
+        "type": EVENT_NOTIFICATION,
+        "unread_delta": 0 if notification.is_read else 1,
+        "notification": {
+            "id": str(notification.id),
+            "title": notification.title,
+            "message": message,
+            "type": notification.type,
+            "reference_type": notification.reference_type,
+            "reference_id": str(notification.reference_id) if notification.reference_id else None,
+            "is_read": bool(notification.is_read),
+            "created_at": created_at.isoformat(),
+        },
+    }
+
+
+def _old_new(state, column: str) -> Tuple[Any, Any]:
+    history = state.attrs[column].history
+    current = (list(history.added) + list(history.unchanged) or [None])[0]
+    previous = history.deleted[0] if history.deleted else current
+    return previous, current
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_realtime_events(session, flush_context):
+    read: Dict[Tuple[str, str], Tuple[List[str], int]] = {}
+    stale_tenants = set()
+
+    def read_change(notification, delta):
+        ids, total = read.get((str(notification.tenant_id), str(notification.user_id)), ([], 0))
+        ids.append(str(notification.id))
+        read[(str(notification.tenant_id), str(notification.user_id))] = (ids, total + delta)
+
+    for obj in session.new:
+        if isinstance(obj, NotificationModel) and obj.tenant_id and obj.user_id:
+            publish_after_commit(session, user_topic(obj.tenant_id, obj.user_id), notification_event(obj))
+        elif isinstance(obj, QuoteModel) and obj.tenant_id:
+            stale_tenants.add(str(obj.tenant_id))
+
+    for obj in session.dirty:
+        if isinstance(obj, NotificationModel) and obj.tenant_id and obj.user_id:
+            was_read, is_read = _old_new(inspect(obj), "is_read")
+            if bool(was_read) != bool(is_read):
+                read_change(obj, -1 if is_read else 1)
+        elif isinstance(obj, QuoteModel) and obj.tenant_id:
+            state = inspect(obj)
+            if any(state.attrs[c].history.has_changes() for c in _QUOTE_BADGE_COLUMNS):
+                stale_tenants.add(str(obj.tenant_id))
+
+    for obj in session.deleted:
+        if isinstance(obj, NotificationModel) and obj.tenant_id and obj.user_id:
+            read_change(obj, 0 if obj.is_read else -1)
+        elif isinstance(obj, QuoteModel) and obj.tenant_id:
+            stale_tenants.add(str(obj.tenant_id))
+
+    for (tenant_id, user_id), (ids, delta) in read.items():
+        publish_after_commit(session, user_topic(tenant_id, user_id), {
+            "type": EVENT_NOTIFICATIONS_READ, "ids": ids, "unread_delta": delta,
+        })
+    for tenant_id in stale_tenants:
+        publish_after_commit(session, badges_stale_topic(tenant_id), {"type": EVENT_BADGES_STALE})
+
+
+# ============ SNAPSHOTS ============
+
+async def unread_count(db: AsyncSession, tenant_id: UUID, user_id: UUID) -> int:
+    result = await db.execute(
+        select(func.count(NotificationModel.id)).where(
+            NotificationModel.tenant_id == tenant_id,
+            NotificationModel.user_id == user_id,
+            NotificationModel.is_read == False,  # noqa: E712
+        )
+    )
+    return result.scalar() or 0
+
+
+def _can_access(user: Any, module: str) -> bool:
+    from backend.core.auth.permissions import PermissionChecker
+
+    try:
+        return bool(PermissionChecker(module)(user))
+    except HTTPException:
+        return False
+
+
+def visible_badges(user: Any, counts: Dict[str, int]) -> Dict[str, int]:
+    """The badges of modules the user can open."""
+    return {
+        name: count for name, count in counts.items()
+        if name in BADGE_COUNTERS and _can_access(user, BADGE_COUNTERS[name][0])
+    }
+
+
+async def build_snapshot(db: AsyncSession, user: Any, badges: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        "type": EVENT_SNAPSHOT,
+        "unread_count": await unread_count(db, user.tenant_id, user.id),
+        "badges": visible_badges(user, badges),
+    }
+
+
+# ============ BADGES ============
+
+class BadgeMonitor:
+    """Badge counts of the tenants with open sockets in this process"""
+
+    def __init__(self, session_factory=None, pubsub: Optional[InProcessPubSub] = None,
+                 refresh_seconds: float = BADGE_REFRESH_SECONDS,
+                 debounce_seconds: float = BADGE_DEBOUNCE_SECONDS):
+        self.session_factory = session_factory
+        self._pubsub = pubsub
+        self.refresh_seconds = refresh_seconds
+        self.debounce_seconds = debounce_seconds
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self._watchers: Dict[str, int] = {}
+        self._tasks: Dict[str, Tuple[asyncio.Task, Subscription]] = {}
+
+    @property
+    def pubsub(self) -> InProcessPubSub:
+        return self._pubsub or get_pubsub()
+
+    async def count(self, tenant_id: Any) -> Dict[str, int]:
+        session_factory = self.session_factory
+        if session_factory is None:
+            from backend.core.database import AsyncSessionLocal
+            session_factory = AsyncSessionLocal
+
+        async with session_factory() as db:
+            # Transaction-local, so the pooled connection does not keep it
+            await db.execute(text("SELECT set_config('app.current_tenant', :tenant_id, true)"),
+                             {"tenant_id": str(tenant_id)})
+            counts = {}
+            for name, (_, counter) in BADGE_COUNTERS.items():
+                counts[name] = await counter(db, UUID(str(tenant_id)))
+            return counts
+
+    async def watch(self, tenant_id: Any) -> Dict[str, int]:
+        """Start following a tenant (one call per socket); returns the current counts."""
+        key = str(tenant_id)
+        self._watchers[key] = self._watchers.get(key, 0) + 1
+        if key not in self._tasks:
+            stale = self.pubsub.subscribe([badges_stale_topic(key)])
+            self._tasks[key] = (asyncio.create_task(self._run(key, stale)), stale)
+        if key not in self.counts:
+            try:
+                self.counts[key] = await self.count(key)
+            except Exception as e:
+                logger.warning(f"Badge count failed for tenant {key}: {e}")
+                return {}
+        return self.counts[key]
+
+    def unwatch(self, tenant_id: Any) -> None:
+        key = str(tenant_id)
+        remaining = self._watchers.get(key, 0) - 1
+        if remaining > 0:
+            self._watchers[key] = remaining
+            return
+        self._watchers.pop(key, None)
+        self.counts.pop(key, None)
+        running = self._tasks.pop(key, None)
+        if running is not None:
+            task, stale = running
+            stale.close()
+            task.cancel()
+
+    async def refresh(self, tenant_id: Any) -> bool:
+        """Recount and fan out if anything changed."""
+        key = str(tenant_id)
+        counts = await self.count(key)
+        if key not in self._watchers or counts == self.counts.get(key):
+            return False
+        self.counts[key] = counts
+        self.pubsub.deliver(badges_topic(key), {"type": EVENT_BADGES, "badges": counts})
+        return True
+
+    async def _run(self, key: str, stale: Subscription) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(stale.get(), timeout=self.refresh_seconds)
+                # Coalesce a burst of quote writes into one recount
+                await asyncio.sleep(self.debounce_seconds)
+                stale.clear()
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.refresh(key)
+            except Exception as e:
+                logger.warning(f"Badge refresh failed for tenant {key}: {e}")
+
+
+# Process-wide singleton
+badge_monitor = BadgeMonitor()
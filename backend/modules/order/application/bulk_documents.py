@@ -0,0 +1,279 @@
+"""
+Bulk Document Generation
+Backs POST /orders/documents/bulk - contracts and menu cards for many
+orders as one streamed ZIP
+
+- Orders and their items come from ONE query (orders LEFT JOIN order_items),
+  read through a server-side cursor and grouped per order as rows arrive.
+- Documents are rendered with the existing generators in the bounded render
+  pool (document_renderer.render_in_pool); at most BULK_DOCUMENT_WINDOW
+  renders are in flight.
+- Each finished document is written to the ZIP (stored, .docx is already
+  deflated) and the bytes are yielded immediately, in completion order.
+Memory is bounded by the cursor batch plus the in-flight window, however
+many orders are requested.
+"""
+
+import asyncio
+import logging
+import os
+import zipfile
+from dataclasses import dataclass, field
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Set
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.order.application.contract_generator import ContractData, generate_contract_docx
+from backend.modules.order.application.document_renderer import DOCX_RENDER_WORKERS, render_in_pool
+from backend.modules.order.application.menu_generator import generate_menu_docx
+from backend.modules.order.domain.models import OrderItemModel, OrderModel
+
+logger = logging.getLogger(__name__)
+
+VN_TIMEZONE = timezone(timedelta(hours=7))
+BULK_DOCUMENT_WINDOW = int(os.getenv("BULK_DOCUMENT_WINDOW", DOCX_RENDER_WORKERS * 2))
+ORDER_FETCH_BATCH = 500  # cursor rows per fetch
+
+DOCUMENT_CONTRACT = "contract"
+DOCUMENT_MENU = "menu"
+DOCUMENT_TYPES = (DOCUMENT_CONTRACT, DOCUMENT_MENU)
+ERRORS_FILENAME = "errors.txt"
+
+
+# ============ ORDER -> DOCUMENT DATA ============
+
+def food_items(items: Iterable) -> list:
+    """Order items that belong on the menu / contract (SERVICE lines excluded)."""
+    # BUGFIX: BUG-20260219-003 — Service items should not appear on menu card
+    return [item for item in items if item.category != 'SERVICE']
+
+
+def menu_dish_names(items: Iterable) -> List[str]:
+    return [item.item_name for item in food_items(items)]
+
+
+def contract_data_for(order, items: Sequence) -> ContractData:
+    """ContractData for an order (ORM row or OrderDocumentSource) and its items."""
+    foods = food_items(items)
+    # Table count = quantity of first food item (all food items share same qty = number of tables)
+    table_count = foods[0].quantity if foods else 0
+
+    total_amount = int(order.final_amount or order.total_amount or 0)
+    deposit_amount = int(order.paid_amount or 0)
+
+    return ContractData(
+        order_code=order.code or '',
+        customer_name=order.customer_name or '',
+        customer_phone=order.customer_phone or '',
+        # Customer address: use event_address as fallback
+        customer_address=order.event_address or '',
+        event_date=order.event_date,
+        event_time=order.event_time,
+        event_address=order.event_address or '',
+        table_count=table_count,
+        dish_names=[item.item_name for item in foods],
+        unit_price_per_table=total_amount // table_count if table_count and table_count > 0 else 0,
+        total_amount=total_amount,
+        deposit_amount=deposit_amount,
+        remaining_amount=total_amount - deposit_amount,
+    )
+
+
+def document_filename(kind: str, order_code: Optional[str]) -> str:
+    """Same names as the single-order downloads."""
+    if kind == DOCUMENT_CONTRACT:
+        safe_code = order_code.replace("/", "-") if order_code else "contract"
+        return f"HopDong-{safe_code}.docx"
+    safe_code = order_code.replace("/", "-") if order_code else "menu"
+    return f"ThucDon-{safe_code}.docx"
+
+
+@dataclass
+class DocumentItem:
+    item_name: str
+    category: Optional[str]
+    quantity: Optional[int]
+
+
+@dataclass
+class OrderDocumentSource:
+    """The columns of an order the documents need, plus its items"""
+    id: UUID
+    code: Optional[str]
+    customer_name: Optional[str]
+    customer_phone: Optional[str]
+    event_date: Optional[datetime]
+    event_time: Optional[str]
+    event_address: Optional[str]
+    total_amount: Optional[float]
+    final_amount: Optional[float]
+    paid_amount: Optional[float]
+    items: List[DocumentItem] = field(default_factory=list)
+
+
+# ============ STREAMING ZIP ============
+
+class _ZipChunkSink:
+    """Write-only, unseekable file object: zipfile appends, the generator drains"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+@dataclass
+class _RenderJob:
+    kind: str
+    filename: str
+    order_code: Optional[str]
+
+
+# ============ SERVICE ============
+
+class BulkDocumentService:
+    """Stream a ZIP of contracts / menu cards for many orders of one tenant"""
+
+    def __init__(self, db: AsyncSession, tenant_id: UUID, window: int = BULK_DOCUMENT_WINDOW):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.window = max(1, window)
+
+    def orders_query(
+        self,
+        order_ids: Optional[Sequence[UUID]] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ):
+        stmt = (
+            select(
+                OrderModel.id, OrderModel.code, OrderModel.customer_name, OrderModel.customer_phone,
+                OrderModel.event_date, OrderModel.event_time, OrderModel.event_address,
+                OrderModel.total_amount, OrderModel.final_amount, OrderModel.paid_amount,
+                OrderItemModel.item_name, OrderItemModel.category, OrderItemModel.quantity,
+            )
+            .outerjoin(OrderItemModel, OrderItemModel.order_id == OrderModel.id)
+            .where(OrderModel.tenant_id == self.tenant_id)
+        )
+        if order_ids:
+            stmt = stmt.where(OrderModel.id.in_(list(order_ids)))
+        else:
+            # Event days in Vietnam time, half-open so orders(tenant_id, event_date) is usable
+            stmt = stmt.where(OrderModel.status != 'CANCELLED')
+            if start_date:
+                stmt = stmt.where(OrderModel.event_date >= datetime.combine(start_date, dt_time.min, VN_TIMEZONE))
+            if end_date:
+                stmt = stmt.where(OrderModel.event_date < datetime.combine(end_date + timedelta(days=1), dt_time.min, VN_TIMEZONE))
+        return stmt.order_by(
+            OrderModel.event_date, OrderModel.code, OrderModel.id,
+            OrderItemModel.sort_order, OrderItemModel.created_at, OrderItemModel.id,
+        )
+
+    async def iter_orders(self, **filters) -> AsyncIterator[OrderDocumentSource]:
+        """Orders with their items, grouped from the joined rows as the cursor advances."""
+        result = await self.db.stream(
+            self.orders_query(**filters).execution_options(yield_per=ORDER_FETCH_BATCH)
+        )
+        current: Optional[OrderDocumentSource] = None
+        async for row in result:
+            if current is None or row.id != current.id:
+                if current is not None:
+                    yield current
+                current = OrderDocumentSource(
+                    id=row.id, code=row.code, customer_name=row.customer_name,
+                    customer_phone=row.customer_phone, event_date=row.event_date,
+                    event_time=row.event_time, event_address=row.event_address,
+                    total_amount=row.total_amount, final_amount=row.final_amount,
+                    paid_amount=row.paid_amount,
+                )
+            if row.item_name is not None:
+                current.items.append(DocumentItem(row.item_name, row.category, row.quantity))
+        if current is not None:
+            yield current
+
+    async def iter_zip(
+        self,
+        documents: Sequence[str] = DOCUMENT_TYPES,
+        **filters,
+    ) -> AsyncIterator[bytes]:
+        sink = _ZipChunkSink()
+        archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+        pending: Set[asyncio.Future] = set()
+        jobs: Dict[asyncio.Future, _RenderJob] = {}
+        used_names: Set[str] = set()
+        errors: List[str] = []
+
+        def unique_name(name: str) -> str:
+            candidate, n = name, 1
+            while candidate in used_names:
+                n += 1
+                candidate = name.replace(".docx", f"-{n}.docx")
+            used_names.add(candidate)
+            return candidate
+
+        def write_finished(done: Iterable[asyncio.Future]) -> bytes:
+            for task in done:
+                job = jobs.pop(task)
+                try:
+                    buffer = task.result()
+                except Exception as e:
+                    logger.error(f"Bulk {job.kind} generation failed for {job.order_code}: {e}")
+                    errors.append(f"{job.filename}: {e}")
+                    continue
+                info = zipfile.ZipInfo(job.filename, date_time=datetime.now().timetuple()[:6])
+                archive.writestr(info, buffer.getvalue())
+            return sink.drain()
+
+        try:
+            async for order in self.iter_orders(**filters):
+                for kind in documents:
+                    if kind == DOCUMENT_MENU:
+                        dish_names = menu_dish_names(order.items)
+                        if not dish_names:
+                            errors.append(f"{document_filename(kind, order.code)}: Đơn hàng chưa có món ăn")
+                            continue
+                        render = (generate_menu_docx, dish_names)
+                    else:
+                        render = (generate_contract_docx, contract_data_for(order, order.items))
+
+                    if len(pending) >= self.window:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        chunk = write_finished(done)
+                        if chunk:
+                            yield chunk
+
+                    task = asyncio.ensure_future(render_in_pool(*render))
+                    jobs[task] = _RenderJob(kind, unique_name(document_filename(kind, order.code)), order.code)
+                    pending.add(task)
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                chunk = write_finished(done)
+                if chunk:
+                    yield chunk
+
+            if errors:
+                archive.writestr(ERRORS_FILENAME, "\n".join(errors) + "\n")
+            archive.close()
+            yield sink.drain()
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def get_bulk_document_service(db: AsyncSession, tenant_id: UUID) -> BulkDocumentService:
+    """Factory function for dependency injection"""
+    return BulkDocumentService(db, tenant_id)
@@ -0,0 +1,267 @@
+"""
+Order Completion Jobs
+Side effects of POST /orders/{id}/complete, run by the outbox worker
+(backend/core/tasks/outbox.py) after the completion itself has committed.
+
+complete_order only flips the status and enqueues these jobs in the same
+transaction, so the request no longer waits on inventory, CRM, loyalty and
+HR work, and a failure in one of them is retried instead of being lost.
+
+Every job is idempotent (the outbox may run a job twice) and re-checks
+that the order is still COMPLETED, so a job that runs after reopen_order
+does nothing. After a reopen the guards are cleared by the rollback
+(reversed EXPORTs, REVERSAL points, deleted AUTO_ORDER timesheets), which
+lets a second completion apply the side effects again.
+"""
+
+import logging
+from decimal import Decimal
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from backend.core.tasks.outbox import enqueue_job, job
+from backend.modules.order.domain.models import OrderModel, OrderStaffAssignmentModel
+
+logger = logging.getLogger(__name__)
+
+JOB_DEDUCT_INVENTORY = "order.deduct_inventory"
+JOB_RECALCULATE_CRM_STATS = "crm.recalculate_stats"
+JOB_EARN_LOYALTY_POINTS = "crm.earn_order_points"
+JOB_CREATE_TIMESHEETS = "hr.create_order_timesheets"
+
+
+async def enqueue_completion_jobs(db: AsyncSession, tenant_id: UUID, order: OrderModel) -> None:
+    """Queue all completion side effects in the caller's transaction."""
+    jobs = [JOB_DEDUCT_INVENTORY, JOB_CREATE_TIMESHEETS]
+    if order.customer_id:
+        # CRM stats are not a job any more: the RFM engine applies them at commit
+        jobs.append(JOB_EARN_LOYALTY_POINTS)
+    for job_name in jobs:
+        await enqueue_job(
+            db, tenant_id, job_name,
+            payload={"order_id": str(order.id)},
+            dedupe_key=f"{job_name}:{order.id}",
+        )
+
+
+async def _load_completed_order(db: AsyncSession, tenant_id: UUID, payload: Dict[str, Any],
+                                with_items: bool = False) -> Optional[OrderModel]:
+    query = select(OrderModel).where(
+        OrderModel.id == UUID(payload["order_id"]),
+        OrderModel.tenant_id == tenant_id,
+    )
+    if with_items:
+        query = query.options(selectinload(OrderModel.items))
+    order = (await db.execute(query)).scalar_one_or_none()
+    if not order or order.status != 'COMPLETED':
+        logger.info(f"Completion job skipped: order {payload.get('order_id')} is no longer COMPLETED")
+        return None
+    return order
+
+
+# ============ INVENTORY (GAP-6.1) ============
+
+@job(JOB_DEDUCT_INVENTORY)
+async def deduct_order_inventory(db: AsyncSession, tenant_id: UUID, payload: Dict[str, Any]) -> None:
+    """Deduct recipe ingredients of the order from the default warehouse."""
+    from backend.modules.inventory.domain.bom_deduction import BillOfMaterialsService
+    from backend.modules.inventory.domain.models import InventoryTransactionModel, WarehouseModel
+
+    order = await _load_completed_order(db, tenant_id, payload, with_items=True)
+    if not order or not order.items:
+        return
+
+    reference_doc = f"ORDER-{order.code}"
+    already_deducted = await db.execute(
+        select(InventoryTransactionModel.id).where(
+            InventoryTransactionModel.tenant_id == tenant_id,
+            InventoryTransactionModel.reference_doc == reference_doc,
+            InventoryTransactionModel.transaction_type == "EXPORT",
+            InventoryTransactionModel.is_reversed == False,
+        ).limit(1)
+    )
+    if already_deducted.scalar_one_or_none():
+        return
+
+    wh_result = await db.execute(
+        select(WarehouseModel).where(WarehouseModel.tenant_id == tenant_id).limit(1)
+    )
+    default_warehouse = wh_result.scalar_one_or_none()
+    if not default_warehouse:
+        return
+
+    bom = BillOfMaterialsService(db, tenant_id)
+    requirements = await bom.explode_order_items(order.items)
+    deduction = await bom.deduct(
+        default_warehouse.id,
+        requirements,
+        reference_doc=reference_doc,
+        notes=f"Auto-deduct: order {order.code}",
+        allow_partial=False,  # skip ingredients that stock cannot cover
+    )
+    await db.commit()
+
+    for line in deduction.shortfalls:
+        logger.warning(
+            f"Inventory deduct failed for {line.item_name}: "
+            f"required {line.requested}, short {line.shortfall}"
+        )
+    if deduction.deducted_count > 0:
+        logger.info(f"Order {order.code}: Auto-deducted {deduction.deducted_count} inventory items")
+
+
+# ============ CRM ============
+
+@job(JOB_RECALCULATE_CRM_STATS)
+async def recalculate_customer_stats(db: AsyncSession, tenant_id: UUID, payload: Dict[str, Any]) -> None:
+    """
+    Recompute total spent / order count of the order's customer.
+    No longer enqueued (the RFM engine updates the customer when the
+    completion commits); kept so jobs already in the outbox still run.
+    """
+    from backend.modules.crm.application.services import CrmIntegrationService
+
+    order = await _load_completed_order(db, tenant_id, payload)
+    if order and order.customer_id:
+        await CrmIntegrationService.recalculate_stats(db, tenant_id, order.customer_id)
+
+
+@job(JOB_EARN_LOYALTY_POINTS)
+async def earn_order_loyalty_points(db: AsyncSession, tenant_id: UUID, payload: Dict[str, Any]) -> None:
+    """Award loyalty points for the order's final amount (once per completion)."""
+    from backend.modules.crm.application.loyalty_service import LoyaltyService
+    from backend.modules.crm.domain.models import LoyaltyPointsHistoryModel
+
+    order = await _load_completed_order(db, tenant_id, payload)
+    if not order or not order.customer_id:
+        return
+
+    # Each reopen writes one REVERSAL, so points are due while EARN <= REVERSAL
+    counts = await db.execute(
+        select(LoyaltyPointsHistoryModel.type, func.count()).where(
+            LoyaltyPointsHistoryModel.tenant_id == tenant_id,
+            LoyaltyPointsHistoryModel.reference_id == order.id,
+            or_(
+                (LoyaltyPointsHistoryModel.type == "EARN") & (LoyaltyPointsHistoryModel.reference_type == "ORDER"),
+                (LoyaltyPointsHistoryModel.type == "REVERSAL") & (LoyaltyPointsHistoryModel.reference_type == "ORDER_REOPEN"),
+            ),
+        ).group_by(LoyaltyPointsHistoryModel.type)
+    )
+    by_type = dict(counts.all())
+    if by_type.get("EARN", 0) > by_type.get("REVERSAL", 0):
+        return
+
+    points_earned = await LoyaltyService(db, tenant_id).earn_points(
+        customer_id=order.customer_id,
+        amount=order.final_amount or Decimal(0),
+        reference_type="ORDER",
+        reference_id=order.id,
+        description=f"Tích điểm từ đơn hàng {order.code}"
+    )
+    if points_earned > 0:
+        logger.info(f"Earned {points_earned} points for customer {order.customer_id} from order {order.code}")
+
+
+# ============ HR (SOL-1) ============
+
+@job(JOB_CREATE_TIMESHEETS)
+async def create_order_timesheets(db: AsyncSession, tenant_id: UUID, payload: Dict[str, Any]) -> None:
+    """Create PENDING AUTO_ORDER timesheets for the staff assigned to the order."""
+    from backend.modules.hr.domain.models import TimesheetModel, StaffAssignmentModel as HrStaffAssignment, EmployeeModel
+
+    order = await _load_completed_order(db, tenant_id, payload)
+    if not order:
+        return
+
+    event_date = order.event_date
+    if hasattr(event_date, 'date'):
+        event_date = event_date.date()
+
+    existing_result = await db.execute(
+        select(TimesheetModel.employee_id).where(
+            TimesheetModel.tenant_id == tenant_id,
+            TimesheetModel.order_id == order.id,
+        )
+    )
+    has_timesheet = set(existing_result.scalars().all())
+
+    staff_result = await db.execute(
+        select(OrderStaffAssignmentModel.staff_id).where(
+            OrderStaffAssignmentModel.order_id == order.id,
+            OrderStaffAssignmentModel.tenant_id == tenant_id
+        )
+    )
+    staff_ids = list(dict.fromkeys(staff_result.scalars().all()))
+
+    timesheets = []
+    if staff_ids:
+        # staff_id FK points to users.id but may store employees.id in practice
+        emp_result = await db.execute(
+            select(EmployeeModel.id, EmployeeModel.user_id).where(
+                or_(EmployeeModel.id.in_(staff_ids), EmployeeModel.user_id.in_(staff_ids)),
+                EmployeeModel.tenant_id == tenant_id
+            )
+        )
+        employee_for_staff = {}
+        for emp_id, user_id in emp_result.all():
+            employee_for_staff.setdefault(emp_id, emp_id)
+            if user_id:
+                employee_for_staff.setdefault(user_id, emp_id)
+
+        for staff_id in staff_ids:
+            employee_id = employee_for_staff.get(staff_id)
+            if not employee_id:
+                logger.warning(f"Order {order.code}: No employee found for staff_id {staff_id}, skipping timesheet")
+                continue
+            if employee_id in has_timesheet:
+                continue
+            has_timesheet.add(employee_id)
+            timesheets.append(TimesheetModel(
+                tenant_id=tenant_id,
+                employee_id=employee_id,
+                order_id=order.id,
+                work_date=event_date,
+                total_hours=Decimal("8.0"),  # Default 8 hours, HR can adjust
+                status='PENDING',  # HR will review and approve
+                source='AUTO_ORDER',
+                notes=f"Tự động tạo từ đơn hàng {order.code}"
+            ))
+    else:
+        # BUGFIX: BUG-20260205-003 - No OrderStaffAssignments: use HR's StaffAssignmentModel via event_id
+        hr_result = await db.execute(
+            select(HrStaffAssignment).where(
+                HrStaffAssignment.event_id == order.id,
+                HrStaffAssignment.tenant_id == tenant_id,
+                HrStaffAssignment.status != 'CANCELLED'
+            )
+        )
+        for hr_assignment in hr_result.scalars().all():
+            if hr_assignment.employee_id in has_timesheet:
+                continue
+            has_timesheet.add(hr_assignment.employee_id)
+
+            planned_hours = Decimal("8.0")
+            if hr_assignment.start_time and hr_assignment.end_time:
+                diff = hr_assignment.end_time - hr_assignment.start_time
+                planned_hours = Decimal(str(round(diff.total_seconds() / 3600, 2)))
+
+            timesheets.append(TimesheetModel(
+                tenant_id=tenant_id,
+                employee_id=hr_assignment.employee_id,
+                assignment_id=hr_assignment.id,
+                order_id=order.id,
+                work_date=event_date,
+                total_hours=planned_hours,
+                status='PENDING',
+                source='AUTO_ORDER',
+                notes=f"Tự động tạo từ đơn hàng {order.code}"
+            ))
+
+    if timesheets:
+        db.add_all(timesheets)
+        await db.commit()
+        logger.info(f"Order {order.code}: Auto-created {len(timesheets)} timesheets for staff")
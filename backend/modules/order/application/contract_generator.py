@@ -3,17 +3,24 @@ Contract Generator Service
 Generates .docx contract from Word template 'HDDV Giao Tuyet Template.docx'
 by filling in order data into placeholder paragraphs.
 Preserves all formatting, fonts, and styles from the template.
+
+The template is compiled once (see document_renderer.py): placeholder
+paragraphs are located up front and only those are copied per contract.
 """
 
 import copy
 import io
-import re
-from datetime import datetime, timedelta
-from decimal import Decimal
+from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
+
+from docx.text.paragraph import Paragraph
 
-from docx import Document
+from backend.modules.order.application.document_renderer import (
+    SlotSpec,
+    TemplateSlot,
+    docx_template_cache,
+)
 
 # Path to the contract template (inside backend/templates/)
 TEMPLATE_PATH = Path(__file__).resolve().parents[3] / "templates" / "contract_template.docx"
@@ -193,182 +200,184 @@ class ContractData:
         self.services_included = services_included or {}
 
 
-def generate_contract_docx(data: ContractData) -> io.BytesIO:
+def _index_contract_template(doc) -> List[SlotSpec]:
     """
-    Generate a contract .docx file by filling in the template with order data.
-
-    Args:
-        data: ContractData with all order information
-
-    Returns:
-        BytesIO buffer containing the generated .docx file
+    Locate the placeholder paragraphs of the contract template once.
+    Same matching rules as the original in-place filler, applied to the
+    template text; later sections win when several match one paragraph.
     """
-    if not TEMPLATE_PATH.exists():
-        raise FileNotFoundError(f"Contract template not found at: {TEMPLATE_PATH}")
+    kinds = {}  # paragraph element -> (kind, arg), in document order
 
-    doc = Document(str(TEMPLATE_PATH))
-    paragraphs = doc.paragraphs
+    def mark(p, kind, arg=None):
+        kinds[p._p] = (kind, arg)
 
-    # ── 1. Contract Number (Table 0, Cell 0, Paragraph 2: "Số :") ──
+    # ── 1. Contract Number (Table 0, Cell 0: "Số :") ──
     try:
-        table0 = doc.tables[0]
-        cell_0_0 = table0.rows[0].cells[0]
-        for p in cell_0_0.paragraphs:
+        for p in doc.tables[0].rows[0].cells[0].paragraphs:
             if 'Số' in p.text and ':' in p.text:
-                _replace_paragraph_text(p, f'Số : {data.order_code}')
+                mark(p, 'contract_number')
                 break
     except (IndexError, AttributeError):
         pass
 
-    # ── 2. Party date line (P6: "Hôm nay, vào, tại:  chúng tôi gồm:") ──
+    paragraphs = doc.paragraphs
+
+    # ── 2. Party date line ("Hôm nay, vào, tại:  chúng tôi gồm:") ──
     for p in paragraphs:
         if 'Hôm nay' in p.text and 'chúng tôi gồm' in p.text:
-            # BUGFIX: "Hôm nay" = ngày in hợp đồng (today), KHÔNG phải ngày đãi tiệc
-            today_str = datetime.now().strftime('%d/%m/%Y')
-            _replace_paragraph_text(p, f'Hôm nay, vào ngày {today_str}, tại TP Hồ Chí Minh, chúng tôi gồm:')
+            mark(p, 'today')
             break
 
-    # ── 3. Customer Info (P9-P12) ──
+    # ── 3. Customer Info ──
     for p in paragraphs:
         text = p.text.strip()
-        
         if text.startswith('Ông/Bà:'):
-            _replace_paragraph_text(p, f'Ông/Bà: {data.customer_name}')
-        
+            mark(p, 'customer_name')
         elif text.startswith('Địa chỉ:') and 'trụ sở' not in text and 'đãi tiệc' not in text:
-            # Customer address (P10), not Party B address or event address
-            _replace_paragraph_text(p, f'Địa chỉ: {data.customer_address}')
-        
+            mark(p, 'customer_address')
         elif text.startswith('Điện thoại:') and '0902786689' not in text:
-            # Customer phone (P12), not Party B phone
-            _replace_paragraph_text(p, f'Điện thoại: {data.customer_phone}')
+            mark(p, 'customer_phone')
 
-    # ── 4. Event Details (P21-P24) ──
+    # ── 4. Event Details ──
     for p in paragraphs:
         text = p.text.strip()
-        
-        # Party time
         if 'Thời gian đãi tiệc' in text and 'kết thúc' not in text:
-            if data.event_date and data.event_time:
-                date_str = data.event_date.strftime('%d/%m/%Y')
-                _replace_paragraph_text(p, f'Thời gian đãi tiệc : {data.event_time} ngày {date_str}')
-            elif data.event_time:
-                _replace_paragraph_text(p, f'Thời gian đãi tiệc : {data.event_time}')
-        
-        # End time = party time + 4 hours
+            mark(p, 'event_time')
         elif 'Thời gian kết thúc tiệc' in text:
-            if data.event_date and data.event_time:
-                try:
-                    h, m = map(int, data.event_time.split(':'))
-                    end_time = f'{(h + 4) % 24}:{m:02d}'
-                    date_str = data.event_date.strftime('%d/%m/%Y')
-                    _replace_paragraph_text(p, f'Thời gian kết thúc tiệc: {end_time} ngày {date_str}')
-                except (ValueError, AttributeError):
-                    pass
-        
-        # Event address
+            mark(p, 'end_time')
         elif 'Địa chỉ đãi tiệc' in text:
-            _replace_paragraph_text(p, f'Địa chỉ đãi tiệc: {data.event_address}')
-        
-        # Table count
+            mark(p, 'event_address')
         elif 'Số Bàn Tiệc' in text:
-            _replace_paragraph_text(p, f'Số Bàn Tiệc : {data.table_count} bàn')
-
-    # ── 5. Menu Items (P26-P31: placeholder tab lines after "Thực Đơn :") ──
-    # Find the "Thực Đơn" paragraph and the dish placeholder paragraphs
-    menu_start_idx = None
-    for i, p in enumerate(paragraphs):
-        if 'Thực Đơn' in p.text and 'bao gồm' in p.text:
-            menu_start_idx = i
-            break
+            mark(p, 'table_count')
 
+    # ── 5. Menu placeholders (tab-only paragraphs between "Thực Đơn" and "Đơn Giá") ──
+    menu_start_idx = next(
+        (i for i, p in enumerate(paragraphs) if 'Thực Đơn' in p.text and 'bao gồm' in p.text), None
+    )
     if menu_start_idx is not None:
-        # Template has 6 placeholder paragraphs (P26-P31) after "Thực Đơn" (P25)
-        # These are empty/tab-only paragraphs with "List Paragraph" style
         placeholder_start = menu_start_idx + 1
-        placeholder_end = placeholder_start + 6  # 6 slots
-
-        # Find "Đơn Giá" paragraph to know where placeholders end
-        don_gia_idx = None
-        for i, p in enumerate(paragraphs):
-            if 'Đơn Giá' in p.text:
-                don_gia_idx = i
-                break
+        don_gia_idx = next((i for i, p in enumerate(paragraphs) if 'Đơn Giá' in p.text), None)
+        placeholder_count = don_gia_idx - placeholder_start if don_gia_idx else 6
+        for i in range(placeholder_count):
+            if placeholder_start + i < len(paragraphs):
+                mark(paragraphs[placeholder_start + i], 'dish', i)
 
-        if don_gia_idx:
-            actual_placeholder_count = don_gia_idx - placeholder_start
-        else:
-            actual_placeholder_count = 6
-
-        # Fill in dish names, then REMOVE unused placeholder paragraphs
-        # BUGFIX: Must remove from XML, not just clear text — Word auto-numbering
-        # still shows empty numbered items (4. 5. 6. 7.) if paragraphs exist
-        paragraphs_to_remove = []
-        for i in range(actual_placeholder_count):
-            p_idx = placeholder_start + i
-            if p_idx < len(paragraphs):
-                if i < len(data.dish_names):
-                    _replace_paragraph_text(paragraphs[p_idx], data.dish_names[i])
-                else:
-                    # Mark for removal (can't modify list while iterating)
-                    paragraphs_to_remove.append(paragraphs[p_idx])
-
-        # Remove unused placeholder paragraphs from XML tree
-        for p in paragraphs_to_remove:
-            p._element.getparent().remove(p._element)
-
-    # ── 6. Pricing (P32-P34) ──
+    # ── 6. Pricing ──
     for p in paragraphs:
         text = p.text.strip()
-        
-        # Unit price per table
         if 'Đơn Giá' in text:
-            _replace_paragraph_text(p, f'Đơn Giá : {format_vnd(data.unit_price_per_table)} đ')
-        
-        # Total amount
+            mark(p, 'unit_price')
         elif 'Tổng Cộng Thanh Toán' in text:
-            _replace_paragraph_text(p, f'Tổng Cộng Thanh Toán : {format_vnd(data.total_amount)} đ')
-        
-        # Total in words
+            mark(p, 'total')
         elif 'Viết Bằng chữ' in text:
-            _replace_paragraph_text(p, f'Viết Bằng chữ : {number_to_vietnamese_words(data.total_amount)}')
+            mark(p, 'total_words')
 
-    # ── 7. Payment Terms (P48-P51) ──
+    # ── 7. Payment Terms ──
     payment_1_done = False
     payment_1_words_done = False
     for p in paragraphs:
         text = p.text.strip()
-        
-        # Payment 1 (deposit)
         if 'Lần 1' in text and not payment_1_done:
-            _replace_paragraph_text(
-                p,
-                f'Lần 1 : {format_vnd(data.deposit_amount)} đ khi ký hợp đồng.'
-            )
+            mark(p, 'deposit')
             payment_1_done = True
-        
-        # Payment 1 in words
         elif 'Viết bằng chữ' in text and payment_1_done and not payment_1_words_done:
-            _replace_paragraph_text(p, f'Viết bằng chữ: {number_to_vietnamese_words(data.deposit_amount)}')
+            mark(p, 'deposit_words')
             payment_1_words_done = True
-        
-        # Payment 2 (remaining)
         elif 'Lần 2' in text:
-            _replace_paragraph_text(
-                p,
-                f'Lần 2 : {format_vnd(data.remaining_amount)} đ khi kết thúc tiệc.'
-            )
-        
-        # Payment 2 in words
+            mark(p, 'remaining')
         elif 'Viết bằng chữ' in text and payment_1_words_done:
-            _replace_paragraph_text(p, f'Viết bằng chữ: {number_to_vietnamese_words(data.remaining_amount)}')
-            break  # Done with payments
+            mark(p, 'remaining_words')
+            break
+
+    # ── 8. Service checklist — static text lines, left as-is ──
+
+    return [SlotSpec(element, kind, arg) for element, (kind, arg) in kinds.items()]
+
+
+def _contract_slot_text(slot: TemplateSlot, data: ContractData) -> Optional[str]:
+    """New text of a placeholder paragraph; None keeps the template text."""
+    kind = slot.kind
+    if kind == 'contract_number':
+        return f'Số : {data.order_code}'
+    if kind == 'today':
+        # BUGFIX: "Hôm nay" = ngày in hợp đồng (today), KHÔNG phải ngày đãi tiệc
+        today_str = datetime.now().strftime('%d/%m/%Y')
+        return f'Hôm nay, vào ngày {today_str}, tại TP Hồ Chí Minh, chúng tôi gồm:'
+    if kind == 'customer_name':
+        return f'Ông/Bà: {data.customer_name}'
+    if kind == 'customer_address':
+        return f'Địa chỉ: {data.customer_address}'
+    if kind == 'customer_phone':
+        return f'Điện thoại: {data.customer_phone}'
+    if kind == 'event_time':
+        if data.event_date and data.event_time:
+            return f'Thời gian đãi tiệc : {data.event_time} ngày {data.event_date.strftime("%d/%m/%Y")}'
+        if data.event_time:
+            return f'Thời gian đãi tiệc : {data.event_time}'
+        return None
+    if kind == 'end_time':
+        # End time = party time + 4 hours
+        if data.event_date and data.event_time:
+            try:
+                h, m = map(int, data.event_time.split(':'))
+                end_time = f'{(h + 4) % 24}:{m:02d}'
+                return f'Thời gian kết thúc tiệc: {end_time} ngày {data.event_date.strftime("%d/%m/%Y")}'
+            except (ValueError, AttributeError):
+                pass
+        return None
+    if kind == 'event_address':
+        return f'Địa chỉ đãi tiệc: {data.event_address}'
+    if kind == 'table_count':
+        return f'Số Bàn Tiệc : {data.table_count} bàn'
+    if kind == 'dish':
+        return data.dish_names[slot.arg]
+    if kind == 'unit_price':
+        return f'Đơn Giá : {format_vnd(data.unit_price_per_table)} đ'
+    if kind == 'total':
+        return f'Tổng Cộng Thanh Toán : {format_vnd(data.total_amount)} đ'
+    if kind == 'total_words':
+        return f'Viết Bằng chữ : {number_to_vietnamese_words(data.total_amount)}'
+    if kind == 'deposit':
+        return f'Lần 1 : {format_vnd(data.deposit_amount)} đ khi ký hợp đồng.'
+    if kind == 'deposit_words':
+        return f'Viết bằng chữ: {number_to_vietnamese_words(data.deposit_amount)}'
+    if kind == 'remaining':
+        return f'Lần 2 : {format_vnd(data.remaining_amount)} đ khi kết thúc tiệc.'
+    if kind == 'remaining_words':
+        return f'Viết bằng chữ: {number_to_vietnamese_words(data.remaining_amount)}'
+    return None
+
+
+def _fill_contract_slot(slot: TemplateSlot, data: ContractData):
+    if slot.kind == 'dish' and slot.arg >= len(data.dish_names):
+        # BUGFIX: Must remove from XML, not just clear text — Word auto-numbering
+        # still shows empty numbered items (4. 5. 6. 7.) if paragraphs exist
+        return []
+    text = _contract_slot_text(slot, data)
+    if text is None:
+        return None
+    p = copy.deepcopy(slot.element)
+    _replace_paragraph_text(Paragraph(p, None), text)
+    return [p]
+
 
-    # ── 8. Service checklist (P37-P44) — mark included services ──
-    # These are static text lines; we leave them as-is from the template.
+def get_contract_template():
+    """Compiled contract template (parsed once per process, reloaded when the file changes)."""
+    return docx_template_cache.get(TEMPLATE_PATH, _index_contract_template)
+
+
+def generate_contract_docx(data: ContractData) -> io.BytesIO:
+    """
+    Generate a contract .docx file by filling in the template with order data.
+    CPU-bound; async callers should use render_in_pool(generate_contract_docx, data).
+
+    Args:
+        data: ContractData with all order information
+
+    Returns:
+        BytesIO buffer containing the generated .docx file
+    """
+    if not TEMPLATE_PATH.exists():
+        raise FileNotFoundError(f"Contract template not found at: {TEMPLATE_PATH}")
 
-    # Save to BytesIO buffer
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
+    return get_contract_template().render(lambda slot: _fill_contract_slot(slot, data))
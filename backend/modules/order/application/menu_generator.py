@@ -2,6 +2,10 @@
 Menu Generator Service
 Generates .docx menu card from Word template by replacing text box content
 with actual order items. Preserves all formatting, borders, and ornaments.
+
+The template is compiled once (see document_renderer.py): the dish
+paragraphs of every text box are cut out up front and only the new dish
+paragraphs are built per menu.
 """
 
 import copy
@@ -12,6 +16,12 @@ from typing import List
 from docx import Document
 from lxml import etree
 
+from backend.modules.order.application.document_renderer import (
+    SlotSpec,
+    TemplateSlot,
+    docx_template_cache,
+)
+
 # Path to the menu template
 TEMPLATE_PATH = Path(__file__).resolve().parents[3] / "templates" / "menu_template.docx"
 
@@ -58,70 +68,71 @@ def _set_paragraph_text(paragraph, text: str, template_run=None) -> None:
     t_elem.text = text
 
 
-def generate_menu_docx(dish_names: List[str]) -> io.BytesIO:
+def _index_menu_template(doc) -> List[SlotSpec]:
     """
-    Generate a menu .docx file by replacing dish names in the template.
-
-    Args:
-        dish_names: List of dish name strings (e.g., ["Tôm chiên rế Sài Gòn xưa", ...])
-
-    Returns:
-        BytesIO buffer containing the generated .docx file
+    One append slot per text box: the dish paragraphs (P1..) are cut out of
+    the template once, the new ones are appended after the "MENU" title.
+    The first dish paragraph is kept as the formatting template.
     """
-    if not TEMPLATE_PATH.exists():
-        raise FileNotFoundError(f"Menu template not found at: {TEMPLATE_PATH}")
-
-    doc = Document(str(TEMPLATE_PATH))
-
-    # Find all text box contents
-    txbx_contents = _get_text_box_contents(doc)
-
-    for txbx in txbx_contents:
+    specs = []
+    for txbx in _get_text_box_contents(doc):
         paragraphs = _get_paragraphs_from_txbx(txbx)
 
-        if not paragraphs:
-            continue
-
         # P0 is always "MENU" title — leave it unchanged
-        # P1..P6 are dish names — replace them
-
-        # Get the first dish paragraph to use as formatting template
-        dish_paragraphs = paragraphs[1:]  # Skip MENU title (P0)
-
+        dish_paragraphs = paragraphs[1:]
         if not dish_paragraphs:
             continue
 
-        # Get template run formatting from the first dish paragraph
-        template_run = None
+        # Formatting template: first run (rPr) and paragraph properties (pPr)
         first_dish_p = dish_paragraphs[0]
         runs = first_dish_p.findall(f'{{{W_NS}}}r')
-        if runs:
-            template_run = runs[0]
-
-        # Get template paragraph properties (pPr) for cloning new paragraphs
+        template_run = copy.deepcopy(runs[0]) if runs else None
         template_pPr = first_dish_p.find(f'{{{W_NS}}}pPr')
+        template_pPr = copy.deepcopy(template_pPr) if template_pPr is not None else None
 
-        # Remove ALL existing dish paragraphs (P1 onwards)
         for dp in dish_paragraphs:
             txbx.remove(dp)
 
-        # Add new paragraphs for each dish
-        for i, dish_name in enumerate(dish_names):
-            # BUGFIX: BUG-20260219-002
-            # Word template pPr already has auto-numbering (list format).
-            # Only set the dish name text — Word handles the "1. 2. 3." prefix.
-            # Create new paragraph element
-            new_p = etree.SubElement(txbx, f'{{{W_NS}}}p')
-
-            # Copy paragraph properties (spacing, alignment, numbering, etc.)
-            if template_pPr is not None:
-                new_p.insert(0, copy.deepcopy(template_pPr))
-
-            # Set text with formatting (dish name only, no manual numbering)
-            _set_paragraph_text(new_p, dish_name, template_run)
-
-    # Save to BytesIO buffer
-    buffer = io.BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
+        specs.append(SlotSpec(txbx, 'dishes', (template_pPr, template_run), append=True))
+    return specs
+
+
+def _dish_paragraphs(slot: TemplateSlot, dish_names: List[str]) -> list:
+    template_pPr, template_run = slot.arg
+    new_paragraphs = []
+    for dish_name in dish_names:
+        # BUGFIX: BUG-20260219-002
+        # Word template pPr already has auto-numbering (list format).
+        # Only set the dish name text — Word handles the "1. 2. 3." prefix.
+        new_p = etree.Element(f'{{{W_NS}}}p')
+
+        # Copy paragraph properties (spacing, alignment, numbering, etc.)
+        if template_pPr is not None:
+            new_p.insert(0, copy.deepcopy(template_pPr))
+
+        # Set text with formatting (dish name only, no manual numbering)
+        _set_paragraph_text(new_p, dish_name, template_run)
+        new_paragraphs.append(new_p)
+    return new_paragraphs
+
+
+def get_menu_template():
+    """Compiled menu template (parsed once per process, reloaded when the file changes)."""
+    return docx_template_cache.get(TEMPLATE_PATH, _index_menu_template)
+
+
+def generate_menu_docx(dish_names: List[str]) -> io.BytesIO:
+    """
+    Generate a menu .docx file by replacing dish names in the template.
+    CPU-bound; async callers should use render_in_pool(generate_menu_docx, names).
+
+    Args:
+        dish_names: List of dish name strings (e.g., ["Tôm chiên rế Sài Gòn xưa", ...])
+
+    Returns:
+        BytesIO buffer containing the generated .docx file
+    """
+    if not TEMPLATE_PATH.exists():
+        raise FileNotFoundError(f"Menu template not found at: {TEMPLATE_PATH}")
+
+    return get_menu_template().render(lambda slot: _dish_paragraphs(slot, dish_names))
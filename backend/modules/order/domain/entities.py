@@ -104,10 +104,13 @@ class OrderStats(BaseModel):
 class PaginatedOrderResponse(BaseModel):
     """Paginated response for orders list - ISS-001 fix"""
     items: List[Order]
-    total: int
+    total: Optional[int] = None      # None when count=none
     page: int
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    total_is_capped: bool = False    # total is a lower bound (count=capped)
+    next_cursor: Optional[str] = None
+    has_more: bool = False
 
 
 class OrderPnL(BaseModel):
@@ -5,8 +5,8 @@ Database: PostgreSQL (catering_db)
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, update, Integer, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func, update, Integer
+from sqlalchemy.orm import noload, selectinload
 from typing import List, Optional
 from uuid import UUID
 from datetime import datetime, timezone
@@ -20,16 +20,18 @@ logger = logging.getLogger(__name__)
 from backend.core.database import get_db
 from backend.core.dependencies import get_current_tenant, CurrentTenant
 from backend.core.auth.permissions import require_permission
+from backend.common.utils.keyset_pagination import COUNT_CAPPED, KeysetPaginator, search_clause
 from backend.modules.order.domain.models import OrderModel, OrderItemModel, OrderPaymentModel, OrderStaffAssignmentModel
 from backend.modules.order.domain.entities import (
     Order, OrderBase, OrderItem, OrderItemBase,
     OrderPayment, OrderPaymentBase, OrderStats, PaginatedOrderResponse
 )
 from backend.modules.crm.application.services import CrmIntegrationService
-from backend.modules.crm.application.loyalty_service import LoyaltyService
 
 router = APIRouter(tags=["Order Management"])
 
+order_list_paginator = KeysetPaginator(OrderModel.created_at, OrderModel.id)
+
 # GAP-O2: Structured audit logging for order module
 audit_logger = logging.getLogger("order.audit")
 
@@ -522,9 +524,10 @@ async def suggest_staff_for_order(
     4. Performance (prioritize fulltime, active)
     
     GAP-M3: Order Staff Auto-Assign feature
+    Conflicts cover HR and order assignments plus approved leave, from the
+    same availability matrix as the HR calendar (see StaffRecommendationEngine).
     """
-    from backend.modules.hr.domain.models import EmployeeModel, StaffAssignmentModel
-    from datetime import timedelta
+    from backend.modules.hr.services.staff_recommendation import StaffRecommendationEngine
     
     # Verify order exists
     order_result = await db.execute(
@@ -537,122 +540,35 @@ async def suggest_staff_for_order(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    # Get order event date for conflict checking
-    event_date = order.event_date
-    
-    # Query all active employees
-    emp_query = select(EmployeeModel).where(
-        EmployeeModel.tenant_id == tenant_id,
-        EmployeeModel.is_active == True
-    )
-    
-    if role_filter:
-        emp_query = emp_query.where(EmployeeModel.role_type == role_filter)
-    
-    emp_result = await db.execute(emp_query)
-    employees = emp_result.scalars().all()
-    
-    # Get already assigned staff for this order
-    assigned_query = select(StaffAssignmentModel.employee_id).where(
-        StaffAssignmentModel.event_id == order_id,
-        StaffAssignmentModel.tenant_id == tenant_id,
-        StaffAssignmentModel.status != 'CANCELLED'
-    )
-    assigned_result = await db.execute(assigned_query)
-    already_assigned = {row[0] for row in assigned_result.all()}
-    
-    # Calculate workload for each employee (assignments this week)
-    week_start = datetime.now() - timedelta(days=7)
-    workload_query = (
-        select(
-            StaffAssignmentModel.employee_id,
-            func.count(StaffAssignmentModel.id).label('count')
-        )
-        .where(
-            StaffAssignmentModel.tenant_id == tenant_id,
-            StaffAssignmentModel.created_at >= week_start,
-            StaffAssignmentModel.status != 'CANCELLED'
-        )
-        .group_by(StaffAssignmentModel.employee_id)
-    )
-    workload_result = await db.execute(workload_query)
-    workload_map = {row[0]: row[1] for row in workload_result.all()}
-    
-    # Check conflicts (same date assignments)
-    conflict_query = (
-        select(
-            StaffAssignmentModel.employee_id,
-            StaffAssignmentModel.event_id
-        )
-        .join(OrderModel, StaffAssignmentModel.event_id == OrderModel.id)
-        .where(
-            StaffAssignmentModel.tenant_id == tenant_id,
-            StaffAssignmentModel.status != 'CANCELLED',
-            func.date(OrderModel.event_date) == func.date(event_date) if event_date else False
-        )
+    recommendation = await StaffRecommendationEngine(db, tenant_id).recommend(
+        order_id=order_id,
+        event_date=order.event_date,
+        role_filter=role_filter,
+        limit=limit,
     )
-    conflict_result = await db.execute(conflict_query)
-    conflicts = {row[0] for row in conflict_result.all()}
-    
-    suggestions = []
-    required_roles = set()
-    
-    for emp in employees:
-        # Skip already assigned to this order
-        if emp.id in already_assigned:
-            continue
-        
-        required_roles.add(emp.role_type)
-        workload = workload_map.get(emp.id, 0)
-        has_conflict = emp.id in conflicts
-        
-        # Calculate score (0-100)
-        score = 50  # Base score
-        
-        # Bonus for fulltime (more reliable)
-        if emp.is_fulltime:
-            score += 15
-        
-        # Bonus for lower workload
-        if workload == 0:
-            score += 20
-        elif workload <= 2:
-            score += 10
-        elif workload >= 5:
-            score -= 10
-        
-        # Penalty for conflict
-        if has_conflict:
-            score -= 30
-        
-        # Role match bonus (if filter specified)
-        if role_filter and emp.role_type == role_filter:
-            score += 10
-        
-        suggestions.append(StaffSuggestion(
-            employee_id=str(emp.id),
-            employee_name=emp.full_name,
-            role_type=emp.role_type or 'STAFF',
-            phone=emp.phone,
-            is_fulltime=emp.is_fulltime,
-            hourly_rate=float(emp.hourly_rate or 0),
-            current_workload=workload,
-            is_available=not has_conflict,
-            score=max(0, min(100, score)),  # Clamp 0-100
-            conflict_reason="Đã có lịch cùng ngày" if has_conflict else None
-        ))
-    
-    # Sort by score descending, then by availability
-    suggestions.sort(key=lambda x: (-x.is_available, -x.score))
     
     return SuggestStaffResponse(
         order_id=str(order_id),
         order_code=order.code,
         event_date=str(order.event_date) if order.event_date else None,
         event_time=order.event_time if hasattr(order, 'event_time') else None,
-        required_roles=list(required_roles),
-        suggestions=suggestions[:limit],
-        total_available=len([s for s in suggestions if s.is_available])
+        required_roles=recommendation.roles,
+        suggestions=[
+            StaffSuggestion(
+                employee_id=str(s.employee_id),
+                employee_name=s.employee_name,
+                role_type=s.role_type,
+                phone=s.phone,
+                is_fulltime=s.is_fulltime,
+                hourly_rate=float(s.hourly_rate),
+                current_workload=s.workload,
+                is_available=s.is_available,
+                score=s.score,
+                conflict_reason=s.conflict_reason
+            )
+            for s in recommendation.suggestions
+        ],
+        total_available=recommendation.total_available
     )
 
 
@@ -785,53 +701,61 @@ async def create_revision_quote(
               dependencies=[Depends(require_permission("order", "view"))])
 async def list_orders(
     status: Optional[str] = Query(None, description="Filter by status"),
-    search: Optional[str] = Query(None, description="Search by code or customer name"),
+    search: Optional[str] = Query(None, description="Search by code or customer name (accents ignored)"),
     unpaid: Optional[bool] = Query(None, description="Filter only orders with balance > 0"),
-    page: int = Query(1, ge=1, description="Page number"),
+    page: int = Query(1, ge=1, description="Page number (ignored when cursor is given)"),
     page_size: int = Query(20, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    count: str = Query(COUNT_CAPPED, pattern="^(none|capped|exact)$", description="Total: none, capped or exact"),
+    include: Optional[str] = Query(None, description="Comma-separated: items,payments"),
     tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db)
 ):
-    """List all orders with optional filters and pagination - ISS-001 Fix"""
-    # Base query with tenant filter
+    """
+    List orders newest first - ISS-001 Fix.
+    Keyset pagination on (created_at, id): follow next_cursor for deep pages;
+    items/payments are only loaded when requested via include.
+    """
     base_query = select(OrderModel).where(OrderModel.tenant_id == tenant_id)
     
     if status:
         base_query = base_query.where(OrderModel.status == status)
     
-    if search:
-        base_query = base_query.where(
-            (OrderModel.code.ilike(f"%{search}%")) |
-            (OrderModel.customer_name.ilike(f"%{search}%"))
-        )
+    if search and search.strip():
+        base_query = base_query.where(search_clause((OrderModel.code, OrderModel.customer_name), search))
     
     # Filter only unpaid orders (balance > 0)
     if unpaid:
         base_query = base_query.where(OrderModel.balance_amount > 0)
     
-    # Count total
-    count_result = await db.execute(select(func.count()).select_from(base_query.subquery()))
-    total = count_result.scalar() or 0
-    
-    # Calculate pagination
-    total_pages = (total + page_size - 1) // page_size if total > 0 else 1
-    offset = (page - 1) * page_size
+    # Slim list by default: relations the caller did not ask for stay empty
+    includes = {part.strip() for part in (include or "").split(",") if part.strip()}
+    base_query = base_query.options(
+        selectinload(OrderModel.items) if "items" in includes else noload(OrderModel.items),
+        selectinload(OrderModel.payments) if "payments" in includes else noload(OrderModel.payments),
+    )
     
-    # Apply pagination and ordering
-    query = base_query.options(
-        selectinload(OrderModel.items),
-        selectinload(OrderModel.payments)
-    ).order_by(OrderModel.created_at.desc()).offset(offset).limit(page_size)
+    try:
+        result = await order_list_paginator.paginate(
+            db, base_query, cursor=cursor, page_size=page_size, count=count,
+            offset=(page - 1) * page_size,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    result = await db.execute(query)
-    orders = result.scalars().all()
+    total_pages = None
+    if result.total is not None:
+        total_pages = (result.total + page_size - 1) // page_size if result.total > 0 else 1
     
     return PaginatedOrderResponse(
-        items=orders,
-        total=total,
+        items=result.items,
+        total=result.total,
         page=page,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        total_is_capped=result.total_is_capped,
+        next_cursor=result.next_cursor,
+        has_more=result.has_more
     )
 
 
@@ -1088,9 +1012,7 @@ async def confirm_order(order_id: UUID, tenant_id: UUID = Depends(get_current_te
     
     _log_order_audit("ORDER_CONFIRM", str(order_id), order.code, "Order confirmed")
     
-    # CRM Hook: Recalculate Stats (e.g. Order Count increases)
-    if order.customer_id:
-        await CrmIntegrationService.recalculate_stats(db, tenant_id, order.customer_id)
+    # CRM stats / tier follow at commit (crm/application/rfm_engine.py)
     
     # Reload with relationships
     result = await db.execute(
@@ -1147,10 +1069,9 @@ async def start_order(order_id: UUID, tenant_id: UUID = Depends(get_current_tena
 @router.post("/{order_id}/complete", response_model=Order,
               dependencies=[Depends(require_permission("order", "update_status"))])
 async def complete_order(order_id: UUID, tenant_id: UUID = Depends(get_current_tenant), db: AsyncSession = Depends(get_db)):
-    """Mark order as completed and auto-deduct inventory (GAP-6.1 Fix)"""
+    """Mark order as completed and queue its side effects (inventory, CRM, loyalty, timesheets)"""
     result = await db.execute(
         select(OrderModel)
-        .options(selectinload(OrderModel.items))
         .where(
             (OrderModel.id == order_id) &
             (OrderModel.tenant_id == tenant_id)
@@ -1165,223 +1086,14 @@ async def complete_order(order_id: UUID, tenant_id: UUID = Depends(get_current_t
     order.completed_at = datetime.now(timezone.utc)
     order.updated_at = datetime.now(timezone.utc)
     
-    # ============ GAP-6.1 FIX: Auto-Deduct Inventory ============
-    # Deduct inventory based on recipe mapping when order is completed
-    try:
-        from backend.modules.menu.domain.models import RecipeModel
-        from backend.modules.inventory.domain.services import InventoryService
-        from backend.modules.inventory.domain.entities import InventoryTransactionBase
-        from backend.modules.inventory.domain.models import WarehouseModel
-        
-        # Get default warehouse
-        wh_result = await db.execute(
-            select(WarehouseModel).where(WarehouseModel.tenant_id == tenant_id).limit(1)
-        )
-        default_warehouse = wh_result.scalar_one_or_none()
-        
-        if default_warehouse and order.items:
-            deducted_count = 0
-            for order_item in order.items:
-                if not order_item.menu_item_id:
-                    continue
-                
-                # Find recipes for this menu item
-                recipe_result = await db.execute(
-                    select(RecipeModel).where(
-                        RecipeModel.menu_item_id == order_item.menu_item_id,
-                        RecipeModel.tenant_id == tenant_id
-                    )
-                )
-                recipes = recipe_result.scalars().all()
-                
-                for recipe in recipes:
-                    # Calculate quantity needed
-                    qty_needed = float(order_item.quantity) * float(recipe.quantity_per_unit)
-                    
-                    if qty_needed > 0:
-                        try:
-                            # Create EXPORT transaction
-                            await InventoryService.create_transaction(
-                                db=db,
-                                data=InventoryTransactionBase(
-                                    item_id=recipe.ingredient_id,
-                                    warehouse_id=default_warehouse.id,
-                                    transaction_type="EXPORT",
-                                    quantity=Decimal(str(qty_needed)),
-                                    reference_doc=f"ORDER-{order.code}",
-                                    notes=f"Auto-deduct: {order_item.item_name} x {order_item.quantity}"
-                                ),
-                                tenant_id=tenant_id,
-                                auto_deduct_lots=True  # FIFO lot deduction
-                            )
-                            deducted_count += 1
-                        except HTTPException as e:
-                            # Log but don't fail order completion if insufficient stock
-                            logger.warning(f"Inventory deduct failed for {recipe.ingredient_name}: {e.detail}")
-            
-            if deducted_count > 0:
-                logger.info(f"Order {order.code}: Auto-deducted {deducted_count} inventory items")
-                
-    except ImportError as e:
-        logger.warning(f"Inventory deduct skipped (module not available): {e}")
-    except Exception as e:
-        # Don't fail order completion if inventory deduct fails
-        logger.warning(f"Inventory auto-deduct failed for order {order.code}: {e}")
-    # ============ END GAP-6.1 FIX ============
+    # Side effects (GAP-6.1 inventory deduct, CRM stats, loyalty points,
+    # SOL-1 timesheets) run in the outbox worker. They are enqueued in this
+    # transaction, so they exist if and only if the completion commits.
+    from backend.modules.order.application.completion_jobs import enqueue_completion_jobs
+    await enqueue_completion_jobs(db, tenant_id, order)
     
     await db.commit()
     
-    # CRM Hook: Recalculate Stats (e.g. Total Spent updates)
-    if order.customer_id:
-        await CrmIntegrationService.recalculate_stats(db, tenant_id, order.customer_id)
-        
-        # CRM Loyalty: Earn points based on final_amount
-        try:
-            loyalty_service = LoyaltyService(db, tenant_id)
-            points_earned = await loyalty_service.earn_points(
-                customer_id=order.customer_id,
-                amount=order.final_amount or Decimal(0),
-                reference_type="ORDER",
-                reference_id=order.id,
-                description=f"Tích điểm từ đơn hàng {order.code}"
-            )
-            if points_earned > 0:
-                logger.info(f"Earned {points_earned} points for customer {order.customer_id} from order {order.code}")
-        except Exception as e:
-            # Don't fail the order completion if loyalty fails
-            logger.warning(f"Failed to earn loyalty points for order {order.code}: {e}")
-    
-    # ============ HR INTEGRATION: Auto-Create Timesheets (SOL-1) ============
-    # Create timesheets for all staff assigned to this order
-    try:
-        from backend.modules.hr.domain.models import TimesheetModel, StaffAssignmentModel as HrStaffAssignment, EmployeeModel
-        from decimal import Decimal
-        
-        # Get all staff assignments for this order
-        staff_result = await db.execute(
-            select(OrderStaffAssignmentModel).where(
-                OrderStaffAssignmentModel.order_id == order_id,
-                OrderStaffAssignmentModel.tenant_id == tenant_id
-            )
-        )
-        staff_assignments = staff_result.scalars().all()
-        
-        # BUGFIX: BUG-20260205-003 - If no OrderStaffAssignments, check HR's StaffAssignmentModel via event_id
-        hr_staff_assignments = []
-        if not staff_assignments:
-            hr_result = await db.execute(
-                select(HrStaffAssignment).where(
-                    HrStaffAssignment.event_id == order_id,
-                    HrStaffAssignment.tenant_id == tenant_id,
-                    HrStaffAssignment.status != 'CANCELLED'
-                )
-            )
-            hr_staff_assignments = hr_result.scalars().all()
-            if hr_staff_assignments:
-                logger.info(f"Order {order.code}: Found {len(hr_staff_assignments)} HR staff assignments via event_id")
-        
-        timesheets_created = 0
-        
-        # Process OrderStaffAssignmentModel records
-        for assignment in staff_assignments:
-            # BUGFIX: Resolve employee_id from staff_id safely
-            # staff_id FK points to users.id but may store employees.id in practice
-            emp_lookup = await db.execute(
-                select(EmployeeModel).where(
-                    or_(
-                        EmployeeModel.id == assignment.staff_id,       # Direct employee ID
-                        EmployeeModel.user_id == assignment.staff_id   # User ID → Employee
-                    ),
-                    EmployeeModel.tenant_id == tenant_id
-                )
-            )
-            employee = emp_lookup.scalar_one_or_none()
-            if not employee:
-                logger.warning(f"Order {order.code}: No employee found for staff_id {assignment.staff_id}, skipping timesheet")
-                continue
-            
-            resolved_employee_id = employee.id
-            
-            # Check if timesheet already exists for this order+employee
-            existing = await db.execute(
-                select(TimesheetModel).where(
-                    TimesheetModel.tenant_id == tenant_id,
-                    TimesheetModel.employee_id == resolved_employee_id,
-                    TimesheetModel.order_id == order_id
-                )
-            )
-            if existing.scalar_one_or_none():
-                continue  # Skip if already exists
-            
-            # Determine work date from order
-            event_date = order.event_date
-            if hasattr(event_date, 'date'):
-                event_date = event_date.date()
-            
-            # Create timesheet
-            timesheet = TimesheetModel(
-                tenant_id=tenant_id,
-                employee_id=resolved_employee_id,
-                order_id=order_id,
-                work_date=event_date,
-                total_hours=Decimal("8.0"),  # Default 8 hours, HR can adjust
-                status='PENDING',  # HR will review and approve
-                source='AUTO_ORDER',
-                notes=f"Tự động tạo từ đơn hàng {order.code}"
-            )
-            db.add(timesheet)
-            timesheets_created += 1
-        
-        # BUGFIX: BUG-20260205-003 - Process HR StaffAssignmentModel records
-        for hr_assignment in hr_staff_assignments:
-            # Check if timesheet already exists for this order+staff
-            existing = await db.execute(
-                select(TimesheetModel).where(
-                    TimesheetModel.tenant_id == tenant_id,
-                    TimesheetModel.employee_id == hr_assignment.employee_id,
-                    TimesheetModel.order_id == order_id
-                )
-            )
-            if existing.scalar_one_or_none():
-                continue  # Skip if already exists
-            
-            # Determine work date from order
-            event_date = order.event_date
-            if hasattr(event_date, 'date'):
-                event_date = event_date.date()
-            
-            # Calculate planned hours from assignment if available
-            planned_hours = Decimal("8.0")  # Default
-            if hr_assignment.start_time and hr_assignment.end_time:
-                diff = hr_assignment.end_time - hr_assignment.start_time
-                planned_hours = Decimal(str(round(diff.total_seconds() / 3600, 2)))
-            
-            # Create timesheet with assignment link
-            timesheet = TimesheetModel(
-                tenant_id=tenant_id,
-                employee_id=hr_assignment.employee_id,
-                assignment_id=hr_assignment.id,  # Link to HR assignment
-                order_id=order_id,
-                work_date=event_date,
-                total_hours=planned_hours,  # Use planned hours from assignment
-                status='PENDING',  # HR will review and approve
-                source='AUTO_ORDER',
-                notes=f"Tự động tạo từ đơn hàng {order.code}"
-            )
-            db.add(timesheet)
-            timesheets_created += 1  # BUGFIX: BUG-20260205-003 - Count HR timesheets too
-        
-        if timesheets_created > 0:
-            await db.commit()  # BUGFIX: BUG-20260205-002 - Persist timesheets to database
-            logger.info(f"Order {order.code}: Auto-created {timesheets_created} timesheets for staff")
-            
-    except ImportError as e:
-        logger.warning(f"HR timesheet auto-create skipped (module not available): {e}")
-    except Exception as e:
-        # Don't fail order completion if timesheet creation fails
-        logger.warning(f"HR timesheet auto-create failed for order {order.code}: {e}")
-    # ============ END HR INTEGRATION ============
-    
     _log_order_audit("ORDER_COMPLETE", str(order_id), order.code, "Order completed")
     
     # Reload with relationships
@@ -1586,12 +1298,7 @@ async def reopen_order(
 
     await db.commit()
 
-    # ============ ROLLBACK 5: Recalculate CRM Stats ============
-    if order.customer_id:
-        try:
-            await CrmIntegrationService.recalculate_stats(db, tenant_id, order.customer_id)
-        except Exception as e:
-            logger.warning(f"CRM stats recalculation failed for order {order.code}: {e}")
+    # CRM stats were recomputed at the commit above (crm/application/rfm_engine.py)
 
     # ============ Create Audit Note ============
     try:
@@ -1970,9 +1677,7 @@ async def mark_paid(order_id: UUID, tenant_id: UUID = Depends(get_current_tenant
                      f"Order marked as paid. Amount: {order.final_amount}",
                      {"final_amount": str(order.final_amount)})
     
-    # CRM Hook: Recalculate Stats
-    if order.customer_id:
-        await CrmIntegrationService.recalculate_stats(db, tenant_id, order.customer_id)
+    # CRM stats / tier follow at commit (crm/application/rfm_engine.py)
     
     # Reload with relationships
     result = await db.execute(
@@ -2748,6 +2453,58 @@ class PullSheet(BaseModel):
     generated_at: str
 
 
+PULL_SHEET_STATUSES = ['CONFIRMED', 'IN_PROGRESS']
+
+
+def _pull_sheet_for(order: OrderModel, order_plan) -> PullSheet:
+    """Render one order's planned lines in the pull sheet response shape."""
+    from datetime import timedelta
+    from backend.modules.inventory.domain.pull_sheet_planner import (
+        STATUS_INSUFFICIENT, STATUS_NOT_LINKED, STATUS_SUFFICIENT,
+    )
+
+    pull_items = [
+        PullSheetItem(
+            inventory_item_id=str(line.inventory_item_id) if line.inventory_item_id else None,
+            item_name=line.item_name,
+            quantity_needed=float(line.quantity_needed),
+            uom=line.uom,
+            warehouse=line.warehouse,
+            lots=[
+                PullSheetLot(
+                    lot_number=lot.lot_number,
+                    expiry_date=lot.expiry_date.strftime("%d/%m/%Y") if lot.expiry_date else None,
+                    available_qty=float(lot.available_qty),
+                    to_pick_qty=float(lot.to_pick_qty),
+                )
+                for lot in line.lots
+            ],
+            status=line.status,
+            shortfall=float(line.shortfall) if line.shortfall is not None else None,
+        )
+        for line in order_plan.lines
+    ]
+
+    # Calculate pickup deadline (T-1 day before event)
+    pickup_deadline = None
+    if order.event_date:
+        deadline = order.event_date - timedelta(days=1)
+        pickup_deadline = deadline.strftime("%d/%m/%Y 16:00")
+
+    return PullSheet(
+        order_id=str(order.id),
+        order_code=order.code,
+        event_date=order.event_date.strftime("%d/%m/%Y") if order.event_date else None,
+        pickup_deadline=pickup_deadline,
+        items=pull_items,
+        total_items=len(pull_items),
+        sufficient_count=order_plan.count(STATUS_SUFFICIENT),
+        insufficient_count=order_plan.count(STATUS_INSUFFICIENT),
+        not_linked_count=order_plan.count(STATUS_NOT_LINKED),
+        generated_at=datetime.now(timezone.utc).strftime("%d/%m/%Y %H:%M")
+    )
+
+
 @router.get("/{order_id}/pull-sheet", response_model=PullSheet,
               dependencies=[Depends(require_permission("order", "view"))])
 async def generate_pull_sheet(
@@ -2760,11 +2517,10 @@ async def generate_pull_sheet(
     Links order items to inventory with FIFO lot selection.
     Shows stock availability and suggests purchases for shortfalls.
     """
-    # Get order with items
+    from backend.modules.inventory.domain.pull_sheet_planner import get_pull_sheet_planner
+
     result = await db.execute(
-        select(OrderModel)
-        .options(selectinload(OrderModel.items))
-        .where(
+        select(OrderModel).where(
             (OrderModel.id == order_id) &
             (OrderModel.tenant_id == tenant_id)
         )
@@ -2774,162 +2530,102 @@ async def generate_pull_sheet(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    if order.status not in ['CONFIRMED', 'IN_PROGRESS']:
+    if order.status not in PULL_SHEET_STATUSES:
         raise HTTPException(
             status_code=400,
             detail=f"Pull sheet chềEtạo được cho đơn hàng đã xác nhận. Status hiện tại: {order.status}"
         )
     
-    # Import inventory models
-    from backend.modules.inventory.domain.models import (
-        InventoryItemModel, InventoryStockModel, InventoryLotModel, RecipeModel, WarehouseModel
-    )
-    
-    pull_items = []
-    sufficient_count = 0
-    insufficient_count = 0
-    not_linked_count = 0
-    
-    for item in order.items:
-        # First, try to find recipe mapping for this menu item
-        recipe_ingredients = []
-        
-        if item.menu_item_id:
-            # Query recipe table for ingredients
-            recipe_result = await db.execute(
-                select(RecipeModel)
-                .where(
-                    RecipeModel.tenant_id == tenant_id,
-                    RecipeModel.menu_item_id == item.menu_item_id
-                )
-            )
-            recipe_ingredients = recipe_result.scalars().all()
-        
-        # If no recipe found, try to search by name (fallback)
-        if not recipe_ingredients:
-            # Search inventory items by similar name
-            inv_result = await db.execute(
-                select(InventoryItemModel)
-                .where(
-                    InventoryItemModel.tenant_id == tenant_id,
-                    InventoryItemModel.is_active == True
-                )
-                .limit(5)  # Get first 5 inventory items for demo
-            )
-            inventory_items = inv_result.scalars().all()
-            
-            if not inventory_items:
-                # No inventory items at all
-                pull_items.append(PullSheetItem(
-                    inventory_item_id=None,
-                    item_name=item.item_name,
-                    quantity_needed=float(item.quantity or 1),
-                    uom=item.uom or "bàn",
-                    warehouse=None,
-                    lots=[],
-                    status="NOT_LINKED",
-                    shortfall=None
-                ))
-                not_linked_count += 1
-                continue
-            
-            # Show first inventory item as "potential match" with NOT_LINKED status
-            # This helps user see what inventory exists
-            pull_items.append(PullSheetItem(
-                inventory_item_id=str(item.menu_item_id) if item.menu_item_id else None,
-                item_name=f"{item.item_name} (chưa có công thức)",
-                quantity_needed=float(item.quantity or 1),
-                uom=item.uom or "bàn",
-                warehouse="Cần thiết lập Recipe",
-                lots=[],
-                status="NOT_LINKED",
-                shortfall=None
-            ))
-            not_linked_count += 1
-            continue
-        
-        # Process each ingredient from recipe
-        for recipe in recipe_ingredients:
-            quantity_needed_for_item = float(recipe.quantity_per_unit) * float(item.quantity or 1)
-            
-            # Get lots for this specific ingredient using FIFO selection
-            lots_result = await db.execute(
-                select(InventoryLotModel)
-                .where(
-                    InventoryLotModel.tenant_id == tenant_id,
-                    InventoryLotModel.item_id == recipe.ingredient_id,
-                    InventoryLotModel.status == 'ACTIVE',
-                    InventoryLotModel.remaining_quantity > 0
-                )
-                .order_by(InventoryLotModel.expiry_date.asc())  # FIFO by expiry
+    plan = await get_pull_sheet_planner(db, tenant_id).plan([order.id])
+    return _pull_sheet_for(order, plan.for_order(order.id))
+
+
+from datetime import date
+
+class PullSheetIngredientTotal(BaseModel):
+    """One ingredient summed over every order of a daily pull sheet"""
+    inventory_item_id: str
+    item_name: str
+    uom: str
+    quantity_needed: float
+    quantity_picked: float
+    shortfall: float
+    order_count: int
+
+
+class DailyPullSheet(BaseModel):
+    """Pull sheet for several orders, lots allocated across all of them"""
+    event_date: Optional[str]
+    orders: List[PullSheet]
+    ingredients: List[PullSheetIngredientTotal]
+    total_orders: int
+    insufficient_ingredient_count: int
+    generated_at: str
+
+
+@router.get("/pull-sheets/daily", response_model=DailyPullSheet,
+              dependencies=[Depends(require_permission("order", "view"))])
+async def generate_daily_pull_sheet(
+    event_date: Optional[date] = Query(None, description="All confirmed orders of this event day (Vietnam time)"),
+    order_ids: Optional[List[UUID]] = Query(None, description="Explicit orders instead of a whole day"),
+    tenant_id: UUID = Depends(get_current_tenant),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Combined Inventory Pull Sheet for several orders (e.g. every event of a day).
+    Shared ingredients are picked FIFO across the orders in event order, so
+    no lot is promised to two events.
+    """
+    from datetime import time as dt_time, timedelta
+    from backend.modules.inventory.domain.pull_sheet_planner import get_pull_sheet_planner
+
+    if not event_date and not order_ids:
+        raise HTTPException(status_code=400, detail="Cần chọn ngày tổ chức hoặc danh sách đơn hàng")
+
+    query = select(OrderModel).where(OrderModel.tenant_id == tenant_id)
+    if order_ids:
+        query = query.where(OrderModel.id.in_(order_ids))
+    else:
+        vn_tz = timezone(timedelta(hours=7))
+        query = query.where(
+            OrderModel.status.in_(PULL_SHEET_STATUSES),
+            OrderModel.event_date >= datetime.combine(event_date, dt_time.min, vn_tz),
+            OrderModel.event_date < datetime.combine(event_date + timedelta(days=1), dt_time.min, vn_tz),
+        )
+    result = await db.execute(query.order_by(OrderModel.event_date, OrderModel.code, OrderModel.id))
+    orders = result.scalars().all()
+
+    if order_ids:
+        missing = set(order_ids) - {order.id for order in orders}
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Order not found: {', '.join(str(m) for m in missing)}")
+        invalid = [order.code for order in orders if order.status not in PULL_SHEET_STATUSES]
+        if invalid:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Pull sheet chỉ tạo được cho đơn hàng đã xác nhận: {', '.join(invalid)}"
             )
-            available_lots = lots_result.scalars().all()
-            
-            remaining_need = quantity_needed_for_item
-            selected_lots = []
-            total_available = 0
-            
-            for lot in available_lots:
-                if remaining_need <= 0:
-                    break
-                
-                pick_qty = min(float(lot.remaining_quantity), remaining_need)
-                selected_lots.append(PullSheetLot(
-                    lot_number=lot.lot_number,
-                    expiry_date=lot.expiry_date.strftime("%d/%m/%Y") if lot.expiry_date else None,
-                    available_qty=float(lot.remaining_quantity),
-                    to_pick_qty=pick_qty
-                ))
-                remaining_need -= pick_qty
-                total_available += float(lot.remaining_quantity)
-            
-            status = "SUFFICIENT" if remaining_need <= 0 else "INSUFFICIENT"
-            shortfall = remaining_need if remaining_need > 0 else None
-            
-            if status == "SUFFICIENT":
-                sufficient_count += 1
-            else:
-                insufficient_count += 1
-            
-            # Get warehouse name
-            warehouse_name = "Kho chính"
-            if available_lots:
-                wh_result = await db.execute(
-                    select(WarehouseModel.name)
-                    .where(WarehouseModel.id == available_lots[0].warehouse_id)
-                )
-                wh_name = wh_result.scalar_one_or_none()
-                if wh_name:
-                    warehouse_name = wh_name
-            
-            pull_items.append(PullSheetItem(
-                inventory_item_id=str(recipe.ingredient_id),
-                item_name=f"{recipe.ingredient_name} (cho {item.item_name})",
-                quantity_needed=quantity_needed_for_item,
-                uom=recipe.uom,
-                warehouse=warehouse_name,
-                lots=selected_lots,
-                status=status,
-                shortfall=shortfall
-            ))
-    
-    # Calculate pickup deadline (T-1 day before event)
-    pickup_deadline = None
-    if order.event_date:
-        from datetime import timedelta
-        deadline = order.event_date - timedelta(days=1)
-        pickup_deadline = deadline.strftime("%d/%m/%Y 16:00")
-    
-    return PullSheet(
-        order_id=str(order.id),
-        order_code=order.code,
-        event_date=order.event_date.strftime("%d/%m/%Y") if order.event_date else None,
-        pickup_deadline=pickup_deadline,
-        items=pull_items,
-        total_items=len(pull_items),
-        sufficient_count=sufficient_count,
-        insufficient_count=insufficient_count,
-        not_linked_count=not_linked_count,
+
+    plan = await get_pull_sheet_planner(db, tenant_id).plan([order.id for order in orders])
+    ingredients = [
+        PullSheetIngredientTotal(
+            inventory_item_id=str(total.inventory_item_id),
+            item_name=total.item_name,
+            uom=total.uom,
+            quantity_needed=float(total.quantity_needed),
+            quantity_picked=float(total.quantity_picked),
+            shortfall=float(total.shortfall),
+            order_count=len(total.order_ids),
+        )
+        for total in plan.ingredients
+    ]
+
+    return DailyPullSheet(
+        event_date=event_date.strftime("%d/%m/%Y") if event_date else None,
+        orders=[_pull_sheet_for(order, plan.for_order(order.id)) for order in orders],
+        ingredients=ingredients,
+        total_orders=len(orders),
+        insufficient_ingredient_count=sum(1 for total in plan.ingredients if total.shortfall > 0),
         generated_at=datetime.now(timezone.utc).strftime("%d/%m/%Y %H:%M")
     )
 
@@ -2968,17 +2664,15 @@ async def generate_menu_docx(
         raise HTTPException(status_code=400, detail="Đơn hàng chưa có món ăn")
 
     # Extract dish names, excluding SERVICE items (e.g., bàn ghế, nhân viên)
-    # BUGFIX: BUG-20260219-003 — Service items should not appear on menu card
     # order_items.category = 'SERVICE' for non-food items (bàn ghế, nhân viên, etc.)
-    dish_names = [
-        item.item_name for item in order.items
-        if item.category != 'SERVICE'
-    ]
+    from backend.modules.order.application.bulk_documents import menu_dish_names
+    dish_names = menu_dish_names(order.items)
 
-    # Generate the menu .docx
+    # Generate the menu .docx (off the event loop, in the bounded render pool)
     try:
+        from backend.modules.order.application.document_renderer import render_in_pool
         from backend.modules.order.application.menu_generator import generate_menu_docx as gen_menu
-        docx_buffer = gen_menu(dish_names)
+        docx_buffer = await render_in_pool(gen_menu, dish_names)
     except FileNotFoundError as e:
         raise HTTPException(status_code=500, detail=f"Template không tìm thấy: {str(e)}")
     except Exception as e:
@@ -3029,44 +2723,15 @@ async def generate_contract_docx_endpoint(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    # Calculate contract data
-    # Table count = quantity of first food item (all food items share same qty = number of tables)
-    food_items = [item for item in order.items if item.category != 'SERVICE']
-    table_count = food_items[0].quantity if food_items else 0
-
-    # Dish names (food only)
-    dish_names = [item.item_name for item in order.items if item.category != 'SERVICE']
-
-    # Financial calculations
-    total_amount = int(order.final_amount or order.total_amount or 0)
-    deposit_amount = int(order.paid_amount or 0)
-    remaining_amount = total_amount - deposit_amount
-    unit_price_per_table = total_amount // table_count if table_count > 0 else 0
-
-    # Customer address: use event_address as fallback
-    customer_address = order.event_address or ''
+    # Build contract data (shared with the bulk ZIP endpoint)
+    from backend.modules.order.application.bulk_documents import contract_data_for
+    from backend.modules.order.application.contract_generator import generate_contract_docx
+    from backend.modules.order.application.document_renderer import render_in_pool
 
-    # Build contract data
-    from backend.modules.order.application.contract_generator import ContractData, generate_contract_docx
-
-    contract_data = ContractData(
-        order_code=order.code or '',
-        customer_name=order.customer_name or '',
-        customer_phone=order.customer_phone or '',
-        customer_address=customer_address,
-        event_date=order.event_date,
-        event_time=order.event_time,
-        event_address=order.event_address or '',
-        table_count=table_count,
-        dish_names=dish_names,
-        unit_price_per_table=unit_price_per_table,
-        total_amount=total_amount,
-        deposit_amount=deposit_amount,
-        remaining_amount=remaining_amount,
-    )
+    contract_data = contract_data_for(order, order.items)
 
     try:
-        docx_buffer = generate_contract_docx(contract_data)
+        docx_buffer = await render_in_pool(generate_contract_docx, contract_data)
     except FileNotFoundError as e:
         raise HTTPException(status_code=500, detail=f"Template không tìm thấy: {str(e)}")
     except Exception as e:
@@ -3084,3 +2749,65 @@ async def generate_contract_docx_endpoint(
             "Content-Disposition": f'attachment; filename="{filename}"'
         }
     )
+
+
+# ============ BULK DOCUMENT GENERATION (ZIP) ============
+
+from typing import Literal
+
+
+class BulkDocumentsRequest(PydanticBaseModel):
+    """Either explicit order ids or an event date range (cancelled orders excluded)"""
+    order_ids: Optional[List[UUID]] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    documents: List[Literal["contract", "menu"]] = ["contract", "menu"]
+
+
+@router.post("/documents/bulk",
+              dependencies=[Depends(require_permission("order", "view"))])
+async def generate_bulk_documents(
+    data: BulkDocumentsRequest,
+    tenant_id: UUID = Depends(get_current_tenant),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Generate contracts and/or menu cards for many orders as one ZIP.
+    Orders and items are loaded with a single streamed query, documents are
+    rendered in parallel workers and streamed into the ZIP as they finish.
+    Orders without dishes get no menu card (listed in errors.txt).
+    """
+    from backend.modules.order.application import contract_generator, menu_generator
+    from backend.modules.order.application.bulk_documents import get_bulk_document_service
+
+    if not data.order_ids and not (data.start_date and data.end_date):
+        raise HTTPException(status_code=400, detail="Cần order_ids hoặc khoảng ngày (start_date, end_date)")
+    if data.start_date and data.end_date and data.start_date > data.end_date:
+        raise HTTPException(status_code=400, detail="start_date phải trước end_date")
+    if not data.documents:
+        raise HTTPException(status_code=400, detail="Chưa chọn loại tài liệu")
+
+    # Fail before streaming starts: a missing template cannot be reported mid-ZIP
+    for kind, path in (("contract", contract_generator.TEMPLATE_PATH), ("menu", menu_generator.TEMPLATE_PATH)):
+        if kind in data.documents and not path.exists():
+            raise HTTPException(status_code=500, detail=f"Template không tìm thấy: {path}")
+
+    service = get_bulk_document_service(db, tenant_id)
+    stream = service.iter_zip(
+        documents=list(dict.fromkeys(data.documents)),
+        order_ids=data.order_ids,
+        start_date=data.start_date,
+        end_date=data.end_date,
+    )
+    if data.order_ids:
+        filename = "TaiLieu-DonHang.zip"
+    else:
+        filename = f"TaiLieu-{data.start_date:%Y%m%d}-{data.end_date:%Y%m%d}.zip"
+
+    return StreamingResponse(
+        stream,
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        }
+    )
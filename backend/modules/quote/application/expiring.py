@@ -0,0 +1,39 @@
+"""
+Expiring Quotes
+Backs GET /quotes/expiring-soon and the quotes_expiring badge of the
+notification push channel.
+
+The sidebar badge only needs the count, so count_expiring_quotes() is a
+single COUNT instead of loading the quotes with their items and services.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.modules.quote.domain.models import QuoteModel
+
+EXPIRING_STATUSES = ("DRAFT", "PENDING", "APPROVED")  # Not converted/rejected
+EXPIRING_SOON_DAYS = 3
+
+
+def expiring_quotes_filter(tenant_id: UUID, days: int = EXPIRING_SOON_DAYS, now: Optional[datetime] = None):
+    now = now or datetime.now(timezone.utc)
+    return (
+        QuoteModel.tenant_id == tenant_id,
+        QuoteModel.status.in_(EXPIRING_STATUSES),
+        QuoteModel.valid_until.isnot(None),
+        QuoteModel.valid_until <= now + timedelta(days=days),
+        QuoteModel.valid_until > now,  # Not yet expired
+    )
+
+
+async def count_expiring_quotes(db: AsyncSession, tenant_id: UUID, days: int = EXPIRING_SOON_DAYS,
+                                now: Optional[datetime] = None) -> int:
+    result = await db.execute(
+        select(func.count(QuoteModel.id)).where(*expiring_quotes_filter(tenant_id, days, now))
+    )
+    return result.scalar() or 0
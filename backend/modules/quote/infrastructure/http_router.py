@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request  # Added Request for rate limiting
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response  # Added Request for rate limiting
 from typing import List, Optional
 from uuid import UUID
-from datetime import datetime, timedelta
+from datetime import datetime
 from decimal import Decimal
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
@@ -18,15 +18,19 @@ from backend.core.dependencies import (
 )
 from backend.modules.quote.domain.entities import Quote, QuoteBase, QuoteItemBase, QuoteNotePreset, QuoteNotePresetCreate, QuoteTemplate, QuoteTemplateCreate, QuoteTemplateUpdate
 from backend.modules.quote.domain.models import QuoteModel, QuoteItemModel, QuoteServiceModel, QuoteNotePresetModel, QuoteTemplateModel
+from backend.modules.quote.application.expiring import EXPIRING_SOON_DAYS, count_expiring_quotes, expiring_quotes_filter
 from backend.modules.order.domain.models import OrderModel, OrderItemModel, OrderPaymentModel
 from backend.modules.crm.application.services import CrmIntegrationService
 from backend.common.utils.code_generator import generate_quote_code, generate_order_code
+from backend.common.utils.keyset_pagination import COUNT_NONE, KeysetPaginator, search_clause
 
 import logging
 import json
 
 router = APIRouter(tags=["Quote Management"])
 
+quote_list_paginator = KeysetPaginator(QuoteModel.created_at, QuoteModel.id)
+
 # GAP-Q5: Structured audit logging for quote module
 logger = logging.getLogger("quote.audit")
 
@@ -57,48 +61,60 @@ def _log_quote_audit(
 
 @router.get("", response_model=List[Quote])
 async def list_quotes(
+    response: Response,
     tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
     _rbac: None = Depends(require_permission("quote:read"))  # ISS-003: RBAC
 ):
-    """Get all quotes from PostgreSQL"""
+    """
+    Get quotes newest first. Keyset pagination: pass the X-Next-Cursor header
+    of the previous page as cursor (skip is kept for older clients).
+    """
     query = select(QuoteModel).where(QuoteModel.tenant_id == tenant_id)
     
     if status:
         query = query.where(QuoteModel.status == status)
-        
-    query = query.order_by(desc(QuoteModel.created_at)).offset(skip).limit(limit)
+    if search and search.strip():
+        query = query.where(search_clause((QuoteModel.code, QuoteModel.customer_name), search))
     
     # Eager load items and services to prevent N+1 issues
     query = query.options(selectinload(QuoteModel.items), selectinload(QuoteModel.services))
     
-    result = await db.execute(query)
-    quotes = result.scalars().all()
-    return quotes
+    try:
+        page = await quote_list_paginator.paginate(db, query, cursor=cursor, page_size=limit, count=COUNT_NONE, offset=skip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return page.items
 
 @router.get("/expiring-soon")
 async def get_expiring_quotes(
     tenant_id: UUID = Depends(get_current_tenant),
     db: AsyncSession = Depends(get_db), 
-    days: int = 3,
+    days: int = EXPIRING_SOON_DAYS,
+    count_only: bool = False,
     _rbac: None = Depends(require_permission("quote:read"))  # ISS-003: RBAC
 ):
     """
     Get quotes expiring within N days.
-    Used for sidebar badge notification.
+    Used for sidebar badge notification - pass count_only=true for the badge
+    (a single COUNT; live updates come from the /ws/notifications channel).
     """
-    now = datetime.now()
-    threshold = now + timedelta(days=days)
-    
+    if count_only:
+        return {
+            "count": await count_expiring_quotes(db, tenant_id, days),
+            "quotes": [],
+            "threshold_days": days
+        }
+
     query = select(QuoteModel).where(
-        QuoteModel.tenant_id == tenant_id,
-        QuoteModel.status.in_(['DRAFT', 'PENDING', 'APPROVED']),  # Not converted/rejected
-        QuoteModel.valid_until != None,
-        QuoteModel.valid_until <= threshold,
-        QuoteModel.valid_until > now  # Not yet expired
+        *expiring_quotes_filter(tenant_id, days)
     ).order_by(QuoteModel.valid_until).options(
         selectinload(QuoteModel.items), 
         selectinload(QuoteModel.services)
@@ -397,9 +413,7 @@ async def update_quote(quote_id: UUID, data: QuoteBase, tenant_id: UUID = Depend
     # GAP-Q5: Audit log
     _log_quote_audit("QUOTE_UPDATE", str(quote.id), quote.code, f"Updated status={quote.status}")
     
-    # CRM Hook: Recalculate Stats (For Potential/Lost logic based on quotes)
-    if quote.customer_id:
-        await CrmIntegrationService.recalculate_stats(db, tenant_id, quote.customer_id)
+    # CRM stats (rejected quotes -> POTENTIAL/LOST) follow at commit (crm/application/rfm_engine.py)
         
     return quote
 
@@ -452,14 +466,14 @@ async def mark_quote_as_lost(
     await db.commit()
     await db.refresh(quote)
     
-    # 4. CRM Hook: Update customer stats for Lost opportunity
+    # 4. CRM Hook: log the lost opportunity
     if quote.customer_id:
         await CrmIntegrationService.log_interaction(
             db, tenant_id, quote.customer_id,
             "QUOTE_LOST",
             f"Báo giá {quote.code} không chốt" + (f": {data.reason}" if data.reason else "")
         )
-        await CrmIntegrationService.recalculate_stats(db, tenant_id, quote.customer_id)
+        await db.commit()
     
     # GAP-Q5: Audit log
     _log_quote_audit("QUOTE_MARK_LOST", str(quote.id), quote.code, f"Marked LOST. Reason: {data.reason or 'N/A'}")
@@ -9,6 +9,7 @@ from sqlalchemy import select, func as sa_func
 from fastapi import HTTPException
 
 from backend.modules.user.domain.role_model import RoleModel
+from backend.core.auth.principal_cache import invalidate_role
 
 
 # Valid permission modules and their actions (BE-02: Format validation)
@@ -135,6 +136,7 @@ class RoleService:
 
         await self.db.commit()
         await self.db.refresh(role)
+        invalidate_role(self.tenant_id, role.code)
         return role
 
     async def update_role_permissions(
@@ -157,6 +159,7 @@ class RoleService:
         role.permissions = _validate_permissions(permissions)
         await self.db.commit()
         await self.db.refresh(role)
+        invalidate_role(self.tenant_id, role.code)
         return role
 
     async def delete_role(self, role_id: UUID) -> None:
@@ -190,3 +193,4 @@ class RoleService:
 
         await self.db.delete(role)
         await self.db.commit()
+        invalidate_role(self.tenant_id, role.code)
@@ -6,6 +6,7 @@ from fastapi import HTTPException
 from backend.core.auth.models import User
 from backend.core.auth.schemas import UserCreate, UserUpdate, User as UserSchema
 from backend.core.auth.security import get_password_hash
+from backend.core.auth.principal_cache import invalidate_user
 
 class UserService:
     def __init__(self, db: Session):
@@ -76,6 +77,8 @@ class UserService:
         
         await self.db.commit()
         await self.db.refresh(db_user)
+        # Role / password / deactivation must not linger in the principal cache
+        invalidate_user(db_user.id)
         return db_user
 
     async def delete_user(self, user_id: UUID, current_user_tenant_id: UUID, current_user: User = None):
@@ -104,6 +107,7 @@ class UserService:
              
         await self.db.delete(db_user)
         await self.db.commit()
+        invalidate_user(user_id)
 
     async def change_password(
         self, 
@@ -130,4 +134,5 @@ class UserService:
         db_user.hashed_password = get_password_hash(new_password)
         
         await self.db.commit()
+        invalidate_user(user_id)
         return True
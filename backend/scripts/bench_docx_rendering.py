@@ -0,0 +1,109 @@
+"""
+Benchmark: contract .docx rendering under concurrent downloads.
+
+Fires N concurrent "downloads" (default 50) on one event loop and reports
+per-request latency from arrival (p50/p99) and event-loop blocking (max and total lag
+seen by a 5ms ticker) for:
+- legacy: template re-opened with python-docx and saved per request,
+  inline in the async handler (what the old generator did around its edits)
+- inline: compiled template, still rendered on the event loop
+- pool: compiled template rendered via render_in_pool() (DOCX_RENDER_WORKERS)
+
+No database is needed.
+
+Usage:
+    python backend/scripts/bench_docx_rendering.py --concurrency 50 --rounds 3
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
+from docx import Document  # noqa: E402
+
+from backend.modules.order.application.contract_generator import (  # noqa: E402
+    TEMPLATE_PATH,
+    ContractData,
+    generate_contract_docx,
+)
+from backend.modules.order.application.document_renderer import render_in_pool  # noqa: E402
+
+TICK = 0.005
+
+
+def sample_contract(n):
+    return ContractData(
+        order_code=f"DH-{n:05d}", customer_name="Nguyễn Văn A", customer_phone="0909123456",
+        customer_address="12 Lê Lợi, Q1", event_date=datetime(2026, 5, 3), event_time="11:30",
+        event_address="Nhà hàng Giao Tuyết", table_count=20,
+        dish_names=["Gỏi ngó sen", "Súp cua", "Gà nướng mật ong", "Lẩu thái"],
+        unit_price_per_table=5_000_000, total_amount=100_000_000,
+        deposit_amount=30_000_000, remaining_amount=70_000_000,
+    )
+
+
+def legacy_render(data):
+    doc = Document(str(TEMPLATE_PATH))
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer
+
+
+async def ticker(stop, lags):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(max(0.0, time.perf_counter() - start - TICK) * 1000)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run(label, handler, concurrency, rounds):
+    latencies, lags = [], []
+    for _ in range(rounds):
+        stop = asyncio.Event()
+        tick = asyncio.create_task(ticker(stop, lags))
+        await asyncio.sleep(TICK * 2)
+
+        # All requests arrive together: latency is measured from the burst start
+        arrived = time.perf_counter()
+
+        async def download(n):
+            await handler(sample_contract(n))
+            latencies.append((time.perf_counter() - arrived) * 1000)
+
+        await asyncio.gather(*(download(n) for n in range(concurrency)))
+        stop.set()
+        await tick
+    print(f"{label:>7}: p50 {statistics.median(latencies):8.1f} ms   p99 {percentile(latencies, 99):8.1f} ms   "
+          f"loop lag max {max(lags):7.1f} ms   total {sum(lags) / rounds:8.1f} ms/round")
+
+
+async def main(args):
+    async def legacy(data):
+        return legacy_render(data)
+
+    async def inline(data):
+        return generate_contract_docx(data)
+
+    async def pool(data):
+        return await render_in_pool(generate_contract_docx, data)
+
+    generate_contract_docx(sample_contract(0))  # compile the template once
+    for label, handler in (("legacy", legacy), ("inline", inline), ("pool", pool)):
+        await run(label, handler, args.concurrency, args.rounds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,165 @@
+"""
+Benchmark: set-based payroll engine vs. the legacy per-employee loop.
+
+Generates an in-memory dataset (default 500 employees x 30 days) and times:
+- legacy: one timesheet SELECT per employee + per-row Decimal(str(...)) + one ORM add per item
+- engine: one timesheet SELECT for the period + single-pass bucketing + one bulk INSERT
+
+No database is needed: every query is simulated with a fixed round-trip
+latency (--rtt-ms, default 1ms) so the numbers reflect both CPU time and
+the number of round-trips each approach makes.
+
+Usage:
+    python backend/scripts/bench_payroll_engine.py --employees 500 --days 30 --rtt-ms 1
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from uuid import uuid4
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
+from backend.modules.hr.services.payroll_engine import (  # noqa: E402
+    PayrollRates,
+    bucket_timesheet_hours,
+    build_payroll_items,
+)
+
+
+SETTINGS = SimpleNamespace(
+    default_base_salary=Decimal("8000000"), standard_working_days_per_month=26, standard_hours_per_day=8,
+    multiplier_overtime=Decimal("1.50"), multiplier_weekend=Decimal("2.00"),
+    multiplier_holiday=Decimal("3.00"), multiplier_night=Decimal("0.30"),
+    default_allowance_meal=Decimal("500000"), default_allowance_transport=Decimal("300000"),
+    default_allowance_phone=Decimal("200000"), rate_social_insurance=Decimal("0.08"),
+    rate_health_insurance=Decimal("0.015"), rate_unemployment=Decimal("0.01"),
+    rate_employer_social=Decimal("0.175"), rate_employer_health=Decimal("0.03"),
+    rate_employer_unemployment=Decimal("0.01"), rate_union_fee=Decimal("0.02"),
+)
+
+
+def generate_dataset(n_employees, n_days, seed=42):
+    rng = random.Random(seed)
+    start = date(2026, 3, 1)
+    employees = []
+    timesheets = []
+    for i in range(n_employees):
+        fulltime = i % 5 == 0
+        emp = SimpleNamespace(
+            id=uuid4(), is_fulltime=fulltime,
+            hourly_rate=Decimal(0) if fulltime else Decimal(rng.choice([40000, 45000, 50000])),
+            base_salary=Decimal("9000000") if fulltime else Decimal(0),
+            allowance_meal=None, allowance_transport=None, allowance_phone=None, allowance_other=None,
+            insurance_salary_base=None, rate_social_override=None, rate_health_override=None,
+            rate_unemployment_override=None,
+        )
+        employees.append(emp)
+        for d in range(n_days):
+            work_date = start + timedelta(days=d)
+            check_in = datetime.combine(work_date, datetime.min.time(), timezone.utc) + timedelta(hours=rng.choice([8, 14, 17]))
+            hours = rng.choice([4, 6, 8, 10])
+            timesheets.append(SimpleNamespace(
+                employee_id=emp.id, work_date=work_date,
+                total_hours=Decimal(hours), overtime_hours=Decimal(max(hours - 8, 0)),
+                actual_start=check_in, actual_end=check_in + timedelta(hours=hours),
+            ))
+    holidays = {start + timedelta(days=9)}
+    return employees, timesheets, holidays
+
+
+def simulate_round_trip(rtt):
+    if rtt:
+        time.sleep(rtt)
+
+
+def run_legacy(employees, timesheets, holidays, rtt):
+    """Per-employee loop as it existed in calculate_payroll before the engine."""
+    by_employee = defaultdict(list)
+    for ts in timesheets:
+        by_employee[ts.employee_id].append(ts)
+
+    items = []
+    for emp in employees:
+        simulate_round_trip(rtt)  # SELECT timesheets WHERE employee_id = :id
+        regular = overtime = weekend = holiday = night = Decimal(0)
+        for ts in by_employee[emp.id]:
+            hours = Decimal(str(ts.total_hours or 0))
+            ts_ot = Decimal(str(ts.overtime_hours or 0))
+            if ts.work_date in holidays:
+                holiday += hours
+            elif ts.work_date.weekday() >= 5:
+                weekend += hours
+            else:
+                regular += hours - ts_ot if hours > ts_ot else hours
+                overtime += ts_ot
+            night_start = datetime.combine(ts.work_date, datetime.min.time()) + timedelta(hours=22)
+            night_end = night_start + timedelta(hours=8)
+            o_start = max(ts.actual_start.replace(tzinfo=None), night_start)
+            o_end = min(ts.actual_end.replace(tzinfo=None), night_end)
+            if o_end > o_start:
+                night += Decimal(str(round((o_end - o_start).total_seconds() / 3600, 2)))
+
+        rate = emp.hourly_rate or Decimal(0)
+        if emp.is_fulltime and not rate:
+            rate = emp.base_salary / (SETTINGS.standard_working_days_per_month or 26) / (SETTINGS.standard_hours_per_day or 8)
+        gross = (regular * rate
+                 + overtime * rate * Decimal(str(SETTINGS.multiplier_overtime or 1.5))
+                 + weekend * rate * Decimal(str(SETTINGS.multiplier_weekend or 2.0))
+                 + holiday * rate * Decimal(str(SETTINGS.multiplier_holiday or 3.0))
+                 + night * rate * Decimal(str(SETTINGS.multiplier_night or 0.3)))
+        if emp.is_fulltime:
+            gross += (Decimal(str(SETTINGS.default_allowance_meal or 0))
+                      + Decimal(str(SETTINGS.default_allowance_transport or 0))
+                      + Decimal(str(SETTINGS.default_allowance_phone or 0)))
+        items.append({"employee_id": emp.id, "gross": gross})
+    simulate_round_trip(rtt)  # flush of N pending ORM inserts (one statement each; counted once here)
+    return items
+
+
+def run_engine(employees, timesheets, holidays, rtt):
+    simulate_round_trip(rtt)  # single SELECT for the whole period
+    rows = [(ts.employee_id, ts.work_date, ts.total_hours, ts.overtime_hours, ts.actual_start, ts.actual_end)
+            for ts in timesheets]
+    hours = bucket_timesheet_hours(rows, holidays)
+    items, _ = build_payroll_items(employees, hours, PayrollRates.from_settings(SETTINGS), {}, uuid4(), uuid4())
+    simulate_round_trip(rtt)  # single bulk INSERT
+    return items
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="simulated DB round-trip latency")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    employees, timesheets, holidays = generate_dataset(args.employees, args.days)
+    rtt = args.rtt_ms / 1000
+
+    legacy = timed(run_legacy, employees, timesheets, holidays, rtt, repeat=args.repeat)
+    engine = timed(run_engine, employees, timesheets, holidays, rtt, repeat=args.repeat)
+
+    print(f"Dataset: {args.employees} employees x {args.days} days = {len(timesheets)} timesheets, "
+          f"simulated RTT {args.rtt_ms}ms")
+    print(f"  legacy per-employee loop : {legacy * 1000:8.1f} ms  ({args.employees + 1} timesheet/insert round-trips)")
+    print(f"  set-based engine         : {engine * 1000:8.1f} ms  (2 timesheet/insert round-trips)")
+    print(f"  speed-up                 : {legacy / engine:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
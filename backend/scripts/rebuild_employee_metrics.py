@@ -0,0 +1,61 @@
+"""
+Rebuild the hr_employee_daily_metrics store from timesheets and staff assignments.
+Backfill after migration 080 and nightly reconciliation.
+
+Run from project root:
+    python backend/scripts/rebuild_employee_metrics.py                 # all tenants, full history
+    python backend/scripts/rebuild_employee_metrics.py --days 35       # all tenants, last 35 days
+    python backend/scripts/rebuild_employee_metrics.py --tenant <uuid> --from 2026-01-01 --to 2026-03-31
+"""
+import argparse
+import asyncio
+import os
+import sys
+from datetime import date, timedelta
+from uuid import UUID
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import text
+from backend.core.database import AsyncSessionLocal
+from backend.modules.hr.services.employee_metrics_service import EmployeeMetricsService
+
+
+async def rebuild(tenant: str = None, from_date: date = None, to_date: date = None):
+    async with AsyncSessionLocal() as session:
+        await session.execute(text("SELECT set_config('app.bypass_rls', 'on', false)"))
+        if tenant:
+            tenant_ids = [UUID(tenant)]
+        else:
+            result = await session.execute(text("SELECT id FROM tenants ORDER BY id"))
+            tenant_ids = [row[0] for row in result.fetchall()]
+
+        for tenant_id in tenant_ids:
+            service = EmployeeMetricsService(session, tenant_id)
+            if from_date or to_date:
+                days = await service.rebuild_range(from_date or to_date, to_date or from_date)
+            else:
+                days = await service.rebuild_all()
+            await session.commit()
+            # commit() ends the transaction; bypass_rls is session-level and stays set
+            print(f"✅ Tenant {tenant_id}: {days} days rebuilt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenant", help="rebuild a single tenant")
+    parser.add_argument("--from", dest="from_date", type=date.fromisoformat)
+    parser.add_argument("--to", dest="to_date", type=date.fromisoformat)
+    parser.add_argument("--days", type=int, help="rebuild the last N days (up to today)")
+    args = parser.parse_args()
+
+    from_date, to_date = args.from_date, args.to_date
+    if args.days:
+        to_date = date.today()
+        from_date = to_date - timedelta(days=args.days - 1)
+    asyncio.run(rebuild(args.tenant, from_date, to_date))
+
+
+if __name__ == "__main__":
+    main()
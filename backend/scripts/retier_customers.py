@@ -0,0 +1,36 @@
+"""
+Re-tier CRM customers: recompute order_count / total_spent / last_order_at /
+rejected_quote_count and customer_type from orders and quotes.
+Backfill after migration 082; the arq worker runs the same pass nightly.
+
+Run from project root:
+    python backend/scripts/retier_customers.py                  # all tenants
+    python backend/scripts/retier_customers.py --tenant <uuid>
+"""
+import argparse
+import asyncio
+import os
+import sys
+from uuid import UUID
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.modules.crm.application.rfm_engine import retier_all_tenants
+
+
+async def retier(tenant: str = None):
+    results = await retier_all_tenants(tenant_ids=[UUID(tenant)] if tenant else None)
+    for tenant_id, result in results.items():
+        print(f"✅ Tenant {tenant_id}: {result.updated} customers updated, {result.tier_changes} tier changes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenant", help="re-tier a single tenant")
+    args = parser.parse_args()
+    asyncio.run(retier(args.tenant))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Run the job_outbox dispatcher without Redis/arq (migration 075).
+
+Run from project root:
+    python backend/scripts/run_outbox_worker.py              # poll forever
+    python backend/scripts/run_outbox_worker.py --once       # drain due jobs and exit
+    python backend/scripts/run_outbox_worker.py --interval 2 --batch-size 50
+
+Several instances can run side by side: jobs are claimed with SKIP LOCKED.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.core.tasks.outbox import OUTBOX_BATCH_SIZE, OutboxDispatcher, load_job_modules
+
+
+async def run(once: bool, interval: float, batch_size: int):
+    load_job_modules()
+    dispatcher = OutboxDispatcher(batch_size=batch_size)
+    while True:
+        totals = await dispatcher.drain()
+        if totals["claimed"]:
+            print(f"✅ {totals['claimed']} jobs: {totals['DONE']} done, "
+                  f"{totals['PENDING']} retrying, {totals['DEAD']} dead")
+        if once:
+            return
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="drain due jobs and exit")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between polls")
+    parser.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(run(args.once, args.interval, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
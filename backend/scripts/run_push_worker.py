@@ -0,0 +1,49 @@
+"""
+Run the Expo push delivery worker without Redis/arq (migration 085).
+
+Run from project root:
+    python backend/scripts/run_push_worker.py              # poll forever
+    python backend/scripts/run_push_worker.py --once       # drain due pushes and exit
+    python backend/scripts/run_push_worker.py --interval 2 --claim-size 1000
+    EXPO_PUSH_URL=http://127.0.0.1:8099/push python backend/scripts/run_push_worker.py --once
+
+Several instances can run side by side: messages are claimed with SKIP LOCKED.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.modules.notification.services.push_sender import PUSH_CLAIM_SIZE, PushDeliveryWorker, push_metrics
+
+
+async def run(once: bool, interval: float, claim_size: int):
+    worker = PushDeliveryWorker(claim_size=claim_size)
+    try:
+        while True:
+            totals = await worker.drain()
+            if totals["claimed"]:
+                print(f"✅ {totals['claimed']} pushes: {totals['SENT']} sent, "
+                      f"{totals['PENDING']} retrying, {totals['DEAD']} dead")
+            if once:
+                print(push_metrics.snapshot())
+                return
+            await asyncio.sleep(interval)
+    finally:
+        await worker.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="drain due pushes and exit")
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between polls")
+    parser.add_argument("--claim-size", type=int, default=PUSH_CLAIM_SIZE)
+    args = parser.parse_args()
+    asyncio.run(run(args.once, args.interval, args.claim_size))
+
+
+if __name__ == "__main__":
+    main()
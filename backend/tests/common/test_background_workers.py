@@ -0,0 +1,210 @@
+"""
+Tests for the in-app background drains (backend/core/tasks/background.py).
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, datetime, time, timezone
+
+import pytest
+
+from backend.core.tasks import background
+from backend.core.tasks.background import DailyTask, PollingLoop
+
+
+@pytest.mark.asyncio
+async def test_loop_keeps_polling_after_failures():
+    calls = []
+
+    async def drain():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("database restarting")
+        return {"claimed": 0}
+
+    loop = PollingLoop("test", drain, interval=0.01)
+    loop.start()
+    await asyncio.sleep(0.05)
+    await loop.stop()
+    assert len(calls) >= 2
+    assert not loop.running
+
+
+@pytest.mark.asyncio
+async def test_start_and_stop_background_workers(monkeypatch):
+    drained = asyncio.Event()
+
+    async def drain():
+        drained.set()
+        return {"claimed": 0}
+
+    monkeypatch.setattr(background, "OUTBOX_IN_APP_WORKER", True)
+    monkeypatch.setattr(background, "PUSH_IN_APP_WORKER", False)
+    monkeypatch.setattr(background, "DAILY_IN_APP_TASKS", False)
+    monkeypatch.setattr(background, "_outbox_loop", lambda: PollingLoop("job_outbox", drain, 0.01))
+    loops = background.start_background_workers()
+    assert background.start_background_workers() is loops  # idempotent across lifespans
+    started = list(loops)
+    await asyncio.wait_for(drained.wait(), 1)
+    await background.stop_background_workers()
+    assert started and not any(loop.running for loop in started) and not background._loops
+
+
+@pytest.mark.asyncio
+async def test_push_loop_drains_and_closes_the_client(monkeypatch):
+    from backend.modules.notification.services import push_sender
+
+    class _Worker:
+        instances = []
+
+        def __init__(self):
+            self.drained = asyncio.Event()
+            self.closed = False
+            _Worker.instances.append(self)
+
+        async def drain(self):
+            self.drained.set()
+            return {"claimed": 0}
+
+        async def aclose(self):
+            self.closed = True
+
+    monkeypatch.setattr(background, "OUTBOX_IN_APP_WORKER", False)
+    monkeypatch.setattr(background, "PUSH_IN_APP_WORKER", True)
+    monkeypatch.setattr(background, "PUSH_IN_APP_INTERVAL", 0.01)
+    monkeypatch.setattr(background, "DAILY_IN_APP_TASKS", False)
+    monkeypatch.setattr(push_sender, "PushDeliveryWorker", _Worker)
+    [loop] = background.start_background_workers()
+    [worker] = _Worker.instances
+    assert loop.name == "push_outbox"
+    await asyncio.wait_for(worker.drained.wait(), 1)
+    await background.stop_background_workers()
+    assert worker.closed and not loop.running
+
+
+def test_disabled_in_app_workers_start_nothing(monkeypatch):
+    monkeypatch.setattr(background, "OUTBOX_IN_APP_WORKER", False)
+    monkeypatch.setattr(background, "PUSH_IN_APP_WORKER", False)
+    monkeypatch.setattr(background, "DAILY_IN_APP_TASKS", False)
+    assert background.start_background_workers() == []
+
+
+# ============ DAILY TASKS ============
+
+class _ClaimConnection:
+    def __init__(self, locked=True, last_run_on=None):
+        self.locked = locked
+        self.last_run_on = last_run_on
+        self.recorded = []
+
+    async def scalar(self, statement, params):
+        if statement is background.TRY_LOCK_TASK_SQL:
+            return self.locked
+        if statement is background.LAST_RUN_SQL:
+            return self.last_run_on
+        raise AssertionError(statement)
+
+    async def execute(self, statement, params):
+        assert statement is background.RECORD_RUN_SQL
+        self.recorded.append(params)
+
+
+def _daily(conn, task, at=time(2, 30)):
+    @asynccontextmanager
+    async def begin():
+        yield conn
+
+    return DailyTask("test.daily", task, at, begin=begin)
+
+
+# 02:45 in Ho Chi Minh City (UTC+7) on 2026-05-10
+AFTER_RUN_TIME = datetime(2026, 5, 9, 19, 45, tzinfo=timezone.utc)
+
+
+def test_due_day_is_the_business_local_day_once_the_time_has_passed():
+    task = _daily(_ClaimConnection(), None)
+    assert task.due_day(AFTER_RUN_TIME) == date(2026, 5, 10)
+    assert task.due_day(datetime(2026, 5, 9, 19, 0, tzinfo=timezone.utc)) is None  # 02:00 local
+    assert task.due_day(datetime(2026, 5, 10, 10, 0, tzinfo=timezone.utc)) == date(2026, 5, 10)  # catch-up
+
+
+@pytest.mark.asyncio
+async def test_due_task_runs_once_and_records_the_day():
+    runs = []
+
+    async def task():
+        runs.append(1)
+        return {"ok": True}
+
+    conn = _ClaimConnection()
+    daily = _daily(conn, task)
+    outcome = await daily.run_if_due(AFTER_RUN_TIME)
+    assert outcome["claimed"] == 1 and outcome["result"] == {"ok": True}
+    assert conn.recorded == [{"name": "test.daily", "day": date(2026, 5, 10), "error": None}]
+
+    conn.locked = False  # the database is not asked again the same day
+    assert await daily.run_if_due(AFTER_RUN_TIME) == {"claimed": 0}
+    assert runs == [1]
+
+
+@pytest.mark.asyncio
+async def test_task_is_skipped_while_another_process_holds_the_lock():
+    async def task():
+        raise AssertionError("must not run")
+
+    assert await _daily(_ClaimConnection(locked=False), task).run_if_due(AFTER_RUN_TIME) == {"claimed": 0}
+
+
+@pytest.mark.asyncio
+async def test_task_already_run_today_by_another_process_is_skipped():
+    async def task():
+        raise AssertionError("must not run")
+
+    conn = _ClaimConnection(last_run_on=date(2026, 5, 10))
+    assert await _daily(conn, task).run_if_due(AFTER_RUN_TIME) == {"claimed": 0}
+    assert conn.recorded == []
+
+
+@pytest.mark.asyncio
+async def test_failed_run_is_recorded_with_its_error():
+    async def task():
+        raise ConnectionError("tenant 7 timed out")
+
+    conn = _ClaimConnection(last_run_on=date(2026, 5, 9))
+    outcome = await _daily(conn, task).run_if_due(AFTER_RUN_TIME)
+    assert outcome["claimed"] == 1
+    assert conn.recorded[0]["error"] == "ConnectionError: tenant 7 timed out"
+
+
+def _daily_tasks_only(monkeypatch):
+    monkeypatch.setattr(background, "OUTBOX_IN_APP_WORKER", False)
+    monkeypatch.setattr(background, "PUSH_IN_APP_WORKER", False)
+    monkeypatch.setattr(background, "DAILY_IN_APP_TASKS", True)
+    monkeypatch.setattr(PollingLoop, "start", lambda self: None)
+
+
+def test_start_schedules_the_daily_crm_tasks(monkeypatch):
+    _daily_tasks_only(monkeypatch)
+    try:
+        loops = background.start_background_workers()
+        assert [loop.name for loop in loops] == ["daily:crm.retier_customers", "daily:crm.birthday_greetings"]
+    finally:
+        background._loops.clear()
+
+
+@pytest.mark.asyncio
+async def test_web_lifespan_starts_the_birthday_campaign(monkeypatch):
+    try:
+        from backend import main
+    except ImportError as e:  # the app imports every module router
+        pytest.skip(f"backend.main does not import here: {e}")
+
+    async def no_hotfix():
+        return None
+
+    _daily_tasks_only(monkeypatch)
+    monkeypatch.setattr(main, "apply_logo_column_hotfix", no_hotfix)
+    monkeypatch.setattr(main, "seed_menu_data_hotfix", no_hotfix)
+    async with main.lifespan(main.app):
+        names = [loop.name for loop in background._loops]
+    assert "daily:crm.birthday_greetings" in names
+    assert not background._loops
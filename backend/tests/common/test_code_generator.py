@@ -3,7 +3,8 @@ Unit tests for code_generator utility module.
 
 Updated: 2026-02-22
 Format: BG-ddmmyy*** and ĐH-ddmmyy***
-Tests use mock AsyncSession to verify date-based sequential code generation.
+Tests use mock AsyncSession (the counter upsert of code_allocator) to verify
+date-based sequential code generation.
 """
 import pytest
 import re
@@ -19,18 +20,11 @@ from backend.common.utils.code_generator import (
 )
 
 
-def _make_mock_db(existing_code=None):
-    """Create a mock AsyncSession that returns an existing code for sequence lookup."""
+def _make_mock_db(last_value=1):
+    """Create a mock AsyncSession whose counter upsert returns last_value."""
     mock_db = AsyncMock()
     mock_result = MagicMock()
-    
-    if existing_code:
-        mock_row = MagicMock()
-        mock_row.__getitem__ = lambda self, idx: existing_code
-        mock_result.first.return_value = mock_row
-    else:
-        mock_result.first.return_value = None
-    
+    mock_result.scalar_one.return_value = last_value
     mock_db.execute.return_value = mock_result
     return mock_db
 
@@ -68,16 +62,19 @@ class TestGenerateEntityCode:
         seq = code[-3:]  # Last 3 chars
         assert seq == "001", f"First sequence should be 001, got {seq}"
     
-    async def test_increments_sequence(self):
-        """Test that sequence increments from existing codes"""
-        today = datetime.now().strftime('%d%m%y')
-        existing_code = f"BG-{today}005"
-        mock_db = _make_mock_db(existing_code)
+    async def test_uses_counter_value(self):
+        """Test that the sequence is the value returned by the counter"""
+        mock_db = _make_mock_db(6)
         
         code = await generate_entity_code("BG", mock_db)
         
         seq = code[-3:]
-        assert seq == "006", f"Sequence should be 006 after 005, got {seq}"
+        assert seq == "006", f"Sequence should be 006, got {seq}"
+    
+    async def test_sequence_past_999_grows(self):
+        """Test that the 1000th code of a day does not wrap or collide"""
+        code = await generate_entity_code("BG", _make_mock_db(1000))
+        assert re.match(r'^BG-\d{6}1000$', code)
     
     async def test_supports_all_entity_types(self):
         """Test that all entity prefixes work correctly"""
@@ -138,14 +135,12 @@ class TestGenerateOrderCode:
         pattern = r'^\d{6}\d{3}$'
         assert re.match(pattern, rest), f"Order code '{code}' does not match expected format"
     
-    async def test_sequence_increments(self):
-        """Test that order sequence increments correctly"""
-        today = datetime.now().strftime('%d%m%y')
-        existing_code = f"ĐH-{today}010"
-        mock_db = _make_mock_db(existing_code)
+    async def test_sequence_from_counter(self):
+        """Test that order sequence comes from the counter"""
+        mock_db = _make_mock_db(11)
         
         code = await generate_order_code(mock_db)
-        assert code.endswith("011"), f"Sequence should be 011 after 010, got {code}"
+        assert code.endswith("011"), f"Sequence should be 011, got {code}"
 
 
 @pytest.mark.asyncio
@@ -154,12 +149,12 @@ class TestGenerateInvoiceCode:
     
     async def test_generates_invoice_code_with_hd_prefix(self):
         """Test that invoice code starts with HD prefix"""
-        code = await generate_invoice_code()
+        code = await generate_invoice_code(_make_mock_db())
         assert code.startswith("HD-"), "Invoice code should start with 'HD-'"
     
     async def test_invoice_code_format(self):
         """Test that invoice code follows HD-ddmmyy*** format"""
-        code = await generate_invoice_code()
+        code = await generate_invoice_code(_make_mock_db())
         
         pattern = r'^HD-\d{6}\d{3}$'
         assert re.match(pattern, code), f"Invoice code '{code}' does not match expected format"
@@ -171,12 +166,12 @@ class TestGenerateReceiptCode:
     
     async def test_generates_receipt_code_with_pn_prefix(self):
         """Test that receipt code starts with PN prefix"""
-        code = await generate_receipt_code()
+        code = await generate_receipt_code(_make_mock_db())
         assert code.startswith("PN-"), "Receipt code should start with 'PN-'"
     
     async def test_receipt_code_format(self):
         """Test that receipt code follows PN-ddmmyy*** format"""
-        code = await generate_receipt_code()
+        code = await generate_receipt_code(_make_mock_db())
         
         pattern = r'^PN-\d{6}\d{3}$'
         assert re.match(pattern, code), f"Receipt code '{code}' does not match expected format"
@@ -192,8 +187,8 @@ class TestCodeGeneratorIntegration:
         
         quote_code = await generate_quote_code(mock_db)
         order_code = await generate_order_code(mock_db)
-        invoice_code = await generate_invoice_code()
-        receipt_code = await generate_receipt_code()
+        invoice_code = await generate_invoice_code(_make_mock_db())
+        receipt_code = await generate_receipt_code(_make_mock_db())
         
         assert quote_code.startswith("BG-")
         assert order_code.startswith("ĐH-")
@@ -207,8 +202,8 @@ class TestCodeGeneratorIntegration:
         codes = [
             await generate_quote_code(mock_db),
             await generate_order_code(mock_db),
-            await generate_invoice_code(),
-            await generate_receipt_code()
+            await generate_invoice_code(mock_db),
+            await generate_receipt_code(mock_db)
         ]
         
         # Should all be unique due to different prefixes
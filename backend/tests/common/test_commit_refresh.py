@@ -0,0 +1,107 @@
+"""
+Tests for the commit-time refresh helper (backend/common/utils/commit_refresh.py).
+"""
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from backend.common.utils.commit_refresh import CommitRefresh, as_utc_day, tenant_lock_sql
+
+LOCK_SQL = tenant_lock_sql("test_commit_refresh")
+
+_trackers = []
+
+
+@pytest.fixture(autouse=True)
+def _remove_listeners():
+    yield
+    while _trackers:
+        tracker = _trackers.pop()
+        event.remove(Session, "before_commit", tracker.apply)
+        event.remove(Session, "after_rollback", tracker.discard)
+
+
+def _tracker(*args, **kwargs) -> CommitRefresh:
+    tracker = CommitRefresh("test_pending", LOCK_SQL, *args, **kwargs)
+    _trackers.append(tracker)
+    return tracker
+
+
+def _session(pending=None, key="test_pending"):
+    session = MagicMock()
+    session.info = {} if pending is None else {key: pending}
+    return session
+
+
+def test_as_utc_day_buckets_aware_datetimes_on_utc():
+    late_evening_hanoi = datetime(2026, 3, 2, 6, 30, tzinfo=timezone(timedelta(hours=7)))
+    assert as_utc_day(late_evening_hanoi) == date(2026, 3, 1)
+    assert as_utc_day(datetime(2026, 3, 2, 23, 0)) == date(2026, 3, 2)
+    assert as_utc_day(date(2026, 3, 2)) == date(2026, 3, 2)
+    assert as_utc_day(None) is None and as_utc_day("2026-03-02") is None
+
+
+def test_apply_locks_and_refreshes_each_tenant_in_a_savepoint():
+    refreshed = []
+    tracker = _tracker(
+        prepare=lambda keys: sorted(day for _, day in keys),
+        refresh=lambda session, tenant_id, days: refreshed.append((tenant_id, days)),
+    )
+    session = _session({("b", 2), ("a", 3), ("a", 1)})
+
+    tracker.apply(session)
+
+    session.flush.assert_called_once()
+    assert refreshed == [("a", [1, 3]), ("b", [2])]
+    assert [c.args for c in session.execute.call_args_list] == [
+        (LOCK_SQL, {"tenant_id": "a"}), (LOCK_SQL, {"tenant_id": "b"})
+    ]
+    assert session.begin_nested.call_count == 2
+    assert "test_pending" not in session.info
+
+
+def test_dict_entries_stay_grouped_and_empty_work_is_skipped():
+    seen = []
+    tracker = _tracker(
+        prepare=lambda entries: {k[1]: v for k, v in entries.items() if v} or None,
+        refresh=lambda session, tenant_id, work: seen.append((tenant_id, work)),
+        container=dict,
+    )
+    session = _session({("a", "c1"): 5, ("b", "c2"): 0})
+
+    tracker.apply(session)
+
+    assert seen == [("a", {"c1": 5})]
+    assert session.execute.call_count == 1
+
+
+def test_failure_goes_to_on_error_and_later_tenants_still_run():
+    errors, refreshed = [], []
+
+    def refresh(session, tenant_id, work):
+        if tenant_id == "a":
+            raise RuntimeError("deadlock detected")
+        refreshed.append(tenant_id)
+
+    tracker = _tracker(
+        prepare=sorted, refresh=refresh,
+        on_error=lambda session, tenant_id, work, e: errors.append((tenant_id, work, str(e))),
+    )
+    tracker.apply(_session({("a", 1), ("b", 2)}))
+
+    assert errors == [("a", [("a", 1)], "deadlock detected")]
+    assert refreshed == ["b"]
+
+
+def test_rollback_discards_and_pending_is_shared_per_session():
+    tracker = _tracker(prepare=sorted, refresh=MagicMock())
+    session = _session()
+    tracker.pending(session).add(("a", 1))
+    assert tracker.pending(session) == {("a", 1)}
+
+    tracker.discard(session)
+
+    assert "test_pending" not in session.info
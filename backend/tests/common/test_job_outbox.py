@@ -0,0 +1,210 @@
+"""
+Tests for the durable job outbox (backend/core/tasks/outbox.py).
+
+Unit tests cover enqueue SQL, retry/dead-letter bookkeeping and the
+registry. The claim test needs a real PostgreSQL (SKIP LOCKED) and only
+runs when OUTBOX_TEST_DATABASE_URL is set.
+"""
+import asyncio
+import os
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.core.tasks import outbox
+from backend.core.tasks.outbox import (
+    JOB_DEAD, JOB_DONE, JOB_PENDING, JOB_REGISTRY, MARK_DONE_SQL, MARK_FAILED_SQL,
+    ClaimedJob, JobOutboxModel, OutboxDispatcher, backoff_seconds, enqueue_job, job,
+)
+
+OUTBOX_DB_URL = os.getenv("OUTBOX_TEST_DATABASE_URL")
+
+
+class _FakeSession:
+    def __init__(self, log):
+        self.log = log
+        self.execute = AsyncMock(side_effect=self._execute)
+        self.commit = AsyncMock()
+
+    async def _execute(self, statement, params=None):
+        self.log.append((statement, params))
+        return MagicMock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _factory(log):
+    return lambda: _FakeSession(log)
+
+
+@pytest.fixture
+def registry():
+    saved = dict(JOB_REGISTRY)
+    yield JOB_REGISTRY
+    JOB_REGISTRY.clear()
+    JOB_REGISTRY.update(saved)
+
+
+def _claimed(name, attempts=1, max_attempts=3):
+    return ClaimedJob(id=uuid4(), tenant_id=uuid4(), job_name=name, payload={"x": 1},
+                      attempts=attempts, max_attempts=max_attempts)
+
+
+class TestEnqueue:
+    @pytest.mark.asyncio
+    async def test_dedupe_key_uses_partial_unique_index(self, registry):
+        db = SimpleNamespace(execute=AsyncMock())
+        await enqueue_job(db, uuid4(), "test.job", {"order_id": "1"}, dedupe_key="test.job:1")
+        stmt = db.execute.await_args.args[0]
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (dedupe_key) WHERE dedupe_key IS NOT NULL AND status IN ('PENDING', 'RUNNING')" in sql
+        assert "DO NOTHING" in sql
+
+    @pytest.mark.asyncio
+    async def test_max_attempts_comes_from_registry(self, registry):
+        @job("test.fragile", max_attempts=2)
+        async def fragile(db, tenant_id, payload):
+            pass
+
+        db = SimpleNamespace(execute=AsyncMock())
+        await enqueue_job(db, uuid4(), "test.fragile")
+        params = db.execute.await_args.args[0].compile(dialect=postgresql.dialect()).params
+        assert params["max_attempts"] == 2
+        assert params["status"] == JOB_PENDING
+        assert "ON CONFLICT" not in str(db.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+
+
+class TestBackoff:
+    def test_exponential_and_capped(self):
+        assert [backoff_seconds(n) for n in (1, 2, 3)] == [10, 20, 40]
+        assert backoff_seconds(50) == outbox.BACKOFF_MAX_SECONDS
+
+
+class TestRunJob:
+    @pytest.mark.asyncio
+    async def test_success_marks_done(self, registry):
+        seen = []
+
+        @job("test.ok")
+        async def ok(db, tenant_id, payload):
+            seen.append((tenant_id, payload))
+
+        log = []
+        claimed = _claimed("test.ok")
+        status = await OutboxDispatcher(_factory(log), worker_id="w1").run_job(claimed)
+
+        assert status == JOB_DONE
+        assert seen == [(claimed.tenant_id, {"x": 1})]
+        # tenant context first, then the DONE update
+        assert "app.current_tenant" in str(log[0][0])
+        assert log[-1][0] is MARK_DONE_SQL
+        assert log[-1][1] == {"id": claimed.id, "worker_id": "w1"}
+
+    @pytest.mark.asyncio
+    async def test_failure_is_rescheduled_with_backoff(self, registry):
+        @job("test.boom")
+        async def boom(db, tenant_id, payload):
+            raise RuntimeError("downstream unavailable")
+
+        log = []
+        status = await OutboxDispatcher(_factory(log)).run_job(_claimed("test.boom", attempts=2, max_attempts=5))
+
+        assert status == JOB_PENDING
+        sql, params = log[-1]
+        assert sql is MARK_FAILED_SQL
+        assert params["status"] == JOB_PENDING
+        assert params["delay_seconds"] == backoff_seconds(2)
+        assert "downstream unavailable" in params["error"]
+
+    @pytest.mark.asyncio
+    async def test_last_attempt_goes_dead(self, registry):
+        @job("test.boom")
+        async def boom(db, tenant_id, payload):
+            raise RuntimeError("still failing")
+
+        log = []
+        status = await OutboxDispatcher(_factory(log)).run_job(_claimed("test.boom", attempts=3, max_attempts=3))
+        assert status == JOB_DEAD
+        assert log[-1][1]["status"] == JOB_DEAD
+
+    @pytest.mark.asyncio
+    async def test_unknown_job_is_dead_lettered(self, registry):
+        log = []
+        status = await OutboxDispatcher(_factory(log)).run_job(_claimed("test.nobody"))
+        assert status == JOB_DEAD
+        assert "No handler" in log[-1][1]["error"]
+
+    @pytest.mark.asyncio
+    async def test_process_batch_counts(self, registry, monkeypatch):
+        @job("test.ok")
+        async def ok(db, tenant_id, payload):
+            pass
+
+        dispatcher = OutboxDispatcher(_factory([]))
+        monkeypatch.setattr(dispatcher, "claim", AsyncMock(return_value=[_claimed("test.ok"), _claimed("test.gone")]))
+        counts = await dispatcher.process_batch()
+        assert counts == {"claimed": 2, JOB_DONE: 1, JOB_PENDING: 0, JOB_DEAD: 1}
+
+
+# ============ PostgreSQL (opt-in) ============
+
+@pytest_asyncio.fixture
+async def outbox_db():
+    schema = f"outbox_test_{uuid4().hex[:8]}"
+    admin = create_async_engine(OUTBOX_DB_URL)
+    async with admin.begin() as conn:
+        await conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+    await admin.dispose()
+
+    engine = create_async_engine(OUTBOX_DB_URL, connect_args={"server_settings": {"search_path": schema}})
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: JobOutboxModel.__table__.create(sync_conn))
+        await conn.execute(text("""
+            CREATE UNIQUE INDEX uq_job_outbox_dedupe_active ON job_outbox (dedupe_key)
+            WHERE dedupe_key IS NOT NULL AND status IN ('PENDING', 'RUNNING')
+        """))
+    try:
+        yield async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+        admin = create_async_engine(OUTBOX_DB_URL)
+        async with admin.begin() as conn:
+            await conn.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+        await admin.dispose()
+
+
+@pytest.mark.skipif(not OUTBOX_DB_URL, reason="OUTBOX_TEST_DATABASE_URL not set")
+@pytest.mark.asyncio
+async def test_parallel_workers_run_each_job_once(outbox_db, registry):
+    runs = []
+
+    @job("test.count")
+    async def count(db, tenant_id, payload):
+        runs.append(payload["n"])
+
+    tenant_id = uuid4()
+    async with outbox_db() as db:
+        for n in range(40):
+            await enqueue_job(db, tenant_id, "test.count", {"n": n}, dedupe_key=f"count:{n}")
+        # duplicate while still pending is ignored
+        await enqueue_job(db, tenant_id, "test.count", {"n": 0}, dedupe_key="count:0")
+        await db.commit()
+
+    workers = [OutboxDispatcher(outbox_db, worker_id=f"w{i}", batch_size=5) for i in range(4)]
+    await asyncio.gather(*(w.drain() for w in workers))
+
+    async with outbox_db() as db:
+        statuses = (await db.execute(select(JobOutboxModel.status))).scalars().all()
+
+    assert sorted(runs) == list(range(40))
+    assert statuses == [JOB_DONE] * 40
@@ -0,0 +1,113 @@
+"""
+Unit tests for keyset pagination / unaccented search (common/utils/keyset_pagination.py).
+
+Queries are checked as compiled PostgreSQL; pages are fed from a mock session.
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+
+from backend.common.utils.keyset_pagination import (
+    COUNT_CAPPED,
+    COUNT_EXACT,
+    COUNT_NONE,
+    KeysetPaginator,
+    decode_cursor,
+    encode_cursor,
+    search_clause,
+)
+from backend.modules.order.domain.models import OrderModel
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def _paginator(cap=100):
+    return KeysetPaginator(OrderModel.created_at, OrderModel.id, count_cap=cap)
+
+
+class TestCursor:
+    def test_round_trip(self):
+        created_at, row_id = datetime(2026, 5, 1, 8, 30, tzinfo=timezone.utc), uuid4()
+        token = encode_cursor(created_at, row_id)
+        assert "=" not in token
+        assert decode_cursor(token) == (created_at, row_id)
+
+    @pytest.mark.parametrize("token", ["garbage", encode_cursor(datetime(2026, 1, 1), uuid4())[:-4], ""])
+    def test_malformed_cursor_raises_value_error(self, token):
+        with pytest.raises(ValueError):
+            decode_cursor(token or "e30")  # "e30" = base64("{}")
+
+
+class TestQueries:
+    def test_cursor_adds_row_value_comparison(self):
+        token = encode_cursor(datetime(2026, 5, 1, tzinfo=timezone.utc), uuid4())
+        sql = _sql(_paginator().page_query(select(OrderModel), token, 20))
+        assert "(orders.created_at, orders.id) < (" in sql
+        assert "ORDER BY orders.created_at DESC, orders.id DESC" in sql
+        assert "OFFSET" not in sql
+
+    def test_capped_count_stops_at_cap(self):
+        sql = _sql(_paginator(cap=100).count_query(select(OrderModel).where(OrderModel.status == "PAID"), COUNT_CAPPED))
+        assert "count(*)" in sql and "LIMIT" in sql
+        assert _paginator().count_query(select(OrderModel), COUNT_NONE) is None
+        assert "LIMIT" not in _sql(_paginator().count_query(select(OrderModel), COUNT_EXACT))
+
+    def test_search_matches_index_expression(self):
+        sql = _sql(select(OrderModel.id).where(search_clause((OrderModel.code, OrderModel.customer_name), " 50%_off ")))
+        # Constants inlined, as in the index expression of migration 081 (|| is left-associative)
+        assert "f_unaccent(lower((coalesce(orders.code, '') || ' ') || coalesce(orders.customer_name, '')))" in sql
+        assert "LIKE" in sql and "ESCAPE" in sql
+        params = select(OrderModel.id).where(
+            search_clause((OrderModel.code,), " 50%_off ")
+        ).compile(dialect=postgresql.dialect()).params
+        assert "50\\%\\_off" in params.values()
+
+
+def _db(rows, count=None):
+    db = SimpleNamespace(execute=AsyncMock())
+    results = []
+    if count is not None:
+        count_result = MagicMock()
+        count_result.scalar.return_value = count
+        results.append(count_result)
+    page_result = MagicMock()
+    page_result.scalars.return_value.all.return_value = rows
+    results.append(page_result)
+    db.execute.side_effect = results
+    return db
+
+
+def _rows(n):
+    start = datetime(2026, 5, 1, tzinfo=timezone.utc)
+    return [SimpleNamespace(id=uuid4(), created_at=start - timedelta(minutes=i)) for i in range(n)]
+
+
+@pytest.mark.asyncio
+class TestPaginate:
+    async def test_probe_row_yields_next_cursor(self):
+        rows = _rows(3)
+        page = await _paginator().paginate(_db(rows), select(OrderModel), page_size=2, count=COUNT_NONE)
+        assert page.items == rows[:2]
+        assert page.has_more
+        assert decode_cursor(page.next_cursor) == (rows[1].created_at, rows[1].id)
+        assert page.total is None
+
+    async def test_last_page_has_no_cursor(self):
+        rows = _rows(2)
+        page = await _paginator().paginate(_db(rows, count=2), select(OrderModel), page_size=2, count=COUNT_EXACT)
+        assert page.next_cursor is None and page.total == 2 and not page.total_is_capped
+
+    async def test_capped_total(self):
+        page = await _paginator(cap=100).paginate(_db(_rows(1), count=101), select(OrderModel), page_size=20)
+        assert page.total == 100 and page.total_is_capped
+
+    async def test_bad_count_mode(self):
+        with pytest.raises(ValueError):
+            await _paginator().paginate(_db([]), select(OrderModel), count="estimate")
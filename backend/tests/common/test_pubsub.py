@@ -0,0 +1,94 @@
+"""
+Tests for the realtime pub/sub (backend/core/pubsub.py).
+"""
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend.core.pubsub import (
+    PG_NOTIFY_MAX_BYTES,
+    RESYNC_MESSAGE,
+    InProcessPubSub,
+    PostgresPubSub,
+    publish_after_commit,
+    set_pubsub,
+)
+
+
+@pytest.fixture
+def pubsub():
+    pubsub = InProcessPubSub(queue_size=2)
+    set_pubsub(pubsub)
+    yield pubsub
+    set_pubsub(None)
+
+
+@pytest.mark.asyncio
+class TestInProcessPubSub:
+    async def test_fans_out_to_topic_subscribers_only(self, pubsub):
+        alice, bob = pubsub.subscribe(["user:a"]), pubsub.subscribe(["user:b", "badges:t"])
+        await pubsub.publish("user:a", {"type": "notification"})
+        pubsub.deliver("badges:t", {"type": "badges"})
+
+        assert await alice.get() == {"type": "notification"}
+        assert await bob.get() == {"type": "badges"}
+        assert bob.clear() == 0
+
+    async def test_overflow_is_reported_once(self, pubsub):
+        subscription = pubsub.subscribe(["user:a"])
+        for n in range(3):
+            pubsub.deliver("user:a", {"n": n})
+        assert subscription.dropped == 1
+        assert subscription.take_missed() is True
+        assert subscription.take_missed() is False
+        assert subscription.clear() == 0
+
+    async def test_closed_subscription_is_forgotten(self, pubsub):
+        async with pubsub.subscribe(["user:a", "user:b"]):
+            assert pubsub.subscriber_count() == 1
+        assert pubsub.subscriber_count() == 0
+        assert pubsub.deliver("user:a", {}) == 0
+
+    async def test_get_waits_for_publish(self, pubsub):
+        subscription = pubsub.subscribe(["user:a"])
+        waiter = asyncio.create_task(subscription.get())
+        await asyncio.sleep(0)
+        pubsub.publish_nowait("user:a", {"type": "ping"})
+        assert await asyncio.wait_for(waiter, 1) == {"type": "ping"}
+
+
+class TestPublishAfterCommit:
+    def _session(self):
+        return Session(bind=create_engine("sqlite://"))
+
+    def test_published_on_commit(self, pubsub):
+        subscription = pubsub.subscribe(["user:a"])
+        with self._session() as session:
+            publish_after_commit(session, "user:a", {"type": "notification"})
+            assert pubsub.subscriber_count("user:a") == 1 and subscription._queue.empty()
+            session.commit()
+        assert subscription._queue.get_nowait() == {"type": "notification"}
+
+    def test_dropped_on_rollback(self, pubsub):
+        subscription = pubsub.subscribe(["user:a"])
+        with self._session() as session:
+            session.connection()  # begin
+            publish_after_commit(session, "user:a", {"type": "notification"})
+            session.rollback()
+            session.commit()
+        assert subscription._queue.empty()
+
+
+class TestPostgresPayload:
+    def test_envelope_round_trips(self):
+        pubsub = PostgresPubSub(dsn="postgresql://localhost/x")
+        received = pubsub.subscribe(["user:a"])
+        pubsub._on_notify(None, 1, pubsub.channel, pubsub._encode("user:a", {"type": "notification", "n": 1}))
+        assert received._queue.get_nowait() == {"type": "notification", "n": 1}
+
+    def test_oversized_message_becomes_resync(self):
+        payload = PostgresPubSub()._encode("user:a", {"type": "notification", "text": "x" * PG_NOTIFY_MAX_BYTES})
+        assert json.loads(payload) == {"topic": "user:a", "message": RESYNC_MESSAGE}
@@ -0,0 +1,157 @@
+"""
+Tests for the rate limit backends (backend/core/rate_limiter.py) and
+RateLimitMiddleware (backend/core/middleware/rate_limit.py).
+
+The shared-bucket test needs a real PostgreSQL and only runs when
+RATE_LIMIT_TEST_DATABASE_URL is set.
+"""
+import asyncio
+import os
+from uuid import uuid4
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend.core.auth.security import create_access_token
+from backend.core.middleware.rate_limit import RateLimitMiddleware
+from backend.core.rate_limiter import (
+    InProcessRateLimiter, PostgresRateLimiter, RateLimiter, gcra, key_func_for,
+)
+
+RATE_LIMIT_DB_URL = os.getenv("RATE_LIMIT_TEST_DATABASE_URL")
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestGcra:
+    def test_burst_then_one_per_interval(self):
+        clock = _Clock()
+        limiter = InProcessRateLimiter(clock=clock)
+        decisions = [limiter.check("k", 3, 3) for _ in range(4)]
+        assert [d.allowed for d in decisions] == [True, True, True, False]
+        assert [d.remaining for d in decisions[:3]] == [2, 1, 0]
+        assert decisions[3].retry_after == pytest.approx(1.0)
+
+        clock.now += 1.0
+        assert limiter.check("k", 3, 3).allowed
+        assert not limiter.check("k", 3, 3).allowed
+
+    def test_rejections_do_not_push_the_bucket_further(self):
+        clock = _Clock()
+        limiter = InProcessRateLimiter(clock=clock)
+        for _ in range(10):
+            limiter.check("k", 2, 60)
+        clock.now += 30
+        assert limiter.check("k", 2, 60).allowed
+
+    def test_full_window_refills_the_bucket(self):
+        decision, tat = gcra(None, 0.0, 100, 60)
+        assert decision.remaining == 99  # no float drift on window / limit
+        for _ in range(99):
+            decision, tat = gcra(tat, 0.0, 100, 60)
+        assert decision.allowed and decision.remaining == 0
+        assert gcra(tat, 0.0, 100, 60)[1] is None
+        assert gcra(tat, 60.0, 100, 60)[0].remaining == 99
+
+    def test_prune_keeps_memory_bounded(self):
+        clock = _Clock()
+        limiter = InProcessRateLimiter(max_keys=10, clock=clock)
+        for i in range(10):
+            limiter.check(f"old-{i}", 5, 1)
+        clock.now += 5  # every old bucket is full again
+        for i in range(5):
+            limiter.check(f"new-{i}", 5, 1)
+        assert len(limiter) == 5
+
+
+def _app(**options):
+    app = FastAPI()
+
+    @app.get("/api/v1/items")
+    async def items():
+        return {"ok": True}
+
+    @app.post("/api/v1/auth/login")
+    async def login():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, **options)
+    return TestClient(app)
+
+
+class TestMiddleware:
+    def test_limits_and_headers(self):
+        client = _app(default_limit=2, window_seconds=60, backend=InProcessRateLimiter())
+        first = client.get("/api/v1/items")
+        assert first.headers["X-RateLimit-Remaining"] == "1"
+        client.get("/api/v1/items")
+        limited = client.get("/api/v1/items")
+        assert limited.status_code == 429
+        assert int(limited.headers["Retry-After"]) == 30
+
+    def test_endpoint_limits_have_their_own_bucket(self):
+        client = _app(default_limit=1, endpoint_limits={"/api/v1/auth/login": 5},
+                      backend=InProcessRateLimiter())
+        assert client.get("/api/v1/items").status_code == 200
+        assert client.post("/api/v1/auth/login").headers["X-RateLimit-Limit"] == "5"
+        assert client.get("/api/v1/items").status_code == 429
+
+    def test_tenant_keys(self):
+        client = _app(default_limit=1, backend=InProcessRateLimiter(), key_func=key_func_for("tenant"))
+
+        def auth(tenant_id):
+            token = create_access_token({"sub": str(uuid4()), "tenant_id": str(tenant_id)})
+            return {"Authorization": f"Bearer {token}"}
+
+        tenant_a, tenant_b = uuid4(), uuid4()
+        assert client.get("/api/v1/items", headers=auth(tenant_a)).status_code == 200
+        assert client.get("/api/v1/items", headers=auth(tenant_a)).status_code == 429  # other user, same tenant
+        assert client.get("/api/v1/items", headers=auth(tenant_b)).status_code == 200
+        # A forged token falls back to the IP bucket
+        assert client.get("/api/v1/items", headers={"Authorization": "Bearer forged"}).status_code == 200
+        assert client.get("/api/v1/items").status_code == 429
+
+    def test_backend_failure_fails_open(self):
+        class Broken(RateLimiter):
+            async def hit(self, key, limit, window):
+                raise ConnectionError("database unavailable")
+
+        client = _app(default_limit=1, backend=Broken())
+        assert client.get("/api/v1/items").status_code == 200
+        assert client.get("/api/v1/items").status_code == 200
+
+    def test_backend_must_implement_hit(self):
+        class Incomplete(RateLimiter):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+
+@pytest.mark.skipif(not RATE_LIMIT_DB_URL, reason="RATE_LIMIT_TEST_DATABASE_URL not set")
+@pytest.mark.asyncio
+async def test_postgres_buckets_are_shared():
+    engine = create_async_engine(RATE_LIMIT_DB_URL)
+    migration = os.path.join(os.path.dirname(__file__), "..", "..", "migrations", "086_rate_limit_buckets.sql")
+    async with engine.begin() as conn:
+        await conn.execute(text(open(migration).read().split(";")[0]))
+    try:
+        workers = [PostgresRateLimiter(engine), PostgresRateLimiter(engine)]
+        key = f"test|ip:{uuid4()}"
+        decisions = await asyncio.gather(*(workers[i % 2].hit(key, 10, 60) for i in range(15)))
+        assert sum(d.allowed for d in decisions) == 10
+        rejected = next(d for d in decisions if not d.allowed)
+        assert 0 < rejected.retry_after <= 6
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text("DELETE FROM rate_limit_buckets WHERE key LIKE 'test|%'"))
+        await engine.dispose()
@@ -0,0 +1 @@
+"""CRM module tests package"""
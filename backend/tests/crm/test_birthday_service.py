@@ -0,0 +1,98 @@
+"""
+Unit tests for the indexed upcoming-birthday lookup and the greeting campaign.
+"""
+import pytest
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+
+from backend.modules.crm.application import birthday_service
+from backend.modules.crm.application.birthday_service import (
+    BirthdayService,
+    birthday_ranges,
+    next_birthday,
+    schedule_birthday_campaigns,
+)
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+class TestRanges:
+    def test_window_inside_one_year(self):
+        assert birthday_ranges(date(2026, 5, 10), 30) == [(510, 609)]
+
+    def test_wrap_around_new_year(self):
+        assert birthday_ranges(date(2026, 12, 20), 21) == [(1220, 1231), (101, 110)]
+
+    def test_feb_29_included_on_feb_28_of_non_leap_year(self):
+        assert birthday_ranges(date(2027, 2, 20), 8) == [(220, 229)]
+        assert birthday_ranges(date(2028, 2, 20), 8) == [(220, 228)]
+
+    def test_full_year(self):
+        assert birthday_ranges(date(2026, 3, 1), 365) == [(101, 1231)]
+
+
+class TestNextBirthday:
+    @pytest.mark.parametrize("birthday,today,expected", [
+        (date(1990, 6, 1), date(2026, 5, 10), date(2026, 6, 1)),
+        (date(1990, 1, 5), date(2026, 12, 20), date(2027, 1, 5)),
+        (date(1992, 2, 29), date(2027, 2, 20), date(2027, 2, 28)),
+        (date(1992, 2, 29), date(2027, 3, 1), date(2028, 2, 29)),
+        (date(1990, 5, 10), date(2026, 5, 10), date(2026, 5, 10)),
+    ])
+    def test_next_birthday(self, birthday, today, expected):
+        assert next_birthday(birthday, today) == expected
+
+
+class TestQuery:
+    def test_wrap_around_is_one_query_ordered_by_date(self):
+        sql = _sql(BirthdayService(None, uuid4()).upcoming_query(date(2026, 12, 20), 21, limit=50))
+        assert "customers.birthday_key BETWEEN 1220 AND 1231 OR customers.birthday_key BETWEEN 101 AND 110" in sql
+        assert "CASE WHEN (customers.birthday_key >= 1220) THEN 0 ELSE 1 END" in sql
+        assert "LIMIT 50" in sql
+
+    def test_full_year_is_ordered_from_today(self):
+        # Without the wrap ordering LIMIT would keep January, not the soonest birthdays
+        sql = _sql(BirthdayService(None, uuid4()).upcoming_query(date(2026, 8, 15), 366, limit=10))
+        assert "customers.birthday_key BETWEEN 101 AND 1231" in sql
+        assert "CASE WHEN (customers.birthday_key >= 815) THEN 0 ELSE 1 END, customers.birthday_key" in sql
+
+    def test_simple_window_orders_by_key(self):
+        sql = _sql(BirthdayService(None, uuid4()).upcoming_query(date(2026, 5, 10), 30))
+        assert "ORDER BY customers.birthday_key, customers.id" in sql and "LIMIT" not in sql
+
+
+def _db(customers):
+    db = SimpleNamespace(execute=AsyncMock())
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = customers
+    db.execute.return_value = result
+    return db
+
+
+@pytest.mark.asyncio
+class TestUpcoming:
+    async def test_days_until_across_new_year(self):
+        customers = [SimpleNamespace(id=uuid4(), birthday=date(1985, 12, 31)),
+                     SimpleNamespace(id=uuid4(), birthday=date(1990, 1, 3))]
+        upcoming = await BirthdayService(_db(customers), uuid4()).upcoming(days=21, today=date(2026, 12, 20))
+        assert [u.days_until for u in upcoming] == [11, 14]
+        assert upcoming[1].celebration == date(2027, 1, 3)
+
+    async def test_campaign_delays_greeting_to_the_morning_of_the_birthday(self):
+        customer = SimpleNamespace(id=uuid4(), birthday=date(1990, 6, 3))
+        now = datetime(2026, 6, 1, 20, 0, tzinfo=timezone.utc)  # 03:00 on Jun 2 in Vietnam
+        with patch.object(birthday_service, "enqueue_job", AsyncMock()) as enqueue:
+            scheduled = await schedule_birthday_campaigns(_db([customer]), uuid4(), now=now)
+
+        assert scheduled == 1
+        kwargs = enqueue.await_args.kwargs
+        assert kwargs["payload"] == {"customer_id": str(customer.id), "birthday": "2026-06-03"}
+        assert kwargs["dedupe_key"] == f"crm.birthday_greeting:{customer.id}:2026"
+        # Jun 3 08:00 +07:00 = Jun 3 01:00 UTC
+        assert kwargs["delay_seconds"] == 29 * 3600
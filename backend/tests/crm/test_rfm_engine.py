@@ -0,0 +1,174 @@
+"""
+Unit tests for the CRM RFM engine.
+
+Covers delta tracking from order / quote changes, the commit-time apply
+(including failure isolation) and the shape of the set-based statements.
+"""
+import pytest
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+# Register related mappers so model instances can be constructed
+import backend.modules.inventory.domain.models  # noqa: F401
+import backend.modules.crm.domain.models  # noqa: F401
+from sqlalchemy.orm.attributes import set_committed_value
+
+from backend.modules.crm.application.rfm_engine import (
+    APPLY_DELTAS_SQL,
+    REFRESH_CUSTOMERS_SQL,
+    RETIER_TENANT_SQL,
+    RfmEngine,
+    _DELTAS_KEY,
+    _collect_customer_deltas,
+    _rfm_refresh,
+    mark_customers_for_refresh,
+)
+from backend.modules.order.domain.models import OrderModel
+from backend.modules.quote.domain.models import QuoteModel
+
+
+def _fake_session(new=(), dirty=(), deleted=()):
+    return SimpleNamespace(info={}, new=list(new), dirty=list(dirty), deleted=list(deleted))
+
+
+def _loaded(model, **values):
+    """An instance as if loaded from the database (no pending history)."""
+    obj = model()
+    for key, value in values.items():
+        set_committed_value(obj, key, value)
+    return obj
+
+
+def _deltas(session, tenant_id):
+    return {c: d for (t, c), d in session.info.get(_DELTAS_KEY, {}).items() if t == str(tenant_id)}
+
+
+class TestOrderDeltas:
+    def test_confirm_adds_order_to_customer(self):
+        tenant_id, customer_id = uuid4(), uuid4()
+        created = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        order = _loaded(OrderModel, tenant_id=tenant_id, customer_id=customer_id, status="PENDING",
+                        final_amount=Decimal("2500000"), created_at=created)
+        order.status = "CONFIRMED"
+        session = _fake_session(dirty=[order])
+
+        _collect_customer_deltas(session, None)
+
+        delta = _deltas(session, tenant_id)[str(customer_id)]
+        assert (delta.orders, delta.spent, delta.last_order_at, delta.exact) == (1, Decimal("2500000"), created, False)
+
+    def test_confirmed_to_completed_is_not_counted_twice(self):
+        order = _loaded(OrderModel, tenant_id=uuid4(), customer_id=uuid4(), status="CONFIRMED",
+                        final_amount=Decimal("100"), created_at=datetime(2026, 3, 1, tzinfo=timezone.utc))
+        order.status = "COMPLETED"
+        session = _fake_session(dirty=[order])
+        _collect_customer_deltas(session, None)
+        assert _DELTAS_KEY not in session.info
+
+    def test_amount_edit_adjusts_spent_only(self):
+        tenant_id, customer_id = uuid4(), uuid4()
+        order = _loaded(OrderModel, tenant_id=tenant_id, customer_id=customer_id, status="CONFIRMED",
+                        final_amount=Decimal("100"), created_at=datetime(2026, 3, 1, tzinfo=timezone.utc))
+        order.final_amount = Decimal("150")
+        session = _fake_session(dirty=[order])
+        _collect_customer_deltas(session, None)
+        delta = _deltas(session, tenant_id)[str(customer_id)]
+        assert (delta.orders, delta.spent, delta.exact) == (0, Decimal("50"), False)
+
+    def test_reopen_recomputes_exactly(self):
+        tenant_id, customer_id = uuid4(), uuid4()
+        order = _loaded(OrderModel, tenant_id=tenant_id, customer_id=customer_id, status="COMPLETED",
+                        final_amount=Decimal("100"), created_at=datetime(2026, 3, 1, tzinfo=timezone.utc))
+        order.status = "IN_PROGRESS"
+        session = _fake_session(dirty=[order])
+        _collect_customer_deltas(session, None)
+        assert _deltas(session, tenant_id)[str(customer_id)].exact
+
+    def test_new_walk_in_order_is_ignored(self):
+        session = _fake_session(new=[OrderModel(tenant_id=uuid4(), status="CONFIRMED", final_amount=100)])
+        _collect_customer_deltas(session, None)
+        assert _DELTAS_KEY not in session.info
+
+
+class TestQuoteDeltas:
+    def test_rejection_increments_rejected_count(self):
+        tenant_id, customer_id = uuid4(), uuid4()
+        quote = _loaded(QuoteModel, tenant_id=tenant_id, customer_id=customer_id, status="PENDING")
+        quote.status = "REJECTED"
+        session = _fake_session(dirty=[quote])
+        _collect_customer_deltas(session, None)
+        assert _deltas(session, tenant_id)[str(customer_id)].rejected == 1
+
+    def test_deleted_rejected_quote_decrements(self):
+        tenant_id, customer_id = uuid4(), uuid4()
+        quote = _loaded(QuoteModel, tenant_id=tenant_id, customer_id=customer_id, status="REJECTED")
+        session = _fake_session(deleted=[quote])
+        _collect_customer_deltas(session, None)
+        assert _deltas(session, tenant_id)[str(customer_id)].rejected == -1
+
+
+class TestCommitApply:
+    def test_deltas_and_exact_customers_go_to_separate_statements(self):
+        tenant_id, c1, c2 = uuid4(), uuid4(), uuid4()
+        session = MagicMock()
+        session.info = {}
+        mark_customers_for_refresh(session, tenant_id, [c2, None])
+        session.info[_DELTAS_KEY][(str(tenant_id), str(c1))] = SimpleNamespace(
+            orders=1, spent=Decimal("10"), last_order_at=None, rejected=0, exact=False)
+
+        _rfm_refresh.apply(session)
+
+        statements = [c.args[0] for c in session.execute.call_args_list]
+        assert statements[1:] == [APPLY_DELTAS_SQL, REFRESH_CUSTOMERS_SQL]
+        apply_params = session.execute.call_args_list[1].args[1]
+        assert apply_params["customer_ids"] == [str(c1)] and apply_params["order_deltas"] == [1]
+        assert session.execute.call_args_list[2].args[1]["customer_ids"] == [str(c2)]
+        assert _DELTAS_KEY not in session.info
+
+    def test_failure_does_not_break_commit(self):
+        session = MagicMock()
+        session.info = {}
+        mark_customers_for_refresh(session, uuid4(), [uuid4()])
+        session.execute.side_effect = RuntimeError("relation customer_tier_history does not exist")
+
+        _rfm_refresh.apply(session)  # must not raise
+
+
+class TestStatements:
+    def test_nightly_pass_is_one_update_from_over_the_tenant(self):
+        sql = RETIER_TENANT_SQL.text
+        assert sql.count("UPDATE customers c SET") == 1
+        assert "FROM tiered t" in sql and "ANY(" not in sql
+        assert "INSERT INTO customer_tier_history" in sql
+
+    def test_manual_tiers_are_kept(self):
+        for statement in (APPLY_DELTAS_SQL, REFRESH_CUSTOMERS_SQL, RETIER_TENANT_SQL):
+            assert "WHEN prev.customer_type IN ('CORPORATE') THEN prev.customer_type" in statement.text
+
+    def test_recency_thresholds_match_legacy_day_counts(self):
+        # legacy: days_since > 365 -> CHURN_RISK, days_since < 180 -> LOYAL
+        sql = RETIER_TENANT_SQL.text
+        assert "interval '366 days'" in sql and "> CAST(:now AS timestamptz) - interval '180 days'" in sql
+
+
+@pytest.mark.asyncio
+class TestEngine:
+    async def test_retier_tenant_locks_then_runs_one_statement(self):
+        db = AsyncMock()
+        db.execute.return_value = MagicMock(one=MagicMock(return_value=SimpleNamespace(updated=7, tier_changes=3)))
+
+        result = await RfmEngine(db, uuid4()).retier_tenant()
+
+        assert db.execute.await_count == 2
+        assert db.execute.await_args.args[0] is RETIER_TENANT_SQL
+        assert db.execute.await_args.args[1]["source"] == "NIGHTLY"
+        assert (result.updated, result.tier_changes) == (7, 3)
+
+    async def test_refresh_without_customers_is_noop(self):
+        db = AsyncMock()
+        result = await RfmEngine(db, uuid4()).refresh_customers([None])
+        assert result.updated == 0
+        db.execute.assert_not_awaited()
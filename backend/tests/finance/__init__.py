@@ -0,0 +1 @@
+"""Finance module tests package"""
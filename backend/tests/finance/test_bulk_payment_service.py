@@ -0,0 +1,129 @@
+"""
+Unit tests for set-based bulk payment recording (finance/services/bulk_payment_service.py).
+
+A fake session records the statements; order rows are canned.
+"""
+import pytest
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+
+# Register related mappers so model instances can be constructed
+import backend.modules.inventory.domain.models  # noqa: F401
+from backend.modules.finance.services.bulk_payment_service import BulkPaymentRow, BulkPaymentService
+from backend.modules.finance.services.journal_service import JournalService, PaymentJournalEntry
+from backend.modules.finance.services.kpi_rollup_service import _DIRTY_KEY
+
+
+def _order(code, final_amount, paid_amount=0, status="CONFIRMED"):
+    return SimpleNamespace(
+        id=uuid4(), code=code, status=status, final_amount=Decimal(final_amount),
+        paid_amount=Decimal(paid_amount), created_at=datetime(2026, 5, 1, tzinfo=timezone.utc),
+        event_date=datetime(2026, 5, 20, 11, 0, tzinfo=timezone.utc),
+    )
+
+
+class FakeSession:
+    def __init__(self, orders):
+        self.orders = orders
+        self.statements = []
+        self.info = {}
+
+    async def execute(self, stmt, params=None):
+        self.statements.append(stmt)
+        return iter(self.orders) if len(self.statements) == 1 else MagicMock()
+
+
+def _sql(stmt):
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+@pytest.fixture
+def journals(monkeypatch):
+    created = []
+
+    async def fake_create_journals(self, payments, orders):
+        created.extend(payments)
+
+    monkeypatch.setattr(BulkPaymentService, "create_journals", fake_create_journals)
+    return created
+
+
+class TestRecord:
+    @pytest.mark.asyncio
+    async def test_fixed_statement_count_and_per_row_results(self, journals):
+        a, b, cancelled = _order("DH-1", 1000), _order("DH-2", 1000, 100), _order("DH-3", 800, status="CANCELLED")
+        db = FakeSession([a, b, cancelled])
+        rows = [
+            BulkPaymentRow(a.id, Decimal(400)),
+            BulkPaymentRow(b.id, Decimal(400), "TRANSFER", "2026-05-03"),
+            BulkPaymentRow(uuid4(), Decimal(10)),
+            BulkPaymentRow(a.id, Decimal(0)),
+            BulkPaymentRow(cancelled.id, Decimal(10)),
+            BulkPaymentRow(a.id, Decimal(600), payment_date="03/05/2026"),
+            BulkPaymentRow(a.id, Decimal(600)),
+        ]
+        outcomes = await BulkPaymentService(db, uuid4()).record(rows)
+
+        assert [o.success for o in outcomes] == [True, True, False, False, False, False, True]
+        assert [o.error for o in outcomes if not o.success] == [
+            "Order not found", "Invalid payment amount", "Order is CANCELLED", "Invalid payment date: 03/05/2026",
+        ]
+        assert outcomes[1].order_code == "DH-2" and outcomes[2].order_code == "N/A"
+
+        select_sql, insert_sql, update_sql = (_sql(s) for s in db.statements)
+        assert "FOR UPDATE" in select_sql and "orders.id IN" in select_sql
+        assert insert_sql.startswith("INSERT INTO order_payments") and insert_sql.count("VALUES") == 1
+        assert "FROM (VALUES" in update_sql
+
+        # DH-1 reaches its final amount over two rows, DH-2 stays open
+        params = list(db.statements[2].compile(dialect=postgresql.dialect()).params.values())
+        assert params[:5] == [a.id, Decimal(1000), Decimal(0), "PAID", params[4]]
+        assert params[5:9] == [b.id, Decimal(500), Decimal(500), "CONFIRMED"]
+        assert len(journals) == 3
+        assert journals[1]["payment_date"] == datetime(2026, 5, 3, tzinfo=timezone.utc)
+        assert {day for _, day in db.info[_DIRTY_KEY]} == {
+            datetime(2026, 5, 1).date(), datetime(2026, 5, 20).date(),
+        }
+
+    @pytest.mark.asyncio
+    async def test_all_or_nothing_writes_nothing_on_any_invalid_row(self, journals):
+        a = _order("DH-1", 1000)
+        db = FakeSession([a])
+        outcomes = await BulkPaymentService(db, uuid4()).record(
+            [BulkPaymentRow(a.id, Decimal(100)), BulkPaymentRow(a.id, Decimal(-5))], all_or_nothing=True
+        )
+        assert not any(o.success for o in outcomes)
+        assert outcomes[0].error.startswith("Batch rejected")
+        assert len(db.statements) == 1 and journals == []
+
+
+class TestJournalBatch:
+    @pytest.mark.asyncio
+    async def test_accounts_and_codes_resolved_once(self):
+        db = MagicMock()
+        db.flush = AsyncMock()
+        service = JournalService(db, tenant_id=uuid4())
+        accounts = {}
+
+        async def get_or_create_account(code, name, account_type):
+            accounts[code] = accounts.get(code) or SimpleNamespace(id=uuid4(), name=name)
+            return accounts[code]
+
+        service.get_or_create_account = AsyncMock(side_effect=get_or_create_account)
+        service.next_journal_codes = AsyncMock(return_value=["THU-202605-041", "THU-202605-042", "THU-202605-043"])
+        entries = [
+            PaymentJournalEntry(uuid4(), uuid4(), Decimal(100), method, "Thu tiền")
+            for method in ("CASH", "TRANSFER", "CASH")
+        ]
+        journals = await service.create_journals_from_payments(entries)
+
+        assert [j.code for j in journals] == ["THU-202605-041", "THU-202605-042", "THU-202605-043"]
+        service.next_journal_codes.assert_awaited_once_with("THU", 3)
+        assert service.get_or_create_account.await_count == 3  # cash, bank, revenue
+        lines_and_txns = db.add_all.call_args_list[1].args[0]
+        assert len(lines_and_txns) == 9
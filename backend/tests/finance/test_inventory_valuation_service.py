@@ -0,0 +1,193 @@
+"""
+Unit tests for the vectorized inventory valuation (COGS, FIFO, weighted average).
+
+The NumPy reductions are checked against straightforward per-item Python
+loops on small hand-made and random datasets; the cache tests cover the
+watermark invalidation.
+"""
+import random
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import backend.modules.inventory.domain.models  # noqa: F401,E402
+from backend.modules.finance.services.inventory_valuation_service import (  # noqa: E402
+    InventoryValuationService,
+    ValuationCache,
+    build_columns,
+    compute_cogs,
+    compute_valuation,
+    summarize_cogs,
+    summarize_valuation,
+)
+
+
+def _item(name, cost, stock):
+    return (uuid4(), name, "Thịt", "kg", cost, stock)
+
+
+def _dataset():
+    beef = _item("Bò", 200, 7)
+    rice = _item("Gạo", 20, 0)
+    salt = _item("Muối", 5, 10)
+    items = [beef, rice, salt]
+    d = datetime(2026, 5, 1, 8)
+    reversed_id = uuid4()
+    txns = [
+        (beef[0], "IMPORT", 5, 180, d, False, None),
+        (beef[0], "IMPORT", 5, 220, d + timedelta(days=2), False, None),
+        (beef[0], "EXPORT", 3, 190, d + timedelta(days=3), False, None),
+        (beef[0], "EXPORT", 2, 210, d + timedelta(days=10), True, None),          # reversed ...
+        (beef[0], "IMPORT", 2, 210, d + timedelta(days=11), False, reversed_id),  # ... by this
+        (rice[0], "EXPORT", 4, None, d + timedelta(days=3), False, None),  # cost_price fallback
+        (salt[0], "ADJUST", 10, None, d, False, None),
+    ]
+    lots = [
+        (beef[0], 5, 2, 180, d, "ACTIVE"),
+        (beef[0], 5, 5, 220, d + timedelta(days=2), "ACTIVE"),
+    ]
+    return items, txns, lots
+
+
+class TestCogs:
+    def test_period_totals_and_fallback(self):
+        items, txns, lots = _dataset()
+        cols = build_columns(items, txns, lots)
+        result = compute_cogs(cols, date(2026, 5, 1), date(2026, 5, 31))
+        assert result.qty.tolist() == [3, 4, 0]
+        assert result.cost.tolist() == [570, 80, 0]
+        assert result.avg_unit_cost.tolist() == [190, 0, 0]
+
+    def test_end_date_is_inclusive(self):
+        items, txns, lots = _dataset()
+        cols = build_columns(items, txns, lots)
+        assert compute_cogs(cols, date(2026, 5, 4), date(2026, 5, 4)).total == 650
+        assert compute_cogs(cols, date(2026, 5, 5), date(2026, 5, 31)).total == 0
+
+    def test_summary_sorted_by_cost(self):
+        items, txns, lots = _dataset()
+        summary = summarize_cogs(build_columns(items, txns, lots), date(2026, 5, 1), date(2026, 5, 31))
+        assert [line.item_name for line in summary.lines] == ["Bò", "Gạo"]
+        assert summary.total_cogs == 650
+
+
+class TestValuation:
+    def test_today_uses_active_lots_and_static_fallback(self):
+        items, txns, lots = _dataset()
+        result = compute_valuation(build_columns(items, txns, lots))
+        assert result.fifo_value.tolist() == [2 * 180 + 5 * 220, 0, 50]
+        assert result.static_value.tolist() == [1400, 0, 50]
+        # (5*180 + 5*220) / 10 = 200 per kg
+        assert result.weighted_avg_value.tolist() == [1400, 0, 50]
+        assert result.lot_count.tolist() == [2, 0, 0]
+
+    def test_as_of_rolls_back_movements(self):
+        items, txns, lots = _dataset()
+        cols = build_columns(items, txns, lots)
+        # End of May 2nd: only the first import happened (7 - 5 + 3 = 5 on hand)
+        result = compute_valuation(cols, date(2026, 5, 2))
+        assert result.on_hand[0] == 5
+        assert result.fifo_value[0] == 5 * 180
+        assert result.weighted_avg_value[0] == 5 * 180
+
+    def test_summary_lists_only_items_in_stock(self):
+        items, txns, lots = _dataset()
+        summary = summarize_valuation(build_columns(items, txns, lots))
+        assert [line.item_name for line in summary.lines] == ["Bò", "Muối"]
+        assert summary.total_fifo == 1510
+
+
+def _reference_fifo(items, txns, lots, as_of):
+    """Per-item loop: roll stock back, then consume the newest lots first."""
+    cutoff = datetime.combine(as_of + timedelta(days=1), datetime.min.time())
+    values = []
+    for item_id, _, _, _, cost, stock in items:
+        on_hand = stock
+        for t in txns:
+            if t[0] == item_id and t[4] >= cutoff:
+                on_hand -= t[2] if t[1] == "IMPORT" else -t[2] if t[1] == "EXPORT" else 0
+        remaining = max(on_hand, 0)
+        value = 0.0
+        for lot in sorted((l for l in lots if l[0] == item_id and l[4] < cutoff), key=lambda l: l[4], reverse=True):
+            take = min(remaining, lot[1])
+            value += take * lot[3]
+            remaining -= take
+        values.append(value + remaining * cost)
+    return values
+
+
+def test_fifo_matches_reference_on_random_data():
+    rng = random.Random(7)
+    items = [_item(f"SKU-{i}", rng.randint(10, 100), rng.randint(0, 60)) for i in range(40)]
+    start = datetime(2026, 1, 1)
+    txns, lots = [], []
+    for _ in range(600):
+        item = rng.choice(items)
+        at = start + timedelta(hours=rng.randint(0, 24 * 90))
+        kind = rng.choice(["IMPORT", "EXPORT", "ADJUST"])
+        qty = rng.randint(1, 10)
+        txns.append((item[0], kind, qty, rng.randint(10, 100), at, False, None))
+        if kind == "IMPORT":
+            lots.append((item[0], qty, qty, rng.randint(10, 100), at, "ACTIVE"))
+
+    cols = build_columns(items, txns, lots)
+    for as_of in (date(2026, 1, 15), date(2026, 2, 20), date(2026, 3, 31)):
+        expected = _reference_fifo(items, txns, lots, as_of)
+        assert np.allclose(compute_valuation(cols, as_of).fifo_value, expected)
+
+
+class TestCache:
+    def _service(self, cache, watermark):
+        service = InventoryValuationService(MagicMock(), uuid4(), cache=cache)
+        service.watermark = AsyncMock(return_value=watermark)
+        items, txns, lots = _dataset()
+        service.load_columns = AsyncMock(side_effect=lambda: build_columns(items, txns, lots))
+        return service
+
+    @pytest.mark.asyncio
+    async def test_reports_are_cached_until_watermark_moves(self):
+        cache = ValuationCache()
+        service = self._service(cache, (7, datetime(2026, 5, 12), 1))
+
+        first = await service.cogs(date(2026, 5, 1), date(2026, 5, 31))
+        assert await service.cogs(date(2026, 5, 1), date(2026, 5, 31)) is first
+        await service.valuation()
+        assert service.load_columns.await_count == 1  # columns shared by both reports
+
+        service.watermark.return_value = (8, datetime(2026, 5, 13), 1)
+        assert await service.cogs(date(2026, 5, 1), date(2026, 5, 31)) is not first
+        assert service.load_columns.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_watermark_tracks_in_place_edits(self):
+        from sqlalchemy.dialects import postgresql
+
+        result = MagicMock()
+        result.one.return_value = (7, datetime(2026, 5, 12), 1, datetime(2026, 5, 14))
+        db = MagicMock(execute=AsyncMock(return_value=result))
+        watermark = await InventoryValuationService(db, uuid4()).watermark()
+
+        sql = str(db.execute.await_args.args[0].compile(dialect=postgresql.dialect()))
+        assert "max(inventory_transactions.updated_at)" in sql
+        assert watermark == (7, datetime(2026, 5, 12), 1, datetime(2026, 5, 14))
+
+    @pytest.mark.asyncio
+    async def test_invalidate_drops_tenant_entries(self):
+        cache = ValuationCache()
+        service = self._service(cache, (1, None, 0))
+        await service.valuation()
+        service.invalidate()
+        await service.valuation()
+        assert service.load_columns.await_count == 2
+
+    def test_lru_is_bounded(self):
+        cache = ValuationCache(maxsize=2)
+        for n in range(3):
+            cache.put(("t", n), (0, None, 0), SimpleNamespace(n=n))
+        assert cache.get(("t", 0), (0, None, 0)) is None
+        assert cache.get(("t", 2), (0, None, 0)).n == 2
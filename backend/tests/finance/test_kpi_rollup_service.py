@@ -0,0 +1,156 @@
+"""
+Unit tests for the finance KPI daily rollup.
+
+Covers dirty-day tracking from ORM changes, the commit-time refresh
+(including failure isolation) and the snapshot read mapping.
+"""
+import pytest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+# Register related mappers so model instances can be constructed
+import backend.modules.inventory.domain.models  # noqa: F401
+from backend.modules.finance.domain.models import FinanceTransactionModel
+from backend.modules.finance.services.kpi_rollup_service import (
+    JOB_REFRESH_KPI_DAYS,
+    REFRESH_DAYS_SQL,
+    FinanceKpiRollupService,
+    _DIRTY_KEY,
+    _affected_days,
+    _collect_dirty_kpi_days,
+    _kpi_refresh,
+    mark_kpi_days_dirty,
+)
+from backend.modules.order.domain.models import OrderModel
+from backend.modules.procurement.domain.models import PurchaseOrderModel
+
+
+def _fake_session(new=(), dirty=(), deleted=()):
+    return SimpleNamespace(info={}, new=list(new), dirty=list(dirty), deleted=list(deleted))
+
+
+class TestAffectedDays:
+    def test_new_order_buckets_today_and_event_date(self):
+        order = OrderModel(tenant_id=uuid4(), status="CONFIRMED", event_date=datetime(2026, 5, 20, 18, 0))
+        days = _affected_days(order, True)
+        assert date(2026, 5, 20) in days
+        assert datetime.now(timezone.utc).date() in days
+
+    def test_explicit_created_at_is_used(self):
+        order = OrderModel(
+            tenant_id=uuid4(),
+            created_at=datetime(2026, 4, 1, 23, 0, tzinfo=timezone.utc),
+            event_date=datetime(2026, 4, 10),
+        )
+        assert _affected_days(order, True) == {date(2026, 4, 1), date(2026, 4, 10)}
+
+    def test_transaction_uses_transaction_date(self):
+        tx = FinanceTransactionModel(tenant_id=uuid4(), type="PAYMENT", amount=Decimal("10"),
+                                     transaction_date=date(2026, 3, 3))
+        assert _affected_days(tx, True) == {date(2026, 3, 3)}
+
+    def test_purchase_order_due_date(self):
+        po = PurchaseOrderModel(tenant_id=uuid4(), status="SENT", due_date=datetime(2026, 6, 30),
+                                created_at=datetime(2026, 6, 1, tzinfo=timezone.utc))
+        assert _affected_days(po, True) == {date(2026, 6, 1), date(2026, 6, 30)}
+
+
+class TestDirtyTracking:
+    def test_collect_groups_by_tenant(self):
+        t1, t2 = uuid4(), uuid4()
+        session = _fake_session(new=[
+            FinanceTransactionModel(tenant_id=t1, type="PAYMENT", amount=1, transaction_date=date(2026, 1, 5)),
+            FinanceTransactionModel(tenant_id=t2, type="EXPENSE", amount=2, transaction_date=date(2026, 1, 6)),
+        ])
+        _collect_dirty_kpi_days(session, None)
+        assert session.info[_DIRTY_KEY] == {(str(t1), date(2026, 1, 5)), (str(t2), date(2026, 1, 6))}
+
+    def test_untracked_models_are_ignored(self):
+        session = _fake_session(new=[SimpleNamespace(tenant_id=uuid4())])
+        _collect_dirty_kpi_days(session, None)
+        assert _DIRTY_KEY not in session.info
+
+    def test_mark_days_dirty_accepts_datetimes(self):
+        session = _fake_session()
+        tenant_id = uuid4()
+        mark_kpi_days_dirty(session, tenant_id, [datetime(2026, 2, 1, 10), date(2026, 2, 2), None])
+        assert session.info[_DIRTY_KEY] == {(str(tenant_id), date(2026, 2, 1)), (str(tenant_id), date(2026, 2, 2))}
+
+
+class TestCommitRefresh:
+    def test_refresh_runs_once_per_tenant_with_sorted_days(self):
+        tenant_id = str(uuid4())
+        session = MagicMock()
+        session.info = {_DIRTY_KEY: {(tenant_id, date(2026, 1, 3)), (tenant_id, date(2026, 1, 1))}}
+
+        _kpi_refresh.apply(session)
+
+        session.flush.assert_called_once()
+        refresh_params = session.execute.call_args_list[-1].args[1]
+        assert refresh_params == {"tenant_id": tenant_id, "days": [date(2026, 1, 1), date(2026, 1, 3)]}
+        assert _DIRTY_KEY not in session.info
+
+    def test_refresh_failure_does_not_break_commit(self):
+        session = MagicMock()
+        session.info = {_DIRTY_KEY: {(str(uuid4()), date(2026, 1, 1))}}
+        session.execute.side_effect = RuntimeError("relation finance_daily_kpis does not exist")
+
+        _kpi_refresh.apply(session)  # must not raise
+
+    def test_failed_days_are_queued_for_retry(self):
+        tenant_id = uuid4()
+        session = MagicMock()
+        session.info = {_DIRTY_KEY: {(str(tenant_id), date(2026, 1, 2)), (str(tenant_id), date(2026, 1, 1))}}
+        session.execute.side_effect = [None, RuntimeError("deadlock detected"), None]
+
+        _kpi_refresh.apply(session)
+
+        retry = session.execute.call_args_list[-1].args[0].compile().params
+        assert retry["job_name"] == JOB_REFRESH_KPI_DAYS and retry["tenant_id"] == tenant_id
+        assert retry["payload"] == {"days": ["2026-01-01", "2026-01-02"]}
+
+    def test_sql_buckets_timestamps_on_utc_days(self):
+        sql = " ".join(REFRESH_DAYS_SQL.text.split())
+        assert "d.day::timestamp AT TIME ZONE 'UTC' AS day_start" in sql
+        assert "o.created_at >= d.day" not in sql and "o.event_date >= d.day" not in sql
+
+    def test_nothing_dirty_sends_no_sql(self):
+        session = MagicMock()
+        session.info = {}
+        _kpi_refresh.apply(session)
+        session.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+class TestService:
+    async def test_dashboard_totals_maps_single_row(self):
+        db = AsyncMock()
+        result = MagicMock()
+        result.one.return_value = (Decimal("100"), Decimal("80"), Decimal("30"), Decimal("20"),
+                                   Decimal("500"), Decimal("70"), Decimal("40"))
+        db.execute.return_value = result
+
+        totals = await FinanceKpiRollupService(db, uuid4()).dashboard_totals(
+            date(2026, 5, 1), date(2026, 4, 1), date(2026, 4, 30), date(2026, 5, 17)
+        )
+
+        db.execute.assert_awaited_once()
+        assert totals["revenue_current"] == Decimal("100")
+        assert totals["payables_total"] == Decimal("70")
+        assert totals["payables_due_soon"] == Decimal("40")
+
+    async def test_rebuild_range_chunks_days(self):
+        db = AsyncMock()
+        service = FinanceKpiRollupService(db, uuid4())
+        rebuilt = await service.rebuild_range(date(2026, 1, 1), date(2026, 1, 10), chunk_days=4)
+        assert rebuilt == 10
+        # lock + upsert per chunk (4 + 4 + 2 days)
+        assert db.execute.await_count == 6
+
+    async def test_refresh_days_empty_is_noop(self):
+        db = AsyncMock()
+        assert await FinanceKpiRollupService(db, uuid4()).refresh_days([]) == 0
+        db.execute.assert_not_awaited()
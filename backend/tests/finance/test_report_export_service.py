@@ -0,0 +1,114 @@
+"""
+Unit tests for the streaming finance report exporter.
+
+The DB cursor is faked with batches of rows; the produced workbook / HTML
+is read back to check content, footer totals and chunked delivery.
+"""
+import pytest
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from uuid import uuid4
+
+from backend.modules.finance.services.report_export_service import (
+    FinanceReportExporter,
+    iter_file_chunks,
+)
+
+
+class _FakeStreamResult:
+    def __init__(self, batches):
+        self._batches = batches
+
+    async def partitions(self):
+        for batch in self._batches:
+            yield batch
+
+
+class _FakeDb:
+    """Records the yield_per option and serves pre-made row batches"""
+
+    def __init__(self, batches):
+        self.batches = batches
+        self.statements = []
+
+    async def stream(self, stmt):
+        self.statements.append(stmt)
+        return _FakeStreamResult(self.batches)
+
+
+def _tx(code, tx_type, amount, description=""):
+    return SimpleNamespace(code=code, transaction_date=date(2026, 3, 1), type=tx_type,
+                           category="Khác", description=description, amount=Decimal(amount))
+
+
+def _exporter(batches, batch_size=2):
+    return FinanceReportExporter(_FakeDb(batches), uuid4(), date(2026, 3, 1), date(2026, 3, 31), batch_size=batch_size)
+
+
+@pytest.mark.asyncio
+class TestExcelExport:
+    async def test_transactions_rows_and_totals(self):
+        openpyxl = pytest.importorskip("openpyxl")
+        exporter = _exporter([
+            [_tx("GD1", "RECEIPT", "1000"), _tx("GD2", "PAYMENT", "300")],
+            [_tx("GD3", "RECEIPT", "500")],
+        ])
+
+        output = await exporter.write_excel("transactions")
+        ws = openpyxl.load_workbook(output).active
+        values = list(ws.iter_rows(values_only=True))
+
+        assert values[3][:6] == ("Mã GD", "Ngày", "Loại", "Danh mục", "Mô tả", "Số tiền")
+        assert [r[0] for r in values[4:7]] == ["GD1", "GD2", "GD3"]
+        assert values[5][2] == "Chi"
+        footer = {r[4]: r[5] for r in values if r and len(r) > 5 and r[4] and str(r[4]).endswith(":")}
+        assert footer == {"Tổng Thu:": 1500, "Tổng Chi:": 300, "Chênh lệch:": 1200}
+
+    async def test_uses_server_side_cursor_batches(self):
+        pytest.importorskip("openpyxl")
+        exporter = _exporter([[_tx("GD1", "RECEIPT", "1")]], batch_size=500)
+        await exporter.write_excel("transactions")
+        assert exporter.db.statements[0].get_execution_options()["yield_per"] == 500
+
+    async def test_rows_are_written_off_the_event_loop(self, monkeypatch):
+        pytest.importorskip("openpyxl")
+        import threading
+        from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+
+        threads = set()
+        append = WriteOnlyWorksheet.append
+
+        def recording_append(ws, row):
+            threads.add(threading.current_thread())
+            return append(ws, row)
+
+        monkeypatch.setattr(WriteOnlyWorksheet, "append", recording_append)
+        await _exporter([[_tx("GD1", "RECEIPT", "1"), _tx("GD2", "PAYMENT", "2")]]).write_excel("transactions")
+        assert threads - {threading.main_thread()}  # data rows came from the threadpool
+
+    async def test_receivables_footer(self):
+        openpyxl = pytest.importorskip("openpyxl")
+        order = SimpleNamespace(code="DH1", customer_name="A", customer_phone="09", event_date=None,
+                                final_amount=Decimal("900"), paid_amount=Decimal("400"), balance_amount=Decimal("500"))
+        output = await _exporter([[order, order]]).write_excel("receivables")
+        rows = list(openpyxl.load_workbook(output).active.iter_rows(values_only=True))
+        assert rows[-1][5:7] == ("Tổng công nợ:", 1000)
+
+
+@pytest.mark.asyncio
+class TestHtmlExport:
+    async def test_summary_report_and_escaping(self):
+        exporter = _exporter([[("RECEIPT", "<b>Tiệc</b>", 2, Decimal("700")), ("PAYMENT", "", 1, Decimal("200"))]])
+        html = (await exporter.write_html("summary")).read().decode("utf-8")
+
+        assert "&lt;b&gt;Tiệc&lt;/b&gt;" in html
+        assert "Tổng Thu: 700 VND" in html
+        assert "Chênh lệch: 500 VND" in html
+
+
+def test_iter_file_chunks_closes_file():
+    import io
+    buffer = io.BytesIO(b"x" * 10)
+    assert list(iter_file_chunks(buffer, chunk_size=4)) == [b"xxxx", b"xxxx", b"xx"]
+    assert buffer.closed
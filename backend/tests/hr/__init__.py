@@ -0,0 +1 @@
+"""HR module tests package"""
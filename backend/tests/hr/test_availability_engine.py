@@ -0,0 +1,188 @@
+"""
+Unit tests for the employee availability matrix (hr/services/availability_engine.py).
+
+Rows are fed straight into AvailabilityMatrix.build (no database); the
+engine test only checks that a range is loaded with three statements.
+"""
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+from backend.modules.hr.services.availability_engine import (
+    BUSY_SQL,
+    EMPLOYEES_SQL,
+    LEAVES_SQL,
+    STATUS_ASSIGNED,
+    STATUS_AVAILABLE,
+    STATUS_CONFLICT,
+    STATUS_ON_LEAVE,
+    VN_TIMEZONE,
+    AvailabilityEngine,
+    AvailabilityMatrix,
+)
+
+FIRST = date(2026, 5, 18)
+LAST = date(2026, 5, 24)
+
+
+def _employee(name):
+    return SimpleNamespace(id=uuid4(), full_name=name, role_type="WAITER", phone=None,
+                           is_fulltime=False, hourly_rate=0)
+
+
+def _leave(emp, start, end, leave_type="Phép năm"):
+    return SimpleNamespace(employee_id=emp.id, start_date=start, end_date=end, leave_type=leave_type)
+
+
+def _shift(emp, start, end=None, order_id=None, assignment_id=None):
+    return SimpleNamespace(source="HR", assignment_id=assignment_id or uuid4(), employee_id=emp.id,
+                           order_id=order_id, order_code=None, event_time=None, event_date=None,
+                           start_time=start, end_time=end, status="ASSIGNED")
+
+
+def _order_staff(emp, event_date, order_id=None, code="DH-1"):
+    return SimpleNamespace(source="ORDER", assignment_id=uuid4(), employee_id=emp.id,
+                           order_id=order_id or uuid4(), order_code=code, event_time="18:00",
+                           event_date=event_date, start_time=None, end_time=None, status="CONFIRMED")
+
+
+def _local(day, hour):
+    return datetime(day.year, day.month, day.day, hour, tzinfo=VN_TIMEZONE)
+
+
+class TestMatrix:
+    def test_statuses_per_day(self):
+        free, shift, away, clash = (_employee(n) for n in ("An", "Bình", "Chi", "Dũng"))
+        day = date(2026, 5, 20)
+        matrix = AvailabilityMatrix.build(
+            FIRST, LAST, [free, shift, away, clash],
+            [_leave(away, date(2026, 5, 19), date(2026, 5, 21)), _leave(clash, day, day)],
+            [_shift(shift, _local(day, 9), _local(day, 15)), _order_staff(clash, _local(day, 11))],
+        )
+
+        assert matrix.row(free.id) == [STATUS_AVAILABLE] * 7
+        assert matrix.status(shift.id, day) == STATUS_ASSIGNED
+        assert matrix.status(shift.id, day + timedelta(days=1)) == STATUS_AVAILABLE
+        assert matrix.row(away.id)[1:4] == [STATUS_ON_LEAVE] * 3
+        assert matrix.status(clash.id, day) == STATUS_CONFLICT
+        assert matrix.day_counts(day) == {STATUS_AVAILABLE: 1, STATUS_ASSIGNED: 1, STATUS_ON_LEAVE: 1,
+                                          STATUS_CONFLICT: 1}
+
+    def test_utc_evening_lands_on_next_local_day(self):
+        emp = _employee("An")
+        # 2026-05-20 18:00 UTC = 2026-05-21 01:00 in Vietnam
+        matrix = AvailabilityMatrix.build(FIRST, LAST, [emp], [], [
+            _order_staff(emp, datetime(2026, 5, 20, 18, 0, tzinfo=timezone.utc)),
+        ])
+        assert matrix.status(emp.id, date(2026, 5, 20)) == STATUS_AVAILABLE
+        assert matrix.status(emp.id, date(2026, 5, 21)) == STATUS_ASSIGNED
+
+    def test_double_booking_is_a_conflict_back_to_back_is_not(self):
+        double, back_to_back = _employee("An"), _employee("Bình")
+        day = date(2026, 5, 20)
+        matrix = AvailabilityMatrix.build(FIRST, LAST, [double, back_to_back], [], [
+            _shift(double, _local(day, 9), _local(day, 14)),
+            _shift(double, _local(day, 13), _local(day, 18)),
+            _shift(back_to_back, _local(day, 9), _local(day, 13)),
+            _shift(back_to_back, _local(day, 13), _local(day, 18)),
+        ])
+        assert matrix.status(double.id, day) == STATUS_CONFLICT
+        assert matrix.status(back_to_back.id, day) == STATUS_ASSIGNED
+
+    def test_order_staffing_shadowed_by_hr_shift_of_same_order(self):
+        emp = _employee("An")
+        order_id = uuid4()
+        day = date(2026, 5, 20)
+        matrix = AvailabilityMatrix.build(FIRST, LAST, [emp], [], [
+            _order_staff(emp, _local(day, 11), order_id=order_id),
+            _shift(emp, _local(day, 9), _local(day, 14), order_id=order_id),
+        ])
+        busy = matrix.employees[emp.id].busy
+        assert [b.source for b in busy] == ["HR"]
+        assert matrix.status(emp.id, day) == STATUS_ASSIGNED
+        # Afternoon is free: the HR shift carries the real times
+        assert matrix.is_available(emp.id, _local(day, 15), _local(day, 20))
+
+
+class TestConflicts:
+    def test_time_window_leave_and_exclusion(self):
+        emp = _employee("An")
+        day = date(2026, 5, 20)
+        assignment_id = uuid4()
+        matrix = AvailabilityMatrix.build(FIRST, LAST, [emp], [_leave(emp, date(2026, 5, 22), date(2026, 5, 22))], [
+            _shift(emp, _local(day, 9), _local(day, 14), assignment_id=assignment_id),
+        ])
+
+        busy, leaves = matrix.conflicts(emp.id, _local(day, 13), _local(day, 16))
+        assert [b.assignment_id for b in busy] == [assignment_id] and leaves == []
+        assert matrix.conflicts(emp.id, _local(day, 13), _local(day, 16), exclude_assignment_id=assignment_id) == ([], [])
+        assert matrix.is_available(emp.id, _local(day, 14), _local(day, 18))
+
+        busy, leaves = matrix.conflicts(emp.id, _local(date(2026, 5, 22), 8), _local(date(2026, 5, 22), 10))
+        assert busy == [] and [leave.leave_type for leave in leaves] == ["Phép năm"]
+
+    def test_available_lists_only_free_employees(self):
+        free, busy = _employee("An"), _employee("Bình")
+        day = date(2026, 5, 20)
+        matrix = AvailabilityMatrix.build(FIRST, LAST, [free, busy], [], [_order_staff(busy, _local(day, 11))])
+        assert [e.employee_id for e in matrix.available(_local(day, 8), _local(day, 10))] == [free.id]
+
+    def test_naive_window_is_local_time(self):
+        emp = _employee("An")
+        day = date(2026, 5, 20)
+        matrix = AvailabilityMatrix.build(FIRST, LAST, [emp], [], [_shift(emp, _local(day, 9), _local(day, 14))])
+        # Naive query parameters (e.g. ?start_time=2026-05-20T13:00) must not raise TypeError
+        busy, _ = matrix.conflicts(emp.id, datetime(2026, 5, 20, 13), datetime(2026, 5, 20, 16))
+        assert len(busy) == 1
+        assert matrix.is_available(emp.id, datetime(2026, 5, 20, 14), datetime(2026, 5, 20, 18))
+        assert matrix.employees[emp.id].busy_between(datetime(2026, 5, 20, 8), datetime(2026, 5, 20, 10)) == busy
+        assert matrix.available(datetime(2026, 5, 20, 10), datetime(2026, 5, 20, 11)) == []
+
+    def test_shift_without_end_runs_to_end_of_day(self):
+        emp = _employee("An")
+        day = date(2026, 5, 20)
+        matrix = AvailabilityMatrix.build(FIRST, LAST, [emp], [], [_shift(emp, _local(day, 17))])
+        assert not matrix.is_available(emp.id, _local(day, 22), _local(day, 23))
+        assert matrix.status(emp.id, day + timedelta(days=1)) == STATUS_AVAILABLE
+
+
+class TestEngine:
+    @pytest.mark.asyncio
+    async def test_range_loaded_with_three_statements(self):
+        result = MagicMock()
+        result.fetchall.return_value = []
+        db = SimpleNamespace(execute=AsyncMock(return_value=result))
+
+        matrix = await AvailabilityEngine(db, uuid4()).load(FIRST, LAST, role_type="CHEF")
+
+        assert [call.args[0] for call in db.execute.await_args_list] == [EMPLOYEES_SQL, LEAVES_SQL, BUSY_SQL]
+        params = db.execute.await_args_list[2].args[1]
+        assert params["range_start"] == datetime(2026, 5, 18, tzinfo=VN_TIMEZONE)
+        assert params["range_end"] == datetime(2026, 5, 25, tzinfo=VN_TIMEZONE)
+        assert db.execute.await_args_list[0].args[1]["role_type"] == "CHEF"
+        assert len(matrix.days) == 7
+
+    @pytest.mark.asyncio
+    async def test_range_is_bounded(self):
+        with pytest.raises(ValueError):
+            await AvailabilityEngine(None, uuid4()).load(FIRST, FIRST + timedelta(days=400))
+        with pytest.raises(ValueError):
+            await AvailabilityEngine(None, uuid4()).load(LAST, FIRST)
+
+    @pytest.mark.asyncio
+    async def test_time_windows_are_not_bounded(self):
+        result = MagicMock()
+        result.fetchall.return_value = []
+        db = SimpleNamespace(execute=AsyncMock(return_value=result))
+
+        matrix = await AvailabilityEngine(db, uuid4()).load_window(datetime(2026, 1, 1), datetime(2026, 6, 1))
+
+        assert (matrix.first_day, matrix.last_day) == (date(2026, 1, 1), date(2026, 5, 31))
+
+    def test_busy_statuses(self):
+        # Same filters as the pre-matrix conflict check and availability calendar
+        sql = " ".join(BUSY_SQL.text.split())
+        assert "sa.status IN ('ASSIGNED', 'CONFIRMED')" in sql
+        assert "o.status IN ('PENDING', 'CONFIRMED', 'IN_PROGRESS')" in sql
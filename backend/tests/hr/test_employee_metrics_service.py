@@ -0,0 +1,146 @@
+"""
+Unit tests for the employee daily metrics store.
+
+Covers dirty-key tracking from timesheet / assignment changes, the
+commit-time refresh (including failure isolation) and the metrics mapping.
+"""
+import pytest
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+# Register related mappers so model instances can be constructed
+import backend.modules.inventory.domain.models  # noqa: F401
+from backend.modules.hr.domain.models import StaffAssignmentModel, TimesheetModel
+from backend.modules.hr.services.employee_metrics_service import (
+    EmployeeMetricsService,
+    REBUILD_RANGE_SQL,
+    REFRESH_KEYS_SQL,
+    _DIRTY_KEY,
+    _affected_keys,
+    _collect_dirty_employee_days,
+    _metrics_refresh,
+    mark_employee_days_dirty,
+    performance_metrics,
+)
+
+
+def _fake_session(new=(), dirty=(), deleted=()):
+    return SimpleNamespace(info={}, new=list(new), dirty=list(dirty), deleted=list(deleted))
+
+
+class TestAffectedKeys:
+    def test_timesheet_buckets_on_work_date(self):
+        employee_id = uuid4()
+        ts = TimesheetModel(tenant_id=uuid4(), employee_id=employee_id, work_date=date(2026, 5, 20), status="PENDING")
+        assert _affected_keys(ts, True) == {(employee_id, date(2026, 5, 20))}
+
+    def test_new_assignment_buckets_today(self):
+        employee_id = uuid4()
+        sa = StaffAssignmentModel(tenant_id=uuid4(), employee_id=employee_id, status="ASSIGNED")
+        assert _affected_keys(sa, True) == {(employee_id, datetime.now(timezone.utc).date())}
+
+    def test_assignment_without_employee_has_no_key(self):
+        sa = StaffAssignmentModel(tenant_id=uuid4(), status="ASSIGNED",
+                                  created_at=datetime(2026, 5, 1, tzinfo=timezone.utc))
+        assert _affected_keys(sa, True) == set()
+
+
+class TestDirtyTracking:
+    def test_collect_groups_by_tenant_and_employee(self):
+        t1, t2, e1, e2 = uuid4(), uuid4(), uuid4(), uuid4()
+        session = _fake_session(new=[
+            TimesheetModel(tenant_id=t1, employee_id=e1, work_date=date(2026, 1, 5)),
+            StaffAssignmentModel(tenant_id=t2, employee_id=e2, status="COMPLETED",
+                                 created_at=datetime(2026, 1, 6, 23, 0, tzinfo=timezone.utc)),
+            SimpleNamespace(tenant_id=t1),
+        ])
+        _collect_dirty_employee_days(session, None)
+        assert session.info[_DIRTY_KEY] == {(str(t1), str(e1), date(2026, 1, 5)), (str(t2), str(e2), date(2026, 1, 6))}
+
+    def test_mark_days_dirty_accepts_datetimes(self):
+        session = _fake_session()
+        tenant_id, employee_id = uuid4(), uuid4()
+        mark_employee_days_dirty(session, tenant_id, [(employee_id, datetime(2026, 2, 1, 10)), (employee_id, None)])
+        assert session.info[_DIRTY_KEY] == {(str(tenant_id), str(employee_id), date(2026, 2, 1))}
+
+
+class TestCommitRefresh:
+    def test_refresh_runs_once_per_tenant_with_paired_arrays(self):
+        tenant_id, e1, e2 = str(uuid4()), str(uuid4()), str(uuid4())
+        session = MagicMock()
+        session.info = {_DIRTY_KEY: {(tenant_id, e2, date(2026, 1, 3)), (tenant_id, e1, date(2026, 1, 1))}}
+
+        _metrics_refresh.apply(session)
+
+        session.flush.assert_called_once()
+        params = session.execute.call_args_list[-1].args[1]
+        assert list(zip(params["employee_ids"], params["days"])) == sorted([(e1, date(2026, 1, 1)), (e2, date(2026, 1, 3))])
+        assert _DIRTY_KEY not in session.info
+
+    def test_refresh_failure_does_not_break_commit(self):
+        session = MagicMock()
+        session.info = {_DIRTY_KEY: {(str(uuid4()), str(uuid4()), date(2026, 1, 1))}}
+        session.execute.side_effect = RuntimeError("relation hr_employee_daily_metrics does not exist")
+
+        _metrics_refresh.apply(session)  # must not raise
+
+    def test_assignments_bucket_on_utc_days(self):
+        sql = " ".join(REFRESH_KEYS_SQL.text.split())
+        assert "k.day::timestamp AT TIME ZONE 'UTC' AS day_start" in sql
+        assert "s.created_at >= b.day_start AND s.created_at < b.day_end" in sql
+        assert "s.created_at >= k.day" not in sql
+        assert "CAST(s.created_at AT TIME ZONE 'UTC' AS date)" in REBUILD_RANGE_SQL.text
+
+
+class TestPerformanceMetrics:
+    def test_on_time_rate_from_checkins(self):
+        row = SimpleNamespace(timesheets=10, approved_timesheets=6, approved_hours=Decimal("52.25"),
+                              approved_overtime_hours=Decimal("4"), checked_in=8, late_checkins=2,
+                              assignments=4, completed_assignments=3)
+        metrics = performance_metrics(row)
+        assert metrics["total_hours"] == 52.2
+        assert metrics["on_time_rate"] == 75.0
+        assert metrics["completion_rate"] == 75.0
+        assert metrics["late_checkins"] == 2
+
+    def test_falls_back_to_approval_rate_without_checkins(self):
+        row = SimpleNamespace(timesheets=4, approved_timesheets=3, approved_hours=0, approved_overtime_hours=0,
+                              checked_in=0, late_checkins=0, assignments=0, completed_assignments=0)
+        assert performance_metrics(row)["on_time_rate"] == 75.0
+
+    def test_no_activity(self):
+        metrics = performance_metrics(None)
+        assert metrics["total_timesheets"] == 0 and metrics["completion_rate"] == 0
+
+
+@pytest.mark.asyncio
+class TestService:
+    async def test_employee_metrics_is_one_query(self):
+        db = AsyncMock()
+        result = MagicMock()
+        result.one.return_value = SimpleNamespace(timesheets=2, approved_timesheets=2, approved_hours=16,
+                                                  approved_overtime_hours=1, checked_in=2, late_checkins=0,
+                                                  assignments=1, completed_assignments=1)
+        db.execute.return_value = result
+
+        metrics = await EmployeeMetricsService(db, uuid4()).employee_metrics(uuid4(), date(2026, 5, 1))
+
+        db.execute.assert_awaited_once()
+        assert metrics["total_hours"] == 16.0 and metrics["on_time_rate"] == 100.0
+
+    async def test_rebuild_range_chunks_days(self):
+        db = AsyncMock()
+        rebuilt = await EmployeeMetricsService(db, uuid4()).rebuild_range(date(2026, 1, 1), date(2026, 1, 10), chunk_days=4)
+        assert rebuilt == 10
+        # lock + rebuild per chunk (4 + 4 + 2 days)
+        assert db.execute.await_count == 6
+        assert db.execute.await_args.args[0] is REBUILD_RANGE_SQL
+        assert db.execute.await_args.args[1]["start_date"] == date(2026, 1, 9)
+
+    async def test_refresh_keys_empty_is_noop(self):
+        db = AsyncMock()
+        assert await EmployeeMetricsService(db, uuid4()).refresh_keys([]) == 0
+        db.execute.assert_not_awaited()
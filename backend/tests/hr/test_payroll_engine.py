@@ -0,0 +1,165 @@
+"""
+Unit tests for the set-based payroll engine.
+
+Covers hour bucketing (regular/OT/weekend/holiday/night), pay computation
+with tenant defaults vs employee overrides, and period totals.
+"""
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from uuid import uuid4
+
+from backend.modules.hr.services.payroll_engine import (
+    HourBuckets,
+    PayrollRates,
+    bucket_timesheet_hours,
+    build_payroll_items,
+    compute_payroll_item,
+    night_hours_for,
+)
+
+
+def _settings(**overrides):
+    values = dict(
+        default_base_salary=Decimal("8000000"),
+        standard_working_days_per_month=26,
+        standard_hours_per_day=8,
+        multiplier_overtime=Decimal("1.50"),
+        multiplier_weekend=Decimal("2.00"),
+        multiplier_holiday=Decimal("3.00"),
+        multiplier_night=Decimal("0.30"),
+        default_allowance_meal=Decimal("500000"),
+        default_allowance_transport=Decimal("300000"),
+        default_allowance_phone=Decimal("200000"),
+        rate_social_insurance=Decimal("0.08"),
+        rate_health_insurance=Decimal("0.015"),
+        rate_unemployment=Decimal("0.01"),
+        rate_employer_social=Decimal("0.175"),
+        rate_employer_health=Decimal("0.03"),
+        rate_employer_unemployment=Decimal("0.01"),
+        rate_union_fee=Decimal("0.02"),
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _employee(**overrides):
+    values = dict(
+        id=uuid4(), is_fulltime=False, hourly_rate=Decimal("50000"), base_salary=Decimal(0),
+        allowance_meal=None, allowance_transport=None, allowance_phone=None, allowance_other=None,
+        insurance_salary_base=None, rate_social_override=None, rate_health_override=None,
+        rate_unemployment_override=None,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+class TestBucketTimesheetHours:
+    """Hours are split by pay type in one pass over all employees' rows"""
+
+    def test_weekday_splits_regular_and_overtime(self):
+        emp_id = uuid4()
+        rows = [(emp_id, date(2026, 3, 2), Decimal("10"), Decimal("2"), None, None)]  # Monday
+
+        buckets = bucket_timesheet_hours(rows, holidays=set())
+
+        assert buckets[emp_id].regular == Decimal("8")
+        assert buckets[emp_id].overtime == Decimal("2")
+
+    def test_weekend_and_holiday_take_all_hours(self):
+        emp_id = uuid4()
+        rows = [
+            (emp_id, date(2026, 3, 7), Decimal("6"), Decimal("1"), None, None),   # Saturday
+            (emp_id, date(2026, 4, 30), Decimal("5"), Decimal("0"), None, None),  # Holiday (Thursday)
+        ]
+
+        buckets = bucket_timesheet_hours(rows, holidays={date(2026, 4, 30)})
+
+        assert buckets[emp_id].weekend == Decimal("6")
+        assert buckets[emp_id].holiday == Decimal("5")
+        assert buckets[emp_id].regular == 0
+        assert buckets[emp_id].overtime == 0
+
+    def test_groups_rows_per_employee_and_counts_distinct_days(self):
+        a, b = uuid4(), uuid4()
+        rows = [
+            (a, date(2026, 3, 2), Decimal("4"), None, None, None),
+            (a, date(2026, 3, 2), Decimal("4"), None, None, None),
+            (b, date(2026, 3, 3), Decimal("8"), None, None, None),
+        ]
+
+        buckets = bucket_timesheet_hours(rows, holidays=set())
+
+        assert buckets[a].regular == Decimal("8")
+        assert buckets[a].working_days == 1
+        assert buckets[b].regular == Decimal("8")
+
+    def test_night_hours_overlap_22_to_06(self):
+        start = datetime(2026, 3, 2, 20, 0, tzinfo=timezone.utc)
+        end = datetime(2026, 3, 3, 1, 30, tzinfo=timezone.utc)
+
+        assert night_hours_for(date(2026, 3, 2), start, end) == Decimal("3.5")
+        assert night_hours_for(date(2026, 3, 2), None, end) == 0
+
+
+class TestComputePayrollItem:
+    """Pay, deductions and employer contributions per employee"""
+
+    def test_parttime_has_no_allowances_or_insurance(self):
+        rates = PayrollRates.from_settings(_settings())
+        emp = _employee()
+        hours = HourBuckets(regular=Decimal("10"), overtime=Decimal("2"))
+
+        item = compute_payroll_item(emp, hours, rates)
+
+        assert item["regular_pay"] == Decimal("500000")
+        assert item["overtime_pay"] == Decimal("150000")
+        assert item["deduction_social_ins"] == 0
+        assert item["employer_total"] == 0
+        assert item["net_salary"] == Decimal("650000")
+        assert item["base_salary"] == 0
+
+    def test_fulltime_uses_tenant_defaults_and_advance(self):
+        rates = PayrollRates.from_settings(_settings())
+        emp = _employee(is_fulltime=True, hourly_rate=Decimal(0), base_salary=Decimal("8320000"),
+                        insurance_salary_base=Decimal("5000000"))
+
+        item = compute_payroll_item(emp, HourBuckets(regular=Decimal("8")), rates, Decimal("100000"))
+
+        assert item["hourly_rate"] == Decimal("40000")  # 8,320,000 / 26 / 8
+        assert item["allowance_meal"] == Decimal("500000")
+        assert item["deduction_social_ins"] == Decimal("400000.00")
+        assert item["deduction_advance"] == Decimal("100000")
+        assert item["_gross"] == Decimal("320000") + Decimal("1000000")
+        # social 8% + health 1.5% + unemployment 1% of 5,000,000 + advance
+        assert item["_deductions"] == Decimal("625000.000")
+        assert item["employer_total"] == Decimal("5000000") * Decimal("0.235")
+
+    def test_employee_override_wins_over_tenant_default(self):
+        rates = PayrollRates.from_settings(_settings())
+        emp = _employee(is_fulltime=True, allowance_meal=Decimal(0), rate_social_override=Decimal(0),
+                        insurance_salary_base=Decimal("1000000"))
+
+        item = compute_payroll_item(emp, HourBuckets(), rates)
+
+        assert item["allowance_meal"] == 0
+        assert item["deduction_social_ins"] == 0
+
+
+class TestBuildPayrollItems:
+    """Bulk insert payloads and period totals"""
+
+    def test_every_active_employee_gets_an_item(self):
+        rates = PayrollRates.from_settings(_settings())
+        worked, idle = _employee(), _employee()
+        tenant_id, period_id = uuid4(), uuid4()
+        hours = {worked.id: HourBuckets(regular=Decimal("2"))}
+
+        rows, result = build_payroll_items([worked, idle], hours, rates, {}, tenant_id, period_id)
+
+        assert result.items_created == 2
+        assert result.total_net == Decimal("100000")
+        assert all(r["tenant_id"] == tenant_id and r["period_id"] == period_id for r in rows)
+        assert all("_gross" not in r and "_deductions" not in r for r in rows)
+        # Identical key sets let SQLAlchemy batch them into multi-row INSERTs
+        assert len({frozenset(r) for r in rows}) == 1
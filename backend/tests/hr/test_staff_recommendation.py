@@ -0,0 +1,136 @@
+"""
+Unit tests for the staff recommendation engine (suggest-staff).
+
+Covers the half-open event-day window, the busy / on-leave sets taken from
+the availability matrix, the statement parameters and the row mapping.
+Ranking itself runs in SQL.
+"""
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+from backend.modules.hr.services.staff_recommendation import (
+    CONFLICT_REASON,
+    LEAVE_REASON,
+    RECOMMEND_STAFF_SQL,
+    VN_TIMEZONE,
+    StaffRecommendationEngine,
+    event_day_window,
+)
+from backend.modules.hr.services.availability_engine import AvailabilityMatrix
+
+
+class TestEventDayWindow:
+    def test_utc_evening_belongs_to_next_local_day(self):
+        # 2026-05-20 18:00 UTC = 2026-05-21 01:00 in Vietnam
+        day, start, end = event_day_window(datetime(2026, 5, 20, 18, 0, tzinfo=timezone.utc))
+        assert day == date(2026, 5, 21)
+        assert start == datetime(2026, 5, 21, tzinfo=VN_TIMEZONE)
+        assert end - start == timedelta(days=1)
+
+    def test_naive_datetime_is_local(self):
+        day, start, _ = event_day_window(datetime(2026, 5, 20, 23, 30))
+        assert day == date(2026, 5, 20)
+        assert start.utcoffset() == timedelta(hours=7)
+
+    def test_plain_date_and_none(self):
+        assert event_day_window(date(2026, 1, 1))[0] == date(2026, 1, 1)
+        assert event_day_window(None) == (None, None, None)
+
+
+def _employee(name, role="WAITER"):
+    return SimpleNamespace(id=uuid4(), full_name=name, role_type=role, phone="0901",
+                           is_fulltime=True, hourly_rate=Decimal("45000"))
+
+
+def _row(**kw):
+    base = dict(id=uuid4(), full_name="Nguyễn Văn A", role_type="WAITER", phone="0901", is_fulltime=True,
+                hourly_rate=Decimal("45000"), workload=0, has_conflict=False, on_leave=False,
+                is_available=True, score=85, total_available=2, roles=["WAITER", "CHEF"])
+    base.update(kw)
+    return SimpleNamespace(**base)
+
+
+def _db(rows=()):
+    result = MagicMock()
+    result.fetchall.return_value = list(rows)
+    return SimpleNamespace(execute=AsyncMock(return_value=result))
+
+
+DAY = date(2026, 5, 20)
+
+
+class TestRecommend:
+    @pytest.mark.asyncio
+    async def test_single_ranking_statement(self):
+        db = _db()
+        order_id = uuid4()
+        now = datetime(2026, 5, 1, tzinfo=timezone.utc)
+        matrix = AvailabilityMatrix.build(DAY, DAY, [], [], [])
+
+        out = await StaffRecommendationEngine(db, uuid4()).recommend(
+            order_id, datetime(2026, 5, 20, 4, 0, tzinfo=timezone.utc), role_filter="CHEF", limit=5,
+            now=now, matrix=matrix)
+
+        assert db.execute.await_count == 1
+        sql, params = db.execute.await_args.args
+        assert sql is RECOMMEND_STAFF_SQL
+        assert params["order_id"] == str(order_id)
+        assert params["workload_since"] == now - timedelta(days=7)
+        assert params["role_filter"] == "CHEF" and params["limit"] == 5
+        assert params["busy_ids"] == [] and params["leave_ids"] == []
+        assert out.suggestions == [] and out.total_available == 0
+
+    def test_sql_ranks_and_limits(self):
+        assert "date(" not in RECOMMEND_STAFF_SQL.text.lower()
+        assert "ORDER BY s.is_available DESC, s.score DESC" in RECOMMEND_STAFF_SQL.text
+        assert "LIMIT :limit" in RECOMMEND_STAFF_SQL.text
+
+    @pytest.mark.asyncio
+    async def test_busy_and_leave_come_from_the_matrix(self):
+        free, busy, away = _employee("An"), _employee("Bình"), _employee("Chi", role="CHEF")
+        order_id, other_order = uuid4(), uuid4()
+        event_date = datetime(2026, 5, 20, 4, 0, tzinfo=timezone.utc)
+        busy_rows = [
+            SimpleNamespace(source="ORDER", assignment_id=uuid4(), employee_id=busy.id, order_id=other_order,
+                            order_code="DH-9", event_time="18:00", event_date=event_date,
+                            start_time=None, end_time=None, status="CONFIRMED"),
+            # Staffing of this order itself is not a conflict
+            SimpleNamespace(source="ORDER", assignment_id=uuid4(), employee_id=free.id, order_id=order_id,
+                            order_code="DH-1", event_time="11:00", event_date=event_date,
+                            start_time=None, end_time=None, status="CONFIRMED"),
+        ]
+        leaves = [SimpleNamespace(employee_id=away.id, start_date=DAY, end_date=DAY, leave_type="Phép năm")]
+        matrix = AvailabilityMatrix.build(DAY, DAY, [free, busy, away], leaves, busy_rows)
+        db = _db()
+
+        await StaffRecommendationEngine(db, uuid4()).recommend(order_id, event_date, matrix=matrix)
+
+        params = db.execute.await_args.args[1]
+        assert params["busy_ids"] == [busy.id]
+        assert params["leave_ids"] == [away.id]
+
+    @pytest.mark.asyncio
+    async def test_without_event_date_nothing_is_loaded(self):
+        db = _db()
+        await StaffRecommendationEngine(db, uuid4()).recommend(uuid4(), None)
+        [call] = db.execute.await_args_list
+        assert call.args[0] is RECOMMEND_STAFF_SQL and call.args[1]["busy_ids"] == []
+
+    @pytest.mark.asyncio
+    async def test_rows_are_mapped_in_sql_order(self):
+        first = _row(score=85)
+        second = _row(full_name="Trần B", score=40, is_available=False, has_conflict=True)
+        third = _row(full_name="Lê C", score=35, is_available=False, on_leave=True)
+        matrix = AvailabilityMatrix.build(DAY, DAY, [], [], [])
+
+        out = await StaffRecommendationEngine(_db([first, second, third]), uuid4()).recommend(
+            uuid4(), DAY, matrix=matrix)
+
+        assert [s.employee_id for s in out.suggestions] == [first.id, second.id, third.id]
+        assert out.total_available == 2
+        assert out.roles == ["CHEF", "WAITER"]
+        assert [s.conflict_reason for s in out.suggestions] == [None, CONFLICT_REASON, LEAVE_REASON]
@@ -0,0 +1 @@
+"""Menu module tests package"""
@@ -0,0 +1,159 @@
+"""
+Unit tests for the recipe costing engine (menu/domain/recipe_costing.py).
+"""
+import pytest
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+# Register related mappers so model instances can be constructed
+import backend.modules.inventory.domain.models  # noqa: F401
+from backend.modules.menu.domain.models import RecipeModel
+from backend.modules.menu.domain.recipe_costing import (
+    POPULARITY_PRICE, POPULARITY_SALES, QUADRANT_DOG, QUADRANT_PUZZLE, QUADRANT_STAR, QUADRANT_WORKHORSE, RECIPE_GRAPH_SQL,
+    RecipeCostingService, RecipeGraph, RecipeGraphCache, _invalidate_on_recipe_write, menu_engineering,
+    recipe_cost_cache,
+)
+
+FOOD = "FOOD"
+
+
+def _rows(item_id, name, selling_price, lines=(), item_type=FOOD, is_active=True, category="Món chính"):
+    """RECIPE_GRAPH_SQL rows for one menu item; lines are (quantity_per_unit, unit_cost)."""
+    base = dict(
+        id=item_id, name=name, category_id=uuid4() if category else None, category_name=category,
+        item_type=item_type if category else None, is_active=is_active, selling_price=Decimal(selling_price),
+    )
+    if not lines:
+        return [SimpleNamespace(**base, ingredient_id=None, ingredient_name=None, quantity_per_unit=None,
+                                uom=None, unit_cost=None)]
+    return [
+        SimpleNamespace(**base, ingredient_id=uuid4(), ingredient_name=f"NL {n}",
+                        quantity_per_unit=Decimal(qty), uom="kg", unit_cost=None if cost is None else Decimal(cost))
+        for n, (qty, cost) in enumerate(lines)
+    ]
+
+
+class TestRecipeGraph:
+    def test_food_cost_summed_once_per_item(self):
+        beef = uuid4()
+        graph = RecipeGraph.from_rows(_rows(beef, "Bò lúc lắc", 200000, [("0.3", 250000), ("0.1", 20000), ("1", None)]))
+
+        item = graph.get(beef)
+        assert item.food_cost == Decimal("77000.0")
+        assert len(item.recipe) == 3 and item.recipe[2].unit_cost == 0
+        assert item.food_cost_pct == pytest.approx(38.5)
+        assert item.profit_margin == 123000
+
+    def test_item_without_recipe_costs_nothing(self):
+        soup = uuid4()
+        item = RecipeGraph.from_rows(_rows(soup, "Súp", 50000)).get(soup)
+        assert item.recipe == [] and item.food_cost == 0 and item.food_cost_pct == 0
+
+
+class TestMenuEngineering:
+    def _graph(self):
+        self.ids = {name: uuid4() for name in ("star", "puzzle", "workhorse", "dog")}
+        rows = (
+            _rows(self.ids["star"], "A", 100, [("1", 20)])
+            + _rows(self.ids["puzzle"], "B", 100, [("1", 25)])
+            + _rows(self.ids["workhorse"], "C", 100, [("1", 60)])
+            + _rows(self.ids["dog"], "D", 100, [("1", 70)])
+            + _rows(uuid4(), "Bàn ghế", 100, [("1", 90)], item_type="SERVICE")
+            + _rows(uuid4(), "Ngưng bán", 100, [("1", 90)], is_active=False)
+        )
+        return RecipeGraph.from_rows(rows)
+
+    def test_sales_drive_popularity(self):
+        graph = self._graph()
+        sold = {self.ids["star"]: 40, self.ids["puzzle"]: 5, self.ids["workhorse"]: 50, self.ids["dog"]: 1}
+        result = menu_engineering(graph, sold)
+
+        assert result["popularity_basis"] == POPULARITY_SALES
+        assert result["total_items"] == 4  # SERVICE and inactive items excluded
+        quadrant = {d["id"]: d["quadrant"] for d in result["items"]}
+        assert quadrant == {
+            str(self.ids["star"]): QUADRANT_STAR, str(self.ids["puzzle"]): QUADRANT_PUZZLE,
+            str(self.ids["workhorse"]): QUADRANT_WORKHORSE, str(self.ids["dog"]): QUADRANT_DOG,
+        }
+        assert result["quadrants"] == {"star": 1, "puzzle": 1, "workhorse": 1, "dog": 1}
+        assert result["avg_food_cost"] == 43.8
+
+    def test_without_sales_falls_back_to_price_proxy(self):
+        cheap, pricey = uuid4(), uuid4()
+        graph = RecipeGraph.from_rows(
+            _rows(cheap, "Rẻ", 100, [("1", 10)], category=None) + _rows(pricey, "Đắt", 300, [("1", 150)])
+        )
+        result = menu_engineering(graph, {})
+        assert result["popularity_basis"] == POPULARITY_PRICE
+        by_name = {d["name"]: d for d in result["items"]}
+        assert by_name["Rẻ"]["category_name"] == "Chưa phân loại"
+        assert by_name["Rẻ"]["quadrant"] == QUADRANT_PUZZLE
+        assert by_name["Đắt"]["quadrant"] == QUADRANT_WORKHORSE
+
+    def test_empty_menu(self):
+        result = menu_engineering(RecipeGraph([]), {})
+        assert result["items"] == [] and result["quadrants"] == {"star": 0, "puzzle": 0, "workhorse": 0, "dog": 0}
+
+
+class TestService:
+    @pytest.mark.asyncio
+    async def test_graph_built_with_one_query_and_cached(self):
+        item_id = uuid4()
+        db = MagicMock()
+        db.execute = AsyncMock(return_value=MagicMock(fetchall=MagicMock(
+            return_value=_rows(item_id, "Gà", 150000, [("0.5", 100000)])
+        )))
+        cache = RecipeGraphCache(ttl=60)
+        service = RecipeCostingService(db, uuid4(), cache=cache)
+
+        assert (await service.item_cost(item_id)).food_cost == 50000
+        assert await service.item_cost(uuid4()) is None
+        assert db.execute.await_count == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_recipe_write_invalidates_tenant(self):
+        tenant = uuid4()
+        recipe_cost_cache.put(tenant, RecipeGraph([]))
+        _invalidate_on_recipe_write(None, None, RecipeModel(tenant_id=tenant))
+        assert recipe_cost_cache.get(tenant) is None
+
+
+@pytest.mark.asyncio
+async def test_cost_endpoints_use_the_request_tenant(monkeypatch):
+    """The caller's tenant, the same key InventoryService invalidates on."""
+    from fastapi import HTTPException
+    from backend.modules.menu.infrastructure import http_router
+
+    tenant = uuid4()
+    tenants = []
+
+    def fake_service(db, tenant_id):
+        tenants.append(tenant_id)
+        return SimpleNamespace(item_cost=AsyncMock(return_value=None), menu_engineering=AsyncMock(return_value={}))
+
+    monkeypatch.setattr(http_router, "get_recipe_costing_service", fake_service)
+    with pytest.raises(HTTPException):
+        await http_router.calculate_food_cost(uuid4(), tenant_id=tenant, db=MagicMock())
+    await http_router.menu_engineering_analysis(days=30, tenant_id=tenant, db=MagicMock())
+    assert tenants == [tenant, tenant]
+
+
+@pytest.mark.asyncio
+async def test_inventory_invalidation_clears_the_service_graph():
+    tenant = uuid4()
+    db = MagicMock()
+    db.execute = AsyncMock(return_value=MagicMock(fetchall=MagicMock(return_value=[])))
+    cache = RecipeGraphCache(ttl=60)
+    await RecipeCostingService(db, tenant, cache=cache).item_cost(uuid4())
+    assert cache.get(tenant) is not None
+
+    cache.invalidate(str(tenant))
+    assert cache.get(tenant) is None
+
+
+def test_graph_joins_are_tenant_scoped():
+    sql = str(RECIPE_GRAPH_SQL)
+    assert "ii.tenant_id = mi.tenant_id" in sql
+    assert "r.tenant_id = mi.tenant_id" in sql
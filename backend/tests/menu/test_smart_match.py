@@ -0,0 +1,116 @@
+"""
+Unit tests for menu smart-match (in-memory index and batched SQL path).
+"""
+import pytest
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+# Register related mappers so model instances can be constructed
+import backend.modules.inventory.domain.models  # noqa: F401
+from backend.modules.menu.domain.models import MenuItemModel
+from backend.modules.menu.domain.smart_match import (
+    MATCH_EXACT, MATCH_FUZZY, MATCH_NONE, MATCH_UNACCENT,
+    MenuMatchEntry, MenuMatchIndex, MenuMatchIndexCache, SmartMatchService,
+    _invalidate_on_menu_item_write, menu_match_cache, strip_diacritics, trigrams,
+)
+
+NAMES = ["Gà nướng muối ớt", "Bò lúc lắc", "Lẩu thái hải sản", "Gỏi ngó sen tôm thịt", "Chả giò"]
+
+
+def _index():
+    return MenuMatchIndex(MenuMatchEntry(uuid4(), name, Decimal(100000 + i)) for i, name in enumerate(NAMES))
+
+
+class TestNormalization:
+    def test_strip_diacritics_handles_d_stroke(self):
+        assert strip_diacritics("đùi gà nướng") == "dui ga nuong"
+        assert strip_diacritics("ĐẬU HŨ") == "DAU HU"
+
+    def test_trigrams_match_pg_trgm_padding(self):
+        assert trigrams("ga") == {"  g", " ga", "ga "}
+        assert trigrams("") == set()
+
+
+class TestIndex:
+    def test_exact_is_case_insensitive(self):
+        out = _index().match("bò LÚC lắc")
+        assert out.match_type == MATCH_EXACT
+        assert out.matches[0]["name"] == "Bò lúc lắc" and out.matches[0]["score"] == 1.0
+
+    def test_unaccent(self):
+        out = _index().match("lau thai hai san")
+        assert out.match_type == MATCH_UNACCENT
+        assert [m["name"] for m in out.matches] == ["Lẩu thái hải sản"]
+
+    def test_fuzzy_ranks_by_similarity(self):
+        out = _index().match("ga nuong muoi")
+        assert out.match_type == MATCH_FUZZY
+        assert out.matches[0]["name"] == "Gà nướng muối ớt"
+        assert 0.3 <= out.matches[0]["score"] < 1
+        assert len(out.matches) <= 3
+
+    def test_no_match(self):
+        assert _index().match("pizza margherita").match_type == MATCH_NONE
+
+    def test_match_many_keeps_order(self):
+        outcomes = _index().match_many(["Chả giò", "xyz", "goi ngo sen tom thit"])
+        assert [o.match_type for o in outcomes] == [MATCH_EXACT, MATCH_NONE, MATCH_UNACCENT]
+
+
+class TestCache:
+    def test_ttl_and_invalidate(self):
+        cache = MenuMatchIndexCache(ttl=60)
+        tenant = uuid4()
+        index = _index()
+        cache.put(tenant, index)
+        assert cache.get(str(tenant)) is index
+        cache.invalidate(tenant)
+        assert cache.get(tenant) is None
+
+    def test_disabled_with_zero_ttl(self):
+        cache = MenuMatchIndexCache(ttl=0)
+        cache.put("t", _index())
+        assert cache.get("t") is None
+
+    def test_orm_write_invalidates_tenant(self):
+        tenant = uuid4()
+        menu_match_cache.put(tenant, _index())
+        _invalidate_on_menu_item_write(None, None, MenuItemModel(tenant_id=tenant, name="Món mới"))
+        assert menu_match_cache.get(tenant) is None
+
+
+class TestService:
+    @pytest.mark.asyncio
+    async def test_index_is_built_once_per_tenant(self):
+        rows = [SimpleNamespace(id=uuid4(), name=n, selling_price=Decimal(1)) for n in NAMES]
+        db = SimpleNamespace(execute=AsyncMock(return_value=rows))
+        cache = MenuMatchIndexCache(ttl=60)
+        tenant = uuid4()
+
+        first = await SmartMatchService(db, tenant, cache).match(["Chả giò"] * 60)
+        second = await SmartMatchService(db, tenant, cache).match(["bo luc lac"])
+
+        assert db.execute.await_count == 1
+        assert {o.match_type for o in first} == {MATCH_EXACT}
+        assert second[0].match_type == MATCH_UNACCENT
+
+    @pytest.mark.asyncio
+    async def test_sql_path_is_one_statement_and_keeps_best_tier(self):
+        a, b = uuid4(), uuid4()
+        rows = [
+            SimpleNamespace(ord=1, tier=1, id=a, name="Chả giò", score=1.0, selling_price=1),
+            SimpleNamespace(ord=1, tier=3, id=b, name="Chả giò chay", score=0.6, selling_price=1),
+            SimpleNamespace(ord=3, tier=3, id=b, name="Chả giò chay", score=0.45, selling_price=1),
+        ]
+        result = MagicMock()
+        result.fetchall.return_value = rows
+        db = SimpleNamespace(execute=AsyncMock(return_value=result))
+
+        outcomes = await SmartMatchService(db, uuid4()).match_sql(["Chả giò", "xyz", "cha gio chya"])
+
+        assert db.execute.await_count == 1
+        assert db.execute.await_args.args[1]["terms"] == ["Chả giò", "xyz", "cha gio chya"]
+        assert [o.match_type for o in outcomes] == [MATCH_EXACT, MATCH_NONE, MATCH_FUZZY]
+        assert [m["id"] for m in outcomes[0].matches] == [str(a)]
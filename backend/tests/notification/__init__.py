@@ -0,0 +1 @@
+"""Notification module tests package"""
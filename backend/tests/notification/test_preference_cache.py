@@ -0,0 +1,121 @@
+"""
+Tests for the notification preference cache and the batched dispatcher
+(backend/modules/notification/services/preference_cache.py, notification_service.py).
+"""
+from datetime import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import pytest
+
+from backend.modules.notification.services.notification_service import create_notifications_if_allowed
+from backend.modules.notification.services.preference_cache import (
+    PreferenceCache,
+    UserPreferences,
+    load_preferences,
+)
+
+TENANT = uuid4()
+
+
+def _settings(user_id, **overrides):
+    values = dict(user_id=user_id, channel_inapp_enabled=True, channel_email_enabled=True,
+                  channel_push_enabled=False, channel_sms_enabled=False,
+                  quiet_hours_enabled=False, quiet_hours_start=time(22, 0), quiet_hours_end=time(7, 0))
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def _pref(user_id, notification_type, channel, enabled):
+    return SimpleNamespace(user_id=user_id, notification_type=notification_type, channel=channel, is_enabled=enabled)
+
+
+def _db(settings=(), prefs=(), tenant_set=True):
+    """AsyncSession mock answering the settings query, then the preferences query."""
+    db = AsyncMock()
+    db.add_all = MagicMock()
+    db.begin_nested = MagicMock()  # savepoint around the push enqueue
+    results = []
+    for rows in (settings, prefs):
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = list(rows)
+        results.append(result)
+    db.execute.side_effect = ([MagicMock()] if tenant_set else []) + results  # SET app.current_tenant first
+    return db
+
+
+class TestUserPreferences:
+    def test_defaults_without_settings(self):
+        prefs = UserPreferences()
+        assert prefs.allows("ORDER_CREATED", "IN_APP", time(23, 0))
+        assert not prefs.allows("ORDER_STATUS_CHANGED", "EMAIL")  # registry default_email False
+        assert prefs.allows("UNKNOWN_TYPE", "IN_APP")
+
+    def test_channel_toggle(self):
+        prefs = UserPreferences.from_models(_settings(1, channel_inapp_enabled=False))
+        assert not prefs.allows("ORDER_CREATED", "IN_APP")
+
+    def test_overnight_quiet_hours_spare_critical_types(self):
+        prefs = UserPreferences.from_models(_settings(1, quiet_hours_enabled=True))
+        assert not prefs.allows("ORDER_CREATED", "IN_APP", time(23, 30))
+        assert not prefs.allows("ORDER_CREATED", "IN_APP", time(6, 59))
+        assert prefs.allows("ORDER_CREATED", "IN_APP", time(12, 0))
+        assert prefs.allows("SECURITY_ALERT", "IN_APP", time(23, 30))
+
+    def test_override_beats_registry_default(self):
+        prefs = UserPreferences.from_models(_settings(1), [_pref(1, "ORDER_CREATED", "IN_APP", False)])
+        assert not prefs.allows("ORDER_CREATED", "IN_APP", time(12, 0))
+
+
+class TestPreferenceCache:
+    def test_ttl_and_invalidation(self):
+        cache = PreferenceCache(ttl=60)
+        cache.put(TENANT, "u", UserPreferences())
+        assert cache.get(TENANT, "u") is not None
+        cache.invalidate(TENANT, "u")
+        assert cache.get(TENANT, "u") is None
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = PreferenceCache(ttl=0)
+        cache.put(TENANT, "u", UserPreferences())
+        assert cache.get(TENANT, "u") is None
+
+
+@pytest.mark.asyncio
+class TestLoadPreferences:
+    async def test_two_queries_for_any_number_of_users_then_cached(self):
+        users = [uuid4() for _ in range(80)]
+        db = _db(settings=[_settings(users[0], channel_inapp_enabled=False)],
+                 prefs=[_pref(users[1], "ORDER_CREATED", "IN_APP", False)], tenant_set=False)
+        cache = PreferenceCache(ttl=60)
+
+        loaded = await load_preferences(db, TENANT, users, cache=cache)
+        assert db.execute.await_count == 2
+        assert not loaded[users[0]].allows("ORDER_CREATED", "IN_APP")
+        assert not loaded[users[1]].allows("ORDER_CREATED", "IN_APP", time(12, 0))
+        assert loaded[users[2]].allows("ORDER_CREATED", "IN_APP")
+
+        again = await load_preferences(db, TENANT, users, cache=cache)
+        assert db.execute.await_count == 2
+        assert again == loaded
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_adds_allowed_rows_in_one_batch():
+    users = [uuid4() for _ in range(5)]
+    db = _db(settings=[_settings(users[0], quiet_hours_enabled=True)],
+             prefs=[_pref(users[1], "STAFF_ASSIGNMENT", "IN_APP", False)])
+
+    with patch("backend.modules.notification.services.preference_cache.preference_cache", PreferenceCache(ttl=60)), \
+            patch("backend.modules.notification.services.notification_service.enqueue_push",
+                  new=AsyncMock()) as push:
+        created = await create_notifications_if_allowed(
+            db, TENANT, users + [users[2]], "STAFF_ASSIGNMENT", "Phân công", "Đơn ĐH-001", now=time(23, 0),
+        )
+
+    assert db.execute.await_count == 3  # SET + settings IN + preferences IN
+    assert [n.user_id for n in created] == users[2:]
+    db.add_all.assert_called_once_with(created)
+    push.assert_awaited_once()
+    assert push.call_args.args[2] == users[2:]
@@ -0,0 +1,225 @@
+"""
+Tests for the Expo push delivery worker (backend/modules/notification/services/push_sender.py).
+
+The worker talks HTTP to a local stub of the Expo push endpoint (real
+sockets, HTTP/1.1 keep-alive); database writes go to a fake session.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from backend.core.tasks.outbox import backoff_seconds
+from backend.modules.notification.services.push_sender import (
+    DEACTIVATE_TOKENS_SQL, MARK_FAILED_SQL, MARK_SENT_SQL, PUSH_DEAD, PUSH_PENDING,
+    ClaimedPush, PushDeliveryWorker, PushMetrics, enqueue_push,
+)
+
+TENANT = uuid4()
+
+
+class _ExpoStub(BaseHTTPRequestHandler):
+    """Answers like Expo: one ticket per message, errors keyed off the token."""
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):
+        messages = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.batches.append(len(messages))
+        if self.server.fail_status:
+            return self._reply(self.server.fail_status, {"errors": [{"code": "INTERNAL"}]})
+        tickets = []
+        for message in messages:
+            token = message["to"]
+            if "gone" in token:
+                tickets.append({"status": "error", "message": "not registered",
+                                "details": {"error": "DeviceNotRegistered"}})
+            elif "busy" in token:
+                tickets.append({"status": "error", "message": "slow down",
+                                "details": {"error": "MessageRateExceeded"}})
+            else:
+                tickets.append({"status": "ok", "id": f"ticket-{token}"})
+        self._reply(200, {"data": tickets})
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def expo():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ExpoStub)
+    server.connections, server.batches, server.fail_status = 0, [], None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/--/api/v2/push/send"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class _FakeSession:
+    def __init__(self, log):
+        self.log = log
+        self.execute = AsyncMock(side_effect=self._execute)
+        self.commit = AsyncMock()
+
+    async def _execute(self, statement, params=None):
+        self.log.append((statement, params))
+        return MagicMock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _push(token, attempts=1, max_attempts=5):
+    return ClaimedPush(id=uuid4(), tenant_id=TENANT, device_token=f"ExponentPushToken[{token}]",
+                       title="Đơn hàng mới", body="ĐH-001", data={"type": "ORDER_CREATED"},
+                       attempts=attempts, max_attempts=max_attempts)
+
+
+def _worker(url, claimed, log):
+    worker = PushDeliveryWorker(session_factory=lambda: _FakeSession(log), push_url=url,
+                                worker_id="test-worker", metrics=PushMetrics())
+    worker.claim = AsyncMock(return_value=claimed)
+    return worker
+
+
+def _calls(log, statement):
+    return [params for stmt, params in log if stmt is statement]
+
+
+@pytest.mark.asyncio
+async def test_coalesces_into_expo_batches_over_one_connection(expo):
+    claimed = [_push(f"ok-{i}") for i in range(250)]
+    log = []
+    worker = _worker(expo.url, claimed, log)
+    try:
+        counts = await worker.process_batch()
+    finally:
+        await worker.aclose()
+
+    assert sorted(expo.batches) == [50, 100, 100]
+    assert expo.connections <= worker.concurrency  # pooled, not one connection per message
+    assert counts == {"claimed": 250, "SENT": 250, "PENDING": 0, "DEAD": 0}
+    [sent] = _calls(log, MARK_SENT_SQL)
+    assert sorted(sent["ticket_ids"]) == sorted(f"ticket-{p.device_token}" for p in claimed)
+    assert worker.metrics.snapshot()["tenants"][str(TENANT)]["sent"] == 250
+
+
+@pytest.mark.asyncio
+async def test_sequential_batches_reuse_the_connection(expo):
+    worker = PushDeliveryWorker(push_url=expo.url, metrics=PushMetrics())
+    try:
+        for _ in range(3):
+            await worker.send_batch([_push("ok")])
+    finally:
+        await worker.aclose()
+    assert expo.batches == [1, 1, 1]
+    assert expo.connections == 1
+
+
+@pytest.mark.asyncio
+async def test_ticket_errors(expo):
+    ok, gone, busy, exhausted = _push("ok"), _push("gone"), _push("busy", attempts=2), _push("busy-2", attempts=5)
+    log = []
+    worker = _worker(expo.url, [ok, gone, busy, exhausted], log)
+    try:
+        counts = await worker.process_batch()
+    finally:
+        await worker.aclose()
+
+    assert counts == {"claimed": 4, "SENT": 1, "PENDING": 1, "DEAD": 2}
+    failed = {}
+    for params in _calls(log, MARK_FAILED_SQL):
+        failed.setdefault((params["status"], params["delay_seconds"]), []).extend(params["ids"])
+    assert failed[(PUSH_PENDING, backoff_seconds(2))] == [busy.id]
+    assert sorted(failed[(PUSH_DEAD, 0)]) == sorted([gone.id, exhausted.id])
+
+    # DeviceNotRegistered deactivates the device under its tenant's RLS context
+    [deactivate] = _calls(log, DEACTIVATE_TOKENS_SQL)
+    assert deactivate == {"tenant_id": str(TENANT), "tokens": [gone.device_token]}
+    tenant_set = [i for i, (_, params) in enumerate(log) if params == {"tenant_id": str(TENANT)}]
+    assert tenant_set and tenant_set[0] < [stmt for stmt, _ in log].index(DEACTIVATE_TOKENS_SQL)
+
+    stats = worker.metrics.snapshot()["tenants"][str(TENANT)]
+    assert (stats["sent"], stats["retried"], stats["dead"], stats["unregistered"]) == (1, 1, 2, 1)
+
+
+@pytest.mark.asyncio
+async def test_server_errors_retry_the_whole_batch(expo):
+    expo.fail_status = 503
+    claimed = [_push(f"ok-{i}") for i in range(3)]
+    log = []
+    worker = _worker(expo.url, claimed, log)
+    try:
+        counts = await worker.process_batch()
+    finally:
+        await worker.aclose()
+    assert counts["PENDING"] == 3
+    [failed] = _calls(log, MARK_FAILED_SQL)
+    assert "503" in failed["error"]
+    assert not _calls(log, MARK_SENT_SQL)
+
+
+@pytest.mark.asyncio
+async def test_unreachable_endpoint_is_retried():
+    log = []
+    worker = _worker("http://127.0.0.1:9/push", [_push("ok")], log)
+    try:
+        counts = await worker.process_batch()
+    finally:
+        await worker.aclose()
+    assert counts["PENDING"] == 1
+
+
+@pytest.mark.asyncio
+async def test_enqueue_is_one_insert_select():
+    db = SimpleNamespace(execute=AsyncMock(return_value=SimpleNamespace(rowcount=3)))
+    users = [uuid4(), uuid4()]
+    assert await enqueue_push(db, TENANT, users + [users[0]], "Tiêu đề", "Nội dung", {"type": "X"}) == 3
+    stmt, params = db.execute.await_args.args
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "INSERT INTO push_outbox" in sql and "FROM device_registrations" in sql
+    assert params["user_ids"] == users
+
+    db.execute.reset_mock()
+    assert await enqueue_push(db, TENANT, [], "t", "b") == 0
+    db.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_is_super_admin_only(monkeypatch):
+    from fastapi import HTTPException
+    from backend.modules.notification.infrastructure import http_router
+
+    metrics = PushMetrics()
+    metrics.record(TENANT, sent=3, dead=1)
+    monkeypatch.setattr(http_router, "push_metrics", metrics)
+
+    super_admin = SimpleNamespace(role=SimpleNamespace(code="super_admin"))
+    snapshot = await http_router.push_delivery_metrics(current_user=super_admin)
+    assert snapshot["tenants"][str(TENANT)]["sent"] == 3 and snapshot["tenants"][str(TENANT)]["dead"] == 1
+
+    for user in (SimpleNamespace(role=SimpleNamespace(code="admin")), SimpleNamespace(role=None)):
+        with pytest.raises(HTTPException) as denied:
+            await http_router.push_delivery_metrics(current_user=user)
+        assert denied.value.status_code == 403
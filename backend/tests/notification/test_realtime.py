@@ -0,0 +1,109 @@
+"""
+Tests for the notification push events (backend/modules/notification/services/realtime.py).
+"""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.orm.attributes import set_committed_value
+
+from backend.core.pubsub import InProcessPubSub
+from backend.modules.hr.domain.models import NotificationModel
+from backend.modules.notification.services.realtime import (
+    EVENT_BADGES,
+    EVENT_NOTIFICATION,
+    EVENT_NOTIFICATIONS_READ,
+    BadgeMonitor,
+    _collect_realtime_events,
+    badges_stale_topic,
+    badges_topic,
+    user_topic,
+    visible_badges,
+)
+from backend.modules.quote.domain.models import QuoteModel
+
+TENANT, USER = uuid4(), uuid4()
+
+
+def _flushed(new=(), dirty=(), deleted=()):
+    session = SimpleNamespace(new=list(new), dirty=list(dirty), deleted=list(deleted), info={})
+    _collect_realtime_events(session, None)
+    return session.info.get("pubsub_pending", [])
+
+
+def _loaded(model, **values):
+    """An instance as loaded from the database (no pending changes)."""
+    obj = model()
+    for name, value in values.items():
+        set_committed_value(obj, name, value)
+    return obj
+
+
+class TestCollectEvents:
+    def test_new_notification_is_pushed_to_its_user(self):
+        notification = NotificationModel(id=uuid4(), tenant_id=TENANT, user_id=USER, title="Đơn nghỉ phép",
+                                         message="Đã duyệt", type="LEAVE_APPROVED", is_read=False)
+        [(topic, message)] = _flushed(new=[notification])
+        assert topic == user_topic(TENANT, USER)
+        assert message["type"] == EVENT_NOTIFICATION and message["unread_delta"] == 1
+        assert message["notification"]["id"] == str(notification.id)
+        assert message["notification"]["created_at"]
+
+    def test_read_flips_are_batched_per_user(self):
+        notifications = [_loaded(NotificationModel, id=uuid4(), tenant_id=TENANT, user_id=USER, is_read=False)
+                         for _ in range(3)]
+        for n in notifications[:2]:
+            n.is_read = True
+        [(topic, message)] = _flushed(dirty=notifications)
+        assert topic == user_topic(TENANT, USER)
+        assert message["type"] == EVENT_NOTIFICATIONS_READ
+        assert message["unread_delta"] == -2 and len(message["ids"]) == 2
+
+    def test_quote_writes_mark_badges_stale(self):
+        touched = _loaded(QuoteModel, id=uuid4(), tenant_id=TENANT, status="DRAFT")
+        touched.status = "APPROVED"
+        untouched = _loaded(QuoteModel, id=uuid4(), tenant_id=TENANT, status="DRAFT", notes="a")
+        untouched.notes = "b"
+        assert [topic for topic, _ in _flushed(dirty=[touched])] == [badges_stale_topic(TENANT)]
+        assert _flushed(dirty=[untouched]) == []
+
+
+def test_badges_follow_module_access():
+    sales = SimpleNamespace(role=SimpleNamespace(code="sales", permissions=[]))
+    chef = SimpleNamespace(role=SimpleNamespace(code="chef", permissions=[]))
+    assert visible_badges(sales, {"quotes_expiring": 2}) == {"quotes_expiring": 2}
+    assert visible_badges(chef, {"quotes_expiring": 2}) == {}
+
+
+@pytest.mark.asyncio
+class TestBadgeMonitor:
+    async def test_one_counter_per_tenant_and_fan_out_on_change(self):
+        pubsub = InProcessPubSub()
+        monitor = BadgeMonitor(pubsub=pubsub, refresh_seconds=60, debounce_seconds=0)
+        monitor.count = AsyncMock(side_effect=[{"quotes_expiring": 1}, {"quotes_expiring": 2}])
+        sockets = pubsub.subscribe([badges_topic(TENANT)])
+
+        assert await monitor.watch(TENANT) == {"quotes_expiring": 1}
+        assert await monitor.watch(TENANT) == {"quotes_expiring": 1}
+        monitor.count.assert_awaited_once()
+
+        pubsub.deliver(badges_stale_topic(TENANT), {"type": "badges_stale"})
+        message = await asyncio.wait_for(sockets.get(), 1)
+        assert message == {"type": EVENT_BADGES, "badges": {"quotes_expiring": 2}}
+
+        monitor.unwatch(TENANT)
+        monitor.unwatch(TENANT)
+        assert pubsub.subscriber_count(badges_stale_topic(TENANT)) == 0
+        assert monitor.counts == {}
+
+    async def test_unchanged_counts_are_not_sent(self):
+        pubsub = InProcessPubSub()
+        monitor = BadgeMonitor(pubsub=pubsub)
+        monitor.count = AsyncMock(return_value={"quotes_expiring": 0})
+        sockets = pubsub.subscribe([badges_topic(TENANT)])
+        await monitor.watch(TENANT)
+        assert await monitor.refresh(TENANT) is False
+        assert sockets.clear() == 0
+        monitor.unwatch(TENANT)
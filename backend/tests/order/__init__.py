@@ -0,0 +1 @@
+"""Order module tests package"""
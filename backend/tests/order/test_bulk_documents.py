@@ -0,0 +1,139 @@
+"""
+Tests for bulk contract / menu generation (order/application/bulk_documents.py).
+
+Orders are fed straight into the service (no database); the query test
+only checks the compiled SQL.
+"""
+import asyncio
+import io
+import zipfile
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+from docx import Document
+from sqlalchemy.dialects import postgresql
+
+from backend.modules.order.application import bulk_documents
+from backend.modules.order.application.bulk_documents import (
+    BulkDocumentService,
+    DocumentItem,
+    OrderDocumentSource,
+    contract_data_for,
+)
+
+
+def _order(code, items):
+    return OrderDocumentSource(
+        id=uuid4(), code=code, customer_name="Khách", customer_phone="0909",
+        event_date=datetime(2026, 5, 3, 4, 30, tzinfo=timezone.utc), event_time="11:30",
+        event_address="Q1", total_amount=Decimal("1000000"), final_amount=Decimal("1100000"),
+        paid_amount=Decimal("100000"), items=items,
+    )
+
+
+def _service(orders, window=2):
+    service = BulkDocumentService(db=None, tenant_id=uuid4(), window=window)
+
+    async def iter_orders(**filters):
+        for order in orders:
+            yield order
+
+    service.iter_orders = iter_orders
+    return service
+
+
+async def _collect(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+class TestContractData:
+    def test_service_lines_excluded_and_amounts_split(self):
+        order = _order("DH-1", [
+            DocumentItem("Bàn ghế", "SERVICE", 5),
+            DocumentItem("Gỏi", "Khai vị", 10),
+            DocumentItem("Lẩu", "Món chính", 10),
+        ])
+        data = contract_data_for(order, order.items)
+        assert data.dish_names == ["Gỏi", "Lẩu"]
+        assert data.table_count == 10
+        assert data.total_amount == 1_100_000
+        assert data.unit_price_per_table == 110_000
+        assert data.remaining_amount == 1_000_000
+
+
+class TestZip:
+    @pytest.mark.asyncio
+    async def test_contracts_and_menus_in_one_zip(self):
+        orders = [
+            _order("DH/1", [DocumentItem("Gỏi", "Khai vị", 10)]),
+            _order("DH-2", [DocumentItem("Lẩu", "Món chính", 8)]),
+            _order("DH-3", [DocumentItem("Nhân viên", "SERVICE", 2)]),
+        ]
+        archive = zipfile.ZipFile(io.BytesIO(await _collect(_service(orders).iter_zip())))
+
+        assert sorted(archive.namelist()) == sorted([
+            "HopDong-DH-1.docx", "ThucDon-DH-1.docx", "HopDong-DH-2.docx", "ThucDon-DH-2.docx",
+            "HopDong-DH-3.docx", "errors.txt",
+        ])
+        assert "ThucDon-DH-3.docx" in archive.read("errors.txt").decode()
+        contract = Document(io.BytesIO(archive.read("HopDong-DH-2.docx")))
+        assert "Lẩu" in [p.text for p in contract.paragraphs]
+
+    @pytest.mark.asyncio
+    async def test_duplicate_codes_get_distinct_names(self):
+        orders = [_order("DH-1", [DocumentItem("Gỏi", None, 1)]) for _ in range(2)]
+        data = await _collect(_service(orders).iter_zip(documents=["menu"]))
+        assert sorted(zipfile.ZipFile(io.BytesIO(data)).namelist()) == ["ThucDon-DH-1-2.docx", "ThucDon-DH-1.docx"]
+
+    @pytest.mark.asyncio
+    async def test_in_flight_renders_are_bounded_and_streamed(self, monkeypatch):
+        running = 0
+        peak = 0
+
+        async def fake_render(fn, *args):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+            return io.BytesIO(b"docx")
+
+        monkeypatch.setattr(bulk_documents, "render_in_pool", fake_render)
+        orders = [_order(f"DH-{n}", [DocumentItem("Gỏi", None, 1)]) for n in range(20)]
+        chunks = [c async for c in _service(orders, window=3).iter_zip()]
+
+        assert peak <= 3
+        assert len(chunks) > 10  # documents leave as they finish, not as one blob
+        assert len(zipfile.ZipFile(io.BytesIO(b"".join(chunks))).namelist()) == 40
+
+    @pytest.mark.asyncio
+    async def test_failed_render_is_reported_not_fatal(self, monkeypatch):
+        async def flaky(fn, *args):
+            if fn is bulk_documents.generate_menu_docx:
+                raise ValueError("broken template")
+            return io.BytesIO(b"docx")
+
+        monkeypatch.setattr(bulk_documents, "render_in_pool", flaky)
+        data = await _collect(_service([_order("DH-1", [DocumentItem("Gỏi", None, 1)])]).iter_zip())
+        archive = zipfile.ZipFile(io.BytesIO(data))
+        assert archive.namelist() == ["HopDong-DH-1.docx", "errors.txt"]
+        assert "broken template" in archive.read("errors.txt").decode()
+
+
+class TestQuery:
+    def test_single_joined_query_with_event_day_window(self):
+        stmt = BulkDocumentService(db=None, tenant_id=uuid4()).orders_query(
+            start_date=date(2026, 5, 2), end_date=date(2026, 5, 3)
+        )
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "LEFT OUTER JOIN order_items" in sql
+        assert "orders.status != " in sql
+        assert "orders.event_date >= " in sql and "orders.event_date < " in sql
+
+    def test_order_ids_skip_date_and_status_filters(self):
+        stmt = BulkDocumentService(db=None, tenant_id=uuid4()).orders_query(order_ids=[uuid4()])
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        assert "orders.id IN" in sql
+        assert "orders.status" not in sql
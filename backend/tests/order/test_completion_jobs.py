@@ -0,0 +1,103 @@
+"""
+Unit tests for the order completion outbox jobs.
+
+Covers what complete_order enqueues and the idempotency guards that make
+the jobs safe to retry and to re-run after reopen -> complete.
+"""
+import pytest
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+# Register related mappers so model instances can be constructed
+import backend.modules.inventory.domain.models  # noqa: F401
+from backend.core.tasks.outbox import JOB_REGISTRY
+from backend.modules.order.application import completion_jobs
+from backend.modules.order.domain.models import OrderModel
+
+
+def _order(status="COMPLETED", customer_id=None):
+    return OrderModel(id=uuid4(), tenant_id=uuid4(), code="DH-001", status=status,
+                      customer_id=customer_id, final_amount=Decimal("2500000"))
+
+
+def _result(scalar=None, rows=None):
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = scalar
+    result.all.return_value = rows or []
+    return result
+
+
+def _db(*results):
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=list(results))
+    db.commit = AsyncMock()
+    return db
+
+
+class TestEnqueue:
+    @pytest.mark.asyncio
+    async def test_customer_order_enqueues_all_jobs(self):
+        order = _order(customer_id=uuid4())
+        with patch.object(completion_jobs, "enqueue_job", AsyncMock()) as enqueue:
+            await completion_jobs.enqueue_completion_jobs(MagicMock(), order.tenant_id, order)
+
+        names = [c.args[2] for c in enqueue.await_args_list]
+        assert set(names) == {
+            completion_jobs.JOB_DEDUCT_INVENTORY, completion_jobs.JOB_CREATE_TIMESHEETS,
+            completion_jobs.JOB_EARN_LOYALTY_POINTS,
+        }
+        for c in enqueue.await_args_list:
+            assert c.kwargs["payload"] == {"order_id": str(order.id)}
+            assert c.kwargs["dedupe_key"] == f"{c.args[2]}:{order.id}"
+
+    @pytest.mark.asyncio
+    async def test_walk_in_order_skips_crm_jobs(self):
+        order = _order()
+        with patch.object(completion_jobs, "enqueue_job", AsyncMock()) as enqueue:
+            await completion_jobs.enqueue_completion_jobs(MagicMock(), order.tenant_id, order)
+        assert len(enqueue.await_args_list) == 2
+
+    def test_jobs_are_registered(self):
+        for name in (completion_jobs.JOB_DEDUCT_INVENTORY, completion_jobs.JOB_CREATE_TIMESHEETS,
+                     completion_jobs.JOB_RECALCULATE_CRM_STATS, completion_jobs.JOB_EARN_LOYALTY_POINTS):
+            assert name in JOB_REGISTRY
+
+
+class TestGuards:
+    @pytest.mark.asyncio
+    async def test_reopened_order_is_skipped(self):
+        order = _order(status="IN_PROGRESS", customer_id=uuid4())
+        db = _db(_result(order))
+        await completion_jobs.earn_order_loyalty_points(db, order.tenant_id, {"order_id": str(order.id)})
+        assert db.execute.await_count == 1
+        db.commit.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_inventory_already_deducted_is_skipped(self):
+        order = _order()
+        order.items = [MagicMock(menu_item_id=uuid4(), quantity=10)]
+        db = _db(_result(order), _result(uuid4()))
+        with patch("backend.modules.inventory.domain.bom_deduction.BillOfMaterialsService") as bom:
+            await completion_jobs.deduct_order_inventory(db, order.tenant_id, {"order_id": str(order.id)})
+        bom.assert_not_called()
+        db.commit.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_points_not_earned_twice(self):
+        order = _order(customer_id=uuid4())
+        db = _db(_result(order), _result(rows=[("EARN", 1)]))
+        with patch("backend.modules.crm.application.loyalty_service.LoyaltyService") as loyalty:
+            await completion_jobs.earn_order_loyalty_points(db, order.tenant_id, {"order_id": str(order.id)})
+        loyalty.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_points_earned_again_after_reversal(self):
+        order = _order(customer_id=uuid4())
+        db = _db(_result(order), _result(rows=[("EARN", 1), ("REVERSAL", 1)]))
+        with patch("backend.modules.crm.application.loyalty_service.LoyaltyService") as loyalty:
+            loyalty.return_value.earn_points = AsyncMock(return_value=250)
+            await completion_jobs.earn_order_loyalty_points(db, order.tenant_id, {"order_id": str(order.id)})
+        kwargs = loyalty.return_value.earn_points.await_args.kwargs
+        assert kwargs["reference_id"] == order.id
+        assert kwargs["amount"] == Decimal("2500000")
@@ -0,0 +1,114 @@
+"""
+Tests for the precompiled .docx templates (order/application/document_renderer.py)
+and the contract / menu generators built on them.
+"""
+import os
+import shutil
+import threading
+from datetime import datetime
+
+import pytest
+from docx import Document
+
+from backend.modules.order.application import contract_generator, menu_generator
+from backend.modules.order.application.contract_generator import ContractData, generate_contract_docx
+from backend.modules.order.application.document_renderer import DocxTemplateCache, render_in_pool
+from backend.modules.order.application.menu_generator import W_NS, generate_menu_docx
+
+
+def _contract(**overrides):
+    values = dict(
+        order_code="DH-0042", customer_name="Nguyễn Văn A", customer_phone="0909123456",
+        customer_address="12 Lê Lợi", event_date=datetime(2026, 5, 3), event_time="11:30",
+        event_address="Nhà hàng Giao Tuyết", table_count=20,
+        dish_names=["Gỏi ngó sen", "Gà <nướng> & mật ong"],
+        unit_price_per_table=5_000_000, total_amount=100_000_000,
+        deposit_amount=30_000_000, remaining_amount=70_000_000,
+    )
+    values.update(overrides)
+    return ContractData(**values)
+
+
+def _texts(buffer):
+    doc = Document(buffer)
+    cell_texts = [p.text for p in doc.tables[0].rows[0].cells[0].paragraphs]
+    return [p.text for p in doc.paragraphs], cell_texts
+
+
+class TestContract:
+    def test_placeholders_are_filled(self):
+        texts, cell_texts = _texts(generate_contract_docx(_contract()))
+        assert "Số : DH-0042" in cell_texts
+        assert "Ông/Bà: Nguyễn Văn A" in texts
+        assert "Thời gian đãi tiệc : 11:30 ngày 03/05/2026" in texts
+        assert "Thời gian kết thúc tiệc: 15:30 ngày 03/05/2026" in texts
+        assert "Số Bàn Tiệc : 20 bàn" in texts
+        assert "Tổng Cộng Thanh Toán : 100.000.000 đ" in texts
+        assert "Lần 1 : 30.000.000 đ khi ký hợp đồng." in texts
+        assert "Viết bằng chữ: Bảy mươi triệu đồng" in texts
+
+    def test_unused_dish_slots_are_removed(self):
+        texts, _ = _texts(generate_contract_docx(_contract()))
+        start = next(i for i, t in enumerate(texts) if "Thực Đơn" in t)
+        price = next(i for i, t in enumerate(texts) if "Đơn Giá" in t)
+        assert texts[start + 1:price] == ["Gỏi ngó sen", "Gà <nướng> & mật ong"]
+
+    def test_renders_do_not_leak_into_each_other(self):
+        generate_contract_docx(_contract(customer_name="Khách 1", dish_names=["Món 1"]))
+        texts, _ = _texts(generate_contract_docx(_contract(customer_name="Khách 2")))
+        assert "Ông/Bà: Khách 2" in texts
+        assert "Ông/Bà: Khách 1" not in texts
+        assert "Gà <nướng> & mật ong" in texts
+
+    def test_unparseable_event_time_keeps_template_end_time(self):
+        template_texts = [p.text for p in Document(str(contract_generator.TEMPLATE_PATH)).paragraphs]
+        texts, _ = _texts(generate_contract_docx(_contract(event_time="chiều")))
+        end_line = next(t for t in template_texts if "Thời gian kết thúc tiệc" in t)
+        assert end_line in texts
+
+
+class TestMenu:
+    def test_every_text_box_gets_the_dishes(self):
+        doc = Document(generate_menu_docx(["Tôm chiên", "Lẩu cá"]))
+        boxes = doc.element.body.findall(f".//{{{W_NS}}}txbxContent")
+        filled = [
+            ["".join(t.text or "" for t in p.iter(f"{{{W_NS}}}t")) for p in box.findall(f"{{{W_NS}}}p")]
+            for box in boxes
+        ]
+        filled = [texts for texts in filled if len(texts) > 1]
+        assert filled
+        assert all(texts[-2:] == ["Tôm chiên", "Lẩu cá"] for texts in filled)
+
+
+class TestTemplateCache:
+    def test_compiled_once_and_reloaded_when_file_changes(self, tmp_path):
+        path = tmp_path / "contract.docx"
+        shutil.copy(contract_generator.TEMPLATE_PATH, path)
+        cache = DocxTemplateCache()
+        indexer = contract_generator._index_contract_template
+
+        first = cache.get(path, indexer)
+        assert cache.get(path, indexer) is first
+        assert (cache.hits, cache.misses) == (1, 1)
+
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert cache.get(path, indexer) is not first
+
+    def test_missing_template_raises(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            DocxTemplateCache().get(tmp_path / "missing.docx", menu_generator._index_menu_template)
+
+
+@pytest.mark.asyncio
+async def test_render_in_pool_runs_off_the_event_loop():
+    loop_thread = threading.get_ident()
+    seen = []
+
+    def render(names):
+        seen.append(threading.get_ident())
+        return generate_menu_docx(names)
+
+    buffer = await render_in_pool(render, ["Gỏi"])
+    assert buffer.getvalue()[:2] == b"PK"
+    assert seen and seen[0] != loop_thread
@@ -0,0 +1,169 @@
+"""
+Tests for the batched pull-sheet planner (inventory/domain/pull_sheet_planner.py).
+
+The planner's queries are replaced with canned rows (no database); the
+statement count test runs against a fake session.
+"""
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+
+import backend.modules.inventory.domain.models  # noqa: F401
+from backend.modules.inventory.domain.pull_sheet_planner import (
+    STATUS_INSUFFICIENT,
+    STATUS_NOT_LINKED,
+    STATUS_SUFFICIENT,
+    PullSheetPlanner,
+    WarehouseNameCache,
+)
+
+BEEF, RICE = uuid4(), uuid4()
+WH_MAIN, WH_COLD = uuid4(), uuid4()
+
+
+def _row(order_id, item_name, quantity, ingredient=None, per_unit=None, menu_item_id=None):
+    return SimpleNamespace(
+        order_id=order_id, order_item_id=uuid4(), item_name=item_name, quantity=quantity, uom="bàn",
+        menu_item_id=menu_item_id or uuid4(),
+        ingredient_id=ingredient, ingredient_name={BEEF: "Bò", RICE: "Gạo"}.get(ingredient),
+        quantity_per_unit=Decimal(per_unit) if per_unit is not None else None, recipe_uom="kg",
+    )
+
+
+def _lot(item_id, number, remaining, warehouse=WH_MAIN, expiry=None):
+    return SimpleNamespace(
+        id=uuid4(), item_id=item_id, lot_number=number, expiry_date=expiry,
+        warehouse_id=warehouse, remaining_quantity=Decimal(remaining),
+    )
+
+
+def _planner(rows, lots, has_inventory=True):
+    planner = PullSheetPlanner(db=None, tenant_id=uuid4(), warehouse_cache=WarehouseNameCache(ttl=0))
+    calls = {"explode": 0, "lots": 0, "exists": 0}
+
+    async def explode(order_ids):
+        calls["explode"] += 1
+        return [r for r in rows if r.order_id in order_ids]
+
+    async def load_lots(ingredient_ids):
+        calls["lots"] += 1
+        wanted = set(ingredient_ids)
+        return [lot for lot in lots if lot.item_id in wanted]
+
+    async def has_inventory_items():
+        calls["exists"] += 1
+        return has_inventory
+
+    async def warehouse_names():
+        return {WH_MAIN: "Kho chính", WH_COLD: "Kho lạnh"}
+
+    planner.explode, planner.load_lots = explode, load_lots
+    planner.has_inventory_items, planner.warehouse_names = has_inventory_items, warehouse_names
+    return planner, calls
+
+
+class TestSingleOrder:
+    @pytest.mark.asyncio
+    async def test_fifo_picks_and_shortfall(self):
+        order = uuid4()
+        planner, calls = _planner(
+            rows=[_row(order, "Bò lúc lắc", 10, BEEF, "0.5"), _row(order, "Cơm chiên", 10, RICE, "0.2")],
+            lots=[
+                _lot(BEEF, "B-1", 3, WH_COLD, datetime(2026, 5, 1)),
+                _lot(BEEF, "B-2", 10, WH_MAIN, datetime(2026, 6, 1)),
+                _lot(RICE, "R-1", 1),
+            ],
+        )
+        lines = (await planner.plan([order])).for_order(order).lines
+
+        beef, rice = lines
+        assert beef.item_name == "Bò (cho Bò lúc lắc)"
+        assert beef.quantity_needed == Decimal("5.0")
+        assert [(p.lot_number, p.available_qty, p.to_pick_qty) for p in beef.lots] == [
+            ("B-1", 3, 3), ("B-2", 10, 2),
+        ]
+        assert beef.status == STATUS_SUFFICIENT and beef.warehouse == "Kho lạnh"
+        assert rice.status == STATUS_INSUFFICIENT and rice.shortfall == Decimal("1.0")
+        assert calls == {"explode": 1, "lots": 1, "exists": 0}
+
+    @pytest.mark.asyncio
+    async def test_dish_without_recipe_is_not_linked(self):
+        order = uuid4()
+        menu_item = uuid4()
+        rows = [_row(order, "Lẩu", 5, menu_item_id=menu_item)]
+
+        planner, calls = _planner(rows, lots=[])
+        line = (await planner.plan([order])).for_order(order).lines[0]
+        assert line.status == STATUS_NOT_LINKED
+        assert line.item_name == "Lẩu (chưa có công thức)"
+        assert line.inventory_item_id == menu_item and line.warehouse == "Cần thiết lập Recipe"
+        assert calls["exists"] == 1
+
+        planner, _ = _planner(rows, lots=[], has_inventory=False)
+        line = (await planner.plan([order])).for_order(order).lines[0]
+        assert (line.item_name, line.inventory_item_id, line.warehouse) == ("Lẩu", None, None)
+
+    @pytest.mark.asyncio
+    async def test_missing_lots_fall_back_to_default_warehouse(self):
+        order = uuid4()
+        planner, _ = _planner([_row(order, "Bò kho", 2, BEEF, "1")], lots=[])
+        line = (await planner.plan([order])).for_order(order).lines[0]
+        assert line.warehouse == "Kho chính"
+        assert line.lots == [] and line.shortfall == Decimal("2")
+
+
+class TestSharedAllocation:
+    @pytest.mark.asyncio
+    async def test_lots_are_not_double_booked_across_orders(self):
+        first, second = uuid4(), uuid4()
+        planner, calls = _planner(
+            rows=[_row(first, "Bò lúc lắc", 4, BEEF, "1"), _row(second, "Bò nướng", 4, BEEF, "1")],
+            lots=[_lot(BEEF, "B-1", 3), _lot(BEEF, "B-2", 3)],
+        )
+        plan = await planner.plan([first, second])
+
+        a = plan.for_order(first).lines[0]
+        b = plan.for_order(second).lines[0]
+        assert [(p.lot_number, p.to_pick_qty) for p in a.lots] == [("B-1", 3), ("B-2", 1)]
+        assert [(p.lot_number, p.available_qty, p.to_pick_qty) for p in b.lots] == [("B-2", 2, 2)]
+        assert b.shortfall == 2
+
+        (beef,) = plan.ingredients
+        assert (beef.quantity_needed, beef.quantity_picked, beef.shortfall) == (8, 6, 2)
+        assert beef.order_ids == [first, second]
+        assert calls == {"explode": 1, "lots": 1, "exists": 0}
+
+
+class TestQueries:
+    @pytest.mark.asyncio
+    async def test_statement_count_is_fixed(self):
+        orders = [uuid4() for _ in range(3)]
+        explode_rows = [_row(o, f"Món {n}", 10, BEEF if n % 2 else RICE, "1") for o in orders for n in range(20)]
+        results = iter([explode_rows, [_lot(BEEF, "B-1", 1000), _lot(RICE, "R-1", 1000)], [(WH_MAIN, "Kho chính")]])
+        statements = []
+
+        class FakeResult:
+            def __init__(self, rows):
+                self.rows = rows
+
+            def all(self):
+                return self.rows
+
+            def __iter__(self):
+                return iter(SimpleNamespace(id=r[0], name=r[1]) for r in self.rows)
+
+        class FakeSession:
+            async def execute(self, stmt):
+                statements.append(stmt)
+                return FakeResult(next(results))
+
+        cache = WarehouseNameCache(ttl=60)
+        plan = await PullSheetPlanner(FakeSession(), uuid4(), warehouse_cache=cache).plan(orders)
+
+        assert len(statements) == 3
+        assert sum(len(o.lines) for o in plan.orders) == 60
+        assert all(line.warehouse == "Kho chính" for o in plan.orders for line in o.lines)
+        assert "LEFT OUTER JOIN recipes" in str(statements[0])
@@ -30,7 +30,7 @@ class TestQuoteCodeGeneration:
         
         mock_db = AsyncMock()
         mock_result = MagicMock()
-        mock_result.first.return_value = None
+        mock_result.scalar_one.return_value = 1  # counter upsert
         mock_db.execute.return_value = mock_result
         
         code = await generate_quote_code(mock_db)
@@ -45,7 +45,7 @@ class TestQuoteCodeGeneration:
         
         mock_db = AsyncMock()
         mock_result = MagicMock()
-        mock_result.first.return_value = None
+        mock_result.scalar_one.return_value = 1  # counter upsert
         mock_db.execute.return_value = mock_result
         
         code = await generate_order_code(mock_db)
@@ -0,0 +1,109 @@
+"""
+Unit tests for the per-process principal cache used by get_current_user.
+"""
+import time
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+from backend.core.auth.principal_cache import PrincipalCache, principal_cache
+from backend.core.auth.schemas import User as UserSchema
+from backend.core.auth.security import create_access_token
+from backend.core import dependencies
+
+
+def _principal(role="manager", tenant_id=None):
+    user_id = uuid4()
+    return UserSchema(
+        id=user_id, tenant_id=tenant_id or uuid4(), email="staff@example.com",
+        full_name="Staff", is_active=True,
+        role={"id": user_id, "code": role, "name": role.upper(), "permissions": []},
+        created_at=datetime.now(), updated_at=datetime.now(),
+    )
+
+
+class TestPrincipalCache:
+    def test_hit_and_miss_counters(self):
+        cache = PrincipalCache(maxsize=10, ttl=30)
+        p = _principal()
+
+        assert cache.get("deps", "tok") is None
+        cache.put("deps", "tok", p)
+        assert cache.get("deps", "tok") is p
+        assert cache.get("auth", "tok") is None  # namespaces are separate
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+
+    def test_lru_eviction_is_bounded(self):
+        cache = PrincipalCache(maxsize=2, ttl=30)
+        cache.put("deps", "a", _principal())
+        cache.put("deps", "b", _principal())
+        cache.get("deps", "a")  # a becomes most recently used
+        cache.put("deps", "c", _principal())
+
+        assert cache.get("deps", "b") is None
+        assert cache.get("deps", "a") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_and_token_expiry(self):
+        cache = PrincipalCache(maxsize=10, ttl=0.01)
+        cache.put("deps", "tok", _principal())
+        time.sleep(0.02)
+        assert cache.get("deps", "tok") is None
+
+        cache = PrincipalCache(maxsize=10, ttl=30)
+        cache.put("deps", "tok", _principal(), token_exp=time.time() - 1)
+        assert cache.get("deps", "tok") is None
+
+    def test_invalidate_user_drops_all_tokens(self):
+        cache = PrincipalCache(maxsize=10, ttl=30)
+        p = _principal()
+        cache.put("deps", "t1", p)
+        cache.put("auth", "t2", p)
+        cache.put("deps", "other", _principal())
+
+        assert cache.invalidate_user(p.id) == 2
+        assert cache.get("deps", "other") is not None
+
+    def test_invalidate_role_is_tenant_scoped(self):
+        cache = PrincipalCache(maxsize=10, ttl=30)
+        tenant = uuid4()
+        cache.put("deps", "a", _principal("chef", tenant))
+        cache.put("deps", "b", _principal("chef"))
+        cache.put("deps", "c", _principal("sales", tenant))
+
+        assert cache.invalidate_role(tenant, "chef") == 1
+        assert cache.get("deps", "b") is not None
+        assert cache.get("deps", "c") is not None
+
+    def test_disabled_when_ttl_zero(self):
+        cache = PrincipalCache(maxsize=10, ttl=0)
+        cache.put("deps", "tok", _principal())
+        assert cache.get("deps", "tok") is None
+
+
+@pytest.mark.asyncio
+class TestGetCurrentUserCaching:
+    async def test_second_call_costs_no_round_trip(self):
+        principal_cache.clear()
+        user_id, tenant_id = uuid4(), uuid4()
+        token = create_access_token({"sub": str(user_id), "tenant_id": str(tenant_id)})
+        row = (user_id, tenant_id, "a@b.com", "A", True, "manager", datetime.now(), datetime.now())
+
+        db = MagicMock()
+        result = MagicMock()
+        result.fetchone.return_value = row
+        db.execute = AsyncMock(return_value=result)
+        db.in_transaction.return_value = False
+        db.info = {}
+
+        first = await dependencies.get_current_user(token, db)
+        second = await dependencies.get_current_user(token, db)
+
+        assert second is first
+        assert db.execute.await_count == 1
+        # RLS settings are queued for the session's next transaction instead
+        assert db.info["pending_rls_config"]["app.current_tenant"] == str(tenant_id)
@@ -3,6 +3,7 @@
 import { useState, useEffect } from 'react';
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query';
 import { api } from '@/lib/api';
+import { useNotificationStream } from '@/hooks/use-notification-stream';
 import { Button } from '@/components/ui/button';
 import { Badge } from '@/components/ui/badge';
 import {
@@ -39,13 +40,16 @@ export default function NotificationBell() {
     const queryClient = useQueryClient();
     const [isOpen, setIsOpen] = useState(false);
 
+    // Live count over /ws/notifications; poll only while the socket is down
+    const streaming = useNotificationStream();
+
     // Get unread count
     const { data: countData } = useQuery({
         queryKey: ['notifications-count'],
         queryFn: async () => {
             return await api.get<{ unread_count: number }>('/notifications/count');
         },
-        refetchInterval: 30000, // Refetch every 30 seconds
+        refetchInterval: streaming ? false : 30000, // Fallback: refetch every 30 seconds
     });
 
     // Get notifications list
@@ -64,7 +68,8 @@ export default function NotificationBell() {
         },
         onSuccess: () => {
             queryClient.invalidateQueries({ queryKey: ['notifications'] });
-            queryClient.invalidateQueries({ queryKey: ['notifications-count'] });
+            // The socket pushes the count change itself
+            if (!streaming) queryClient.invalidateQueries({ queryKey: ['notifications-count'] });
         },
     });
 
@@ -75,7 +80,8 @@ export default function NotificationBell() {
         },
         onSuccess: () => {
             queryClient.invalidateQueries({ queryKey: ['notifications'] });
-            queryClient.invalidateQueries({ queryKey: ['notifications-count'] });
+            // The socket pushes the count change itself
+            if (!streaming) queryClient.invalidateQueries({ queryKey: ['notifications-count'] });
         },
     });
 
@@ -5,6 +5,7 @@ import { usePathname } from 'next/navigation';
 import { cn } from '@/lib/utils';
 import { usePermission } from '@/hooks/usePermission';
 import { useMyTenant } from '@/hooks/use-tenants';
+import { useNotificationBadges } from '@/hooks/use-notification-stream';
 import {
     Sheet,
     SheetContent,
@@ -25,9 +26,10 @@ import {
     IconChefHat,
 } from '@tabler/icons-react';
 
-const navigation = [
+// badge: key of the live counts pushed over /ws/notifications
+const navigation: { name: string; href: string; icon: typeof IconHome; badge?: string }[] = [
     { name: 'Dashboard', href: '/dashboard', icon: IconHome },
-    { name: 'Báo giá', href: '/quote', icon: IconFileText },
+    { name: 'Báo giá', href: '/quote', icon: IconFileText, badge: 'quotes_expiring' },
     { name: 'Đơn hàng', href: '/orders', icon: IconShoppingCart },
     { name: 'Khách hàng', href: '/crm', icon: IconUsers },
     { name: 'Thực đơn', href: '/menu', icon: IconChefHat },
@@ -48,6 +50,7 @@ export function Sidebar({ mobileOpen = false, onMobileClose }: SidebarProps) {
     const pathname = usePathname();
     const { filterNavigation } = usePermission();
     const { data: tenant } = useMyTenant();
+    const badges = useNotificationBadges();
 
     // Filter navigation items based on user's role permissions
     const visibleNavigation = filterNavigation(navigation);
@@ -85,6 +88,7 @@ export function Sidebar({ mobileOpen = false, onMobileClose }: SidebarProps) {
                 <ul role="list" className="flex flex-1 flex-col gap-y-1">
                     {visibleNavigation.map((item) => {
                         const isActive = pathname === item.href || pathname.startsWith(item.href + '/');
+                        const badgeCount = item.badge ? badges[item.badge] ?? 0 : 0;
                         return (
                             <li key={item.name}>
                                 <Link
@@ -104,6 +108,11 @@ export function Sidebar({ mobileOpen = false, onMobileClose }: SidebarProps) {
                                         )}
                                     />
                                     {item.name}
+                                    {badgeCount > 0 && (
+                                        <span className="ml-auto flex h-5 min-w-[20px] items-center justify-center rounded-full bg-accent-gradient px-1.5 text-[10px] font-bold">
+                                            {badgeCount > 99 ? '99+' : badgeCount}
+                                        </span>
+                                    )}
                                 </Link>
                             </li>
                         );
@@ -0,0 +1,119 @@
+'use client';
+
+import { useEffect, useState } from 'react';
+import { useQuery, useQueryClient } from '@tanstack/react-query';
+import { API_BASE_URL } from '@/lib/api';
+import { useAuthStore } from '@/stores/auth-store';
+
+// ============ TYPES ============
+
+export type NotificationBadges = Record<string, number>;
+
+type StreamMessage =
+ | { type: 'snapshot'; unread_count: number; badges: NotificationBadges }
+ | { type: 'notification'; unread_delta: number; notification: unknown }
+ | { type: 'notifications_read'; unread_delta: number; ids: string[] }
+ | { type: 'badges'; badges: NotificationBadges }
+ | { type: 'ping' | 'pong' };
+
+const MAX_RECONNECT_DELAY_MS = 30000;
+
+function streamUrl(token: string): string {
+ const origin = API_BASE_URL.replace(/\/api\/v1\/?$/, '').replace(/^http/, 'ws');
+ return `${origin}/ws/notifications?token=${encodeURIComponent(token)}`;
+}
+
+// ============ HOOK ============
+
+/**
+ * Server-push notification channel (/ws/notifications).
+ * Keeps ['notifications-count'] and ['notification-badges'] (read through
+ * useNotificationBadges) up to date from pushed deltas; returns whether the
+ * socket is live so callers can fall back to polling while it is not.
+ */
+export function useNotificationStream(): boolean {
+ const queryClient = useQueryClient();
+ const token = useAuthStore((state) => state.token);
+ const [connected, setConnected] = useState(false);
+
+ useEffect(() => {
+ if (!token || typeof window === 'undefined') return;
+
+ let socket: WebSocket | null = null;
+ let retryTimer: ReturnType<typeof setTimeout> | undefined;
+ let attempts = 0;
+ let closed = false;
+
+ const setCount = (update: (count: number) => number) => {
+ queryClient.setQueryData<{ unread_count: number }>(['notifications-count'], (old) => ({
+ unread_count: Math.max(0, update(old?.unread_count ?? 0)),
+ }));
+ };
+
+ const handle = (message: StreamMessage) => {
+ switch (message.type) {
+ case 'snapshot':
+ setCount(() => message.unread_count);
+ queryClient.setQueryData(['notification-badges'], message.badges);
+ break;
+ case 'notification':
+ case 'notifications_read':
+ setCount((count) => count + message.unread_delta);
+ queryClient.invalidateQueries({ queryKey: ['notifications'] });
+ break;
+ case 'badges':
+ queryClient.setQueryData(['notification-badges'], message.badges);
+ break;
+ }
+ };
+
+ const connect = () => {
+ socket = new WebSocket(streamUrl(token));
+ socket.onopen = () => {
+ attempts = 0;
+ setConnected(true);
+ };
+ socket.onmessage = (event) => {
+ try {
+ handle(JSON.parse(event.data) as StreamMessage);
+ } catch (e) {
+ console.error('Invalid notification stream message', e);
+ }
+ };
+ socket.onclose = () => {
+ setConnected(false);
+ if (closed) return;
+ // Exponential backoff, polling covers the gap
+ const delay = Math.min(1000 * 2 ** attempts, MAX_RECONNECT_DELAY_MS);
+ attempts += 1;
+ retryTimer = setTimeout(connect, delay);
+ };
+ };
+
+ connect();
+ return () => {
+ closed = true;
+ clearTimeout(retryTimer);
+ socket?.close();
+ setConnected(false);
+ };
+ }, [token, queryClient]);
+
+ return connected;
+}
+
+/**
+ * Badge counts pushed over the stream (e.g. quotes_expiring), keyed by badge.
+ * Never fetched: NotificationBell owns the socket and writes the cache; empty
+ * until the first snapshot.
+ */
+export function useNotificationBadges(): NotificationBadges {
+ const { data } = useQuery<NotificationBadges>({
+ queryKey: ['notification-badges'],
+ queryFn: () => ({}),
+ enabled: false,
+ initialData: {},
+ staleTime: Infinity,
+ });
+ return data;
+}